@@ -1,4 +1,5 @@
 import os
+import atexit
 import asyncio
 import threading
 import logging
@@ -6,6 +7,7 @@ from flask import Flask, redirect, url_for
 from werkzeug.middleware.proxy_fix import ProxyFix
 from app.extensions import db, migrate
 from app.utils.config import Config
+from app.utils.db_writer import db_writer
 from app.repositories import SettingsRepository
 from app.tasks.manager import TaskManager
 
@@ -68,7 +70,10 @@ def create_app(test_config=None):
     # Register API blueprint (needed for both regular and test modes)
     try:
         from app.api import bp as api_blueprint
+        from app.api.controllers import urls_controller
         app.register_blueprint(api_blueprint, url_prefix='/api')
+        # URLs added or refreshed through the API wake the task loop
+        urls_controller.task_manager = task_manager
     except (ImportError, AttributeError) as e:
         logger.warning(f"Could not register API blueprint: {e}")
 
@@ -99,9 +104,14 @@ def create_app(test_config=None):
             # Set the settings repository in the Config singleton
             settings_repo = SettingsRepository()
             config.set_settings_repository(settings_repo)
+            # Status checks and searches are spread over the configured engines from the start
+            config.configure_engine_pool()
 
             # Initialize async task manager only in non-testing mode 
             if not is_testing:
+                # Background writes go through one writer thread; pending ones are written at exit
+                db_writer.start(app)
+                atexit.register(db_writer.stop)
                 task_manager.init_app(app)
 
                 # Start task manager in a background thread
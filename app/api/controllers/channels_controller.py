@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from flask_restx import Namespace, Resource, fields, reqparse
 from flask import request
@@ -6,6 +5,8 @@ from sqlalchemy import or_
 from app.models import AcestreamChannel
 from app.models.scraped_url import ScrapedURL
 from app.repositories import ChannelRepository, URLRepository
+from app.utils.background_loop import background_loop
+from app.utils.config import Config
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
@@ -43,7 +44,11 @@ status_check_result_model = api.model('StatusCheckResult', {
     'is_online': fields.Boolean(description='Whether the channel is online'),
     'status': fields.String(description='Channel status: online/offline'),
     'last_checked': fields.DateTime(description='When the channel status was checked'),
-    'error': fields.String(description='Error message, if any')
+    'error': fields.String(description='Error message, if any'),
+    'cache_hit': fields.Boolean(description='Whether the result was shared rather than checked for this request'),
+    'cache': fields.String(description='How the result was served: hit (recent result), shared (joined a check '
+                                       'in flight) or miss (checked for this request)'),
+    'cache_age': fields.Float(description='Seconds since the result was checked, for cache hits')
 })
 
 channels_source_model = api.model('ChannelSource', {
@@ -278,32 +283,34 @@ class ChannelStatusCheck(Resource):
     def post(self, channel_id):
         """Check online status for a specific channel."""
         try:
-            # Just verify the channel exists
             channel = channel_repo.get_by_id(channel_id)
             if not channel:
                 api.abort(404, 'Channel not found')
-            
-            # Instead of passing the ORM object, just pass the ID
-            from app.services.channel_status_service import check_channel_status
-            
-            # Pass only the channel ID to the async function
-            result = asyncio.run(check_channel_status(channel_id))
-            
-            # Return the result - no need to access ORM object here
-            return {
-                'id': result['id'],
-                'name': result['name'],
-                'status': result['status'],
-                'is_online': result['is_online'],
-                'last_checked': result['last_checked'],
-                'error': result.get('error', None)
-            }
+
+            from flask import current_app
+            from app.services.channel_status_service import check_channel_status_shared
+
+            # On the persistent background loop: its engine connections are reused, and requests
+            # for the same channel share one check and its result for a while
+            return background_loop.run(check_channel_status_shared(
+                current_app._get_current_object(), channel, Config().status_cache_ttl))
         except Exception as e:
             logger.error(f"Error checking channel status: {e}", exc_info=True)
             api.abort(500, str(e))
 
 @api.route('/check-status')
 class ChannelBatchStatusCheck(Resource):
+    @api.doc('get_status_check_progress')
+    @api.response(404, 'No status check has run')
+    def get(self):
+        """Get progress of the running or last background status check."""
+        from app.services.channel_status_service import get_sweep_progress
+
+        progress = get_sweep_progress()
+        if progress is None:
+            return {'message': 'No status check has run'}, 404
+        return progress
+
     @api.doc('check_all_channels_status')
     @api.response(202, 'Status check initiated')
     def post(self):
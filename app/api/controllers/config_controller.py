@@ -7,6 +7,7 @@ from app.utils.config import Config
 from app.extensions import db
 import logging
 from app.services.acestream_status_service import AcestreamStatusService
+from app.utils.engine_pool import engine_pool
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +25,20 @@ ace_engine_url_model = api.model('AceEngineURL', {
     'ace_engine_url': fields.String(required=True, description='URL for Acestream Engine')
 })
 
+ace_engine_urls_model = api.model('AceEngineURLs', {
+    'ace_engine_urls': fields.List(fields.String, required=True,
+                                   description='URLs of the Acestream Engines status checks and searches are spread over')
+})
+
 rescrape_interval_model = api.model('RescrapeInterval', {
     'hours': fields.Integer(required=True, description='Hours between automatic rescans')
 })
 
+rescrape_bounds_model = api.model('RescrapeBounds', {
+    'min_minutes': fields.Integer(description='Shortest adaptive interval, for URLs whose content keeps changing'),
+    'max_minutes': fields.Integer(description='Longest adaptive interval, for URLs whose content never changes')
+})
+
 acexy_status_model = api.model('AcexyStatus', {
     'enabled': fields.Boolean(description='Whether Acexy is enabled'),
     'available': fields.Boolean(description='Whether Acexy is available'),
@@ -42,7 +53,8 @@ acestream_status_model = api.model('AcestreamStatus', {
     'version': fields.String(description='Acestream Engine version'),
     'platform': fields.String(description='Platform'),
     'playlist_loaded': fields.Boolean(description='Whether playlist is loaded'),
-    'connected': fields.Boolean(description='Whether engine is connected to network')
+    'connected': fields.Boolean(description='Whether engine is connected to network'),
+    'engines': fields.List(fields.Raw, description='Health and load of each engine of the pool')
 })
 
 status_check_interval_model = api.model('StatusCheckInterval', {
@@ -87,6 +99,35 @@ class AceEngineURL(Resource):
         except Exception as e:
             api.abort(500, str(e))
 
+@api.route('/ace_engine_urls')
+class AceEngineURLs(Resource):
+    @api.doc('get_ace_engine_urls')
+    def get(self):
+        """Get the Acestream Engine URLs status checks and searches are spread over."""
+        try:
+            config = Config()
+            return {"ace_engine_urls": config.ace_engine_urls}
+        except Exception as e:
+            api.abort(500, str(e))
+
+    @api.doc('update_ace_engine_urls')
+    @api.expect(ace_engine_urls_model)
+    def put(self):
+        """Update the Acestream Engine URLs status checks and searches are spread over."""
+        data = request.json or {}
+        urls = data.get('ace_engine_urls')
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls or not all(isinstance(url, str) and url.strip() for url in urls):
+            api.abort(400, "ace_engine_urls must be a non-empty list of URLs")
+        
+        try:
+            config = Config()
+            config.ace_engine_urls = [url.strip() for url in urls]
+            return {"message": "Ace Engine URLs updated successfully", "ace_engine_urls": engine_pool.urls}
+        except Exception as e:
+            api.abort(500, str(e))
+
 @api.route('/rescrape_interval')
 class RescrapeInterval(Resource):
     @api.doc('get_rescrape_interval')
@@ -115,6 +156,41 @@ class RescrapeInterval(Resource):
         except Exception as e:
             api.abort(500, str(e))
 
+@api.route('/rescrape_bounds')
+class RescrapeBounds(Resource):
+    @api.doc('get_rescrape_bounds')
+    def get(self):
+        """Get the bounds of the adaptive per-URL rescrape interval."""
+        try:
+            config = Config()
+            return {"min_minutes": config.rescrape_min_interval, "max_minutes": config.rescrape_max_interval}
+        except Exception as e:
+            api.abort(500, str(e))
+    
+    @api.doc('update_rescrape_bounds')
+    @api.expect(rescrape_bounds_model)
+    def put(self):
+        """Update the bounds of the adaptive per-URL rescrape interval."""
+        data = request.json or {}
+        min_minutes = data.get('min_minutes')
+        max_minutes = data.get('max_minutes')
+        
+        if min_minutes is None and max_minutes is None:
+            api.abort(400, "min_minutes or max_minutes is required")
+        
+        try:
+            config = Config()
+            if min_minutes is not None:
+                config.rescrape_min_interval = max(1, int(min_minutes))
+            if max_minutes is not None:
+                config.rescrape_max_interval = max(1, int(max_minutes))
+            return {"message": "Rescrape bounds updated successfully",
+                    "min_minutes": config.rescrape_min_interval, "max_minutes": config.rescrape_max_interval}
+        except ValueError:
+            api.abort(400, "min_minutes and max_minutes must be integers")
+        except Exception as e:
+            api.abort(500, str(e))
+
 @api.route('/acexy_status')
 class AcexyStatus(Resource):
     @api.doc('get_acexy_status')
@@ -209,12 +285,10 @@ class AcestreamStatus(Resource):
     @api.marshal_with(acestream_status_model)
     def get(self):
         """Get Acestream Engine status."""
-        config = Config()
-        
-        # Create service instance and get status
-        service = AcestreamStatusService(engine_url=config.ace_engine_url)
+        # One engine of the pool is checked; the pool reports on all of them
+        service = AcestreamStatusService()
         status = service.check_status()
-        
+        status['engines'] = engine_pool.get_stats()['engines']
         return status
 
 @api.route('/addpid')
@@ -8,6 +8,8 @@ from app.repositories.epg_source_repository import EPGSourceRepository
 from app.repositories.epg_string_mapping_repository import EPGStringMappingRepository
 from app.repositories.epg_channel_repository import EPGChannelRepository
 from app.services.epg_service import EPGService
+from app.services.epg_mapping_rules import invalidate_mapping_rules
+from app.services.epg_source_cache import epg_source_cache
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +41,9 @@ auto_scan_model = api.model('AutoScan', {
 # Update options model for EPG channel updates
 update_channels_model = api.model('UpdateChannels', {
     'respect_existing': fields.Boolean(required=False, description='Don\'t modify channels that already have EPG data', default=False),
-    'clean_unmatched': fields.Boolean(required=False, description='Clean EPG data if no match is found', default=False)
+    'clean_unmatched': fields.Boolean(required=False, description='Clean EPG data if no match is found', default=False),
+    'dry_run': fields.Boolean(required=False, description='Return the planned changes without writing them', default=False),
+    'commit_every_chunk': fields.Boolean(required=False, description='Commit after every chunk of updates to release the database lock sooner', default=False)
 })
 
 # Endpoints for EPG sources
@@ -93,6 +97,7 @@ class EPGSourceResource(Resource):
         if not source:
             api.abort(404, f"EPG source with ID {id} not found")
         
+        epg_source_cache.invalidate(source)
         repo.delete(source)
         return {'message': f'EPG source {id} deleted'}, 200
 
@@ -153,6 +158,7 @@ class EPGStringMappingListResource(Resource):
         
         try:
             repo.create(mapping)
+            invalidate_mapping_rules()
             return mapping, 201
         except Exception as e:
             logger.error(f"Error creating EPG mapping: {str(e)}")
@@ -168,6 +174,7 @@ class EPGStringMappingResource(Resource):
             api.abort(404, f"Mapping with ID {id} not found")
         
         repo.delete(mapping)
+        invalidate_mapping_rules()
         return {'message': f'Mapping {id} deleted'}, 200
 
 # Endpoints for EPG operations
@@ -179,7 +186,8 @@ class EPGRefreshResource(Resource):
         data = service.fetch_epg_data()
         return {
             'message': 'EPG data refreshed successfully',
-            'channels_found': len(data)
+            'channels_found': len(data),
+            'stats': service.refresh_stats
         }
 
 @api.route('/update-channels')
@@ -192,13 +200,24 @@ class EPGUpdateChannelsResource(Resource):
             data = request.get_json() or {}
             respect_existing = data.get('respect_existing', False)
             clean_unmatched = data.get('clean_unmatched', False)
+            dry_run = data.get('dry_run', False)
             
             service = EPGService()
             stats = service.update_all_channels_epg(
                 respect_existing=respect_existing,
-                clean_unmatched=clean_unmatched
+                clean_unmatched=clean_unmatched,
+                dry_run=dry_run,
+                commit_every_chunk=data.get('commit_every_chunk', False)
             )
             
+            if dry_run:
+                changes = stats.pop('changes')
+                return {
+                    'message': f'Dry run: {len(changes)} channels would change',
+                    'stats': stats,
+                    'changes': changes
+                }
+            
             return {
                 'message': 'Channel EPG update process completed',
                 'stats': stats
@@ -1,15 +1,19 @@
 from flask_restx import Namespace, Resource, fields, reqparse
-from flask import Response, redirect, request, current_app
+from flask import redirect, request, current_app
 import time
 from datetime import datetime, timezone
 from app.models import AcestreamChannel
 from app.services.playlist_service import PlaylistService
+from app.services.artifact_cache import serve_artifact
 from app.repositories import URLRepository
 from app.services import ScraperService
 from app.repositories.tv_channel_repository import TVChannelRepository
 
 api = Namespace('playlists', description='Playlist management operations')
 
+# The EPG guide covers a window around "now", so it is re-rendered at least this often
+EPG_GUIDE_MAX_AGE = 300
+
 playlist_parser = reqparse.RequestParser()
 playlist_parser.add_argument('refresh', type=bool, required=False, default=False,
                           help='Whether to refresh the playlist before returning')
@@ -40,18 +44,16 @@ class M3UPlaylist(Resource):
             except Exception as e:
                 api.abort(500, f"Error during playlist refresh: {str(e)}")
         
-        playlist_service = PlaylistService()
-        playlist = playlist_service.generate_playlist(search_term=search)
-        
         filename = f"acestream_playlist_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
         if search:
             filename += f"_filtered"
         filename += ".m3u"
         
-        return Response(
-            playlist,
+        return serve_artifact(
+            'playlist.m3u', {'search': search, 'base_url': None},
+            lambda: PlaylistService().iter_playlist(search_term=search),
             mimetype="audio/x-mpegurl",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            filename=filename
         )
 
 @api.route('/tv-channels/m3u')
@@ -64,12 +66,6 @@ class TVChannelsPlaylist(Resource):
         search = args.get('search', None)
         favorites_only = args.get('favorites_only', False)
         
-        playlist_service = PlaylistService()
-        playlist = playlist_service.generate_tv_channels_playlist(
-            search_term=search,
-            favorites_only=favorites_only
-        )
-        
         filename = f"tv_channels_playlist_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
         if search:
             filename += f"_filtered"
@@ -77,10 +73,14 @@ class TVChannelsPlaylist(Resource):
             filename += "_favorites"
         filename += ".m3u"
         
-        return Response(
-            playlist,
+        return serve_artifact(
+            'tv-channels.m3u', {'search': search, 'favorites_only': favorites_only},
+            lambda: PlaylistService().iter_tv_channels_playlist(
+                search_term=search,
+                favorites_only=favorites_only
+            ),
             mimetype="audio/x-mpegurl",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            filename=filename
         )
 
 @api.route('/epg.xml')
@@ -93,12 +93,6 @@ class EPGXmlGuide(Resource):
         search = args.get('search', None)
         favorites_only = args.get('favorites_only', False)
         
-        playlist_service = PlaylistService()
-        xml_guide = playlist_service.generate_epg_xml(
-            search_term=search,
-            favorites_only=favorites_only
-        )
-        
         filename = f"epg_guide_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
         if search:
             filename += f"_filtered"
@@ -106,10 +100,15 @@ class EPGXmlGuide(Resource):
             filename += "_favorites"
         filename += ".xml"
         
-        return Response(
-            xml_guide,
+        return serve_artifact(
+            'epg.xml', {'search': search, 'favorites_only': favorites_only},
+            lambda: PlaylistService().iter_epg_xml(
+                search_term=search,
+                favorites_only=favorites_only
+            ),
             mimetype="application/xml",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            filename=filename,
+            max_age=EPG_GUIDE_MAX_AGE
         )
 
 @api.route('/channels')
@@ -143,12 +142,6 @@ class AllStreamsPlaylist(Resource):
         search = args.get('search', None)
         include_unassigned = request.args.get('include_unassigned', 'true').lower() == 'true'
         
-        playlist_service = PlaylistService()
-        playlist = playlist_service.generate_all_streams_playlist(
-            search_term=search,
-            include_unassigned=include_unassigned
-        )
-        
         filename = f"all_streams_playlist_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
         if search:
             filename += f"_filtered"
@@ -156,8 +149,12 @@ class AllStreamsPlaylist(Resource):
             filename += "_assigned_only"
         filename += ".m3u"
         
-        return Response(
-            playlist,
+        return serve_artifact(
+            'all-streams.m3u', {'search': search, 'include_unassigned': include_unassigned},
+            lambda: PlaylistService().iter_all_streams_playlist(
+                search_term=search,
+                include_unassigned=include_unassigned
+            ),
             mimetype="audio/x-mpegurl",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            filename=filename
         )
\ No newline at end of file
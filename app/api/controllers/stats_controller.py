@@ -1,6 +1,7 @@
 from flask_restx import Namespace, Resource, fields
 from app.models import AcestreamChannel, ScrapedURL
 from app.utils.config import Config
+from app.utils.http_client import http_clients
 
 api = Namespace('stats', description='Application statistics')
 
@@ -84,6 +85,49 @@ class Stats(Resource):
         except Exception as e:
             api.abort(500, f"Error retrieving statistics: {str(e)}")
 
+@api.route('/http/')
+class HTTPClientStats(Resource):
+    @api.doc('get_http_client_stats')
+    def get(self):
+        """Get connection reuse and pool saturation counters of the shared HTTP sessions (this worker)."""
+        return http_clients.get_stats()
+
+@api.route('/scrape/')
+class ScrapeStats(Resource):
+    @api.doc('get_scrape_stats')
+    def get(self):
+        """Get the duration of the last scrape cycle and the latest scrape latency of each URL."""
+        from app import task_manager
+        if not task_manager:
+            return {'last_cycle': None, 'url_latencies': {}}
+        return task_manager.get_scrape_stats()
+
+@api.route('/engines/')
+class EngineStats(Resource):
+    @api.doc('get_engine_stats')
+    def get(self):
+        """Get health, load and channel assignments of the Acestream engine pool (this worker)."""
+        from app.utils.engine_pool import engine_pool
+        return engine_pool.get_stats()
+
+@api.route('/status-cache/')
+class StatusCacheStats(Resource):
+    @api.doc('get_status_cache_stats')
+    def get(self):
+        """Get hits, shared and fresh checks of the single-channel status cache (this worker)."""
+        from app.services.channel_status_service import status_cache
+        return status_cache.get_stats()
+
+@api.route('/status-sweep/')
+class StatusSweepStats(Resource):
+    @api.doc('get_status_sweep_stats')
+    def get(self):
+        """Get the budget, queue and progress of the background channel status sweeper."""
+        from app import task_manager
+        if not task_manager:
+            return {}
+        return task_manager.get_status_sweep_stats()
+
 @api.route('/tv-channels/')
 class TVChannelStats(Resource):
     @api.doc('get_tv_channel_stats')
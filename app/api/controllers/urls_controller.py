@@ -3,16 +3,19 @@ from flask import request, current_app
 from app.models import ScrapedURL
 from app.repositories import URLRepository, ChannelRepository
 from datetime import datetime, timezone
-from app.tasks.manager import TaskManager
 from urllib.parse import unquote
 import logging
 
 logger = logging.getLogger(__name__)
 
-task_manager = TaskManager()
+# The app's task manager, set by create_app
+task_manager = None
 
-if not hasattr(task_manager, 'add_task'):
-    task_manager.add_task = lambda task_type, *args, **kwargs: None
+
+def queue_scrape(url):
+    """Have the task manager scrape ``url`` as soon as it can."""
+    if task_manager is not None:
+        task_manager.add_task('scrape_url', url)
 
 api = Namespace('urls', description='URL management')
 
@@ -32,7 +35,11 @@ url_model = api.model('URL', {
     'last_scraped': fields.DateTime(description='When the URL was last processed'),
     'enabled': fields.Boolean(description='Whether the URL is enabled'),
     'error_count': fields.Integer(description='Number of consecutive errors'),
-    'last_error': fields.String(description='Last error message, if any')
+    'last_error': fields.String(description='Last error message, if any'),
+    'content_unchanged': fields.Boolean(description='Whether the last scrape found the content unchanged'),
+    'change_history': fields.String(description="Recent scrape outcomes, oldest first: C changed, U unchanged"),
+    'scrape_interval': fields.Integer(description='Current adaptive rescrape interval in seconds'),
+    'next_scrape_at': fields.DateTime(description='When the URL is next due for scraping')
 })
 
 url_repo = URLRepository()
@@ -81,7 +88,7 @@ class URLList(Resource):
             url_obj = url_repo.add(data['url'], url_type)
             
             try:
-                task_manager.add_task('scrape_url', url_obj.url)
+                queue_scrape(url_obj.url)
             except Exception as e:
                 current_app.logger.error(f"Failed to queue URL for scraping: {e}")
             
@@ -191,7 +198,7 @@ class URLRefresh(Resource):
             if not url_obj.enabled:
                 api.abort(400, 'URL is disabled and cannot be refreshed')
             
-            task_manager.add_task('scrape_url', url_obj.url)
+            queue_scrape(url_obj.url)
             
             return {
                 'message': 'URL queued for refreshing',
@@ -237,7 +244,7 @@ class URLRefreshByUrl(Resource):
             if not url_obj.enabled:
                 api.abort(400, 'URL is disabled and cannot be refreshed')
             
-            task_manager.add_task('scrape_url', decoded_url)
+            queue_scrape(decoded_url)
             
             return {
                 'message': 'URL queued for refreshing',
@@ -27,6 +27,9 @@ class EPGProgram(db.Model):
     rating = db.Column(db.String(20), nullable=True)
     icon_url = db.Column(db.Text, nullable=True)
     
+    # SHA-1 of the programme slot and content, used to skip unchanged rows on refresh
+    content_hash = db.Column(db.String(40), nullable=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -13,6 +13,14 @@ class EPGSource(db.Model):
     error_count = db.Column(db.Integer, default=0)
     last_error = db.Column(db.Text, nullable=True)
     
+    # Validators of the cached guide body, used for conditional fetches
+    etag = db.Column(db.String(255), nullable=True)
+    last_modified = db.Column(db.String(64), nullable=True)
+    content_digest = db.Column(db.String(64), nullable=True)  # SHA-256 of the body
+    content_length = db.Column(db.Integer, nullable=True)
+    # Digest of the last body synced into the database; differs from content_digest after a failed sync
+    ingested_digest = db.Column(db.String(64), nullable=True)
+    
     def __repr__(self):
         return f"<EPGSource {self.id}: {self.name or self.url}>"
         
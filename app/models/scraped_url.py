@@ -15,6 +15,16 @@ class ScrapedURL(db.Model):
     enabled = db.Column(db.Boolean, default=True)
     added_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     url_type = db.Column(db.String(20), default='regular')  # 'regular', 'zeronet', etc.
+    # Validators and normalized-content digest of the last fetch, for conditional rescrapes
+    etag = db.Column(db.String(255), nullable=True)
+    last_modified = db.Column(db.String(64), nullable=True)
+    content_digest = db.Column(db.String(64), nullable=True)
+    content_unchanged = db.Column(db.Boolean, default=False)  # Last scrape found the content unchanged
+    # Adaptive rescrape schedule: recent outcomes ('C' changed, 'U' unchanged, oldest first),
+    # the current interval in seconds and when the URL is next due
+    change_history = db.Column(db.String(32), nullable=True)
+    scrape_interval = db.Column(db.Integer, nullable=True)
+    next_scrape_at = db.Column(db.DateTime, nullable=True)
     
     channels = db.relationship('AcestreamChannel', backref='source', lazy='dynamic')
     
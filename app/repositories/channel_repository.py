@@ -1,13 +1,20 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import update, bindparam, delete, or_, select
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 from ..models import AcestreamChannel
+from ..models.tv_channel import TVChannel
 from ..extensions import db
 from .base import BaseRepository
 
 logger = logging.getLogger(__name__)
 
+# Metadata keys a scraped link may carry, written to the columns of the same name
+SCRAPED_METADATA_FIELDS = ('tvg_id', 'tvg_name', 'logo', 'group')
+
 class ChannelRepository(BaseRepository[AcestreamChannel]):
     def __init__(self):
         super().__init__(AcestreamChannel)
@@ -202,6 +209,27 @@ class ChannelRepository(BaseRepository[AcestreamChannel]):
             except:
                 pass
             return False
+
+    def write_statuses(self, statuses: List[Dict[str, Any]]) -> None:
+        """
+        Write check results of many channels with two executemany UPDATEs, without committing.
+        
+        Each dict carries 'channel_id', 'online', 'check_time' and 'error'.
+        The online state, which playlists render, is only written to the
+        rows where it flips; the check time and error, which they do not,
+        go in a statement of their own. A sweep that changes nothing rendered
+        therefore leaves the playlist and guide caches valid. Used by the
+        database writer, which commits the batch.
+        """
+        table = self.model.__table__
+        flips = update(table).where(
+            table.c.id == bindparam('channel_id'),
+            table.c.is_online.is_distinct_from(bindparam('online'))
+        ).values(is_online=bindparam('online'))
+        checks = update(table).where(table.c.id == bindparam('channel_id')).values(
+            last_checked=bindparam('check_time'), check_error=bindparam('error'))
+        self._db.session.execute(flips, statuses)
+        self._db.session.execute(checks, statuses)
             
     def commit(self):
         """Commit the current transaction."""
@@ -246,4 +274,146 @@ class ChannelRepository(BaseRepository[AcestreamChannel]):
             
         except SQLAlchemyError as e:
             logger.error(f"Error getting channels: {e}")
-            return []
\ No newline at end of file
+            return []
+    def get_epg_snapshots(self) -> List[SimpleNamespace]:
+        """
+        Get the EPG-related fields of all channels as detached snapshots.
+        
+        Snapshots can be modified freely without the session noticing, so EPG
+        updates can be planned first and written in bulk afterwards.
+        """
+        columns = (self.model.id, self.model.name, self.model.tvg_id, self.model.tvg_name,
+                   self.model.logo, self.model.epg_update_protected)
+        try:
+            rows = self._db.session.query(*columns).order_by(self.model.name).all()
+            return [SimpleNamespace(**row._asdict()) for row in rows]
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting channel EPG snapshots: {e}")
+            return []
+
+    def get_status_snapshots(self) -> List[SimpleNamespace]:
+        """
+        Get what status checks need of every channel, as detached snapshots.
+        
+        Besides id, name, status, is_online and last_checked, each snapshot
+        says whether the channel is assigned to an active TV channel
+        (in_tv_channel) and whether that TV channel is a favorite.
+        """
+        columns = (self.model.id, self.model.name, self.model.status, self.model.is_online,
+                   self.model.last_checked,
+                   (TVChannel.id.isnot(None) & TVChannel.is_active.is_(True)).label('in_tv_channel'),
+                   (TVChannel.is_active.is_(True) & TVChannel.is_favorite.is_(True)).label('favorite'))
+        try:
+            rows = self._db.session.query(*columns).outerjoin(
+                TVChannel, TVChannel.id == self.model.tv_channel_id
+            ).all()
+            return [SimpleNamespace(**row._asdict()) for row in rows]
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting channel status snapshots: {e}")
+            return []
+
+    def bulk_update_epg(self, changes: List[Dict[str, Any]], chunk_size: int = 500,
+                        commit_every_chunk: bool = False) -> int:
+        """
+        Write EPG fields for many channels with chunked executemany UPDATEs.
+        
+        Each dict carries the channel ID under 'channel_id' plus tvg_id,
+        tvg_name and logo. All chunks share one transaction unless
+        commit_every_chunk is set, which commits after each chunk so the
+        SQLite write lock is released between them.
+        
+        Returns:
+            Number of channels written
+        """
+        if not changes:
+            return 0
+        
+        table = self.model.__table__
+        stmt = update(table).where(table.c.id == bindparam('channel_id'))
+        try:
+            for start in range(0, len(changes), chunk_size):
+                self._db.session.execute(stmt, changes[start:start + chunk_size])
+                if commit_every_chunk:
+                    self._db.session.commit()
+            self._db.session.commit()
+            logger.info(f"Bulk updated EPG data of {len(changes)} channels")
+            return len(changes)
+        except SQLAlchemyError as e:
+            self._db.session.rollback()
+            logger.error(f"Error bulk updating channel EPG data: {e}")
+            raise
+
+    def sync_source_channels(self, source_url: str, links: List[Tuple[str, str, dict]],
+                             chunk_size: int = 500, commit: bool = True) -> Dict[str, int]:
+        """
+        Make the channels of a source match its scraped links in one transaction.
+        
+        The source's rows are read with one query. Links that are new or
+        whose name or metadata differ are written with chunked
+        INSERT ... ON CONFLICT DO UPDATE statements that set only the name,
+        source and the metadata keys the link carries, so status, online
+        state and TV channel assignments survive. A link whose channel
+        belongs to another source takes it over, as before. Channels of the
+        source that are no longer linked are deleted.
+        
+        With ``commit=False`` (the database writer, which commits the batch)
+        the writes are left in the caller's transaction, and errors are
+        raised without rolling it back.
+        
+        Returns:
+            Dict with the number of channels 'written', 'unchanged' and 'deleted'
+        """
+        table = self.model.__table__
+        current = {}
+        for link in links:
+            current[link[0]] = link
+        
+        try:
+            existing = {
+                row.id: row for row in self._db.session.execute(
+                    select(table.c.id, table.c.name, *(table.c[field] for field in SCRAPED_METADATA_FIELDS))
+                    .where(table.c.source_url == source_url)
+                )
+            }
+            
+            # Group the rows to write by the metadata keys they carry; each group is one statement
+            groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+            unchanged = 0
+            for channel_id, name, metadata in current.values():
+                fields = tuple(field for field in SCRAPED_METADATA_FIELDS if field in (metadata or {}))
+                values = {'id': channel_id, 'name': name, 'source_url': source_url,
+                          **{field: metadata[field] for field in fields}}
+                row = existing.get(channel_id)
+                if row is not None and all(getattr(row, key) == values[key] for key in ('name',) + fields):
+                    unchanged += 1
+                    continue
+                groups.setdefault(fields, []).append(values)
+            
+            for fields, rows in groups.items():
+                stmt = insert(table)
+                updated = ('name', 'source_url') + fields
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.id],
+                    set_={column: stmt.excluded[column] for column in updated},
+                    where=or_(*(table.c[column].is_distinct_from(stmt.excluded[column]) for column in updated))
+                )
+                for start in range(0, len(rows), chunk_size):
+                    chunk = [{'status': 'active', 'is_online': True, **row} for row in rows[start:start + chunk_size]]
+                    self._db.session.execute(stmt, chunk)
+            
+            removed = [channel_id for channel_id in existing if channel_id not in current]
+            for start in range(0, len(removed), chunk_size):
+                self._db.session.execute(delete(table).where(table.c.id.in_(removed[start:start + chunk_size])))
+            
+            if commit:
+                self._db.session.commit()
+        except SQLAlchemyError as e:
+            if commit:
+                self._db.session.rollback()
+            logger.error(f"Error syncing channels of source {source_url}: {e}")
+            raise
+        
+        stats = {'written': sum(len(rows) for rows in groups.values()), 'unchanged': unchanged, 'deleted': len(removed)}
+        logger.info(f"Synced channels of {source_url}: {stats['written']} written, "
+                    f"{stats['unchanged']} unchanged, {stats['deleted']} deleted")
+        return stats
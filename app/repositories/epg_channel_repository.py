@@ -21,6 +21,22 @@ class EPGChannelRepository:
         """Get channels with matching XML ID (across all sources)."""
         return EPGChannel.query.filter_by(channel_xml_id=channel_xml_id).all()
     
+    def get_first_by_channel_xml_ids(self, channel_xml_ids) -> Dict[str, EPGChannel]:
+        """
+        Map each XML ID to its first stored channel (lowest row ID), like
+        get_by_channel_xml_id(...)[0] but for many IDs in one query.
+        
+        Args:
+            channel_xml_ids: List of XML IDs, or a query selecting them
+        """
+        channels = EPGChannel.query.filter(
+            EPGChannel.channel_xml_id.in_(channel_xml_ids)
+        ).order_by(EPGChannel.id).all()
+        first = {}
+        for channel in channels:
+            first.setdefault(channel.channel_xml_id, channel)
+        return first
+    
     def get_by_source_and_channel_xml_id(self, source_id: int, channel_xml_id: str) -> Optional[EPGChannel]:
         """Get channel by source ID and XML channel ID."""
         return EPGChannel.query.filter_by(epg_source_id=source_id, channel_xml_id=channel_xml_id).first()
@@ -82,6 +98,14 @@ class EPGChannelRepository:
         
         return len(new_channels)
     
+    def delete_by_ids(self, channel_ids: List[int]) -> int:
+        """Delete channels by primary key."""
+        if not channel_ids:
+            return 0
+        count = EPGChannel.query.filter(EPGChannel.id.in_(channel_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+    
     def delete_by_source_id(self, source_id: int) -> int:
         """Delete all channels for a specific source."""
         count = EPGChannel.query.filter_by(epg_source_id=source_id).delete()
@@ -1,6 +1,6 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, update, bindparam
 from app.extensions import db
 from app.models.epg_program import EPGProgram
 from sqlalchemy.dialects.sqlite import insert
@@ -38,6 +38,72 @@ class EPGProgramRepository:
             logger.error(f"Error in bulk_insert: {str(e)}")
             raise
     
+    def bulk_update(self, programs_data: List[Dict[str, Any]]) -> int:
+        """
+        Bulk update EPG programs by primary key.
+        
+        Each dict must carry the row ID under 'program_id' plus the columns to
+        set. Rows are written with a single executemany UPDATE OR REPLACE, so a
+        changed title colliding with another stored slot replaces it instead
+        of failing the whole batch.
+        """
+        try:
+            if not programs_data:
+                return 0
+            
+            table = EPGProgram.__table__
+            stmt = update(table).where(table.c.id == bindparam('program_id')).prefix_with('OR REPLACE')
+            db.session.execute(stmt, programs_data)
+            db.session.commit()
+            
+            logger.info(f"Bulk updated {len(programs_data)} EPG programs")
+            return len(programs_data)
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in bulk_update: {str(e)}")
+            raise
+    
+    def delete_by_ids(self, program_ids: List[int], chunk_size: int = 500) -> int:
+        """Delete programs by primary key, in chunks to stay under SQLite's variable limit."""
+        if not program_ids:
+            return 0
+        
+        count = 0
+        for i in range(0, len(program_ids), chunk_size):
+            chunk = program_ids[i:i + chunk_size]
+            count += EPGProgram.query.filter(
+                EPGProgram.id.in_(chunk)
+            ).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+    
+    def get_sync_index(self, epg_source_id: int) -> Dict[Tuple[int, datetime, datetime], Tuple[int, Optional[str]]]:
+        """
+        Get the stored programs of a source keyed by their slot.
+        
+        Returns:
+            Mapping of (epg_channel_id, start_time, end_time) to (program ID, content hash)
+        """
+        from app.models.epg_channel import EPGChannel
+        
+        rows = db.session.query(
+            EPGProgram.id,
+            EPGProgram.epg_channel_id,
+            EPGProgram.start_time,
+            EPGProgram.end_time,
+            EPGProgram.content_hash
+        ).join(
+            EPGChannel, EPGChannel.id == EPGProgram.epg_channel_id
+        ).filter(
+            EPGChannel.epg_source_id == epg_source_id
+        ).all()
+        
+        return {
+            (channel_id, start_time, end_time): (program_id, content_hash)
+            for program_id, channel_id, start_time, end_time, content_hash in rows
+        }
+    
     def get_by_id(self, program_id: int) -> Optional[EPGProgram]:
         """Get program by ID."""
         return EPGProgram.query.get(program_id)
@@ -54,6 +120,26 @@ class EPGProgramRepository:
         
         return query.order_by(EPGProgram.start_time).all()
     
+    def get_programs_for_channels(self, epg_channel_ids: List[int], start_time: datetime, end_time: datetime) -> List:
+        """
+        Get the programs of several EPG channels within a time range, in one query.
+        
+        Only the columns needed to render a guide are loaded. Rows are ordered
+        by channel and start time, so each channel's programs come out in the
+        same order as get_programs_for_channel.
+        """
+        if not epg_channel_ids:
+            return []
+        
+        return db.session.query(
+            EPGProgram.epg_channel_id, EPGProgram.start_time, EPGProgram.end_time,
+            EPGProgram.title, EPGProgram.description, EPGProgram.category
+        ).filter(
+            EPGProgram.epg_channel_id.in_(epg_channel_ids),
+            EPGProgram.end_time > start_time,
+            EPGProgram.start_time < end_time
+        ).order_by(EPGProgram.epg_channel_id, EPGProgram.start_time, EPGProgram.id).all()
+    
     def get_current_program(self, epg_channel_id: int, current_time: datetime = None) -> Optional[EPGProgram]:
         """Get the current program for a channel."""
         if current_time is None:
@@ -72,6 +158,16 @@ class EPGProgramRepository:
         db.session.commit()
         return count
     
+    def delete_by_channel_ids(self, epg_channel_ids: List[int]) -> int:
+        """Delete all programs for the given EPG channels."""
+        if not epg_channel_ids:
+            return 0
+        count = EPGProgram.query.filter(
+            EPGProgram.epg_channel_id.in_(epg_channel_ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+    
     def delete_by_source_id(self, epg_source_id: int) -> int:
         """Delete all programs for channels from a specific EPG source."""
         from app.models.epg_channel import EPGChannel
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Tuple, Union
 from sqlalchemy.sql import text
 from app.models.tv_channel import TVChannel
 from app.models.acestream_channel import AcestreamChannel
@@ -103,6 +103,67 @@ class TVChannelRepository:
         Returns:
             Tuple of (list of TV channels, total number of matches, number of pages)
         """
+        query = self._filtered_query(category, country, language, search_term, favorites_only, is_active)
+            
+        # Count total before pagination
+        total = query.count()
+        total_pages = (total + per_page - 1) // per_page  # Ceiling division
+        
+        # Apply ordering and pagination
+        channels = self._ordered(query).paginate(
+            page=page, per_page=per_page, error_out=False
+        ).items
+        
+        return channels, total, total_pages
+
+    def get_channels_with_acestreams(self,
+                                     search_term: str = None,
+                                     favorites_only: bool = False,
+                                     is_active: bool = None) -> List[Tuple[TVChannel, List[AcestreamChannel]]]:
+        """
+        Get all matching TV channels together with their acestreams.
+        
+        Uses two queries no matter how many channels match: one for the TV
+        channels and one for all of their acestreams, which are then grouped
+        per channel. Nothing is paginated.
+        
+        Args:
+            search_term: Search in name and description
+            favorites_only: Show only favorite channels
+            is_active: Filter by active status
+            
+        Returns:
+            List of (TV channel, acestreams) tuples in the same order as filter_channels
+        """
+        query = self._filtered_query(search_term=search_term, favorites_only=favorites_only, is_active=is_active)
+        channels = self._ordered(query).all()
+        
+        # Rowid order is the order the per-channel queries used to return
+        acestreams = AcestreamChannel.query.filter(
+            AcestreamChannel.tv_channel_id.in_(query.with_entities(TVChannel.id))
+        ).order_by(db.literal_column('acestream_channels.rowid')).all()
+        
+        by_channel = {}
+        for acestream in acestreams:
+            by_channel.setdefault(acestream.tv_channel_id, []).append(acestream)
+        
+        return [(channel, by_channel.get(channel.id, [])) for channel in channels]
+
+    def get_epg_ids_query(self,
+                          search_term: str = None,
+                          favorites_only: bool = False,
+                          is_active: bool = None):
+        """Query selecting the EPG IDs of the matching TV channels, for use as a subquery."""
+        query = self._filtered_query(search_term=search_term, favorites_only=favorites_only, is_active=is_active)
+        return query.filter(TVChannel.epg_id.isnot(None)).with_entities(TVChannel.epg_id)
+
+    def _filtered_query(self,
+                        category: str = None,
+                        country: str = None,
+                        language: str = None,
+                        search_term: str = None,
+                        favorites_only: bool = False,
+                        is_active: bool = None):
         query = TVChannel.query
         
         if category:
@@ -122,24 +183,17 @@ class TVChannelRepository:
             query = query.filter_by(is_favorite=True)
         if is_active is not None:
             query = query.filter_by(is_active=is_active)
-            
-        # Count total before pagination
-        total = query.count()
-        total_pages = (total + per_page - 1) // per_page  # Ceiling division
-        
-        # Apply ordering and pagination
-        channels = query.order_by(
+        return query
+
+    def _ordered(self, query):
+        return query.order_by(
             # Put channels with numbers first
             db.case([(TVChannel.channel_number.is_(None), 1)], else_=0),
             # Order by channel_number in ascending order
             TVChannel.channel_number.asc(),
             # Then order by name for channels without a number
             TVChannel.name.asc()
-        ).paginate(
-            page=page, per_page=per_page, error_out=False
-        ).items
-        
-        return channels, total, total_pages
+        )
 
     def create(self, channel_data: Dict) -> TVChannel:
         """
@@ -1,5 +1,6 @@
 import logging
 from typing import Optional, List
+from sqlalchemy import bindparam, case, func, update
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, timezone
 from ..models import ScrapedURL
@@ -29,16 +30,90 @@ class URLRepository(BaseRepository[ScrapedURL]):
     def update_status(self, url: str, status: str, error: str = None):
         url_obj = self.get_by_url(url)
         if url_obj:
-            url_obj.status = status
-            url_obj.last_processed = datetime.now(timezone.utc)
-            if error:
-                url_obj.error_count = (url_obj.error_count or 0) + 1
-                url_obj.last_error = error
-            else:
-                url_obj.error_count = 0
-                url_obj.last_error = None
+            self._set_status(url_obj, status, error)
+            self.commit()
+
+    @staticmethod
+    def _set_status(url_obj: ScrapedURL, status: str, error: str = None) -> None:
+        url_obj.status = status
+        url_obj.last_processed = datetime.now(timezone.utc)
+        if error:
+            url_obj.error_count = (url_obj.error_count or 0) + 1
+            url_obj.last_error = error
+        else:
+            url_obj.error_count = 0
+            url_obj.last_error = None
+
+    def mark_pending(self, urls: List[str]) -> int:
+        """Set URLs that are OK back to pending, for a rescrape; returns how many were."""
+        try:
+            count = self.model.query.filter(
+                self.model.url.in_(urls), self.model.status == 'OK'
+            ).update({'status': 'pending'}, synchronize_session=False)
+            self._db.session.commit()
+            return count
+        except SQLAlchemyError as e:
+            self._db.session.rollback()
+            logger.error(f"Error marking URLs pending: {e}")
+            raise
+
+    def write_statuses(self, statuses: List[dict]) -> None:
+        """
+        Write the status of many URLs with one executemany UPDATE, without committing.
+        
+        Each dict carries 'scraped_url', 'new_status', 'error' and
+        'processed_at'; as in update_status, an error counts towards the URL's
+        error_count and no error resets it. Used by the database writer, which
+        commits the batch.
+        """
+        table = self.model.__table__
+        has_error = bindparam('error').isnot(None)
+        stmt = update(table).where(table.c.url == bindparam('scraped_url')).values(
+            status=bindparam('new_status'),
+            last_processed=bindparam('processed_at'),
+            error_count=case((has_error, func.coalesce(table.c.error_count, 0) + 1), else_=0),
+            last_error=bindparam('error'),
+        )
+        self._db.session.execute(stmt, statuses)
+
+    def record_fetch(self, url: str, unchanged: bool, etag: Optional[str] = None,
+                     last_modified: Optional[str] = None, content_digest: Optional[str] = None):
+        """Store the validators and content digest of a successful scrape for the next conditional one."""
+        url_obj = self.get_by_url(url)
+        if url_obj:
+            self._set_fetch(url_obj, unchanged, etag, last_modified, content_digest)
             self.commit()
 
+    @staticmethod
+    def _set_fetch(url_obj: ScrapedURL, unchanged: bool, etag: Optional[str] = None,
+                   last_modified: Optional[str] = None, content_digest: Optional[str] = None) -> None:
+        url_obj.etag = etag
+        url_obj.last_modified = last_modified
+        url_obj.content_digest = content_digest
+        url_obj.content_unchanged = unchanged
+
+    def record_scrape(self, url: str, status: str, error: str = None, fetch_state: Optional[dict] = None,
+                      url_type: Optional[str] = None) -> Optional[ScrapedURL]:
+        """
+        Store the outcome of a scrape of ``url``, without committing.
+        
+        Sets the status as update_status does and, when given, the fetch
+        validators as record_fetch does and the URL type. Used by the
+        database writer, which commits the batch; errors are raised so the
+        batch fails as a whole.
+        
+        Returns:
+            The URL object, or None if the URL is not tracked
+        """
+        url_obj = self.get_by_url(url)
+        if url_obj:
+            if fetch_state is not None:
+                self._set_fetch(url_obj, **fetch_state)
+            self._set_status(url_obj, status, error)
+            if url_type is not None:
+                url_obj.url_type = url_type
+        return url_obj
+
     def get_enabled(self):
         return self.model.query.filter_by(enabled=True).all()
         
@@ -1,21 +1,53 @@
 import re
+import asyncio
 import logging
 import json
+import hashlib
+import inspect
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Set, Union
+from typing import Dict, List, Optional, Tuple, Set, Union
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 from ..extensions import db
 from ..models import ScrapedURL
 from ..models.url_types import BaseURL
-from ..services.m3u_service import M3UService
+from ..utils.db_writer import db_writer
+from ..services.m3u_service import M3UFetchCache, M3UService, current_m3u_fetch_cache
+from .page import HTMLPage
 
 logger = logging.getLogger(__name__)
 
+# Per-request tokens of the ZeroNet wrapper that change on every fetch
+_VOLATILE_TOKENS = re.compile(r'((?:wrapper_nonce|wrapper_key|ajax_key|postmessage_nonce_security)["\']?\s*[=:]\s*["\']?)[\w-]+')
+_WHITESPACE = re.compile(r'\s+')
+# Any mention of a playlist file: the channels may come from linked M3U files
+_PLAYLIST_LINK = re.compile(r'\.m3u8?\b', re.IGNORECASE)
+# The listaplana.txt entry of the fileContents object embedded by ZeroNet list sites
+_LISTA_PLANA = re.compile(r'fileContents\s*=\s*\{[^}]*?listaplana\.txt[^}]*?:\s*`(.*?)`', re.DOTALL)
+_FILE_CONTENTS_LISTA_PLANA = re.compile(r'fileContents\s*=\s*\{[^}]*listaplana\.txt[^}]*:\s*`(.*?)`', re.DOTALL)
+_LINKS_DATA = re.compile(r'const linksData = (\{.*?\});', re.DOTALL)
+
+
+def content_digest(content: str) -> str:
+    """SHA-256 of a page with whitespace and per-request ZeroNet tokens normalized away."""
+    normalized = _WHITESPACE.sub(' ', _VOLATILE_TOKENS.sub(r'\1', content)).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
 class BaseScraper(ABC):
     """Base scraper class with common acestream link extraction logic."""
 
+    # Extraction stages for HTML pages, tried in order until one finds channels.
+    # Each entry names a method taking an HTMLPage and returning (id, name[, metadata]) tuples.
+    extraction_stages: Tuple[Tuple[str, ...], ...] = (
+        ('extract_from_script',),
+        ('extract_from_iframe_content', 'extract_from_content', 'extract_from_m3u_links'),
+    )
+    # BeautifulSoup backend for pages the fast path cannot handle; None picks lxml when installed
+    html_parser: Optional[str] = None
+    # Answer what the raw markup can without building a DOM
+    fast_extraction: bool = True
+
     def __init__(self, url_obj: BaseURL, timeout: int = 10, retries: int = 3):
         self.url_obj = url_obj
         self.timeout = timeout
@@ -27,6 +59,36 @@ class BaseScraper(ABC):
         # Pattern to match multiple whitespace characters (spaces, tabs, newlines)
         self.whitespace_pattern = re.compile(r'\s+')
         self.current_url = url_obj.original_url
+        # Validators of the previous scrape, and what this one found
+        self.previous_fetch: Dict[str, Optional[str]] = {}
+        self.fetch_validators: Dict[str, Optional[str]] = {}
+        self.not_modified = False
+        self.unchanged = False
+        self.content_digest: Optional[str] = None
+
+    def use_previous_fetch(self, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                           content_digest: Optional[str] = None):
+        """Make this scrape conditional on what the previous one saw."""
+        self.previous_fetch = {'etag': etag, 'last_modified': last_modified, 'content_digest': content_digest}
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """If-None-Match/If-Modified-Since headers for the previous fetch, if any."""
+        headers = {}
+        if self.previous_fetch.get('etag'):
+            headers['If-None-Match'] = self.previous_fetch['etag']
+        if self.previous_fetch.get('last_modified'):
+            headers['If-Modified-Since'] = self.previous_fetch['last_modified']
+        return headers
+
+    def fetch_state(self) -> Dict:
+        """Validators and digest to store for the next conditional scrape."""
+        return {
+            'unchanged': self.unchanged,
+            'etag': self.fetch_validators.get('etag') or (self.previous_fetch.get('etag') if self.not_modified else None),
+            'last_modified': (self.fetch_validators.get('last_modified')
+                              or (self.previous_fetch.get('last_modified') if self.not_modified else None)),
+            'content_digest': self.content_digest,
+        }
 
     def clean_channel_name(self, name: str) -> str:
         """Clean channel name by replacing multiple whitespace with single space and trimming."""
@@ -42,18 +104,18 @@ class BaseScraper(ABC):
         """Fetch content from the source URL."""
         pass
 
-    def extract_from_script(self, soup: BeautifulSoup) -> List[Tuple[str, str]]:
+    def extract_from_script(self, page: HTMLPage) -> List[Tuple[str, str]]:
         """Extract acestream links from script tags."""
         channels = []
+        scripts = page.scripts()
         
         # First try to find fileContents with listaplana.txt
-        for script in soup.find_all('script'):
-            if script.string and 'fileContents' in script.string and 'listaplana.txt' in script.string:
+        for script in scripts:
+            if 'fileContents' in script and 'listaplana.txt' in script:
                 logger.info("Found fileContents with listaplana.txt - prioritizing this source")
                 
                 # Extract the listaplana.txt content using regex
-                lista_plana_match = re.search(r'fileContents\s*=\s*\{[^}]*?listaplana\.txt[^}]*?:\s*`(.*?)`', 
-                                             script.string, re.DOTALL)
+                lista_plana_match = _LISTA_PLANA.search(script)
                 if lista_plana_match:
                     content = lista_plana_match.group(1)
                     for line in content.splitlines():
@@ -79,10 +141,9 @@ class BaseScraper(ABC):
                         return channels
         
         # Fallback to regular linksData extraction only if listaplana.txt didn't yield results
-        script_tag = soup.find('script', text=re.compile(r'const linksData'))
-        if (script_tag):
-            script_content = script_tag.string
-            json_str = re.search(r'const linksData = (\{.*?\});', script_content, re.DOTALL)
+        script_content = next((script for script in scripts if 'const linksData' in script), None)
+        if script_content:
+            json_str = _LINKS_DATA.search(script_content)
             if json_str:
                 try:
                     links_data = json.loads(json_str.group(1))
@@ -100,28 +161,29 @@ class BaseScraper(ABC):
 
         return channels
 
-    def extract_from_content(self, soup: BeautifulSoup) -> List[Tuple[str, str]]:
+    def extract_from_content(self, page: HTMLPage) -> List[Tuple[str, str]]:
         """Extract acestream links from general content."""
         channels = []
-        ids = self.acestream_pattern.findall(str(soup))
+        ids = self.acestream_pattern.findall(page.acestream_text())
+        channel_name = None
         
         for id in ids:
             if id not in self.identified_ids:
-                link_name_div = soup.find('div', class_='link-name')
-                if link_name_div and link_name_div.text.strip():
+                # Every ID is named after the page's first link-name div
+                if channel_name is None:
+                    channel_name = (page.first_text('div', 'link-name') or '').strip()
+                if channel_name:
                     # Only add channels where a proper name is found
-                    channel_name = link_name_div.text.strip()
-                    # Clean the channel name
-                    channel_name = self.clean_channel_name(channel_name)
-                    channels.append((id, channel_name))
+                    channels.append((id, self.clean_channel_name(channel_name)))
                     self.identified_ids.add(id)
                 # Do NOT add channels with generated names based on IDs
 
         return channels
 
-    async def extract_from_m3u_links(self, content: str) -> List[Tuple[str, str, dict]]:
+    async def extract_from_m3u_links(self, page: HTMLPage) -> List[Tuple[str, str, dict]]:
         """Extract channels from M3U files linked in the content."""
         channels = []
+        content = page.content
         
         # Find M3U links in content
         m3u_urls = await self.m3u_service.find_m3u_links(content, self.current_url)
@@ -130,28 +192,34 @@ class BaseScraper(ABC):
         direct_m3u_urls = set(self.m3u_pattern.findall(content))
         m3u_urls.extend(direct_m3u_urls)
         
-        # Process each unique M3U URL
-        for m3u_url in set(m3u_urls):
-            try:
-                m3u_channels = await self.m3u_service.extract_channels_from_m3u(m3u_url)
-                for channel_id, name, metadata in m3u_channels:
-                    # Only add channels with actual names, not ID-based names
-                    if channel_id not in self.identified_ids and name and not name.startswith("Channel "):
-                        # Clean the channel name
-                        cleaned_name = self.clean_channel_name(name)
-                        channels.append((channel_id, cleaned_name, metadata))
-                        self.identified_ids.add(channel_id)
-            except Exception as e:
-                logger.warning(f"Failed to process M3U file {m3u_url}: {e}")
+        # Fetch each unique M3U URL concurrently, through the scrape cycle's cache if there is one
+        unique_urls = list(set(m3u_urls))
+        cache = current_m3u_fetch_cache() or M3UFetchCache()
+        results = await asyncio.gather(
+            *(self.m3u_service.extract_channels_from_m3u(m3u_url, cache=cache) for m3u_url in unique_urls),
+            return_exceptions=True
+        )
+        
+        for m3u_url, m3u_channels in zip(unique_urls, results):
+            if isinstance(m3u_channels, Exception):
+                logger.warning(f"Failed to process M3U file {m3u_url}: {m3u_channels}")
+                continue
+            for channel_id, name, metadata in m3u_channels:
+                # Only add channels with actual names, not ID-based names
+                if channel_id not in self.identified_ids and name and not name.startswith("Channel "):
+                    # Clean the channel name
+                    cleaned_name = self.clean_channel_name(name)
+                    channels.append((channel_id, cleaned_name, metadata))
+                    self.identified_ids.add(channel_id)
                 
         return channels
 
-    def extract_from_iframe_content(self, soup: BeautifulSoup) -> List[Tuple[str, str, dict]]:
+    def extract_from_iframe_content(self, page: HTMLPage) -> List[Tuple[str, str, dict]]:
         """Extract acestream links from iframe content in ZeroNet sites."""
         channels = []
         
         # Try to extract from list view (channel-item)
-        channel_items = soup.select('.channel-item')
+        channel_items = page.select('.channel-item') if page.has_class('channel-item') else []
         for item in channel_items:
             name_elem = item.select_one('.item-name')
             url_elem = item.select_one('.item-url')
@@ -169,11 +237,10 @@ class BaseScraper(ABC):
                         self.identified_ids.add(channel_id)
         
         # Try to extract from script content with fileContents variable
-        script_tags = soup.find_all('script')
-        for script in script_tags:
-            if script.string and 'fileContents' in script.string:
+        for script in page.scripts():
+            if 'fileContents' in script:
                 # Look for listaplana.txt content in fileContents
-                match = re.search(r'fileContents\s*=\s*\{[^}]*listaplana\.txt[^}]*:\s*`(.*?)`', script.string, re.DOTALL)
+                match = _FILE_CONTENTS_LISTA_PLANA.search(script)
                 if match:
                     content = match.group(1)
                     for line in content.splitlines():
@@ -193,6 +260,22 @@ class BaseScraper(ABC):
         
         return channels
 
+    async def extract_channels(self, content: str) -> List[Tuple[str, str, dict]]:
+        """Run the extraction stages over an HTML page; the first stage that finds channels wins."""
+        page = HTMLPage(content, parser=self.html_parser, fast=self.fast_extraction)
+        channels = []
+        for stage in self.extraction_stages:
+            for name in stage:
+                found = getattr(self, name)(page)
+                if inspect.isawaitable(found):
+                    found = await found
+                channels.extend(channel if len(channel) == 3 else (*channel, {}) for channel in found)
+            if channels:
+                break
+        logger.debug(f"Extracted {len(channels)} channels from {self.current_url} "
+                     f"({'with' if page.dom_built else 'without'} an HTML parse)")
+        return channels
+
     async def scrape(self, url: str = None) -> Tuple[List[Tuple[str, str, dict]], str]:
         """Main scraping method."""
         # Use provided URL or the normalized URL from url_obj
@@ -210,6 +293,23 @@ class BaseScraper(ABC):
             try:
                 content = await self.fetch_content(url_to_scrape)
                 
+                if self.not_modified:
+                    logger.info(f"{url_to_scrape} not modified since the last scrape")
+                    self.unchanged = True
+                    self.content_digest = self.previous_fetch.get('content_digest')
+                    break
+                
+                self.content_digest = content_digest(content)
+                # Pages that may pull channels from linked playlists are always scraped in full,
+                # and never answered with a 304 that would hide changes to those playlists
+                self_contained = is_m3u_file or not _PLAYLIST_LINK.search(content)
+                if not self_contained:
+                    self.fetch_validators = {}
+                if self_contained and self.content_digest == self.previous_fetch.get('content_digest'):
+                    logger.info(f"Content of {url_to_scrape} unchanged since the last scrape")
+                    self.unchanged = True
+                    break
+                
                 # Direct handling for M3U files
                 if is_m3u_file:
                     logger.info(f"Processing direct M3U file: {url_to_scrape}")
@@ -228,24 +328,7 @@ class BaseScraper(ABC):
                         logger.warning(f"No channels found in M3U file content")
                     break
                 
-                soup = BeautifulSoup(content, 'html.parser')
-                
-                # First check script tags for listaplana.txt content
-                script_channels = [(id, name, {}) for id, name in self.extract_from_script(soup)]
-                
-                # If we found channels from script (possibly from listaplana.txt), use only those
-                if script_channels:
-                    channels.extend(script_channels)
-                else:
-                    # Otherwise, try other extraction methods
-                    iframe_channels = self.extract_from_iframe_content(soup)
-                    content_channels = [(id, name, {}) for id, name in self.extract_from_content(soup)]
-                    m3u_channels = await self.extract_from_m3u_links(content)
-                    
-                    channels.extend(iframe_channels)
-                    channels.extend(content_channels)
-                    channels.extend(m3u_channels)
-                
+                channels.extend(await self.extract_channels(content))
                 break
             except Exception as e:
                 logger.error(f"Error scraping {url_to_scrape}: {str(e)}")
@@ -258,11 +341,11 @@ class BaseScraper(ABC):
         # Log results summary
         if channels:
             logger.info(f"Successfully extracted {len(channels)} channels from {url_to_scrape}")
-        else:
+        elif not self.unchanged:
             logger.warning(f"No channels extracted from {url_to_scrape}")
 
         # Update URL status in database
-        self.update_url_status(url_to_scrape, status)
+        await db_writer.call(lambda: self.update_url_status(url_to_scrape, status))
         
         return channels, status
 
@@ -1,8 +1,8 @@
-import aiohttp
 import logging
 from typing import Optional
 from .base import BaseScraper
 from ..models.url_types import RegularURL
+from ..utils.http_client import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -25,22 +25,30 @@ class HTTPScraper(BaseScraper):
         else:
             logger.info(f"Fetching HTTP content from: {url}")
 
+        response = None
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, 
-                                     headers=self.headers,
-                                     timeout=self.timeout) as response:
-                    response.raise_for_status()
-                    content = await response.text()
-                    
-                    # If it's an M3U file, validate and log appropriately
-                    if is_m3u_file:
-                        if content.strip().startswith('#EXTM3U') or 'acestream://' in content:
-                            logger.info(f"Successfully fetched M3U file content ({len(content)} bytes)")
-                        else:
-                            logger.warning(f"Content doesn't appear to be a valid M3U file. First 100 chars: {content[:100]}")
-                    
-                    return content
+            session = http_clients.session('scraper')
+            async with session.get(url, 
+                                 headers={**self.headers, **self.conditional_headers()},
+                                 timeout=self.timeout) as response:
+                if response.status == 304:
+                    self.not_modified = True
+                    return ''
+                response.raise_for_status()
+                content = await response.text()
+                self.fetch_validators = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }
+                
+                # If it's an M3U file, validate and log appropriately
+                if is_m3u_file:
+                    if content.strip().startswith('#EXTM3U') or 'acestream://' in content:
+                        logger.info(f"Successfully fetched M3U file content ({len(content)} bytes)")
+                    else:
+                        logger.warning(f"Content doesn't appear to be a valid M3U file. First 100 chars: {content[:100]}")
+                
+                return content
         except Exception as e:
             content_type = getattr(response, 'headers', {}).get('Content-Type', 'unknown')
             logger.error(f"Error fetching content from {url}: {str(e)}. Content-Type: {content_type}")
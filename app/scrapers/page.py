@@ -0,0 +1,142 @@
+import re
+import html
+from typing import List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+# lxml builds trees several times faster than the pure Python parser
+DEFAULT_PARSER = 'lxml' if lxml is not None else 'html.parser'
+
+# Spans the HTML parser keeps verbatim: comments, and script/style bodies (no entity decoding)
+_OPAQUE = re.compile(r'<!--.*?-->|<(script|style)(?=[\s/>])[^>]*>(.*?)</\s*\1\s*>', re.IGNORECASE | re.DOTALL)
+# Markup the raw scan cannot reproduce the parse of: unbalanced opaque spans, CDATA and
+# declarations, bogus end tags and tags the parser would make out of "<acestream://..."
+_UNSAFE_MARKUP = re.compile(r'<!--|<(?:script|style)(?=[\s/>])|<!\[|</\s|<acestream', re.IGNORECASE)
+_DIV_OPEN = re.compile(r'<div(?=[\s/>])([^>]*)>', re.IGNORECASE)
+_CLASS_ATTR = re.compile(r'(?:^|\s)class\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))', re.IGNORECASE)
+_DIV_CLOSE = re.compile(r'</div\s*>', re.IGNORECASE)
+# Stand-in for the HTML parse: the fast path could not answer
+_NEEDS_DOM = object()
+
+
+class HTMLPage:
+    """
+    A fetched page, queried through the few views the extractors need.
+
+    Each view is answered from the raw markup when that is known to give what
+    the parsed document would, and from a BeautifulSoup tree, built on first
+    use, otherwise. ``fast=False`` always uses the tree.
+    """
+
+    def __init__(self, content: str, parser: Optional[str] = None, fast: bool = True):
+        self.content = content
+        self.parser = parser or DEFAULT_PARSER
+        self.fast = fast
+        self._soup: Optional[BeautifulSoup] = None
+        self._scanned = False
+        self._opaque: Optional[List[Tuple[int, int, Optional[str], Optional[str]]]] = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.content, self.parser)
+        return self._soup
+
+    @property
+    def dom_built(self) -> bool:
+        return self._soup is not None
+
+    def _scan(self) -> Optional[List[Tuple[int, int, Optional[str], Optional[str]]]]:
+        """(start, end, tag, body) of the opaque spans, or None when the markup needs a real parse."""
+        if not self._scanned:
+            self._scanned = True
+            if self.fast:
+                spans, last, safe = [], 0, True
+                for match in _OPAQUE.finditer(self.content):
+                    if _UNSAFE_MARKUP.search(self.content, last, match.start()):
+                        safe = False
+                        break
+                    tag = match.group(1).lower() if match.group(1) else None
+                    spans.append((match.start(), match.end(), tag, match.group(2)))
+                    last = match.end()
+                if safe and not _UNSAFE_MARKUP.search(self.content, last):
+                    self._opaque = spans
+        return self._opaque
+
+    def scripts(self) -> List[str]:
+        """Text of the non-empty script elements, in document order."""
+        spans = self._scan()
+        if spans is None:
+            return [script.string for script in self.soup.find_all('script') if script.string]
+        return [body for _, _, tag, body in spans if tag == 'script' and body]
+
+    def has_class(self, class_name: str) -> bool:
+        """Whether any element may carry ``class_name``; False is certain, True may be a false positive."""
+        return class_name in self.content
+
+    def select(self, selector: str):
+        return self.soup.select(selector)
+
+    def acestream_text(self) -> str:
+        """The document as serialized by the parser, for scanning for acestream IDs."""
+        spans = self._scan()
+        if spans is None:
+            return str(self.soup)
+        if '&' not in self.content:
+            return self.content
+        # The parser decodes character references everywhere but in opaque spans,
+        # and only escapes back &, < and >, none of which can be part of an ID
+        parts, last = [], 0
+        for start, end, _, _ in spans:
+            parts.append(html.unescape(self.content[last:start]))
+            parts.append(self.content[start:end])
+            last = end
+        parts.append(html.unescape(self.content[last:]))
+        return ''.join(parts)
+
+    def first_text(self, tag: str, class_name: str) -> Optional[str]:
+        """Text of the first ``tag`` element with class ``class_name``, or None if there is none."""
+        text = self._first_div_text(class_name) if tag == 'div' else _NEEDS_DOM
+        if text is _NEEDS_DOM:
+            element = self.soup.find(tag, class_=class_name)
+            return element.text if element else None
+        return text
+
+    def _first_div_text(self, class_name: str):
+        spans = self._scan()
+        if spans is None:
+            return _NEEDS_DOM
+        if class_name not in self.content:
+            return None
+        # Blank out opaque spans so that markup inside them is not mistaken for elements
+        markup, last, pieces = self.content, 0, []
+        for start, end, _, _ in spans:
+            pieces.append(markup[last:start])
+            pieces.append('<' + ' ' * (end - start - 1))
+            last = end
+        pieces.append(markup[last:])
+        markup = ''.join(pieces)
+
+        for match in _DIV_OPEN.finditer(markup):
+            attrs = match.group(1)
+            if class_name not in attrs:
+                continue
+            if '&' in attrs or attrs.rstrip().endswith('/'):
+                return _NEEDS_DOM
+            classes = _CLASS_ATTR.findall(attrs)
+            if len(classes) != 1:
+                return _NEEDS_DOM
+            if class_name not in ''.join(classes[0]).split():
+                continue
+            # Only a plain text body can be read without a parse
+            end = markup.find('<', match.end())
+            if end < 0 or not _DIV_CLOSE.match(markup, end):
+                return _NEEDS_DOM
+            text = markup[match.end():end]
+            return _NEEDS_DOM if '&' in text else text
+        return None
@@ -5,6 +5,7 @@ import re
 from bs4 import BeautifulSoup
 from .base import BaseScraper
 from ..models.url_types import ZeronetURL
+from ..utils.http_client import http_clients
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
@@ -24,7 +25,6 @@ class ZeronetScraper(BaseScraper):
             'DNT': '1',
             'Upgrade-Insecure-Requests': '1'
         }
-        self.cookie_jar = aiohttp.CookieJar()
 
     async def fetch_content(self, url: str) -> str:
         """Fetch content from Zeronet URLs using internal service with retries."""
@@ -47,78 +47,78 @@ class ZeronetScraper(BaseScraper):
         
         while retry_count < self.retries:
             try:
-                async with aiohttp.ClientSession(cookie_jar=self.cookie_jar) as session:
-                    # First request to get the content
-                    async with session.get(
-                        internal_url,
-                        headers=self.headers,
-                        timeout=self.timeout
-                    ) as response:
-                        response.raise_for_status()
-                        content = await response.text()
-                        
-                        # If it's an M3U file, just return the content without further processing
-                        if is_m3u_file:
-                            if content.strip().startswith('#EXTM3U') or 'acestream://' in content:
-                                logger.info(f"Successfully fetched M3U file content ({len(content)} bytes)")
-                                return content
-                            else:
-                                logger.warning(f"Content doesn't appear to be a valid M3U file. First 100 chars: {content[:100]}")
-                        
-                        # Check for new_era_iframe.html format by looking for specific HTML structure
-                        if 'channel-item' in content or 'ACEStream NEW ERA' in content:
-                            logger.info("Detected NEW ERA iframe format")
+                session = http_clients.session('zeronet')
+                # First request to get the content
+                async with session.get(
+                    internal_url,
+                    headers=self.headers,
+                    timeout=self.timeout
+                ) as response:
+                    response.raise_for_status()
+                    content = await response.text()
+                    
+                    # If it's an M3U file, just return the content without further processing
+                    if is_m3u_file:
+                        if content.strip().startswith('#EXTM3U') or 'acestream://' in content:
+                            logger.info(f"Successfully fetched M3U file content ({len(content)} bytes)")
                             return content
+                        else:
+                            logger.warning(f"Content doesn't appear to be a valid M3U file. First 100 chars: {content[:100]}")
+                    
+                    # Check for new_era_iframe.html format by looking for specific HTML structure
+                    if 'channel-item' in content or 'ACEStream NEW ERA' in content:
+                        logger.info("Detected NEW ERA iframe format")
+                        return content
+                    
+                    # Look for the iframe_src in the script
+                    iframe_src_match = re.search(r'iframe_src\s*=\s*"([^"]+)"', content)
+                    if iframe_src_match:
+                        iframe_url = iframe_src_match.group(1)
+                        logger.info(f"Found iframe URL in script: {iframe_url}")
                         
-                        # Look for the iframe_src in the script
-                        iframe_src_match = re.search(r'iframe_src\s*=\s*"([^"]+)"', content)
-                        if iframe_src_match:
-                            iframe_url = iframe_src_match.group(1)
-                            logger.info(f"Found iframe URL in script: {iframe_url}")
-                            
-                            # Handle relative URLs
-                            if iframe_url.startswith('/'):
-                                base_url = f"http://{zeronet_host}:43110"
-                                iframe_url = base_url + iframe_url
-                            
-                            try:
-                                # Try to fetch iframe content
-                                async with session.get(
-                                    iframe_url,
-                                    headers=self.headers,
-                                    timeout=self.timeout
-                                ) as iframe_response:
-                                    iframe_response.raise_for_status()
-                                    iframe_content = await iframe_response.text()
-                                    
-                                    if ('acestream://' in iframe_content or 
-                                        'const linksData' in iframe_content or
-                                        'fileContents' in iframe_content or
-                                        'channel-item' in iframe_content):
-                                        return iframe_content
-                            except aiohttp.ClientError as e:
-                                logger.warning(f"Failed to fetch iframe content: {e}")
-                                # Don't retry on iframe errors, continue with main content
+                        # Handle relative URLs
+                        if iframe_url.startswith('/'):
+                            base_url = f"http://{zeronet_host}:43110"
+                            iframe_url = base_url + iframe_url
                         
-                        # Check main content as fallback
-                        if 'acestream://' in content or 'const linksData' in content or 'fileContents' in content:
-                            return content
+                        try:
+                            # Try to fetch iframe content
+                            async with session.get(
+                                iframe_url,
+                                headers=self.headers,
+                                timeout=self.timeout
+                            ) as iframe_response:
+                                iframe_response.raise_for_status()
+                                iframe_content = await iframe_response.text()
+                                
+                                if ('acestream://' in iframe_content or 
+                                    'const linksData' in iframe_content or
+                                    'fileContents' in iframe_content or
+                                    'channel-item' in iframe_content):
+                                    return iframe_content
+                        except aiohttp.ClientError as e:
+                            logger.warning(f"Failed to fetch iframe content: {e}")
+                            # Don't retry on iframe errors, continue with main content
+                    
+                    # Check main content as fallback
+                    if 'acestream://' in content or 'const linksData' in content or 'fileContents' in content:
+                        return content
+                    
+                    # If we get here, no expected content was found in this attempt
+                    retry_count += 1
+                    if retry_count < self.retries:
+                        delay = 2 ** retry_count
+                        content_preview = content[:150] + "..." if len(content) > 150 else content
+                        logger.warning(f"No relevant content found, retry {retry_count}/{self.retries}. "
+                                      f"Content preview: {content_preview}. Waiting {delay} seconds...")
+                        await asyncio.sleep(delay)
+                    else:
+                        content_type = response.headers.get('Content-Type', 'unknown')
+                        content_preview = content[:150] + "..." if len(content) > 150 else content
+                        error_msg = (f"No acestream data found after max retries. Content-Type: {content_type}. "
+                                    f"Content preview: {content_preview}")
+                        raise ValueError(error_msg)
                         
-                        # If we get here, no expected content was found in this attempt
-                        retry_count += 1
-                        if retry_count < self.retries:
-                            delay = 2 ** retry_count
-                            content_preview = content[:150] + "..." if len(content) > 150 else content
-                            logger.warning(f"No relevant content found, retry {retry_count}/{self.retries}. "
-                                          f"Content preview: {content_preview}. Waiting {delay} seconds...")
-                            await asyncio.sleep(delay)
-                        else:
-                            content_type = response.headers.get('Content-Type', 'unknown')
-                            content_preview = content[:150] + "..." if len(content) > 150 else content
-                            error_msg = (f"No acestream data found after max retries. Content-Type: {content_type}. "
-                                        f"Content preview: {content_preview}")
-                            raise ValueError(error_msg)
-                            
             except Exception as e:
                 last_error = e
                 retry_count += 1
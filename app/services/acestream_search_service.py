@@ -4,7 +4,7 @@ import json
 from typing import Dict, Any, List, Optional, Tuple
 
 from app.extensions import db
-from app.utils.config import Config
+from app.utils.engine_pool import EnginePool, engine_pool
 
 logger = logging.getLogger(__name__)
 
@@ -12,28 +12,20 @@ class AcestreamSearchService:
     """Service for searching Acestream channels via the engine API."""
     
     def __init__(self, engine_url: str = None):
-        """Initialize search service with engine URL."""
-        # Use provided URL or fetch from config
-        if engine_url:
-            self.engine_url = engine_url
-        else:
-            config = Config()
-            # Fix: directly access the ace_engine_url property instead of calling get_config()
-            self.engine_url = config.ace_engine_url
+        """Initialize search service with an engine URL, or the configured engines."""
+        # Use provided URL or the shared pool of the configured engines
+        self.engines = EnginePool([engine_url]) if engine_url else engine_pool
+        self.engine_url = self.engines.urls[0] if self.engines.size else None
         
-        # If URL doesn't start with a protocol, assume http://
-        if not self.engine_url.startswith('http'):
-            self.engine_url = f"http://{self.engine_url}"
-        
-        # Ensure the URL doesn't end with a slash
-        self.engine_url = self.engine_url.rstrip('/')
-        
-        logger.debug(f"Acestream Search Service initialized with engine URL: {self.engine_url}")
+        logger.debug(f"Acestream Search Service initialized with engine URLs: {', '.join(self.engines.urls)}")
     
     def search(self, query: str = "", page: int = 1, page_size: int = 10, category: str = "") -> Dict[str, Any]:
         """
         Search for Acestream channels using the engine API.
         
+        The search goes to the least busy engine; if that engine fails,
+        another one is tried once.
+        
         Args:
             query: The search query string (optional, defaults to empty string for all channels)
             page: Page number for pagination (1-based)
@@ -43,9 +35,27 @@ class AcestreamSearchService:
         Returns:
             Dict containing search results, pagination info, and status
         """
+        if not self.engines.size:
+            logger.error("Acestream search failed: no Acestream engine configured")
+            return self._failure("No Acestream engine configured", page, page_size)
+        
+        failed_engines = []
+        # At most two engines
+        for _ in range(min(2, self.engines.size)):
+            with self.engines.acquire(exclude=failed_engines) as engine:
+                result, engine_ok = self._search(engine.url, query, page, page_size, category)
+                self.engines.report(engine, engine_ok, None if engine_ok else result['message'])
+            if engine_ok:
+                break
+            failed_engines.append(engine.url)
+        return result
+    
+    def _search(self, engine_url: str, query: str, page: int, page_size: int,
+                category: str) -> Tuple[Dict[str, Any], bool]:
+        """Search on one engine; returns the result and whether the engine itself worked."""
         try:
             # Construct search URL
-            search_url = f"{self.engine_url}/search"
+            search_url = f"{engine_url}/search"
             
             # Convert from 1-based pagination (UI) to 0-based pagination (API)
             api_page = page - 1
@@ -112,7 +122,7 @@ class AcestreamSearchService:
                                 # Create a processed result with the required fields
                                 processed_item = {
                                     'name': result.get('name', 'Unnamed Channel'),
-                                    'id': self.get_content_id(item.get('infohash')), # Get ID from infohash
+                                    'id': self.get_content_id(item.get('infohash'), engine_url), # Get ID from infohash
                                     'categories': item.get('categories', []),
                                     'bitrate': item.get('bitrate', 0)
                                 }
@@ -150,52 +160,38 @@ class AcestreamSearchService:
                     
                     query_description = query if query else "all channels"
                     logger.info(f"Found {len(processed_results)} results for query '{query_description}'")
-                    return result
+                    return result, True
                 except json.JSONDecodeError as json_err:
                     logger.error(f"Failed to parse JSON response: {json_err}")
                     logger.error(f"Raw response content (first 500 chars): {response.text[:500]}")
-                    return {
-                        'success': False,
-                        'message': f"Failed to parse API response: {json_err}",
-                        'results': [],
-                        'pagination': {
-                            'page': page,
-                            'page_size': page_size,
-                            'total_results': 0,
-                            'total_pages': 0
-                        }
-                    }
+                    return self._failure(f"Failed to parse API response: {json_err}", page, page_size), True
             else:
                 error_msg = f"Acestream search failed with status code {response.status_code}"
                 logger.error(error_msg)
                 logger.error(f"Response content: {response.text[:500]}..." if len(response.text) > 500 else response.text)
-                return {
-                    'success': False,
-                    'message': error_msg,
-                    'results': [],
-                    'pagination': {
-                        'page': page,
-                        'page_size': page_size,
-                        'total_results': 0,
-                        'total_pages': 0
-                    }
-                }
+                engine_ok = response.status_code < 500 and response.status_code != 429
+                return self._failure(error_msg, page, page_size), engine_ok
         except Exception as e:
             error_msg = f"Error searching Acestream: {str(e)}"
             logger.error(error_msg)
             # Log the exception details for debugging
             logger.exception("Exception details:")
-            return {
-                'success': False,
-                'message': error_msg,
-                'results': [],
-                'pagination': {
-                    'page': page,
-                    'page_size': page_size,
-                    'total_results': 0,
-                    'total_pages': 0
-                }
+            return self._failure(error_msg, page, page_size), not isinstance(e, requests.RequestException)
+    
+    @staticmethod
+    def _failure(message: str, page: int, page_size: int) -> Dict[str, Any]:
+        """A search result without results, for a search that failed."""
+        return {
+            'success': False,
+            'message': message,
+            'results': [],
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total_results': 0,
+                'total_pages': 0
             }
+        }
     
     def extract_acestream_id(self, url: str) -> Optional[str]:
         """
@@ -211,9 +207,9 @@ class AcestreamSearchService:
             return url.split('acestream://')[1]
         return None
     
-    def get_content_id(self, infohash: str) -> Optional[str]:
+    def get_content_id(self, infohash: str, engine_url: Optional[str] = None) -> Optional[str]:
         try:
-            url = f"{self.engine_url}/server/api"
+            url = f"{engine_url or self.engine_url}/server/api"
             params = {
                 "api_version": 3,
                 "method": "get_content_id",
@@ -3,6 +3,8 @@ import os
 import requests
 from typing import Dict, Any, Optional, Tuple
 
+from app.utils.engine_pool import EnginePool, engine_pool
+
 logger = logging.getLogger(__name__)
 
 class AcestreamStatusService:
@@ -13,35 +15,24 @@ class AcestreamStatusService:
         Initialize the service with optional custom engine URL.
         
         Args:
-            engine_url: Optional URL from Config for external Acestream engine
+            engine_url: Optional URL of an engine to check instead of the configured ones
         """
-        self.config_engine_url = engine_url
         self.is_internal_engine = self.is_enabled()
         
-        # Determine the URL to use based on whether internal engine is enabled
+        # The internal engine is addressed through environment variables
         if self.is_internal_engine:
-            # Use environment variables for internal engine
             host = os.environ.get('ACESTREAM_HTTP_HOST', 'localhost')
             if host == "ACEXY_HOST":
                 host = os.environ.get('ACEXY_HOST', 'localhost')
             port = os.environ.get('ACESTREAM_HTTP_PORT', '6878')
-            self.engine_url = f"http://{host}:{port}"
-        else:
-            # Use the config URL for external engine
-            self.engine_url = self.config_engine_url
-            
-            # If still no URL provided, use a default
-            if not self.engine_url:
-                self.engine_url = "http://localhost:6878"
-        
-        # If URL doesn't start with a protocol, assume http://
-        if not self.engine_url.startswith('http'):
-            self.engine_url = f"http://{self.engine_url}"
+            engine_url = f"http://{host}:{port}"
         
-        # Ensure the URL doesn't end with a slash
-        self.engine_url = self.engine_url.rstrip('/')
+        # A given or internal engine is checked alone; otherwise the shared pool picks one
+        self.engines = EnginePool([engine_url]) if engine_url else engine_pool
+        self.engine_url = self.engines.urls[0] if self.engines.size else None
         
-        logger.debug(f"Acestream Engine URL set to: {self.engine_url} (internal engine: {self.is_internal_engine})")
+        logger.debug(f"Acestream Engine URLs: {', '.join(self.engines.urls) or 'none'} "
+                     f"(internal engine: {self.is_internal_engine})")
     
     def is_enabled(self) -> bool:
         """Check if internal Acestream Engine is enabled based on environment variable."""
@@ -51,6 +42,10 @@ class AcestreamStatusService:
         """
         Check Acestream Engine status and return details.
         
+        The engine is picked from the pool like for status checks and
+        searches, and the outcome is reported back to it, so an engine
+        that does not answer counts towards marking it down.
+        
         Returns:
             Dict with status details including:
             - enabled: Whether the internal engine is enabled (for UI logic)
@@ -63,14 +58,26 @@ class AcestreamStatusService:
             - connected: Whether engine is connected to network
             - playlist_loaded: Whether engine has loaded its playlist
         """
-        # Always attempt to check status, regardless of whether internal engine is enabled
+        try:
+            with self.engines.acquire() as engine:
+                self.engine_url = engine.url
+                status = self._check_engine(engine.url)
+                self.engines.report(engine, status['available'],
+                                    None if status['available'] else status['message'])
+                return status
+        except RuntimeError as e:
+            # No engine configured
+            return self._unavailable(f"Could not connect to Acestream Engine: {str(e)}")
+    
+    def _check_engine(self, engine_url: str) -> Dict[str, Any]:
+        """Check the status of one engine."""
         try:
             # Get engine status
-            status_url = f"{self.engine_url}/server/api?api_version=3&method=get_status"
+            status_url = f"{engine_url}/server/api?api_version=3&method=get_status"
             status_response = requests.get(status_url, timeout=10)
             
             # Get network connection status
-            network_url = f"{self.engine_url}/server/api?api_version=3&method=get_network_connection_status"
+            network_url = f"{engine_url}/server/api?api_version=3&method=get_network_connection_status"
             network_response = requests.get(network_url, timeout=10)
             
             if status_response.status_code == 200 and network_response.status_code == 200:
@@ -90,7 +97,7 @@ class AcestreamStatusService:
                 return {
                     "enabled": self.is_internal_engine,  # Whether internal engine is enabled
                     "is_internal": self.is_internal_engine,
-                    "engine_url": self.engine_url,
+                    "engine_url": engine_url,
                     "available": True,
                     "message": message,
                     "version": engine_version,
@@ -106,37 +113,24 @@ class AcestreamStatusService:
             if network_response.status_code != 200:
                 error_details += f", network API returned {network_response.status_code}"
                 
-            message = f"Acestream Engine is not responding properly{error_details}"
-            if not self.is_internal_engine:
-                message = f"External {message}"
-                
-            return {
-                "enabled": self.is_internal_engine,  # Whether internal engine is enabled
-                "is_internal": self.is_internal_engine,
-                "engine_url": self.engine_url,
-                "available": False,
-                "message": message,
-                "version": None,
-                "platform": None,
-                "playlist_loaded": None,
-                "connected": None
-            }
+            return self._unavailable(f"Acestream Engine is not responding properly{error_details}")
             
         except Exception as e:
             logger.error(f"Error checking Acestream Engine status: {str(e)}")
-            
-            message = f"Could not connect to Acestream Engine: {str(e)}"
-            if not self.is_internal_engine:
-                message = f"External {message}"
-                
-            return {
-                "enabled": self.is_internal_engine,  # Whether internal engine is enabled
-                "is_internal": self.is_internal_engine,
-                "engine_url": self.engine_url,
-                "available": False,
-                "message": message,
-                "version": None,
-                "platform": None,
-                "playlist_loaded": None,
-                "connected": None
-            }
\ No newline at end of file
+            return self._unavailable(f"Could not connect to Acestream Engine: {str(e)}")
+    
+    def _unavailable(self, message: str) -> Dict[str, Any]:
+        """Status of an engine that could not be reached or did not answer properly."""
+        if not self.is_internal_engine:
+            message = f"External {message}"
+        return {
+            "enabled": self.is_internal_engine,  # Whether internal engine is enabled
+            "is_internal": self.is_internal_engine,
+            "engine_url": self.engine_url,
+            "available": False,
+            "message": message,
+            "version": None,
+            "platform": None,
+            "playlist_loaded": None,
+            "connected": None
+        }
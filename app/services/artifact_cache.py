@@ -0,0 +1,426 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Response, request, stream_with_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.utils.path import data_dir
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Tables whose contents end up in playlists and EPG guides
+WATCHED_TABLES = frozenset({'acestream_channels', 'tv_channels', 'settings', 'epg_channels', 'epg_programs'})
+
+_WRITE_STATEMENT = re.compile(
+    r'\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b(?:\s+OR\s+\w+)?(?:\s+INTO|\s+FROM)?\s+["`]?(\w+)',
+    re.IGNORECASE
+)
+# Columns of watched tables that are never rendered: updates that set only these change nothing served
+UNRENDERED_COLUMNS = {'acestream_channels': frozenset({'last_checked', 'check_error'})}
+_UPDATE_SET_CLAUSE = re.compile(r'\bSET\s+(.*?)\s+WHERE\b', re.IGNORECASE | re.DOTALL)
+_ASSIGNED_COLUMN = re.compile(r'["`]?(\w+)["`]?\s*=')
+_CHANGED_FLAG = 'artifact_data_changed'
+
+# Streamed documents larger than this are still served, just not cached
+MAX_CACHED_ARTIFACT_SIZE = 8 * 1024 * 1024
+
+# Documents smaller than this are not worth compressing
+MIN_COMPRESSED_SIZE = 1024
+GZIP_LEVEL = 6
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+
+def _gzip_compressor():
+    # A gzip container written by zlib has no timestamp or file name, so
+    # every worker produces the same bytes for the same document
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def _gzip(body: bytes) -> bytes:
+    compressor = _gzip_compressor()
+    return compressor.compress(body) + compressor.flush()
+
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {'gzip': _gzip}
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=9)
+if zstandard is not None:
+    ENCODERS['zstd'] = lambda body: zstandard.ZstdCompressor(level=10).compress(body)
+
+# Offered in this order when a client accepts several equally
+ENCODING_PREFERENCE = ('br', 'zstd', 'gzip')
+
+
+class DataGeneration:
+    """
+    Counter of changes to the data rendered into playlists and guides.
+
+    Every committed write to a watched table that can change rendered
+    data bumps it (see ``UNRENDERED_COLUMNS``). The bump is also
+    recorded in a small file under the data dir, so changes committed by
+    other worker processes (or the task manager of another worker) are
+    noticed with a single stat() call and no database query. The file is
+    ``name`` in the data dir unless ``path`` is given.
+    """
+
+    def __init__(self, path: Optional[Path] = None, name: str = 'data_generation'):
+        self._path = path
+        self.name = name
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._seen = None
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            self._path = data_dir() / self.name
+        return self._path
+
+    def _identity(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> int:
+        """Return the current generation, picking up bumps made by other processes."""
+        identity = self._identity()
+        with self._lock:
+            if identity != self._seen:
+                self._seen = identity
+                self._generation += 1
+            return self._generation
+
+    def bump(self) -> int:
+        """Start a new generation and let the other processes know."""
+        with self._lock:
+            self._generation += 1
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix='.generation_')
+                with os.fdopen(fd, 'w') as f:
+                    f.write(f"{os.getpid()}-{time.time_ns()}-{self._generation}")
+                os.replace(tmp_path, self.path)
+                self._seen = self._identity()
+            except OSError as e:
+                logger.warning(f"Could not record data generation: {e}")
+            return self._generation
+
+
+class Artifact:
+    """
+    A rendered playlist or guide with its strong ETag.
+
+    Compressed encodings are kept alongside the plain body and produced at
+    most once. ``body`` is None when only the gzipped document was small
+    enough to cache; plain requests then get it decompressed on the fly.
+    """
+
+    __slots__ = ('body', 'etag', 'mimetype', 'created', 'size', 'encodings', '_lock')
+
+    def __init__(self, body: Optional[bytes], mimetype: str, etag: Optional[str] = None,
+                 size: Optional[int] = None, encodings: Optional[Dict[str, bytes]] = None):
+        self.body = body
+        self.etag = etag or hashlib.sha256(body).hexdigest()[:32]
+        self.size = len(body) if body is not None else size
+        self.mimetype = mimetype
+        self.created = time.monotonic()
+        self.encodings = dict(encodings or {})
+        self._lock = threading.Lock()
+
+    def available_encodings(self) -> List[str]:
+        """Encodings that are stored or can be produced from the plain body."""
+        return [encoding for encoding in ENCODING_PREFERENCE
+                if encoding in self.encodings or (self.body is not None and encoding in ENCODERS)]
+
+    def encoded(self, encoding: str) -> bytes:
+        """Return the body in ``encoding``, compressing it on first use."""
+        with self._lock:
+            data = self.encodings.get(encoding)
+            if data is None:
+                data = self.encodings[encoding] = ENCODERS[encoding](self.body)
+            return data
+
+    def iter_body(self) -> Iterator[bytes]:
+        """Yield the plain body, decompressing the gzipped copy if that is all there is."""
+        if self.body is not None:
+            yield self.body
+            return
+        decompressor = zlib.decompressobj(31)
+        data = self.encodings['gzip']
+        for offset in range(0, len(data), DECOMPRESS_CHUNK_SIZE):
+            yield decompressor.decompress(data[offset:offset + DECOMPRESS_CHUNK_SIZE])
+        yield decompressor.flush()
+
+    def representation_etag(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f"{self.etag}-{encoding}"
+
+    @property
+    def stored_size(self) -> int:
+        with self._lock:
+            return len(self.body or b'') + sum(len(data) for data in self.encodings.values())
+
+
+class ArtifactCache:
+    """
+    Rendered playlists and guides keyed by (endpoint, params, generation).
+
+    Entries of older generations are dropped as soon as a new generation is
+    seen, so a hit always reflects the current data. ETags are content
+    hashes, so they are the same across worker processes.
+    """
+
+    def __init__(self, generation: Optional[DataGeneration] = None, max_entries: int = 64):
+        self.generation = generation or DataGeneration()
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, Artifact]' = OrderedDict()
+        self._entries_generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(endpoint: str, params: Dict) -> Tuple:
+        return endpoint, tuple(sorted(params.items()))
+
+    def get(self, endpoint: str, params: Dict, max_age: Optional[float] = None) -> Optional[Artifact]:
+        """Return the cached artifact for the current generation, if any."""
+        generation = self.generation.current()
+        key = self._key(endpoint, params)
+        with self._lock:
+            if generation != self._entries_generation:
+                self._entries.clear()
+                self._entries_generation = generation
+            artifact = self._entries.get(key)
+            if artifact and max_age is not None and time.monotonic() - artifact.created > max_age:
+                del self._entries[key]
+                artifact = None
+            if artifact:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return artifact
+
+    def put(self, endpoint: str, params: Dict, artifact: Artifact, generation: int) -> None:
+        """Store an artifact rendered from the data of ``generation``."""
+        current = self.generation.current()
+        with self._lock:
+            if generation != current:
+                # The data changed while rendering; the result may already be stale
+                return
+            if generation != self._entries_generation:
+                self._entries.clear()
+                self._entries_generation = generation
+            self._entries[self._key(endpoint, params)] = artifact
+            self._entries.move_to_end(self._key(endpoint, params))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, endpoint: str, params: Dict, render: Callable[[], str], mimetype: str,
+                      max_age: Optional[float] = None) -> Artifact:
+        """Return the cached artifact, rendering and caching it on a miss."""
+        artifact = self.get(endpoint, params, max_age)
+        if artifact:
+            return artifact
+        generation = self.generation.current()
+        artifact = Artifact(render().encode('utf-8'), mimetype)
+        self.put(endpoint, params, artifact, generation)
+        return artifact
+
+    def stream(self, endpoint: str, params: Dict, chunks: Callable[[], Iterable[str]], mimetype: str,
+               max_size: int = MAX_CACHED_ARTIFACT_SIZE, gzipped: bool = False) -> Iterator[bytes]:
+        """
+        Yield a document as encoded chunks while it is being rendered.
+
+        The document is gzipped as it goes, and ``gzipped`` yields those
+        bytes instead of the plain ones. Both bodies are cached once the
+        document is complete; each is left out if it grows past ``max_size``,
+        and nothing is cached if the client goes away first.
+        """
+        generation = self.generation.current()
+        digest = hashlib.sha256()
+        compressor = _gzip_compressor()
+        plain, compressed = [], []
+        plain_size = compressed_size = 0
+        for chunk in chunks():
+            data = chunk.encode('utf-8')
+            digest.update(data)
+            plain_size += len(data)
+            if plain is not None:
+                if plain_size > max_size:
+                    plain = None
+                else:
+                    plain.append(data)
+            packed = compressor.compress(data)
+            if packed and compressed is not None:
+                compressed_size += len(packed)
+                if compressed_size > max_size:
+                    compressed = None
+                else:
+                    compressed.append(packed)
+            if not gzipped:
+                yield data
+            elif packed:
+                yield packed
+        packed = compressor.flush()
+        if gzipped:
+            yield packed
+        if compressed is not None and compressed_size + len(packed) <= max_size:
+            encodings = {'gzip': b''.join(compressed) + packed}
+        else:
+            encodings = {}
+        if plain is None and not encodings:
+            return
+        artifact = Artifact(b''.join(plain) if plain is not None else None, mimetype,
+                            etag=digest.hexdigest()[:32], size=plain_size, encodings=encodings)
+        self.put(endpoint, params, artifact, generation)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'generation': self._entries_generation,
+                    'bytes': sum(artifact.stored_size for artifact in self._entries.values())}
+
+
+def _negotiate_encoding(offers: List[str]) -> Optional[str]:
+    """Return the client's preferred encoding among ``offers``, None for the plain body."""
+    return request.accept_encodings.best_match(offers)
+
+
+def artifact_response(artifact: Artifact, filename: str) -> Response:
+    """
+    Serve an artifact in the best encoding the client accepts, answering 304
+    when the client already has this version.
+
+    Each encoding is a separate representation with its own ETag.
+    """
+    encoding = None
+    if artifact.size >= MIN_COMPRESSED_SIZE:
+        encoding = _negotiate_encoding(artifact.available_encodings())
+    etag = artifact.representation_etag(encoding)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        headers = {"Content-Disposition": f"attachment; filename={filename}"}
+        if encoding is not None:
+            body = artifact.encoded(encoding)
+            headers['Content-Encoding'] = encoding
+        elif artifact.body is not None:
+            body = artifact.body
+        else:
+            body = artifact.iter_body()
+            headers['Content-Length'] = str(artifact.size)
+        response = Response(body, mimetype=artifact.mimetype, headers=headers)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    # Clients may keep the document but must revalidate it on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def serve_artifact(endpoint: str, params: Dict, chunks: Callable[[], Iterable[str]], mimetype: str,
+                   filename: str, max_age: Optional[float] = None) -> Response:
+    """
+    Serve a cached document, or stream it from ``chunks`` and cache it.
+
+    Streamed responses carry no ETag, since it is only known once the whole
+    document has been rendered; the next poll gets it from the cache.
+    """
+    artifact = artifact_cache.get(endpoint, params, max_age)
+    if artifact:
+        return artifact_response(artifact, filename)
+    return streamed_response(endpoint, params, chunks, mimetype, filename)
+
+
+def streamed_response(endpoint: str, params: Dict, chunks: Callable[[], Iterable[str]], mimetype: str,
+                      filename: str) -> Response:
+    """Stream a document to the client, gzipped if it accepts that, caching it once complete."""
+    gzipped = _negotiate_encoding(['gzip']) == 'gzip'
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if gzipped:
+        headers['Content-Encoding'] = 'gzip'
+    response = Response(
+        stream_with_context(artifact_cache.stream(endpoint, params, chunks, mimetype, gzipped=gzipped)),
+        mimetype=mimetype,
+        headers=headers
+    )
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+data_generation = DataGeneration()
+artifact_cache = ArtifactCache(data_generation)
+
+
+def _changes_rendered_data(table: str, statement: str, rowcount: int) -> bool:
+    """Whether a write to a watched table can change what playlists and guides render."""
+    if rowcount == 0:
+        return False
+    unrendered = UNRENDERED_COLUMNS.get(table)
+    if unrendered and statement.lstrip()[:6].upper() == 'UPDATE':
+        match = _UPDATE_SET_CLAUSE.search(statement)
+        if match:
+            columns = {column.lower() for column in _ASSIGNED_COLUMN.findall(match.group(1))}
+            if columns and columns <= unrendered:
+                return False
+    return True
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _track_watched_writes(conn, cursor, statement, parameters, context, executemany):
+    match = _WRITE_STATEMENT.match(statement)
+    if match:
+        table = match.group(1).lower()
+        if table in WATCHED_TABLES and _changes_rendered_data(table, statement, cursor.rowcount):
+            conn.info[_CHANGED_FLAG] = True
+
+
+# The Connection 'commit' event fires before the DBAPI commit, so it only
+# marks the thread; the bump happens once the session's commit has finished,
+# otherwise a concurrent render could cache old rows under the new generation.
+_pending = threading.local()
+
+
+@event.listens_for(Engine, 'commit')
+def _mark_on_commit(conn):
+    if conn.info.pop(_CHANGED_FLAG, False):
+        _pending.bump = True
+
+
+@event.listens_for(Engine, 'rollback')
+def _forget_on_rollback(conn):
+    conn.info.pop(_CHANGED_FLAG, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    if getattr(_pending, 'bump', False):
+        _pending.bump = False
+        data_generation.bump()
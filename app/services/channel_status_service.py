@@ -1,34 +1,145 @@
+import time
 import asyncio
 import logging
-import aiohttp
 import threading
+from contextvars import ContextVar
+from types import SimpleNamespace
 from datetime import datetime, timezone
-from typing import Optional, List, Union, Dict, Any
+from typing import Optional, List, Dict, Any
 from ..models import AcestreamChannel
 from ..extensions import db
+from ..utils.aimd import AIMDLimiter
 from ..utils.config import Config
+from ..utils.db_writer import db_writer
 from ..repositories.channel_repository import ChannelRepository
+from ..utils.engine_pool import EnginePool, engine_pool
+from ..utils.http_client import http_clients
+from ..utils.single_flight import MISS, SingleFlightCache
 
 logger = logging.getLogger(__name__)
 
+# Set by check_channel when the engine itself failed (no answer, timeout, HTTP 5xx or 429),
+# as opposed to answering that the channel is offline
+_engine_failed: ContextVar[bool] = ContextVar('engine_failed', default=False)
+
+# Seconds between progress lines of a sweep
+PROGRESS_LOG_INTERVAL = 10
+
+
+class StatusSweep:
+    """Progress of one status check over many channels."""
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.checked = 0
+        self.online = 0
+        self.engine_errors = 0
+        self.skipped = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.deadline_reached = False
+        self.limiter: Optional[AIMDLimiter] = None
+        self._logged_at = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def checks_per_second(self) -> float:
+        return self.checked / self.elapsed if self.elapsed else 0.0
+
+    def log_progress(self, force: bool = False):
+        now = time.monotonic()
+        if force or now - self._logged_at >= PROGRESS_LOG_INTERVAL:
+            self._logged_at = now
+            limit = self.limiter.current if self.limiter else None
+            logger.info(f"Checked {self.checked}/{self.total} channels, {self.checks_per_second:.1f} checks/s, "
+                        f"concurrency {limit}, {self.engine_errors} engine errors")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'checked': self.checked,
+            'online': self.online,
+            'offline': self.checked - self.online,
+            'engine_errors': self.engine_errors,
+            'skipped': self.skipped,
+            'running': self.started_at is not None and self.finished_at is None,
+            'deadline_reached': self.deadline_reached,
+            'elapsed_seconds': round(self.elapsed, 1),
+            'checks_per_second': round(self.checks_per_second, 2),
+            'concurrency': self.limiter.get_stats() if self.limiter else None,
+        }
+
+
+# The background sweep running or last run, for progress reports
+_current_sweep: Optional[StatusSweep] = None
+
+
+def get_sweep_progress() -> Optional[Dict[str, Any]]:
+    """Progress of the running or last background status check, None if there was none."""
+    sweep = _current_sweep
+    return sweep.to_dict() if sweep else None
+
 class ChannelStatusService:
     """Service for checking Acestream channel status."""
+    # Checks are spread over the configured engines; set a pool of your own on an instance to use others
+    engines: EnginePool = engine_pool
+
     def __init__(self):
-        config = Config()
-        self.ace_engine_url = config.ace_engine_url
         self.timeout = 10
         self.repo = ChannelRepository()  # Create single repository instance
         self._next_player_id = 0  # Counter for generating unique player IDs
         
     async def check_channel(self, channel: AcestreamChannel) -> bool:
         """Check if a channel is alive by querying the Acestream engine."""
-        from flask import current_app
-        
+        return (await self.probe(channel))['is_online']
+
+    async def probe(self, channel: AcestreamChannel) -> Dict[str, Any]:
+        """Check a channel (or anything with its id and name) and record the result; returns the result."""
+        check_time = datetime.now(timezone.utc)
+        is_online, error = await self._query_engine(channel)
+        if not is_online and error:
+            logger.info(f"Channel {channel.id} ({channel.name}) is offline: {error}")
+        await self._record_status(channel.id, is_online, check_time, error)
+        return {
+            'id': channel.id,
+            'name': channel.name,
+            'is_online': is_online,
+            'status': 'online' if is_online else 'offline',
+            'last_checked': check_time,
+            'error': error
+        }
+
+    async def _query_engine(self, channel: AcestreamChannel):
+        """
+        Ask an engine about a channel; returns (is_online, error).
+
+        The channel's engine in the pool is asked first. If the engine itself
+        fails, another engine is tried once.
+        """
+        if not self.engines.size:
+            _engine_failed.set(True)
+            return False, "No Acestream engine configured"
+        failed_engines = []
+        for _ in range(min(2, self.engines.size)):
+            _engine_failed.set(False)
+            with self.engines.acquire(channel.id, exclude=failed_engines) as engine:
+                is_online, error = await self._ask_engine(engine.url, channel)
+                self.engines.report(engine, not _engine_failed.get(), error)
+            if not _engine_failed.get():
+                break
+            failed_engines.append(engine.url)
+        return is_online, error
+
+    async def _ask_engine(self, engine_url: str, channel: AcestreamChannel):
         try:
-            check_time = datetime.now(timezone.utc)
-              # Build status check URL with unique player ID
+            # Build status check URL with unique player ID
             self._next_player_id = (self._next_player_id + 1) % 100000  # Roll over at 100000
-            status_url = f"{self.ace_engine_url}/ace/getstream"
+            status_url = f"{engine_url}/ace/getstream"
             params = {
                 'id': channel.id,
                 'format': 'json',
@@ -36,165 +147,157 @@ class ChannelStatusService:
                 'pid': str(self._next_player_id)
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(status_url, 
-                                     params=params,
-                                     timeout=self.timeout) as response:
-                    if response.status == 200:
-                        try:
-                            data = await response.json()
-                            
-                            if isinstance(data, dict):
-                                response_data = data.get('response', {})
-                                error = data.get('error')
-                                
-                                # Perform database updates within app context
-                                with current_app.app_context():
-                                    # Check for "got newer download" message
-                                    if error and "got newer download" in str(error).lower():
-                                        self.repo.update_channel_status(channel.id, True, check_time)
-                                        return True
-                                    
-                                    # Check regular online status
-                                    if (error is None and 
-                                        response_data and 
-                                        response_data.get('is_live') == 1):
-                                        self.repo.update_channel_status(channel.id, True, check_time)
-                                        return True
-                                    
-                                    # Channel exists but not available
-                                    error_msg = error if error else "Channel is not live"
-                                    self.repo.update_channel_status(channel.id, False, check_time, error_msg)
-                                    logger.info(f"Channel {channel.id} ({channel.name}) is offline: {error_msg}")
-                                    return False
-                                    
-                            with current_app.app_context():
-                                self.repo.update_channel_status(channel.id, False, check_time, "Invalid response format")
-                            return False
-                                
-                        except ValueError as e:
-                            with current_app.app_context():
-                                self.repo.update_channel_status(channel.id, False, check_time, f"Invalid response format: {str(e)}")
-                            return False
+            session = http_clients.session('status')
+            async with session.get(status_url, 
+                                 params=params,
+                                 timeout=self.timeout) as response:
+                if response.status == 200:
+                    try:
+                        data = await response.json()
+                    except ValueError as e:
+                        return False, f"Invalid response format: {str(e)}"
+                        
+                    if not isinstance(data, dict):
+                        return False, "Invalid response format"
+                    response_data = data.get('response', {})
+                    error = data.get('error')
                     
-                    with current_app.app_context():
-                        self.repo.update_channel_status(channel.id, False, check_time, f"HTTP {response.status}")
-                    return False
-            
+                    # Check for "got newer download" message
+                    if error and "got newer download" in str(error).lower():
+                        return True, None
+                    
+                    # Check regular online status
+                    if error is None and response_data and response_data.get('is_live') == 1:
+                        return True, None
+                    
+                    # Channel exists but not available
+                    return False, error if error else "Channel is not live"
+                
+                if response.status >= 500 or response.status == 429:
+                    _engine_failed.set(True)
+                return False, f"HTTP {response.status}"
+        
         except Exception as e:
+            _engine_failed.set(True)
             logger.error(f"Error checking channel {channel.id}: {e}")
-            with current_app.app_context():
-                self.repo.update_channel_status(channel.id, False, check_time, str(e))
-            return False
-            
-    async def check_channels(self, channels: List[AcestreamChannel], concurrency: int = 2):
-        """Check multiple channels concurrently with rate limiting."""
-        semaphore = asyncio.Semaphore(concurrency)
-        
-        async def check_with_semaphore(channel):
-            async with semaphore:
-                try:
-                    # Check the channel
-                    result = await self.check_channel(channel)
-                    await asyncio.sleep(2)
-                    return result
-                except Exception as e:
-                    logger.error(f"Error checking channel {channel.id}: {e}")
-                    return False
-        
-        chunk_size = 2
-        results = []
-        
-        for i in range(0, len(channels), chunk_size):
-            chunk = channels[i:i + chunk_size]
-            tasks = [asyncio.create_task(check_with_semaphore(channel)) for channel in chunk]
-            
-            try:
-                chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
-                results.extend([r for r in chunk_results if not isinstance(r, Exception)])
-            except Exception as e:
-                logger.error(f"Error processing chunk: {e}", exc_info=True)
-            finally:
-                for task in tasks:
-                    if not task.done():
-                        task.cancel()
+            return False, str(e)
+
+    async def _record_status(self, channel_id: str, is_online: bool, check_time: datetime, error: Optional[str]):
+        # Through the database writer: a sweep's results are committed in batches, off the event loop
+        try:
+            await db_writer.write('channel_status', {
+                'channel_id': channel_id,
+                'online': is_online,
+                'check_time': check_time,
+                'error': error,
+            }, key=channel_id)
+        except Exception as e:
+            logger.error(f"Error updating status for channel {channel_id}: {e}")
             
-            await asyncio.sleep(2)
-        
-        return results
+    async def check_channels(self, channels: List[AcestreamChannel], max_concurrency: Optional[int] = None,
+                             deadline: Optional[float] = None, sweep: Optional[StatusSweep] = None) -> List[bool]:
+        """
+        Check many channels, as many at once as the engines keep up with.
+
+        Concurrency starts low and follows the engines: it grows while checks
+        come back quickly and is halved when they slow down or the engine
+        fails (see AIMDLimiter), never above ``max_concurrency`` (by default
+        the configured ceiling per engine times the engines). No new
+        check starts after ``deadline`` seconds; the remaining channels are
+        counted as skipped. Progress goes to ``sweep`` if given.
+
+        Returns:
+            Online status of the channels checked, in the order given
+        """
+        config = Config()
+        max_concurrency = max_concurrency or config.status_check_max_concurrency * max(1, self.engines.size)
+        sweep = sweep or StatusSweep()
+        sweep.total = len(channels)
+        # Two checks per engine to start with
+        sweep.limiter = limiter = AIMDLimiter(initial=min(2 * max(1, self.engines.size), max_concurrency),
+                                              maximum=max_concurrency)
+        loop = asyncio.get_running_loop()
+        sweep.started_at = time.monotonic()
+        deadline_at = loop.time() + deadline if deadline else None
+        results: List[Optional[bool]] = [None] * len(channels)
+        pending = iter(enumerate(channels))
 
-async def check_channel_status(channel_id_or_obj: Union[str, AcestreamChannel, Dict[str, Any]]) -> dict:
+        async def worker():
+            while not sweep.deadline_reached:
+                async with limiter.slot() as slot:
+                    item = next(pending, None)
+                    if item is None:
+                        return
+                    if deadline_at is not None and loop.time() >= deadline_at:
+                        sweep.deadline_reached = True
+                        return
+                    index, channel = item
+                    _engine_failed.set(False)
+                    try:
+                        results[index] = await self.check_channel(channel)
+                        engine_ok = not _engine_failed.get()
+                    except Exception as e:
+                        logger.error(f"Error checking channel {channel.id}: {e}")
+                        results[index], engine_ok = False, False
+                    slot.record(engine_ok)
+                sweep.checked += 1
+                sweep.online += bool(results[index])
+                sweep.engine_errors += not engine_ok
+                sweep.log_progress()
+
+        try:
+            # One worker per slot the limiter may ever allow; the limiter decides how many run
+            await asyncio.gather(*(worker() for _ in range(min(max_concurrency, len(channels)))))
+        finally:
+            sweep.finished_at = time.monotonic()
+            sweep.skipped = sweep.total - sweep.checked
+        if sweep.deadline_reached:
+            logger.warning(f"Status check deadline reached, skipped {sweep.skipped} channels")
+        sweep.log_progress(force=True)
+        return [result for result in results if result is not None]
+
+# Results of single-channel checks, shared by requests for the same channel
+status_cache = SingleFlightCache()
+
+
+async def check_channel_status_shared(app, channel: Any, ttl: float) -> Dict[str, Any]:
     """
-    Check status of a single channel.
-    
-    Args:
-        channel_id_or_obj: Can be channel ID string, channel object or dict with channel data
+    Check a channel's status for a request, sharing results between requests.
+
+    A result younger than ``ttl`` seconds is returned without asking the
+    engine, and requests arriving while a check of the channel is in flight
+    wait for that check instead of starting another. Runs on the background
+    loop (see background_loop), in an app context of ``app``.
+
+    Returns:
+        The result of ChannelStatusService.probe, with ``cache`` ('hit',
+        'shared' or 'miss'), ``cache_hit`` and ``cache_age`` in seconds
     """
-    from flask import current_app
-    
-    # Determine what we're working with and get channel ID
-    channel_id = None
-    channel_name = None
-    
-    if isinstance(channel_id_or_obj, str):
-        channel_id = channel_id_or_obj
-    elif isinstance(channel_id_or_obj, dict):
-        channel_id = channel_id_or_obj.get('id')
-        channel_name = channel_id_or_obj.get('name', 'Unknown')
-    elif hasattr(channel_id_or_obj, 'id'):
-        channel_id = channel_id_or_obj.id
-        channel_name = getattr(channel_id_or_obj, 'name', 'Unknown')
-    
-    if not channel_id:
-        raise ValueError("Missing channel ID")
-        
-    # Create a new service instance
-    service = ChannelStatusService()
-    
-    # We need to get a fresh channel object in a new session
-    with current_app.app_context():
-        repo = ChannelRepository()
-        channel = repo.get_by_id(channel_id)
-        if not channel:
-            raise ValueError(f"Channel {channel_id} not found")
-            
-        # Now check the channel
-        is_online = await service.check_channel(channel)
-        
-        # Get the fresh state after the check
-        updated_channel = repo.get_by_id(channel_id)
-        
-        # Return the results
-        return {
-            'id': channel_id,
-            'name': channel_name or updated_channel.name,
-            'is_online': is_online, 
-            'status': 'online' if is_online else 'offline',
-            'last_checked': updated_channel.last_checked,
-            'error': updated_channel.check_error
-        }
+    async def probe():
+        with app.app_context():
+            return await ChannelStatusService().probe(SimpleNamespace(id=channel.id, name=channel.name))
+
+    result, served, age = await status_cache.get(channel.id, probe, ttl)
+    return dict(result, cache=served, cache_hit=served != MISS,
+                cache_age=round(age, 1) if age is not None else None)
 
 def start_background_check(channels: list[AcestreamChannel]) -> dict:
     """Start background channel status check."""
+    global _current_sweep
     from flask import current_app
     
     # Capture the app instance before starting the thread
     app = current_app._get_current_object()
     
+    config = Config()
+    deadline = config.status_check_deadline * 60
+    sweep = _current_sweep = StatusSweep(len(channels))
+
     async def run_checks():
         service = ChannelStatusService()
         try:
-            batch_size = 30
-            total_processed = 0
-            
-            for i in range(0, len(channels), batch_size):
-                batch = channels[i:i + batch_size]
-                with app.app_context():
-                    await service.check_channels(batch, concurrency=5)
-                total_processed += len(batch)
-                logger.info(f"Processed {total_processed}/{len(channels)} channels")
-                await asyncio.sleep(3)
-                
+            with app.app_context():
+                await service.check_channels(channels, deadline=deadline, sweep=sweep)
         except Exception as e:
             logger.error(f"Error in background check: {e}", exc_info=True)
     
@@ -210,6 +313,7 @@ def start_background_check(channels: list[AcestreamChannel]) -> dict:
             logger.error(f"Background thread error: {e}", exc_info=True)
         finally:
             try:
+                loop.run_until_complete(http_clients.close())
                 loop.close()
             except Exception as e:
                 logger.error(f"Error closing loop: {e}")
@@ -0,0 +1,184 @@
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.extensions import db
+from app.models.epg_string_mapping import EPGStringMapping
+from app.services.artifact_cache import DataGeneration
+from app.utils.aho_corasick import AhoCorasick
+
+logger = logging.getLogger(__name__)
+
+
+class MappingRule:
+    """An EPGStringMapping detached from the session, with its scoring inputs precomputed."""
+
+    __slots__ = ('id', 'search_pattern', 'epg_channel_id', 'pattern', 'words', 'joined_words',
+                 'base_score', 'first_word')
+
+    def __init__(self, mapping_id: int, search_pattern: str, epg_channel_id: str):
+        self.id = mapping_id
+        self.search_pattern = search_pattern
+        self.epg_channel_id = epg_channel_id
+        self.pattern = search_pattern.lower()
+        self.words = self.pattern.split()
+        self.joined_words = ' '.join(self.words)
+        self.first_word = self.words[0] if self.words else None
+
+        # Base score - pattern length multiplied by 10 to give it more weight
+        self.base_score = len(self.pattern) * 10
+        # Bonus for patterns with numbers
+        if any(char.isdigit() for char in self.pattern):
+            self.base_score += 1500
+
+    def score(self, name_lower: str, channel_words: List[str], channel_joined: str) -> int:
+        """Score this rule against a channel name it occurs in."""
+        pattern_score = self.base_score
+
+        # HIGHEST PRIORITY: Exact match with full name
+        if self.pattern == name_lower:
+            pattern_score += 10000  # Extremely high priority
+
+        # VERY HIGH PRIORITY: Pattern exactly matches the start of the name
+        if name_lower.startswith(self.pattern):
+            pattern_score += 3000  # Higher priority than having numbers
+
+        # Bonus for matching complete words
+        if all(word in channel_words for word in self.words):
+            pattern_score += 1000 * len(self.words)
+
+            # Bonus if words are in the same order
+            if self.joined_words in channel_joined:
+                pattern_score += 500
+
+        # Bonus if first word of pattern matches first word of channel
+        # This helps prioritize patterns like "dazn laliga" for channels starting with "DAZN"
+        if channel_words and self.first_word is not None and channel_words[0] == self.first_word:
+            pattern_score += 1800
+
+        return pattern_score
+
+
+class CompiledMappingRules:
+    """
+    EPG string mapping rules compiled into a single Aho–Corasick automaton.
+
+    Regular patterns, exclusion patterns (``!`` prefix, matched without the
+    prefix) and the literal patterns used by get_channel_epg_data are all
+    found in one pass over the lowercased channel name. Winners are the same
+    as scoring every rule in table order.
+    """
+
+    MAPPING, EXCLUSION, LITERAL = 0, 1, 2
+
+    def __init__(self, rows: List[Tuple[int, str, str]]):
+        self.rows = rows
+        self.rules = [MappingRule(*row) for row in rows]
+        self.mapping_count = sum(1 for rule in self.rules if not rule.search_pattern.startswith('!'))
+
+        entries = []
+        for index, rule in enumerate(self.rules):
+            if rule.search_pattern.startswith('!'):
+                entries.append((rule.pattern[1:], self.EXCLUSION, index))
+            else:
+                entries.append((rule.pattern, self.MAPPING, index))
+            entries.append((rule.pattern, self.LITERAL, index))
+        self._entries = [(kind, index) for _, kind, index in entries]
+        self._automaton = AhoCorasick(text for text, _, _ in entries)
+
+    def _matches(self, name_lower: str, kind: int) -> List[int]:
+        """Indexes of the rules of ``kind`` occurring in the name, in table order."""
+        return sorted(
+            index for kind_, index in (self._entries[i] for i in self._automaton.find_all(name_lower))
+            if kind_ == kind
+        )
+
+    def exclusion_for(self, name: str) -> Optional[MappingRule]:
+        """The first exclusion rule matching the channel name, if any."""
+        matches = self._matches(name.lower(), self.EXCLUSION)
+        return self.rules[matches[0]] if matches else None
+
+    def best_mapping(self, name: str) -> Optional[MappingRule]:
+        """The highest-scoring regular rule for the channel name; ties go to the earliest rule."""
+        name_lower = name.lower()
+        channel_words = name_lower.split()
+        channel_joined = ' '.join(channel_words)
+
+        best, best_score = None, None
+        for index in self._matches(name_lower, self.MAPPING):
+            rule = self.rules[index]
+            score = rule.score(name_lower, channel_words, channel_joined)
+            if best_score is None or score > best_score:
+                best, best_score = rule, score
+        return best
+
+    def literal_matches(self, name: str) -> List[MappingRule]:
+        """Rules whose raw pattern occurs in the channel name, in table order."""
+        return [self.rules[index] for index in self._matches(name.lower(), self.LITERAL)]
+
+
+_cache_lock = threading.Lock()
+_cached_rules: Optional[CompiledMappingRules] = None
+# (engine, generation) the cached rules were compiled for
+_cached_version = None
+
+# Bumped when a commit changes the mapping rows; the file lets other worker processes notice
+mapping_generation = DataGeneration(name='epg_mapping_generation')
+_CHANGED_FLAG = 'epg_mappings_changed'
+
+
+def get_mapping_rules() -> CompiledMappingRules:
+    """
+    Return the compiled mapping rules, recompiling only when the mappings changed.
+
+    The cache holds until a commit writes to the mapping table (in this or
+    another worker process, noticed with a stat() of the generation file),
+    so matching channel after channel does not query the table each time.
+    """
+    global _cached_rules, _cached_version
+    version = (db.engine, mapping_generation.current())
+    with _cache_lock:
+        if _cached_rules is not None and _cached_version == version:
+            return _cached_rules
+
+    rows = [tuple(row) for row in db.session.query(
+        EPGStringMapping.id, EPGStringMapping.search_pattern, EPGStringMapping.epg_channel_id
+    ).order_by(EPGStringMapping.id).all()]
+
+    with _cache_lock:
+        if _cached_rules is None or _cached_rules.rows != rows:
+            _cached_rules = CompiledMappingRules(rows)
+            logger.debug(f"Compiled {len(rows)} EPG string mapping rules")
+        _cached_version = version
+        return _cached_rules
+
+
+def invalidate_mapping_rules() -> None:
+    """Drop the compiled rules; called when mappings change through the API."""
+    global _cached_rules, _cached_version
+    with _cache_lock:
+        _cached_rules = None
+        _cached_version = None
+
+
+@event.listens_for(EPGStringMapping, 'after_insert')
+@event.listens_for(EPGStringMapping, 'after_update')
+@event.listens_for(EPGStringMapping, 'after_delete')
+def _mark_mappings_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[_CHANGED_FLAG] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    if session.info.pop(_CHANGED_FLAG, False):
+        mapping_generation.bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_CHANGED_FLAG, None)
@@ -0,0 +1,223 @@
+import os
+import time
+import pickle
+import logging
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+
+from app.models.epg_source import EPGSource
+from app.services.epg_source_cache import MODIFIED, ERROR
+from app.utils.config import Config
+from app.utils.db_writer import db_writer
+from app.utils.xmltv import open_xmltv_stream
+
+logger = logging.getLogger(__name__)
+
+# Records pickled per batch when a worker process spools a parsed guide
+SPOOL_BATCH_SIZE = 2000
+# Upper bound on download threads; the per-host limit applies on top of it
+MAX_DOWNLOAD_THREADS = 16
+
+
+def parse_guide_to_spool(cache_path: str, spool_path: str, batch_size: int = SPOOL_BATCH_SIZE) -> float:
+    """
+    Parse a cached guide into a spool file of prepared records.
+
+    Runs in a worker process: the XML parsing, time parsing and hashing all
+    happen here, and the writer only replays the pickled batches.
+
+    Returns:
+        Seconds spent parsing
+    """
+    from app.services.epg_service import EPGService
+
+    start = time.perf_counter()
+    service = EPGService()
+    with open(cache_path, 'rb') as f, open(spool_path, 'wb') as spool:
+        batch = []
+        for record in service._iter_prepared_records(open_xmltv_stream(f)):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+    return time.perf_counter() - start
+
+
+def iter_spool(spool_path: str):
+    """Replay the records written by parse_guide_to_spool."""
+    with open(spool_path, 'rb') as spool:
+        while True:
+            try:
+                batch = pickle.load(spool)
+            except EOFError:
+                return
+            yield from batch
+
+
+class EPGRefreshPipeline:
+    """
+    Refresh several EPG sources at once.
+
+    Downloads run on a thread pool, limited per host. Guides that changed are
+    parsed on a process pool, and the calling thread is the single writer:
+    it applies fetch results and syncs parsed records into the database as
+    they become ready. It holds off the background database writer for one
+    commit at a time, so the database is never written concurrently and
+    queued status and scrape writes go in between the sync batches.
+    """
+
+    def __init__(self, service, per_host_limit: Optional[int] = None, parse_workers: Optional[int] = None):
+        config = Config()
+        self.service = service
+        self.per_host_limit = per_host_limit or config.epg_fetch_per_host_limit
+        self.parse_workers = config.epg_parse_workers if parse_workers is None else parse_workers
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._state = {}
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _download(self, snapshot: Dict) -> Dict:
+        queued = time.perf_counter()
+        with self._host_slot(snapshot['url']):
+            start = time.perf_counter()
+            result = self.service.source_cache.download(snapshot)
+        result['timings'] = {
+            'queued': round(start - queued, 3),
+            'download': round(time.perf_counter() - start, 3),
+        }
+        return result
+
+    def run(self, sources: List[EPGSource]) -> None:
+        """Refresh the given sources, recording results in the service's refresh_stats."""
+        if not sources:
+            return
+
+        started = time.perf_counter()
+        sources_by_id = {source.id: source for source in sources}
+        self._state = {source.id: {'started': started} for source in sources}
+
+        parse_pool = None
+        if self.parse_workers > 0:
+            # Spawned rather than forked: the app runs background threads whose
+            # locks would otherwise be copied into the children mid-use
+            parse_pool = ProcessPoolExecutor(
+                max_workers=min(self.parse_workers, len(sources)),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+        try:
+            with tempfile.TemporaryDirectory(prefix='epg_spool_') as spool_dir, \
+                    ThreadPoolExecutor(max_workers=min(len(sources), MAX_DOWNLOAD_THREADS)) as download_pool:
+                pending = {
+                    download_pool.submit(self._download, self.service.source_cache.snapshot(source)): ('download', source.id)
+                    for source in sources
+                }
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, source_id = pending.pop(future)
+                        source = sources_by_id[source_id]
+                        try:
+                            if stage == 'download':
+                                parse_future = self._handle_download(source, future.result(), parse_pool, spool_dir)
+                                if parse_future:
+                                    pending[parse_future] = ('parse', source_id)
+                            else:
+                                self._handle_parsed(source, future.result(), spool_dir)
+                        except Exception as e:
+                            logger.error(f"Error refreshing EPG source {source.url}: {e}")
+                            self._fail(source, str(e))
+        finally:
+            if parse_pool:
+                parse_pool.shutdown()
+
+        # Rebuild the in-memory channel map in source order, so channels that
+        # several guides share resolve the same way no matter which finished first
+        self.service.epg_data = {}
+        for source in sources:
+            if self._state[source.id].get('fetch', {}).get('status') != ERROR:
+                self.service._load_source_channels(source.id)
+
+        stats = self.service.refresh_stats
+        stats['elapsed'] = round(time.perf_counter() - started, 3)
+        if stats['per_source']:
+            stats['slowest_source'] = max(stats['per_source'], key=lambda sid: stats['per_source'][sid]['timings']['total'])
+
+    def _handle_download(self, source: EPGSource, fetch: Dict, parse_pool, spool_dir: str):
+        """Apply a finished download and start parsing if needed; returns the parse future, if any."""
+        state = self._state[source.id]
+        state['fetch'] = fetch
+        state['timings'] = fetch.pop('timings')
+        with db_writer.exclusive():
+            self.service.source_cache.apply(source, fetch)
+
+        if fetch['status'] == ERROR:
+            self._finish(source, None)
+            return None
+
+        # A body that was fetched but never fully synced (a failed parse or
+        # write, or a channel listing) is parsed even when the server says 304
+        if fetch['status'] != MODIFIED and self.service.source_cache.is_ingested(source) \
+                and self.service._load_source_channels(source.id):
+            logger.info(f"EPG source {source.id} unchanged ({fetch['status']}), skipping parse")
+            self._finish(source, None)
+            return None
+
+        cache_path = str(self.service.source_cache.path_for(source))
+        if parse_pool is None:
+            start = time.perf_counter()
+            with self.service.source_cache.open_stream(source) as stream:
+                stats = self.service._ingest_xmltv_stream(stream, source.id)
+            state['timings']['write'] = round(time.perf_counter() - start, 3)
+            self._finish(source, stats)
+            return None
+
+        spool_path = os.path.join(spool_dir, f"source_{source.id}.spool")
+        return parse_pool.submit(parse_guide_to_spool, cache_path, spool_path)
+
+    def _handle_parsed(self, source: EPGSource, parse_seconds: float, spool_dir: str) -> None:
+        """Writer stage: sync a spooled guide into the database."""
+        state = self._state[source.id]
+        state['timings']['parse'] = round(parse_seconds, 3)
+
+        spool_path = os.path.join(spool_dir, f"source_{source.id}.spool")
+        start = time.perf_counter()
+        stats = self.service._sync_source_records(iter_spool(spool_path), source.id)
+        state['timings']['write'] = round(time.perf_counter() - start, 3)
+        os.unlink(spool_path)
+        self._finish(source, stats)
+
+    def _fail(self, source: EPGSource, error: str) -> None:
+        state = self._state[source.id]
+        state['fetch'] = dict(state.get('fetch') or {'bytes_downloaded': 0, 'bytes_saved': 0},
+                              status=ERROR, error=error)
+        state.setdefault('timings', {})
+        self._finish(source, None)
+
+    def _finish(self, source: EPGSource, stats: Optional[Dict]) -> None:
+        state = self._state[source.id]
+        timings = state['timings']
+        timings['total'] = round(time.perf_counter() - state['started'], 3)
+        self.service._record_source_refresh(source.id, state['fetch'], stats, timings)
+
+        if state['fetch']['status'] != ERROR:
+            if stats is not None:
+                self.service.source_cache.mark_ingested(source)
+            # Update last_updated timestamp for this source
+            source.last_updated = datetime.now()
+            with db_writer.exclusive():
+                self.service.epg_source_repo.update(source)
+        logger.info(f"EPG source {source.id} refreshed in {timings['total']}s ({timings})")
@@ -1,23 +1,25 @@
-import requests
 import xml.etree.ElementTree as ET
 import logging
 from datetime import datetime, timedelta
-from difflib import SequenceMatcher
 from typing import Dict, List, Optional, Tuple
 import re
-import os
-import time
+import io
+import hashlib
 
 from app.models.acestream_channel import AcestreamChannel
 from app.models.epg_source import EPGSource
-from app.models.epg_string_mapping import EPGStringMapping
-from app.models.epg_program import EPGProgram
 from app.repositories.epg_source_repository import EPGSourceRepository
 from app.repositories.epg_string_mapping_repository import EPGStringMappingRepository
 from app.repositories.channel_repository import ChannelRepository
 from app.repositories.epg_channel_repository import EPGChannelRepository
 from app.repositories.epg_program_repository import EPGProgramRepository
 from app.extensions import db
+from app.services.epg_mapping_rules import CompiledMappingRules, get_mapping_rules
+from app.services.epg_refresh import EPGRefreshPipeline
+from app.services.epg_source_cache import epg_source_cache, NOT_MODIFIED, UNCHANGED, ERROR
+from app.utils.db_writer import db_writer
+from app.utils.ngram_index import NGramIndex
+from app.utils.xmltv import open_xmltv_stream, iter_xmltv, iter_channel_elements
 
 logger = logging.getLogger(__name__)
 
@@ -30,216 +32,333 @@ class EPGService:
         self.epg_program_repo = EPGProgramRepository()
         self.epg_data = {}  # Cache of EPG data {tvg_id: {tvg_name, logo}}
         self.auto_mapping_threshold = 0.75  # Similarity threshold for auto-mapping
+        self.fuzzy_candidates = 50  # Candidates rescored per name during fuzzy matching
+        self._epg_name_index = None
+        self._epg_name_index_signature = None
         self.data_dir = "data"  # Directory to store data files (e.g., timestamps)
+        self.program_batch_size = 5000  # Programs flushed to the database per batch
+        self.channel_update_chunk_size = 500  # Channel EPG updates per executemany
+        self.refresh_stats = {}  # Totals of the last fetch_epg_data run
+        self.source_cache = epg_source_cache  # Conditional fetches and on-disk guide bodies
     
     def fetch_epg_data(self) -> Dict:
         """Fetch EPG data from all enabled sources."""
         self.epg_data = {}  # Reset cache
+        self._reset_refresh_stats()
         
         # Get ENABLED sources only
         sources = self.epg_source_repo.get_enabled()
         
         logger.info(f"Found {len(sources)} enabled EPG sources")
         
-        total_channels = 0
-        for source in sources:
-            try:
-                logger.info(f"Fetching EPG data from {source.url}")
-                response = requests.get(source.url, timeout=60)
-                if response.status_code == 200:
-                    # Check if content is gzipped
-                    is_gzipped = source.url.endswith('.gz') or 'content-encoding' in response.headers and response.headers['content-encoding'] == 'gzip'
-                    
-                    # Parse the XML content
-                    if is_gzipped:
-                        import gzip
-                        import io
-                        
-                        try:
-                            logger.info(f"Detected gzipped content, attempting to decompress")
-                            # Handle gzipped content
-                            content = io.BytesIO(response.content)
-                            with gzip.GzipFile(fileobj=content) as f:
-                                xml_content = f.read().decode('utf-8')
-                        except Exception as gz_error:
-                            logger.error(f"Error decompressing gzipped content: {gz_error}")
-                            # Fall back to raw content in case of error
-                            xml_content = response.text
-                    else:
-                        xml_content = response.text
-                        
-                    source.cached_data = xml_content
-                    
-                    # Prepare for bulk insertion
-                    channels_to_insert = []
-                    
-                    # Use original method to parse EPG XML and populate cache
-                    self._parse_epg_xml(xml_content, source.id)
-                    
-                    # Prepare channel data for database storage
-                    for channel_id, channel_data in self.epg_data.items():
-                        if channel_data.get('source_id') == source.id:
-                            # Create dictionary for database insertion
-                            # Fix field names to match EPGChannel model
-                            channel_db_data = {
-                                'epg_source_id': source.id,
-                                'channel_xml_id': channel_id,
-                                'name': channel_data.get('tvg_name', ''), 
-                                'icon_url': channel_data.get('logo', ''),
-                                'language': channel_data.get('language')
-                            }
-                            channels_to_insert.append(channel_db_data)
-                    
-                    # Bulk insert channels to database
-                    if channels_to_insert:
-                        # First delete existing channels for this source
-                        self.epg_channel_repo.delete_by_source_id(source.id)
-                        # Then insert new ones
-                        inserted_count = self.epg_channel_repo.bulk_insert(channels_to_insert)
-                        logger.info(f"Bulk inserted {inserted_count} channels from source {source.id}")
-                    
-                    # Update last_updated timestamp for this source
-                    source.last_updated = datetime.now()
-                    self.epg_source_repo.update(source)
-                    logger.info(f"Updated last_updated timestamp for source {source.id} to {source.last_updated.isoformat()}")
-            
-            except Exception as e:
-                logger.error(f"Error fetching EPG data from {source.url}: {e}")
-    
+        # Downloads and parsing run concurrently; this thread stays the only DB writer
+        EPGRefreshPipeline(self).run(sources)
+        
         return self.epg_data    
     
+    def _reset_refresh_stats(self) -> None:
+        self.refresh_stats = {'sources': 0, 'channels': 0, 'programs': 0,
+                              'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0,
+                              'cache_hits': 0, 'hit_rate': 0.0, 'bytes_downloaded': 0, 'bytes_saved': 0,
+                              'per_source': {}}
+    
+    def _load_stored_epg_data(self) -> Dict:
+        """Fill the in-memory EPG cache from the stored channels of the enabled sources, without fetching."""
+        self.epg_data = {}
+        for source in self.epg_source_repo.get_enabled():
+            self._load_source_channels(source.id)
+        return self.epg_data
+    
+    def _load_source_channels(self, source_id: int) -> int:
+        """Fill the in-memory EPG cache from the stored channels of a source.
+        
+        Returns:
+            Number of channels loaded
+        """
+        channels = self.epg_channel_repo.get_by_source_id(source_id)
+        for channel in channels:
+            self.epg_data[channel.channel_xml_id] = {
+                "tvg_id": channel.channel_xml_id,
+                "tvg_name": channel.name,
+                "logo": channel.icon_url,
+                "source_id": source_id,
+                "language": channel.language
+            }
+        return len(channels)
+    
+    def _record_source_refresh(self, source_id: int, fetch: Dict, stats: Optional[Dict], timings: Dict) -> None:
+        """Add one source's fetch, sync results and stage timings to refresh_stats."""
+        totals = self.refresh_stats
+        totals['sources'] += 1
+        totals['bytes_downloaded'] += fetch['bytes_downloaded']
+        totals['bytes_saved'] += fetch['bytes_saved']
+        if fetch['status'] in (NOT_MODIFIED, UNCHANGED):
+            totals['cache_hits'] += 1
+        for key, value in (stats or {}).items():
+            totals[key] += value
+        
+        totals['per_source'][source_id] = dict(
+            self.source_cache.get_stats(source_id),
+            status=fetch['status'],
+            error=fetch.get('error'),
+            parsed=stats is not None,
+            bytes_downloaded=fetch['bytes_downloaded'],
+            last_bytes_saved=fetch['bytes_saved'],
+            timings=timings
+        )
+        totals['hit_rate'] = round(totals['cache_hits'] / totals['sources'], 3)
+    
     def _parse_epg_xml(self, xml_content: str, source_id: int) -> None:
+        """Parse an in-memory XMLTV document and store its channels and programs."""
         try:
-            root = ET.fromstring(xml_content)
+            if isinstance(xml_content, str):
+                xml_content = xml_content.encode('utf-8')
+            self._ingest_xmltv_stream(open_xmltv_stream(io.BytesIO(xml_content)), source_id)
+        except Exception as e:
+            logger.error(f"Error parsing EPG XML: {str(e)}")
+            raise
+
+    def _ingest_xmltv_stream(self, stream, source_id: int) -> Dict:
+        """
+        Walk an XMLTV stream incrementally and sync it into the database.
+        
+        Returns:
+            Dict with channel and program counts plus inserted/updated/deleted/unchanged
+        """
+        return self._sync_source_records(self._iter_prepared_records(stream), source_id)
+
+    def _iter_prepared_records(self, stream):
+        """
+        Parse an XMLTV stream into ('channel', data) and ('programme', row) records.
+        
+        Programme rows already carry parsed times, truncated fields and their
+        content hash, keyed by 'channel_xml_id'. This is the CPU-bound half of
+        ingestion and needs no database, so it can run in a worker process.
+        """
+        for kind, data in iter_xmltv(stream):
+            if kind == 'channel':
+                if data['id']:
+                    yield kind, data
+                continue
             
-            # Extract channel information
-            for channel in root.findall(".//channel"):
-                channel_id = channel.get("id")
-                if not channel_id:
-                    continue
-                
-                # Get the display name
-                display_name_elem = channel.find("display-name")
-                channel_name = display_name_elem.text if display_name_elem is not None else ""
-                
-                # Get language from the display-name attribute
-                language = display_name_elem.get("lang") if display_name_elem is not None else None
-                
-                # Get icon URL
-                icon_elem = channel.find("icon")
-                icon_url = icon_elem.get("src") if icon_elem is not None else ""
-                
+            program_data = self._prepare_program(data)
+            if program_data:
+                yield kind, program_data
+
+    def _sync_source_records(self, records, source_id: int) -> Dict:
+        """
+        Sync prepared XMLTV records of a source into the database.
+        
+        Channels are buffered until the first programme appears (XMLTV lists
+        channels first), then synced in place so their row IDs stay stable.
+        Each programme is keyed by its channel and time slot and compared by
+        content hash; only rows that are new, changed or gone are written.
+        Inserts and updates are flushed every ``program_batch_size`` rows,
+        keeping memory flat for huge guides. Each write holds off the
+        background database writer only until it commits, so status checks
+        and scrape results are written in between.
+        
+        Returns:
+            Dict with channel and program counts plus inserted/updated/deleted/unchanged
+        """
+        pending_channels = []
+        channel_mapping = None
+        stored_programs = self.epg_program_repo.get_sync_index(source_id)
+        seen_slots = set()
+        inserts, updates = [], []
+        stats = {'channels': 0, 'programs': 0, 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        
+        for kind, data in records:
+            if kind == 'channel':
+                channel_id = data['id']
                 self.epg_data[channel_id] = {
                     "tvg_id": channel_id,
-                    "tvg_name": channel_name,
-                    "logo": icon_url,
+                    "tvg_name": data['name'],
+                    "logo": data['icon'],
                     "source_id": source_id,  # Store the source ID
-                    "language": language     # Store the language
+                    "language": data['language']  # Store the language
+                }
+                channel_db_data = {
+                    'name': data['name'] or '',
+                    'icon_url': data['icon'] or '',
+                    'language': data['language']
                 }
-              # Parse program data and store in database
-            self._parse_and_store_programs(root, source_id)
+                stats['channels'] += 1
                 
-        except Exception as e:
-            logger.error(f"Error parsing EPG XML: {str(e)}")
-            raise
-
-    def _parse_and_store_programs(self, xml_root, source_id: int) -> None:
-        """Parse program data from EPG XML and store in database."""
-        try:
-            from datetime import datetime
-            import re
-            
-            # First, get all EPG channels for this source to create a mapping
-            epg_channels = self.epg_channel_repo.get_by_source_id(source_id)
-            channel_mapping = {ch.channel_xml_id: ch.id for ch in epg_channels}
+                if channel_mapping is None:
+                    channel_db_data['channel_xml_id'] = channel_id
+                    pending_channels.append(channel_db_data)
+                else:
+                    # Channel declared after programs started: store it on its own
+                    with db_writer.exclusive():
+                        channel = self.epg_channel_repo.create_or_update(source_id, channel_id, channel_db_data)
+                    channel_mapping[channel_id] = channel.id
+                continue
             
-            # Clear existing programs for this source
-            self.epg_program_repo.delete_by_source_id(source_id)
+            if channel_mapping is None:
+                with db_writer.exclusive():
+                    channel_mapping = self._sync_source_channels(source_id, pending_channels)
+                pending_channels = []
             
-            programs_to_insert = []
+            # Check if we have this channel in our database
+            epg_channel_id = channel_mapping.get(data['channel_xml_id'])
+            if not epg_channel_id:
+                continue
             
-            # Extract program information
-            for programme in xml_root.findall(".//programme"):
-                channel_xml_id = programme.get("channel")
-                start_str = programme.get("start")
-                stop_str = programme.get("stop")
-                
-                if not all([channel_xml_id, start_str, stop_str]):
-                    continue
-                
-                # Check if we have this channel in our database
-                epg_channel_id = channel_mapping.get(channel_xml_id)
-                if not epg_channel_id:
-                    continue
-                
-                try:
-                    # Parse time strings - XMLTV format: 20230101120000 +0000
-                    start_time = self._parse_xmltv_time(start_str)
-                    end_time = self._parse_xmltv_time(stop_str)
-                    
-                    if not start_time or not end_time:
-                        continue
-                    
-                    # Get program details
-                    title_elem = programme.find("title")
-                    title = title_elem.text if title_elem is not None else "Unknown Program"
-                    
-                    subtitle_elem = programme.find("sub-title")
-                    subtitle = subtitle_elem.text if subtitle_elem is not None else None
-                    
-                    desc_elem = programme.find("desc")
-                    description = desc_elem.text if desc_elem is not None else None
-                    
-                    category_elem = programme.find("category")
-                    category = category_elem.text if category_elem is not None else None
-                    
-                    # Get episode info if available
-                    episode_elem = programme.find("episode-num")
-                    episode_number = episode_elem.text if episode_elem is not None else None
-                    
-                    # Get rating if available
-                    rating_elem = programme.find("rating/value")
-                    rating = rating_elem.text if rating_elem is not None else None
-                    
-                    # Get icon if available
-                    icon_elem = programme.find("icon")
-                    icon_url = icon_elem.get("src") if icon_elem is not None else None
-                    
-                    # Create program data
-                    program_data = {
-                        'epg_channel_id': epg_channel_id,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'title': title[:500],  # Limit title length
-                        'subtitle': subtitle[:500] if subtitle else None,
-                        'description': description,
-                        'category': category[:100] if category else None,
-                        'episode_number': episode_number[:100] if episode_number else None,
-                        'rating': rating[:20] if rating else None,
-                        'icon_url': icon_url
-                    }
-                    
-                    programs_to_insert.append(program_data)
-                    
-                except Exception as e:
-                    logger.warning(f"Error parsing program data for channel {channel_xml_id}: {e}")
-                    continue
+            slot = (epg_channel_id, data['start_time'].replace(tzinfo=None), data['end_time'].replace(tzinfo=None))
+            if slot in seen_slots:
+                continue  # Duplicate slot within the feed, first one wins
+            seen_slots.add(slot)
+            stats['programs'] += 1
             
-            # Bulk insert programs
-            if programs_to_insert:
-                inserted_count = self.epg_program_repo.bulk_insert(programs_to_insert)
-                logger.info(f"Inserted {inserted_count} programs for source {source_id}")
+            program_data = dict(data, epg_channel_id=epg_channel_id)
+            del program_data['channel_xml_id']
+            stored = stored_programs.pop(slot, None)
+            if stored is None:
+                inserts.append(program_data)
+            elif stored[1] == program_data['content_hash']:
+                stats['unchanged'] += 1
             else:
-                logger.warning(f"No programs found for source {source_id}")
-                
+                program_data['program_id'] = stored[0]
+                updates.append(program_data)
+            
+            if len(inserts) >= self.program_batch_size:
+                with db_writer.exclusive():
+                    stats['inserted'] += self.epg_program_repo.bulk_insert(inserts)
+                inserts = []
+            if len(updates) >= self.program_batch_size:
+                with db_writer.exclusive():
+                    stats['updated'] += self.epg_program_repo.bulk_update(updates)
+                updates = []
+        
+        with db_writer.exclusive():
+            if channel_mapping is None:
+                channel_mapping = self._sync_source_channels(source_id, pending_channels)
+            
+            stats['inserted'] += self.epg_program_repo.bulk_insert(inserts)
+            stats['updated'] += self.epg_program_repo.bulk_update(updates)
+        
+        # A feed without channels is treated as broken rather than empty,
+        # so stored data is only pruned when the feed declared its channels
+        if stats['channels']:
+            # Count stale slots rather than deleted rows: an insert into the same
+            # (channel, start, title) may already have replaced the old row
+            stale_programs = [program_id for program_id, _ in stored_programs.values()]
+            with db_writer.exclusive():
+                self.epg_program_repo.delete_by_ids(stale_programs)
+            stats['deleted'] = len(stale_programs)
+            stale_channels = [
+                ch.id for ch in self.epg_channel_repo.get_by_source_id(source_id)
+                if ch.channel_xml_id not in channel_mapping
+            ]
+            if stale_channels:
+                with db_writer.exclusive():
+                    self.epg_program_repo.delete_by_channel_ids(stale_channels)
+                    self.epg_channel_repo.delete_by_ids(stale_channels)
+                logger.info(f"Removed {len(stale_channels)} channels no longer listed by source {source_id}")
+        
+        if stats['programs']:
+            logger.info(
+                f"Synced {stats['programs']} programs for source {source_id}: "
+                f"{stats['inserted']} inserted, {stats['updated']} updated, "
+                f"{stats['deleted']} deleted, {stats['unchanged']} unchanged"
+            )
+        else:
+            logger.warning(f"No programs found for source {source_id}")
+        
+        return stats
+
+    def _sync_source_channels(self, source_id: int, channels: List[Dict]) -> Dict[str, int]:
+        """Create or update the listed channels of a source, keeping existing row IDs.
+        
+        Returns:
+            Mapping of channel XML ID to EPG channel row ID for the listed channels
+        """
+        existing = {ch.channel_xml_id: ch for ch in self.epg_channel_repo.get_by_source_id(source_id)}
+        listed = []
+        new_channels = []
+        
+        for channel_data in channels:
+            channel = existing.get(channel_data['channel_xml_id'])
+            if channel is None:
+                new_channels.append(dict(channel_data, epg_source_id=source_id))
+                continue
+            for key in ('name', 'icon_url', 'language'):
+                if getattr(channel, key) != channel_data[key]:
+                    setattr(channel, key, channel_data[key])
+            listed.append(channel)
+        
+        db.session.commit()
+        
+        if new_channels:
+            inserted_count = self.epg_channel_repo.bulk_insert(new_channels)
+            logger.info(f"Bulk inserted {inserted_count} channels from source {source_id}")
+        
+        mapping = {ch.channel_xml_id: ch.id for ch in listed}
+        if new_channels:
+            listed_ids = {data['channel_xml_id'] for data in new_channels}
+            mapping.update({
+                ch.channel_xml_id: ch.id
+                for ch in self.epg_channel_repo.get_by_source_id(source_id)
+                if ch.channel_xml_id in listed_ids
+            })
+        return mapping
+
+    @staticmethod
+    def _program_content_hash(program_data: Dict) -> str:
+        """Hash a programme by channel, slot and content to detect changes between refreshes."""
+        parts = [
+            program_data['channel_xml_id'],
+            program_data['start_time'].isoformat(),
+            program_data['end_time'].isoformat(),
+        ]
+        parts.extend(program_data[key] or '' for key in (
+            'title', 'subtitle', 'description', 'category', 'episode_number', 'rating', 'icon_url'
+        ))
+        return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def _prepare_program(self, data: Dict) -> Optional[Dict]:
+        """Convert a parsed <programme> into a program row keyed by its channel XML ID."""
+        channel_xml_id = data['channel']
+        
+        if not all([channel_xml_id, data['start'], data['stop']]):
+            return None
+        
+        try:
+            # Parse time strings - XMLTV format: 20230101120000 +0000
+            start_time = self._parse_xmltv_time(data['start'])
+            end_time = self._parse_xmltv_time(data['stop'])
+            
+            if not start_time or not end_time:
+                return None
+            
+            title = data['title'] or "Unknown Program"
+            subtitle = data['subtitle']
+            category = data['category']
+            episode_number = data['episode_number']
+            rating = data['rating']
+            
+            program_data = {
+                'channel_xml_id': channel_xml_id,
+                'start_time': start_time,
+                'end_time': end_time,
+                'title': title[:500],  # Limit title length
+                'subtitle': subtitle[:500] if subtitle else None,
+                'description': data['description'],
+                'category': category[:100] if category else None,
+                'episode_number': episode_number[:100] if episode_number else None,
+                'rating': rating[:20] if rating else None,
+                'icon_url': data['icon_url']
+            }
+            program_data['content_hash'] = self._program_content_hash(program_data)
+            return program_data
         except Exception as e:
-            logger.error(f"Error parsing and storing programs: {str(e)}")
-            raise
+            logger.warning(f"Error parsing program data for channel {channel_xml_id}: {e}")
+            return None
 
     def _parse_xmltv_time(self, time_str: str) -> datetime:
         """Parse XMLTV time format to datetime object."""
         try:
-            import re
             from datetime import datetime, timezone
             from dateutil import parser
             
@@ -316,47 +435,9 @@ class EPGService:
             # Find all channel elements
             channels = []
             for channel_elem in root.findall(".//channel"):
-                channel_id = channel_elem.get('id')
-                if not channel_id:
-                    continue
-                
-                # Get display names with language attributes
-                display_names = {}
-                default_name = None
-                
-                for display_name in channel_elem.findall('display-name'):
-                    name_text = display_name.text
-                    if name_text:
-                        lang = display_name.get('lang')
-                        if lang:
-                            display_names[lang] = name_text
-                        if not default_name:
-                            default_name = name_text
-                
-                # Use first display name or ID as fallback
-                name = default_name or channel_id
-                
-                # Get icon URL if available
-                icon_url = None
-                icon_elem = channel_elem.find('icon')
-                if icon_elem is not None:
-                    icon_url = icon_elem.get('src')
-                
-                # Extract primary language if available
-                primary_language = None
-                if display_names:
-                    primary_language = next(iter(display_names.keys()), None)
-                
-                # Create channel dictionary
-                channel = {
-                    'id': channel_id,
-                    'name': name,
-                    'logo': icon_url,
-                    'language': primary_language,
-                    'display_names': display_names
-                }
-                
-                channels.append(channel)
+                channel = self._channel_from_element(channel_elem)
+                if channel:
+                    channels.append(channel)
             
             logger.info(f"Parsed {len(channels)} channels from XML content")
             return channels
@@ -364,6 +445,48 @@ class EPGService:
             logger.error(f"Failed to parse EPG channels: {str(e)}", exc_info=True)
             return []
     
+    def _channel_from_element(self, channel_elem) -> Optional[Dict]:
+        """Convert an XMLTV <channel> element into the dict returned by parse_epg_channels."""
+        channel_id = channel_elem.get('id')
+        if not channel_id:
+            return None
+        
+        # Get display names with language attributes
+        display_names = {}
+        default_name = None
+        
+        for display_name in channel_elem.findall('display-name'):
+            name_text = display_name.text
+            if name_text:
+                lang = display_name.get('lang')
+                if lang:
+                    display_names[lang] = name_text
+                if not default_name:
+                    default_name = name_text
+        
+        # Use first display name or ID as fallback
+        name = default_name or channel_id
+        
+        # Get icon URL if available
+        icon_url = None
+        icon_elem = channel_elem.find('icon')
+        if icon_elem is not None:
+            icon_url = icon_elem.get('src')
+        
+        # Extract primary language if available
+        primary_language = None
+        if display_names:
+            primary_language = next(iter(display_names.keys()), None)
+        
+        # Create channel dictionary
+        return {
+            'id': channel_id,
+            'name': name,
+            'logo': icon_url,
+            'language': primary_language,
+            'display_names': display_names
+        }
+    
     def get_channel_epg_data(self, channel: AcestreamChannel) -> Dict:
         """
         Get EPG data for a specific channel with the following priority:
@@ -380,9 +503,8 @@ class EPGService:
             return self.epg_data[channel.tvg_id]
         
         # 2. Look for string pattern matches
-        string_mappings = self.epg_string_mapping_repo.get_all()
-        for mapping in string_mappings:
-            if mapping.search_pattern.lower() in channel.name.lower() and mapping.epg_channel_id in self.epg_data:
+        for mapping in get_mapping_rules().literal_matches(channel.name):
+            if mapping.epg_channel_id in self.epg_data:
                 # Found a pattern match
                 return self.epg_data[mapping.epg_channel_id]
         
@@ -390,11 +512,9 @@ class EPGService:
         best_match = None
         best_score = 0
         
-        for epg_id, epg_data in self.epg_data.items():
-            score = SequenceMatcher(None, channel.name.lower(), epg_data["tvg_name"].lower()).ratio()
-            if score > best_score and score >= self.auto_mapping_threshold:
-                best_score = score
-                best_match = epg_id
+        match = self._get_epg_name_index().best_match(channel.name.lower(), self.auto_mapping_threshold)
+        if match:
+            best_match, best_score = match
         
         if best_match:
             logger.info(f"Auto-mapped '{channel.name}' to '{self.epg_data[best_match]['tvg_name']}' (score: {best_score:.2f})")
@@ -407,6 +527,17 @@ class EPGService:
             "logo": ""
         }
     
+    def _get_epg_name_index(self) -> NGramIndex:
+        """N-gram index over the names in self.epg_data, rebuilt whenever the cache changes."""
+        signature = (id(self.epg_data), len(self.epg_data))
+        if self._epg_name_index is None or self._epg_name_index_signature != signature:
+            index = NGramIndex(top_k=self.fuzzy_candidates)
+            for epg_id, epg_data in self.epg_data.items():
+                index.add(epg_id, (epg_data["tvg_name"] or "").lower())
+            self._epg_name_index = index
+            self._epg_name_index_signature = signature
+        return self._epg_name_index
+    
     def auto_scan_channels(self, threshold=0.75, clean_unmatched=False, respect_existing=True, epg_channels=None):
         """
         Automatically match channels with EPG data based on name similarity.
@@ -473,8 +604,6 @@ class EPGService:
         Returns:
             Dict with statistics and matches if apply_changes=False
         """
-        from difflib import SequenceMatcher
-        
         stats = {
             'matched': 0,
             'cleaned': 0,
@@ -493,6 +622,11 @@ class EPGService:
             if 'HD' in clean_name:
                 epg_lookup[clean_name.replace('HD', '').strip()] = channel
         
+        # Fuzzy matching only rescores the closest candidates from an n-gram index
+        epg_index = NGramIndex(top_k=self.fuzzy_candidates)
+        for epg_name in epg_lookup:
+            epg_index.add(epg_name, epg_name)
+        
         # Create a direct mapping of EPG IDs to channels for faster lookup
         epg_id_lookup = {channel['id']: channel for channel in epg_channels}
         
@@ -533,14 +667,13 @@ class EPGService:
                 # If no direct match, try fuzzy matching
                 else:
                     # Find the best match using similarity
-                    for epg_name, epg_channel in epg_lookup.items():
-                        similarity = SequenceMatcher(None, clean_name, epg_name).ratio()
-                        # Only consider this match if it's better than what we have AND above threshold
-                        if similarity > best_similarity and similarity >= threshold:
-                            best_similarity = similarity
-                            best_epg = epg_channel
-                            best_epg_id = epg_channel['id']
-                            match_method = "fuzzy_name_match"
+                    # Only consider a match if it's better than what we have AND above threshold
+                    match = epg_index.best_match(clean_name, threshold, min_score=best_similarity)
+                    if match:
+                        epg_name, best_similarity = match
+                        best_epg = epg_lookup[epg_name]
+                        best_epg_id = best_epg['id']
+                        match_method = "fuzzy_name_match"
                 
                 # If we found a match
                 if best_epg_id:
@@ -599,8 +732,6 @@ class EPGService:
         if not name:
             return ""
             
-        import re
-        
         # Convert to lowercase
         clean = name.lower()
         
@@ -648,121 +779,75 @@ class EPGService:
             
         return (tvg_id_updated, tvg_name_updated, logo_updated)
     
-    def _update_channel_epg(self, channel: AcestreamChannel) -> Tuple[bool, bool, bool, bool]:
+    def _update_channel_epg(self, channel: AcestreamChannel,
+                            rules: Optional[CompiledMappingRules] = None) -> Tuple[bool, bool, bool, bool]:
         """
         Update EPG data for a channel.
         
+        Args:
+            channel: The channel to update
+            rules: Compiled mapping rules; loaded from the cache when not given
+        
         Returns a tuple of (tvg_id_updated, tvg_name_updated, logo_updated, any_update)
         """
-        string_mappings = self.epg_string_mapping_repo.get_all()
+        if rules is None:
+            rules = get_mapping_rules()
         
         # Detect if channel should be excluded
-        channel_name_lower = channel.name.lower()
-        for mapping in string_mappings:
-            if mapping.search_pattern.startswith('!'):
-                exclusion_pattern = mapping.search_pattern[1:].lower()
-                if exclusion_pattern in channel_name_lower:
-                    logger.info(f"Channel '{channel.name}' excluded by pattern '!{exclusion_pattern}'")
-                    
-                    # Clean EPG data if channel has any data
-                    changes_made = False
-                    
-                    if channel.tvg_id:
-                        channel.tvg_id = None
-                        changes_made = True
-                    
-                    if channel.tvg_name:
-                        channel.tvg_name = None
-                        changes_made = True
-                    
-                    if channel.logo:
-                        channel.logo = None
-                        changes_made = True
-                    
-                    if changes_made:
-                        logger.info(f"Cleared EPG data from channel '{channel.name}' due to exclusion pattern")
-                        return (True, True, True, True)
-                    
-                    return (False, False, False, False)
-        
-        # Improved mapping logic
-        potential_mappings = []
-        
-        # Pre-process channel name to split into words for more exact comparison
-        channel_words = channel_name_lower.split()
-        
-        for mapping in string_mappings:
-            if not mapping.search_pattern.startswith('!'):  # Only process regular patterns
-                pattern_lower = mapping.search_pattern.lower()
-                pattern_words = pattern_lower.split()
-                
-                # Only consider patterns that are within the channel name
-                if pattern_lower in channel_name_lower:
-                    # Base score - pattern length multiplied by 10 to give it more weight
-                    pattern_score = len(pattern_lower) * 10
-                    
-                    # HIGHEST PRIORITY: Exact match with full name
-                    if pattern_lower == channel_name_lower:
-                        pattern_score += 10000  # Extremely high priority
-                    
-                    # VERY HIGH PRIORITY: Pattern exactly matches the start of the name
-                    if channel_name_lower.startswith(pattern_lower):
-                        pattern_score += 3000  # Higher priority than having numbers
-                    
-                    # HIGH PRIORITY: Match at the beginning of the name (more important than having numbers)
-                    elif channel_name_lower.startswith(pattern_lower + ' '):
-                        pattern_score += 2500  # Higher priority than having numbers
-                    
-                    # Bonus for matching complete words
-                    matching_words = 0
-                    for word in pattern_words:
-                        if word in channel_words:
-                            matching_words += 1
-                    
-                    if matching_words == len(pattern_words):
-                        pattern_score += 1000 * matching_words
-                        
-                        # Bonus if words are in the same order
-                        if ' '.join(pattern_words) in ' '.join(channel_words):
-                            pattern_score += 500
-                    
-                    # Bonus for patterns with numbers
-                    if any(char.isdigit() for char in pattern_lower):
-                        pattern_score += 1500
-                    
-                    # Bonus if first word of pattern matches first word of channel
-                    # This helps prioritize patterns like "dazn laliga" for channels starting with "DAZN"
-                    if channel_words and pattern_words and channel_words[0] == pattern_words[0]:
-                        pattern_score += 1800
-                    
-                    potential_mappings.append((mapping, pattern_score))
-        
-        # Sort by score, highest to lowest
-        potential_mappings.sort(key=lambda x: x[1], reverse=True)
+        exclusion = rules.exclusion_for(channel.name)
+        if exclusion:
+            logger.info(f"Channel '{channel.name}' excluded by pattern '{exclusion.search_pattern}'")
+            
+            # Clean EPG data if channel has any data
+            changes_made = False
+            
+            if channel.tvg_id:
+                channel.tvg_id = None
+                changes_made = True
+            
+            if channel.tvg_name:
+                channel.tvg_name = None
+                changes_made = True
+            
+            if channel.logo:
+                channel.logo = None
+                changes_made = True
+            
+            if changes_made:
+                logger.info(f"Cleared EPG data from channel '{channel.name}' due to exclusion pattern")
+                return (True, True, True, True)
+            
+            return (False, False, False, False)
         
         # Use the mapping with the highest score if it exists
-        if potential_mappings:
-            best_mapping, score = potential_mappings[0]
-            
+        best_mapping = rules.best_mapping(channel.name)
+        if best_mapping:
             if best_mapping.epg_channel_id in self.epg_data:
                 epg_data = self.epg_data[best_mapping.epg_channel_id]
                 updates = self._apply_epg_data(channel, epg_data)
                 if any(updates):
                     logger.info(f"Channel '{channel.name}' matched pattern '{best_mapping.search_pattern}', applied EPG data from channel '{best_mapping.epg_channel_id}'")
-                return updates
+                return updates + (any(updates),)
             else:
                 logger.warning(f"EPG channel ID '{best_mapping.epg_channel_id}' not found for pattern '{best_mapping.search_pattern}'")
         
         # If no suitable mapping was found
         return (False, False, False, False)
 
-    def update_all_channels_epg(self, respect_existing: bool = False, clean_unmatched: bool = False) -> dict:
+    def update_all_channels_epg(self, respect_existing: bool = False, clean_unmatched: bool = False,
+                                dry_run: bool = False, commit_every_chunk: bool = False) -> dict:
         """
         Updates EPG information for all channels that don't have EPG locked.
         
+        Changes are planned on detached snapshots of the channels first and
+        then written with chunked executemany UPDATEs in a single transaction,
+        instead of one commit per channel.
+        
         Args:
             respect_existing: If True, don't modify channels that already have some EPG data
             clean_unmatched: If True, clear EPG data from channels with no match
+            dry_run: If True, don't write anything; the planned changes are returned under 'changes'
+            commit_every_chunk: If True, commit after every chunk to bound how long the write lock is held
         
         Returns:
             Stats about the update process.
@@ -777,14 +862,13 @@ class EPGService:
             "errors": 0
         }
         
-        # Check if there are mapping rules defined
-        string_mappings = self.epg_string_mapping_repo.get_all()
-        normal_rules = [m for m in string_mappings if not m.search_pattern.startswith('!')]
-        has_mapping_rules = len(normal_rules) > 0
+        # Check if there are mapping rules defined; they are compiled once for the whole run
+        rules = get_mapping_rules()
+        has_mapping_rules = rules.mapping_count > 0
         
-        logger.info(f"Updating EPG mappings. Has mapping rules: {has_mapping_rules}, Normal rules count: {len(normal_rules)}")
+        logger.info(f"Updating EPG mappings. Has mapping rules: {has_mapping_rules}, Normal rules count: {rules.mapping_count}")
         
-        channels = self.channel_repo.get_all()
+        channels = self.channel_repo.get_epg_snapshots()
         channels_with_epg = [c for c in channels if c.tvg_id or c.tvg_name or c.logo]
         
         logger.info(f"Processing {len(channels)} channels, {len(channels_with_epg)} have some EPG data")
@@ -792,120 +876,117 @@ class EPGService:
         
         # First make sure to load EPG data
         if not self.epg_data:
-            self.fetch_epg_data()
-        
-        # Use an explicit transaction to ensure changes are applied
-        from sqlalchemy.orm import Session
-        session = db.session
+            if dry_run:
+                # Refreshing the guides writes them; a dry run plans against the stored channels
+                self._load_stored_epg_data()
+            else:
+                self.fetch_epg_data()
         
-        try:
-            for channel in channels:
-                try:
-                    # Check if channel is protected from EPG updates
-                    if channel.epg_update_protected:
-                        stats["locked"] += 1
-                        continue
-                    
-                    # If respect_existing option is active and channel already has data, skip it
-                    if respect_existing and (channel.tvg_id or channel.tvg_name or channel.logo):
-                        stats["skipped"] += 1
-                        continue
-                    
-                    if not has_mapping_rules:
-                        # If there are no mapping rules and the channel has data, clean it ONLY if clean_unmatched is true
-                        if clean_unmatched and (channel.tvg_id or channel.tvg_name or channel.logo):
-                            old_data = f"tvg_id={channel.tvg_id}, tvg_name={channel.tvg_name}, logo={'Yes' if channel.logo else 'No'}"
-                            
-                            # Perform cleaning directly
-                            channel.tvg_id = None
-                            channel.tvg_name = None
-                            channel.logo = None
-                            
-                            # Update the channel in the database
-                            try:
-                                self.channel_repo.update(channel)
-                                session.flush()
-                                
-                                stats["cleaned"] += 1
-                                logger.info(f"CLEANED: Channel '{channel.name}' (previous: {old_data}) - no mapping rules exist")
-                            except Exception as e:
-                                logger.error(f"Failed to update channel {channel.name}: {str(e)}")
-                                stats["errors"] += 1
-                        continue
-                    
-                    # If there are rules, proceed with applying mappings
-                    was_updated, tvg_id_updated, tvg_name_updated, logo_updated = self._update_channel_epg(channel)
-                    
-                    if was_updated:
-                        try:
-                            self.channel_repo.update(channel)
-                            session.flush()  # Ensure changes are applied
-                            
-                            if not channel.tvg_id and not channel.tvg_name and not channel.logo:
-                                stats["cleaned"] += 1
-                                stats["excluded"] += 1
-                                logger.info(f"EXCLUDED: Channel '{channel.name}' matched exclusion rule")
-                            else:
-                                stats["updated"] += 1
-                                logger.info(f"UPDATED: Channel '{channel.name}' with new EPG data")
-                        except Exception as e:
-                            logger.error(f"Failed to save updates for channel {channel.name}: {str(e)}")
-                            stats["errors"] += 1
-                        continue
-                    
-                    # If channel was not updated and not excluded, clean its data
-                    is_excluded = self._is_excluded_by_rule(channel)
-                    
-                    if not is_excluded and (channel.tvg_id or channel.tvg_name or channel.logo):
-                        # Clean only if clean_unmatched is true
-                        if clean_unmatched:
-                            old_data = f"tvg_id={channel.tvg_id}, tvg_name={channel.tvg_name}, logo={'Yes' if channel.logo else 'No'}"
-                            
-                            # Clean data
-                            channel.tvg_id = None
-                            channel.tvg_name = None
-                            channel.logo = None
-                            
-                            try:
-                                self.channel_repo.update(channel)
-                                session.flush()
-                                
-                                stats["cleaned"] += 1
-                                logger.info(f"CLEANED: Channel '{channel.name}' (previous: {old_data}) - no matching rule")
-                            except Exception as e:
-                                logger.error(f"Failed to clean channel {channel.name}: {str(e)}")
-                                stats["errors"] += 1
-                    elif is_excluded:
+        changes = []
+        for channel in channels:
+            try:
+                # Check if channel is protected from EPG updates
+                if channel.epg_update_protected:
+                    stats["locked"] += 1
+                    continue
+                
+                # If respect_existing option is active and channel already has data, skip it
+                if respect_existing and (channel.tvg_id or channel.tvg_name or channel.logo):
+                    stats["skipped"] += 1
+                    continue
+                
+                before = (channel.tvg_id, channel.tvg_name, channel.logo)
+                
+                if not has_mapping_rules:
+                    # If there are no mapping rules and the channel has data, clean it ONLY if clean_unmatched is true
+                    if clean_unmatched and any(before):
+                        self._clear_epg_data(channel)
+                        changes.append(self._planned_change(channel, before))
+                        stats["cleaned"] += 1
+                        logger.info(f"CLEANED: Channel '{channel.name}' (previous: {self._describe_epg(before)}) - no mapping rules exist")
+                    continue
+                
+                # If there are rules, proceed with applying mappings
+                tvg_id_updated, tvg_name_updated, logo_updated, was_updated = self._update_channel_epg(channel, rules)
+                
+                if was_updated:
+                    changes.append(self._planned_change(channel, before))
+                    if not channel.tvg_id and not channel.tvg_name and not channel.logo:
+                        stats["cleaned"] += 1
                         stats["excluded"] += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing channel {channel.name}: {str(e)}")
-                    stats["errors"] += 1
-            
-            # Confirm all changes
-            session.commit()
-            logger.info(f"EPG update completed. Summary: Updated={stats['updated']}, Cleaned={stats['cleaned']}, Locked={stats['locked']}, Excluded={stats['excluded']}, Errors={stats['errors']}")
+                        logger.info(f"EXCLUDED: Channel '{channel.name}' matched exclusion rule")
+                    else:
+                        stats["updated"] += 1
+                        logger.info(f"UPDATED: Channel '{channel.name}' with new EPG data")
+                    continue
+                
+                # If channel was not updated and not excluded, clean its data
+                is_excluded = self._is_excluded_by_rule(channel, rules)
+                
+                # A matched channel that already carries the mapped data is up to date
+                best_mapping = None if is_excluded else rules.best_mapping(channel.name)
+                if best_mapping and best_mapping.epg_channel_id in self.epg_data:
+                    continue
+                
+                if not is_excluded and any(before):
+                    # Clean only if clean_unmatched is true
+                    if clean_unmatched:
+                        self._clear_epg_data(channel)
+                        changes.append(self._planned_change(channel, before))
+                        stats["cleaned"] += 1
+                        logger.info(f"CLEANED: Channel '{channel.name}' (previous: {self._describe_epg(before)}) - no matching rule")
+                elif is_excluded:
+                    stats["excluded"] += 1
+            except Exception as e:
+                logger.error(f"Error processing channel {channel.name}: {str(e)}")
+                stats["errors"] += 1
         
+        if dry_run:
+            stats["changes"] = changes
+            logger.info(f"EPG update dry run planned {len(changes)} channel changes")
+            return stats
+        
+        try:
+            self.channel_repo.bulk_update_epg(
+                [{'channel_id': c['id'], **c['after']} for c in changes],
+                chunk_size=self.channel_update_chunk_size,
+                commit_every_chunk=commit_every_chunk
+            )
         except Exception as e:
-            session.rollback()
             logger.error(f"Transaction failed, rolling back: {str(e)}")
             stats["errors"] += 1
             raise
-                
+        
+        logger.info(f"EPG update completed. Summary: Updated={stats['updated']}, Cleaned={stats['cleaned']}, Locked={stats['locked']}, Excluded={stats['excluded']}, Errors={stats['errors']}")
         return stats
     
-    def _is_excluded_by_rule(self, channel: AcestreamChannel) -> bool:
+    @staticmethod
+    def _clear_epg_data(channel) -> None:
+        channel.tvg_id = None
+        channel.tvg_name = None
+        channel.logo = None
+    
+    @staticmethod
+    def _describe_epg(values: Tuple) -> str:
+        tvg_id, tvg_name, logo = values
+        return f"tvg_id={tvg_id}, tvg_name={tvg_name}, logo={'Yes' if logo else 'No'}"
+    
+    @staticmethod
+    def _planned_change(channel, before: Tuple) -> Dict:
+        """One planned channel update: its EPG fields before and after."""
+        fields = ('tvg_id', 'tvg_name', 'logo')
+        return {
+            'id': channel.id,
+            'name': channel.name,
+            'before': dict(zip(fields, before)),
+            'after': {field: getattr(channel, field) for field in fields}
+        }
+    
+    def _is_excluded_by_rule(self, channel: AcestreamChannel, rules: Optional[CompiledMappingRules] = None) -> bool:
         """Determine if a channel is excluded by a pattern rule."""
-        channel_name_lower = channel.name.lower()
-        string_mappings = self.epg_string_mapping_repo.get_all()
-        
-        for mapping in string_mappings:
-            if mapping.search_pattern.startswith('!'):
-                exclusion_pattern = mapping.search_pattern[1:].lower()
-                if exclusion_pattern in channel_name_lower:
-                    return True
-        
-        return False
+        if rules is None:
+            rules = get_mapping_rules()
+        return rules.exclusion_for(channel.name) is not None
 
     def get_channels_from_source(self, source_id):
         """
@@ -926,26 +1007,12 @@ class EPGService:
                 logger.warning(f"EPG source {source_id} not found")
                 return []
             
-            # Get XML content directly from URL
-            xml_content = None
-            
-            if source.url:
-                logger.info(f"Fetching data from URL for EPG source {source_id}: {source.url}")
-                try:
-                    response = requests.get(source.url, timeout=30)
-                    if response.status_code == 200:
-                        xml_content = response.text
-                    else:
-                        logger.error(f"Error fetching EPG source {source_id}: HTTP {response.status_code}")
-                except Exception as e:
-                    logger.error(f"Error fetching EPG source {source_id} URL: {str(e)}")
-            
-            if not xml_content:
-                logger.warning(f"No XML content available for EPG source {source_id}")
-                return []
-            
-            # Parse the XML content to get channels
-            channels = self.parse_epg_channels(xml_content)
+            # Read channels from the cached guide, refreshed with a conditional request
+            channels = []
+            for channel_elem in self._iter_source_channel_elements(source):
+                channel = self._channel_from_element(channel_elem)
+                if channel:
+                    channels.append(channel)
             
             logger.info(f"Found {len(channels)} channels from EPG source {source_id}")
             return channels
@@ -1032,23 +1099,8 @@ class EPGService:
             return []
             
         try:
-            # Fetch and parse XML
-            import requests
-            import xml.etree.ElementTree as ET
-            from io import StringIO
-            
-            # Try to fetch the XML data
-            response = requests.get(source.url, timeout=30)
-            response.raise_for_status()
-            
-            # Parse the XML
-            xml_data = response.text
-            tree = ET.parse(StringIO(xml_data))
-            root = tree.getroot()
-            
-            # Find all channel elements
             channels = []
-            for channel_elem in root.findall('.//channel'):
+            for channel_elem in self._iter_source_channel_elements(source):
                 channel_id = channel_elem.get('id', '')
                 
                 # Get channel name
@@ -1075,6 +1127,24 @@ class EPGService:
             logger.error(f"Error extracting channels from EPG source: {e}")
             return []
     
+    def _iter_source_channel_elements(self, source: EPGSource):
+        """
+        Yield the <channel> elements of a source's guide.
+        
+        The guide is refreshed through the fetch cache (a conditional request
+        when a copy is on disk) and read from the cached body, stopping at the
+        first programme.
+        """
+        if not source.url:
+            return
+        
+        fetch = self.source_cache.fetch(source, timeout=30)
+        if fetch['status'] == ERROR:
+            return
+        
+        with self.source_cache.open_stream(source) as stream:
+            yield from iter_channel_elements(stream)
+    
     def should_refresh_epg(self):
         """
         Check if EPG data should be refreshed based on last refresh time
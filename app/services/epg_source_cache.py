@@ -0,0 +1,227 @@
+import os
+import gzip
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional
+
+import requests
+
+from app.models.epg_source import EPGSource
+from app.repositories.epg_source_repository import EPGSourceRepository
+from app.utils.path import data_dir
+from app.utils.xmltv import detect_compression, open_xmltv_stream
+
+logger = logging.getLogger(__name__)
+
+# Fetch outcomes; everything except MODIFIED means the cached body is current
+MODIFIED = 'modified'
+NOT_MODIFIED = 'not_modified'  # Server answered 304
+UNCHANGED = 'unchanged'  # Server sent the body again but its digest matches
+CACHED = 'cached'  # Download failed, serving the last good copy
+ERROR = 'error'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class EPGSourceCache:
+    """
+    On-disk cache of EPG guide bodies with conditional fetching.
+
+    Each source's body is kept compressed under the data dir. ETag,
+    Last-Modified and a SHA-256 digest of the body are stored on the
+    EPGSource row so later fetches can be conditional. Callers can skip
+    re-parsing a guide whose cached body is the one they last ingested
+    (see :meth:`is_ingested`).
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self._cache_dir = Path(cache_dir) if cache_dir else None
+        self.source_repo = EPGSourceRepository()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> Path:
+        if self._cache_dir is None:
+            self._cache_dir = data_dir() / 'epg_cache'
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        return self._cache_dir
+
+    def path_for(self, source: EPGSource) -> Path:
+        """Path of the cached body for a source."""
+        return self._path(source.id)
+
+    def _path(self, source_id: int) -> Path:
+        return self.cache_dir / f"source_{source_id}.xml.cache"
+
+    def fetch(self, source: EPGSource, timeout: int = 60) -> Dict:
+        """
+        Bring the cached body of a source up to date.
+
+        Returns:
+            Dict with 'status' (one of MODIFIED, NOT_MODIFIED, UNCHANGED,
+            CACHED, ERROR), 'bytes_downloaded', 'bytes_saved' and 'error'
+        """
+        return self.apply(source, self.download(self.snapshot(source), timeout=timeout))
+
+    @staticmethod
+    def snapshot(source: EPGSource) -> Dict:
+        """Copy the fields download() needs, so it can run outside the database session's thread."""
+        return {
+            'id': source.id,
+            'url': source.url,
+            'etag': source.etag,
+            'last_modified': source.last_modified,
+            'content_digest': source.content_digest,
+            'content_length': source.content_length,
+        }
+
+    def download(self, source: Dict, timeout: int = 60) -> Dict:
+        """
+        Conditionally download a source described by snapshot() into the cache.
+
+        Touches only the network and the cache directory, never the database,
+        so it is safe to call from worker threads. Pass the result to apply().
+        """
+        path = self._path(source['id'])
+        has_copy = path.exists()
+        headers = {}
+        if has_copy:
+            if source['etag']:
+                headers['If-None-Match'] = source['etag']
+            if source['last_modified']:
+                headers['If-Modified-Since'] = source['last_modified']
+
+        result = {'status': ERROR, 'bytes_downloaded': 0, 'bytes_saved': 0, 'error': None, 'validators': None}
+        try:
+            response = requests.get(source['url'], timeout=timeout, stream=True, headers=headers)
+            try:
+                if response.status_code == 304 and has_copy:
+                    result['status'] = NOT_MODIFIED
+                    result['bytes_saved'] = source['content_length'] or 0
+                elif response.status_code == 200:
+                    # Let urllib3 undo any transport-level Content-Encoding;
+                    # gzip/xz/zip payloads are kept as they were served
+                    response.raw.decode_content = True
+                    digest, size = self._download(response.raw, path)
+                    result['bytes_downloaded'] = size
+                    result['status'] = UNCHANGED if has_copy and digest == source['content_digest'] else MODIFIED
+                    result['validators'] = {
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'content_digest': digest,
+                        'content_length': size,
+                    }
+                else:
+                    result['error'] = f"HTTP {response.status_code}"
+            finally:
+                response.close()
+        except Exception as e:
+            result['error'] = str(e)
+
+        if result['status'] == ERROR:
+            logger.error(f"Error fetching EPG source {source['id']}: {result['error']}")
+            if has_copy:
+                logger.info(f"Using cached copy of EPG source {source['id']}")
+                result['status'] = CACHED
+        else:
+            logger.info(f"Fetched EPG source {source['id']}: {result['status']} "
+                        f"({result['bytes_downloaded']} bytes downloaded, {result['bytes_saved']} saved)")
+        return result
+
+    def apply(self, source: EPGSource, result: Dict) -> Dict:
+        """Store the validators of a download() result on its source and count it in the stats."""
+        if result['validators']:
+            for key, value in result['validators'].items():
+                setattr(source, key, value)
+            self.source_repo.update(source)
+
+        self._record(source.id, result)
+        return result
+
+    @staticmethod
+    def is_ingested(source: EPGSource) -> bool:
+        """Whether the cached body of a source is the one last synced into the database."""
+        return source.content_digest is not None and source.ingested_digest == source.content_digest
+
+    @staticmethod
+    def mark_ingested(source: EPGSource) -> None:
+        """Record that the cached body of a source has been synced; the caller commits."""
+        source.ingested_digest = source.content_digest
+
+    def _download(self, raw: BinaryIO, path: Path):
+        """
+        Stream a response body into the cache file, hashing it on the way.
+
+        Bodies that arrive uncompressed are gzipped on disk. The file is
+        written next to its destination and swapped in atomically, so a
+        failed download never clobbers the last good copy.
+
+        Returns:
+            Tuple of (SHA-256 hex digest, body size in bytes)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                sink = out
+                first = True
+                while True:
+                    chunk = raw.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if first:
+                        first = False
+                        if detect_compression(chunk[:8]) is None:
+                            sink = gzip.GzipFile(fileobj=out, mode='wb', compresslevel=6)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    sink.write(chunk)
+                if sink is not out:
+                    sink.close()
+            os.replace(tmp_path, str(path))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest.hexdigest(), size
+
+    @contextmanager
+    def open_stream(self, source: EPGSource) -> Iterator[BinaryIO]:
+        """Open the cached guide of a source as a decompressed XMLTV stream."""
+        with open(self.path_for(source), 'rb') as f:
+            yield open_xmltv_stream(f)
+
+    def invalidate(self, source: EPGSource) -> None:
+        """Drop the cached body and validators of a source (e.g. before it is deleted)."""
+        path = self.path_for(source)
+        if path.exists():
+            path.unlink()
+        source.etag = None
+        source.last_modified = None
+        source.content_digest = None
+        source.content_length = None
+        source.ingested_digest = None
+
+    def _record(self, source_id: int, result: Dict) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(source_id, {'fetches': 0, 'hits': 0, 'bytes_saved': 0})
+            stats['fetches'] += 1
+            if result['status'] in (NOT_MODIFIED, UNCHANGED):
+                stats['hits'] += 1
+            stats['bytes_saved'] += result['bytes_saved']
+
+    def get_stats(self, source_id: int) -> Dict:
+        """Cumulative fetch counters of a source since startup, including its hit rate."""
+        with self._lock:
+            stats = dict(self._stats.get(source_id, {'fetches': 0, 'hits': 0, 'bytes_saved': 0}))
+        stats['hit_rate'] = round(stats['hits'] / stats['fetches'], 3) if stats['fetches'] else 0.0
+        return stats
+
+
+# Shared by every EPGService instance so hit rates accumulate across requests
+epg_source_cache = EPGSourceCache()
@@ -1,14 +1,21 @@
 import re
+import asyncio
+import hashlib
 import logging
-import aiohttp
-from typing import List, Tuple, Dict, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterator, List, Tuple, Dict, Optional
 from dataclasses import dataclass
 from urllib.parse import urljoin, urlparse
 from ..models.url_types import create_url_object, ZeronetURL, RegularURL
-from .stream_service import StreamService
+from ..utils.http_client import http_clients
+from ..utils.m3u import M3UEntry, M3UEntryParser, aiter_m3u_entries, iter_m3u_entries
 
 logger = logging.getLogger(__name__)
 
+# Read size when streaming M3U files
+STREAM_CHUNK_SIZE = 64 * 1024
+
 @dataclass
 class M3UChannel:
     id: str
@@ -19,14 +26,93 @@ class M3UChannel:
     tvg_name: Optional[str] = None
     original_url: Optional[str] = None
 
+class M3UFetchCache:
+    """
+    M3U files fetched during one scrape cycle, shared by all the scrapers in it.
+
+    Each URL is fetched at most once: concurrent callers wait for the download
+    in flight, later ones reuse its result. Channels are kept by content
+    digest, so mirrors serving the same file share one list. At most
+    ``max_concurrent`` downloads run at a time.
+    """
+
+    def __init__(self, max_concurrent: int = 8):
+        self.max_concurrent = max_concurrent
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self._by_url: Dict[str, asyncio.Future] = {}
+        self._by_digest: Dict[str, List[M3UEntry]] = {}
+        self.requests = 0
+        self.fetches = 0
+        self.duplicate_contents = 0
+
+    async def get(self, url: str, load: Callable[[str], Awaitable[Tuple[Optional[str], List[M3UEntry]]]]
+                  ) -> List[M3UEntry]:
+        """
+        Channels of the M3U file at ``url``, loading it only if no one did this cycle.
+
+        ``load`` fetches and parses a URL into (content digest, channels); a
+        None digest means the fetch failed.
+        """
+        self.requests += 1
+        future = self._by_url.get(url)
+        if future is None:
+            future = self._by_url[url] = asyncio.ensure_future(self._load(url, load))
+        # A caller giving up must not cancel the download others are waiting for
+        return list(await asyncio.shield(future))
+
+    async def _load(self, url, load) -> List[M3UEntry]:
+        async with self.semaphore:
+            self.fetches += 1
+            digest, channels = await load(url)
+        if digest is None:
+            return []
+        if digest in self._by_digest:
+            self.duplicate_contents += 1
+        else:
+            self._by_digest[digest] = channels
+        return self._by_digest[digest]
+
+    def get_stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'fetches': self.fetches,
+            'saved_fetches': self.requests - self.fetches,
+            'distinct_contents': len(self._by_digest),
+            'duplicate_contents': self.duplicate_contents,
+            'max_concurrent': self.max_concurrent,
+        }
+
+
+async def _hashed(chunks: AsyncIterable[bytes], digest) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+# Cache of the scrape cycle running in the current context, if any
+_current_fetch_cache: ContextVar[Optional[M3UFetchCache]] = ContextVar('m3u_fetch_cache', default=None)
+
+
+@contextmanager
+def m3u_fetch_cycle(max_concurrent: int = 8) -> Iterator[M3UFetchCache]:
+    """Share one M3UFetchCache between everything scraped inside the block, including tasks it starts."""
+    cache = M3UFetchCache(max_concurrent)
+    token = _current_fetch_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_fetch_cache.reset(token)
+
+
+def current_m3u_fetch_cache() -> Optional[M3UFetchCache]:
+    return _current_fetch_cache.get()
+
+
 class M3UService:
     """Service for handling M3U playlists."""
     
     def __init__(self):
-        self.stream_service = StreamService()
         self.acestream_pattern = re.compile(r'acestream://([\w\d]+)')
-        self.extinf_pattern = re.compile(r'#EXTINF:(-?\d+)\s*(?:\s*(.+?)\s*)?,\s*(.+)')
-        self.tvg_pattern = re.compile(r'tvg-(?:id|name|logo|group-title)="([^"]*)"')
         self.m3u_pattern = re.compile(r'https?://[^\s<>"]+?\.m3u[8]?(?=[\s<>"]|$)')
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -87,220 +173,72 @@ class M3UService:
         
         return list(m3u_urls)
 
-    async def download_m3u(self, url: str) -> str:
-        """Download M3U file content."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                return await response.text()
-
     def parse_m3u_content(self, content: str) -> List[M3UChannel]:
-        """Parse M3U content and extract channel information."""
+        """Parse M3U content into channels, with the playlist line each one came from."""
+        parser = M3UEntryParser()
         channels = []
-        current_extinf = None
-        
         for line in content.splitlines():
-            line = line.strip()
-            
-            if line.startswith('#EXTINF:'):
-                # Parse EXTINF line
-                extinf_match = self.extinf_pattern.match(line)
-                if extinf_match:
-                    # Extract metadata
-                    metadata = extinf_match.group(2) or ""
-                    name = extinf_match.group(3)
-                    
-                    # Clean the channel name
-                    name = self.clean_text(name)
-                    
-                    # Parse TVG tags if present
-                    tvg_id = None
-                    tvg_name = None
-                    logo = None
-                    group = None
-                    
-                    for tag in self.tvg_pattern.finditer(metadata):
-                        tag_text = tag.group(0)
-                        if 'tvg-id=' in tag_text:
-                            tvg_id = tag.group(1)
-                        elif 'tvg-name=' in tag_text:
-                            tvg_name = self.clean_text(tag.group(1))
-                        elif 'tvg-logo=' in tag_text:
-                            logo = tag.group(1)
-                        elif 'group-title=' in tag_text:
-                            group = self.clean_text(tag.group(1))
-                    
-                    current_extinf = M3UChannel(
-                        id="",  # Will be set when we find the acestream URL
-                        name=name or "Unknown Channel",  # Default name if none provided
-                        group=group,
-                        logo=logo,
-                        tvg_id=tvg_id,
-                        tvg_name=tvg_name or name
-                    )
-            
-            elif not line.startswith('#') and current_extinf:
-                # Extract acestream ID from URL
-                acestream_id = self.stream_service.extract_acestream_id(line)
-                if acestream_id:
-                    # If no name was provided in EXTINF, use the ID as name
-                    if not current_extinf.name or current_extinf.name == "Unknown Channel":
-                        current_extinf.name = f"Channel {acestream_id}"
-                        
-                    current_extinf.id = acestream_id
-                    current_extinf.original_url = line  # Store original URL
-                    channels.append(current_extinf)
-                current_extinf = None
+            entry = parser.feed(line)
+            if entry is None:
+                continue
+            channel_id, name, metadata = entry
+            name = self.clean_text(name) or f"Channel {channel_id}"
+            channels.append(M3UChannel(
+                id=channel_id,
+                name=name,
+                group=self.clean_text(metadata.get('group')) or None,
+                logo=metadata.get('logo'),
+                tvg_id=metadata.get('tvg_id'),
+                tvg_name=self.clean_text(metadata.get('tvg_name')) or name,
+                original_url=line.strip()
+            ))
+        return channels
 
-        # Filter out entries with missing IDs
-        return [ch for ch in channels if ch.id]
+    async def extract_channels_from_m3u(self, m3u_url: str,
+                                        cache: Optional[M3UFetchCache] = None) -> List[M3UEntry]:
+        """
+        Extract channel information from M3U file.
 
-    async def extract_channels_from_m3u(self, m3u_url: str) -> List[Tuple[str, str, Dict]]:
-        """Extract channel information from M3U file."""
-        channels = []
-        
+        Goes through ``cache``, or the current scrape cycle's cache, when there is one.
+        """
+        cache = cache or current_m3u_fetch_cache()
+        if cache is not None:
+            return await cache.get(m3u_url, self._load_m3u)
+        return (await self._load_m3u(m3u_url))[1]
+
+    async def _load_m3u(self, m3u_url: str) -> Tuple[Optional[str], List[M3UEntry]]:
+        """SHA-256 of an M3U file's body and its channels; (None, []) if it could not be read."""
+        digest = hashlib.sha256()
         try:
-            # Create the appropriate URL object based on URL type
-            url_obj = create_url_object(m3u_url)
-            
-            # Handle different URL types
-            if isinstance(url_obj, ZeronetURL):
-                m3u_content = await self._fetch_zeronet_m3u(m3u_url)
-            else:
-                m3u_content = await self._fetch_http_m3u(m3u_url)
-            
-            if not m3u_content:
-                return []
-            
-            # Parse the M3U content
-            channel_info = {}
-            channel_id = None
-            
-            for line in m3u_content.splitlines():
-                line = line.strip()
-                
-                # Skip empty lines and comments
-                if not line or line.startswith('#'):
-                    # Extract metadata from EXTINF line
-                    if line.startswith('#EXTINF:'):
-                        # Parse channel name and optional attributes
-                        name_match = re.search(r'#EXTINF:.*,(.+)', line)
-                        if name_match:
-                            channel_info['name'] = name_match.group(1).strip()
-                        
-                        # Extract any other metadata
-                        # ... (implementation details)
-                    continue
-                
-                # Check if the line contains an acestream link
-                acestream_match = self.acestream_pattern.search(line)
-                if acestream_match:
-                    channel_id = acestream_match.group(1)
-                    name = channel_info.get('name', f"Channel {channel_id}")
-                    metadata = {k: v for k, v in channel_info.items() if k != 'name'}
-                    channels.append((channel_id, name, metadata))
-                    channel_info = {}
-            
-            return channels
-        
+            channels = [entry async for entry in self.stream_channels_from_m3u(m3u_url, digest)]
         except Exception as e:
             logger.error(f"Error extracting channels from M3U at {m3u_url}: {e}")
-            return []
+            return None, []
+        return digest.hexdigest(), channels
 
-    async def _fetch_http_m3u(self, url: str) -> Optional[str]:
-        """Fetch M3U content from regular HTTP URL."""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers, timeout=10) as response:
-                    response.raise_for_status()
-                    return await response.text()
-        except Exception as e:
-            logger.error(f"Error fetching M3U from HTTP URL {url}: {e}")
-            return None
-    
-    async def _fetch_zeronet_m3u(self, url: str) -> Optional[str]:
-        """Fetch M3U content from ZeroNet URL."""
-        try:
-            url_obj = create_url_object(url, 'zeronet')
-            internal_url = url_obj.get_internal_url()
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(internal_url, headers=self.headers, timeout=20) as response:
-                    response.raise_for_status()
-                    return await response.text()
-        except Exception as e:
-            logger.error(f"Error fetching M3U from ZeroNet URL {url}: {e}")
-            return None
+    async def stream_channels_from_m3u(self, m3u_url: str, digest=None) -> AsyncIterator[M3UEntry]:
+        """
+        Yield (id, name, metadata) for each channel of an M3U file as it downloads.
+
+        The body is parsed line by line and never held in full, so memory does
+        not grow with the playlist. ``digest``, a hashlib object, is fed the raw body.
+        """
+        if isinstance(create_url_object(m3u_url), ZeronetURL):
+            session, timeout = http_clients.session('zeronet'), 20
+            url = create_url_object(m3u_url, 'zeronet').get_internal_url()
+        else:
+            session, timeout, url = http_clients.session('m3u'), 10, m3u_url
+
+        async with session.get(url, headers=self.headers, timeout=timeout) as response:
+            response.raise_for_status()
+            chunks = response.content.iter_chunked(STREAM_CHUNK_SIZE)
+            if digest is not None:
+                chunks = _hashed(chunks, digest)
+            async for entry in aiter_m3u_entries(chunks, response.charset or 'utf-8'):
+                yield entry
 
-    def extract_channels_from_content(self, content: str) -> List[Tuple[str, str, Dict]]:
+    def extract_channels_from_content(self, content: str) -> List[M3UEntry]:
         """Extract channel information directly from M3U content."""
-        channels = []
-        channel_info = {}
-        
-        for line in content.splitlines():
-            line = line.strip()
-            
-            # Skip empty lines
-            if not line:
-                continue
-            
-            # Handle EXTINF lines
-            if line.startswith('#EXTINF:'):
-                # Parse channel name and optional attributes
-                name_match = re.search(r'#EXTINF:.*,(.+)', line)
-                if name_match:
-                    channel_info['name'] = name_match.group(1).strip()
-                
-                # Extract tvg-id, tvg-name, group-title, etc.
-                for tag_match in re.finditer(r'(tvg-[^=]+|group-title)="([^"]+)"', line):
-                    tag_name = tag_match.group(1)
-                    tag_value = tag_match.group(2)
-                    
-                    # Normalize field names to match database column names
-                    if tag_name == 'tvg-id':
-                        channel_info['tvg_id'] = tag_value
-                    elif tag_name == 'tvg-name':
-                        channel_info['tvg_name'] = tag_value
-                    elif tag_name == 'tvg-logo':
-                        channel_info['logo'] = tag_value
-                    elif tag_name == 'group-title':
-                        channel_info['group'] = tag_value
-                    else:
-                        # Store any other metadata with original name
-                        channel_info[tag_name] = tag_value
-                
-                continue
-            
-            # Skip other comment lines
-            if line.startswith('#'):
-                continue
-            
-            # Check if the line contains an acestream link or ace/getstream URL
-            acestream_match = self.acestream_pattern.search(line)
-            getstream_match = re.search(r'ace/getstream\?id=([\w\d]+)', line) if not acestream_match else None
-            
-            if acestream_match:
-                channel_id = acestream_match.group(1)
-                name = channel_info.get('name', f"Channel {channel_id}")
-                
-                # Extract any other metadata
-                metadata = {k: v for k, v in channel_info.items() if k != 'name'}
-                
-                channels.append((channel_id, name, metadata))
-                
-                # Reset channel_info for the next channel
-                channel_info = {}
-            elif getstream_match:
-                channel_id = getstream_match.group(1)
-                name = channel_info.get('name', f"Channel {channel_id}")
-                
-                # Extract any other metadata
-                metadata = {k: v for k, v in channel_info.items() if k != 'name'}
-                
-                channels.append((channel_id, name, metadata))
-                
-                # Reset channel_info for the next channel
-                channel_info = {}
-        
+        channels = list(iter_m3u_entries(content.splitlines()))
         logger.info(f"Extracted {len(channels)} channels with metadata from M3U content")
-        return channels
\ No newline at end of file
+        return channels
@@ -1,25 +1,90 @@
 import os
-from typing import List, Dict, Optional
+import html
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from ..repositories import ChannelRepository
 from app.utils.config import Config
 from app.repositories.tv_channel_repository import TVChannelRepository
 from app.services.tv_channel_service import TVChannelService
 from app.models.acestream_channel import AcestreamChannel
 
+# Characters buffered before a chunk of a streamed document is yielded
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def join_lines(lines: Iterable[str], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Stream ``'\\n'.join(lines)`` as chunks of roughly ``chunk_size`` characters.
+    
+    The first chunk is yielded as soon as it fills up, so clients get data
+    while the rest of the document is still being generated.
+    """
+    buffer = []
+    size = 0
+    separator = ''
+    for line in lines:
+        buffer.append(separator)
+        buffer.append(line)
+        separator = '\n'
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def score_acestream(acestream) -> int:
+    """Rank an acestream of a TV channel: online first, then by metadata completeness."""
+    score = 0
+    if acestream.is_online:
+        score += 10
+    if acestream.logo:
+        score += 3
+    if acestream.tvg_id:
+        score += 2
+    if acestream.tvg_name:
+        score += 1
+    return score
+
+
+def sort_tv_channels(channels_with_acestreams):
+    """Sort (TV channel, acestreams) pairs by channel_number if available, then name."""
+    return sorted(
+        channels_with_acestreams,
+        key=lambda item: (item[0].channel_number is None, item[0].channel_number or 0, item[0].name.lower())
+    )
+
+
 class PlaylistService:
     def __init__(self):
         self.channel_repository = ChannelRepository()
         self.config = Config()
         self.tv_channel_repository = TVChannelRepository()
         self.tv_channel_service = TVChannelService()
+        self.programme_batch_size = 500  # Channel mappings whose programmes are fetched per query
 
-    def _format_stream_url(self, channel_id: str, local_id: int) -> str:
-        """Format stream URL based on base_url configuration."""
+    def _stream_url_settings(self, base_url: str = None) -> tuple:
+        """Read the settings used by _format_stream_url once, for a whole playlist.
+        
+        Args:
+            base_url: Overrides the configured base URL
+        """
         # Get base_url directly from config instance
-        base_url = getattr(self.config, 'base_url', 'acestream://')
+        base_url = base_url or getattr(self.config, 'base_url', 'acestream://')
         
         # Check if PID parameter should be added
         should_add_pid = getattr(self.config, 'addpid', False)
+        return base_url, should_add_pid
+
+    def _format_stream_url(self, channel_id: str, local_id: int, settings: tuple = None) -> str:
+        """Format stream URL based on base_url configuration.
+        
+        Args:
+            settings: (base_url, addpid) from _stream_url_settings; read from config when not given
+        """
+        base_url, should_add_pid = settings or self._stream_url_settings()
                 
         # Don't add pid if addpid is False
         if should_add_pid:
@@ -36,9 +101,15 @@ class PlaylistService:
             ).all()
         return self.channel_repository.get_active()
 
-    def generate_playlist(self, search_term=None):
-        """Generate M3U playlist with channels."""
-        playlist_lines = ['#EXTM3U']
+    def _playlist_lines(self, search_term=None, base_url=None):
+        """Generate M3U playlist lines with channels.
+        
+        Args:
+            search_term: Optional search term to filter channels by name
+            base_url: Optional base URL used instead of the configured one
+        """
+        yield '#EXTM3U'
+        url_settings = self._stream_url_settings(base_url)
         
         # Query channels from the database
         channels = self._get_channels(search_term)
@@ -49,7 +120,7 @@ class PlaylistService:
         # Add each channel to the playlist
         for local_id, channel in enumerate(channels, start=0):
             # Use _format_stream_url to get the correct URL format
-            stream_url = self._format_stream_url(channel.id, local_id)
+            stream_url = self._format_stream_url(channel.id, local_id, url_settings)
             
             # Handle duplicate names
             base_name = channel.name
@@ -80,68 +151,48 @@ class PlaylistService:
                 extinf += f' {"".join(metadata)}'
             extinf += f',{display_name}'
             
-            playlist_lines.append(extinf)
-            playlist_lines.append(stream_url)
-            
-        return '\n'.join(playlist_lines)
+            yield extinf
+            yield stream_url
     
-    def generate_tv_channels_playlist(self, search_term=None, favorites_only=False):
-        """Generate M3U playlist with TV channels using all their acestreams.
+    def _tv_channels_playlist_lines(self, search_term=None, favorites_only=False):
+        """Generate M3U playlist lines with TV channels using all their acestreams.
         
         Args:
             search_term: Optional search term to filter channels by name
             favorites_only: If True, only include favorite channels
             
-        Returns:
-            String containing the M3U playlist content
+        Yields:
+            Lines of the M3U playlist, without line breaks
         """
-        playlist_lines = ['#EXTM3U']
+        yield '#EXTM3U'
+        url_settings = self._stream_url_settings()
         
-        # Query TV channels with filters
-        channels, total, _ = self.tv_channel_repository.filter_channels(
+        # Query TV channels with filters, together with all their acestreams
+        channels = self.tv_channel_repository.get_channels_with_acestreams(
             search_term=search_term,
-            favorites_only=favorites_only,
-            per_page=1000  # Large value to avoid pagination
+            favorites_only=favorites_only
         )
         
         # Sort channels by channel_number if available
-        sorted_channels = sorted(
-            channels, 
-            key=lambda c: (c.channel_number is None, c.channel_number or 0, c.name.lower())
-        )
+        sorted_channels = sort_tv_channels(channels)
         
         # Track used names and their counts
         name_counts = {}
         local_id = 0
         
         # Process each TV channel
-        for tv_channel in sorted_channels:
-            # Get all acestreams for this TV channel, prioritize online and best quality
-            acestreams = AcestreamChannel.query.filter_by(tv_channel_id=tv_channel.id).all()
-            
+        for tv_channel, acestreams in sorted_channels:
             # Skip channels without acestreams
             if not acestreams:
                 continue
                 
             # Sort acestreams by quality (online first, then by metadata completeness)
-            def score_acestream(acestream):
-                score = 0
-                if acestream.is_online:
-                    score += 10
-                if acestream.logo:
-                    score += 3
-                if acestream.tvg_id:
-                    score += 2
-                if acestream.tvg_name:
-                    score += 1
-                return score
-                
             sorted_acestreams = sorted(acestreams, key=score_acestream, reverse=True)
             
             # Process each acestream for this TV channel
             for stream_index, acestream in enumerate(sorted_acestreams):
                 # Use _format_stream_url to get the correct URL format
-                stream_url = self._format_stream_url(acestream.id, local_id)
+                stream_url = self._format_stream_url(acestream.id, local_id, url_settings)
                 local_id += 1
                   # Handle duplicate names and multiple streams per channel
                 base_name = tv_channel.name
@@ -196,86 +247,66 @@ class PlaylistService:
                     extinf += f' {"".join(metadata)}'
                 extinf += f',{display_name}'
                 
-                playlist_lines.append(extinf)
-                playlist_lines.append(stream_url)
-            
-        return '\n'.join(playlist_lines)
+                yield extinf
+                yield stream_url
 
-    def generate_epg_xml(self, search_term=None, favorites_only=False):
-        """Generate XML EPG guide for channels with EPG data and associated acestreams.
+    def _epg_xml_lines(self, search_term=None, favorites_only=False):
+        """Generate XML EPG guide lines for channels with EPG data and associated acestreams.
         
         Args:
             search_term: Optional search term to filter channels by name
             favorites_only: If True, only include favorite channels
             
-        Returns:
-            String containing the XML EPG guide content
+        Yields:
+            Lines of the XML EPG guide, without line breaks
         """
-        from datetime import datetime, timedelta
         from app.repositories.epg_channel_repository import EPGChannelRepository
         from app.repositories.epg_program_repository import EPGProgramRepository
         import html
         
         # Start with XML header and root element
-        xml_lines = [
-            '<?xml version="1.0" encoding="utf-8" ?>',
-            '<!DOCTYPE tv SYSTEM "xmltv.dtd">',
-            '<tv generator-info-name="Acestream Scraper EPG Generator" generator-info-url="https://github.com/pipepito/acestream-scraper">'
-        ]
-        
-        # Get TV channels with filters
-        channels, _, _ = self.tv_channel_repository.filter_channels(
+        yield '<?xml version="1.0" encoding="utf-8" ?>'
+        yield '<!DOCTYPE tv SYSTEM "xmltv.dtd">'
+        yield '<tv generator-info-name="Acestream Scraper EPG Generator" generator-info-url="https://github.com/pipepito/acestream-scraper">'
+        
+        # Get TV channels with filters, together with all their acestreams
+        channels = self.tv_channel_repository.get_channels_with_acestreams(
             search_term=search_term,
             favorites_only=favorites_only,
-            is_active=True,
-            per_page=1000  # Large value to avoid pagination
+            is_active=True
         )
         
         # Sort channels by channel_number if available (consistent with playlist generation)
-        sorted_channels = sorted(
-            channels, 
-            key=lambda c: (c.channel_number is None, c.channel_number or 0, c.name.lower())
-        )
+        sorted_channels = sort_tv_channels(channels)
         
         # Initialize repositories for EPG data
         epg_channel_repo = EPGChannelRepository()
         epg_program_repo = EPGProgramRepository()
         
+        # Look up the EPG channels of every EPG ID at once
+        epg_channels_by_xml_id = epg_channel_repo.get_first_by_channel_xml_ids(
+            self.tv_channel_repository.get_epg_ids_query(
+                search_term=search_term,
+                favorites_only=favorites_only,
+                is_active=True
+            )
+        )
+        
         # Track channels and their EPG mappings
         channel_epg_mappings = []
         # Initialize name_counts for tracking duplicates
         name_counts = {} # Simple counter for duplicate channel names
         
         # Process each TV channel
-        for tv_channel in sorted_channels:
+        for tv_channel, acestreams in sorted_channels:
             # Skip channels without EPG ID or acestreams
-            if not tv_channel.epg_id or tv_channel.acestream_channels.count() == 0:
-                continue
-                
-            # Get all acestreams for this TV channel
-            acestreams = AcestreamChannel.query.filter_by(tv_channel_id=tv_channel.id).all()
-            if not acestreams:
+            if not tv_channel.epg_id or not acestreams:
                 continue
                 
             # Sort acestreams by quality (same logic as playlist generation)
-            def score_acestream(acestream):
-                score = 0
-                if acestream.is_online:
-                    score += 10
-                if acestream.logo:
-                    score += 3
-                if acestream.tvg_id:
-                    score += 2
-                if acestream.tvg_name:
-                    score += 1
-                return score
-                
             sorted_acestreams = sorted(acestreams, key=score_acestream, reverse=True)
-              # Find the EPG channels corresponding to this TV channel's EPG ID
-            epg_channels = epg_channel_repo.get_by_channel_xml_id(tv_channel.epg_id)
-            
-            # Use the first channel if available, otherwise None
-            epg_channel = epg_channels[0] if epg_channels else None
+            # Use the first EPG channel with this TV channel's EPG ID if available, otherwise None
+            epg_channel = epg_channels_by_xml_id.get(tv_channel.epg_id)
             
             # Create channel definitions for each acestream (handle duplicates like playlist)
             base_name = tv_channel.name
@@ -313,120 +344,114 @@ class PlaylistService:
             epg_id = mapping['epg_id']
             display_name = mapping['display_name']
             tv_channel = mapping['tv_channel']
-            xml_lines.append(f'  <channel id="{html.escape(epg_id)}">')
-            xml_lines.append(f'    <display-name>{html.escape(display_name)}</display-name>')
+            yield f'  <channel id="{html.escape(epg_id)}">'
+            yield f'    <display-name>{html.escape(display_name)}</display-name>'
             
             if tv_channel.logo_url:
-                xml_lines.append(f'    <icon src="{html.escape(tv_channel.logo_url)}" />')
+                yield f'    <icon src="{html.escape(tv_channel.logo_url)}" />'
                 
             if tv_channel.website:
-                xml_lines.append(f'    <url>{html.escape(tv_channel.website)}</url>')
+                yield f'    <url>{html.escape(tv_channel.website)}</url>'
                 
-            xml_lines.append('  </channel>')
+            yield '  </channel>'
         
         # Initialize the programs section - add an empty line to separate channels from programs
-        xml_lines.append('')
+        yield ''
         
         # Get program data for each channel mapping
-        for mapping in channel_epg_mappings:
-            epg_id = mapping['epg_id']
-            original_epg_id = mapping['original_epg_id']
-            epg_channel = mapping['epg_channel']
-            
-            if not epg_channel:
-                continue
-            
-            # Get programs for this channel
-            now = datetime.utcnow()
-            start_time = now - timedelta(hours=12)  # Include past 12 hours
-            end_time = now + timedelta(days=7)     # Include next 7 days
+        yield from self._programme_lines(channel_epg_mappings, epg_program_repo)
+        
+        # Close the XML document
+        yield '</tv>'
+    
+    def _programme_lines(self, channel_epg_mappings: List[Dict], epg_program_repo=None) -> Iterator[str]:
+        """Generate the <programme> entries of every channel mapping.
+        
+        Programmes are fetched with one windowed query per batch of
+        ``programme_batch_size`` mappings instead of one query per mapping.
+        Each programme is escaped and formatted once per EPG channel; the
+        variants of a TV channel (epg_id.1, epg_id.2, ...) reuse the same
+        fragments and only differ in their channel attribute.
+        """
+        from app.repositories.epg_program_repository import EPGProgramRepository
+        epg_program_repo = epg_program_repo or EPGProgramRepository()
+        
+        now = datetime.utcnow()
+        start_time = now - timedelta(hours=12)  # Include past 12 hours
+        end_time = now + timedelta(days=7)     # Include next 7 days
+        
+        mappings = [mapping for mapping in channel_epg_mappings if mapping['epg_channel']]
+        for batch_start in range(0, len(mappings), self.programme_batch_size):
+            batch = mappings[batch_start:batch_start + self.programme_batch_size]
             
-            # Get programs using the epg_channel object
-            programs = epg_program_repo.get_programs_for_channel(epg_channel.id, start_time, end_time)
+            fragments = {mapping['epg_channel'].id: [] for mapping in batch}
+            for program in epg_program_repo.get_programs_for_channels(list(fragments), start_time, end_time):
+                fragments[program.epg_channel_id].append(self._programme_fragment(program))
             
             # Generate program entries - each variant of a channel needs its own program entries
             # with the correct channel ID
-            for program in programs:
-                start_time_str = program.start_time.strftime("%Y%m%d%H%M%S %z")
-                stop_time_str = program.end_time.strftime("%Y%m%d%H%M%S %z")
-                
-                # Make sure timezone offset is included
-                if start_time_str.endswith(' '):
-                    start_time_str += '+0000'  # Add UTC offset if missing
-                if stop_time_str.endswith(' '):
-                    stop_time_str += '+0000'  # Add UTC offset if missing
-                
-                xml_lines.append(f'  <programme start="{start_time_str}" stop="{stop_time_str}" channel="{html.escape(epg_id)}">')
-                xml_lines.append(f'    <title>{html.escape(program.title)}</title>')
-                
-                if program.description:
-                    xml_lines.append(f'    <desc>{html.escape(program.description)}</desc>')
-                
-                if program.category:
-                    xml_lines.append(f'    <category>{html.escape(program.category)}</category>')
-                
-                xml_lines.append('  </programme>')
+            for mapping in batch:
+                channel_attr = f' channel="{html.escape(mapping["epg_id"])}">'
+                for head, body in fragments[mapping['epg_channel'].id]:
+                    yield head + channel_attr + body
+    
+    @staticmethod
+    def _programme_fragment(program) -> Tuple[str, str]:
+        """Pre-render a programme as the text before and after its channel attribute."""
+        start_time_str = program.start_time.strftime("%Y%m%d%H%M%S %z")
+        stop_time_str = program.end_time.strftime("%Y%m%d%H%M%S %z")
         
-        # Close the XML document
-        xml_lines.append('</tv>')
+        # Make sure timezone offset is included
+        if start_time_str.endswith(' '):
+            start_time_str += '+0000'  # Add UTC offset if missing
+        if stop_time_str.endswith(' '):
+            stop_time_str += '+0000'  # Add UTC offset if missing
+        
+        body = [f'\n    <title>{html.escape(program.title)}</title>']
+        if program.description:
+            body.append(f'\n    <desc>{html.escape(program.description)}</desc>')
+        if program.category:
+            body.append(f'\n    <category>{html.escape(program.category)}</category>')
+        body.append('\n  </programme>')
         
-        return '\n'.join(xml_lines)
+        return f'  <programme start="{start_time_str}" stop="{stop_time_str}"', ''.join(body)
     
-    def generate_all_streams_playlist(self, search_term=None, include_unassigned=True):
-        """Generate M3U playlist with all acestreams, including both TV channels and unassigned streams.
+    def _all_streams_playlist_lines(self, search_term=None, include_unassigned=True):
+        """Generate M3U playlist lines with all acestreams, including both TV channels and unassigned streams.
         
         Args:
             search_term: Optional search term to filter channels by name
             include_unassigned: If True, include acestreams not assigned to TV channels
             
-        Returns:
-            String containing the M3U playlist content
+        Yields:
+            Lines of the M3U playlist, without line breaks
         """
-        playlist_lines = ['#EXTM3U']
+        yield '#EXTM3U'
+        url_settings = self._stream_url_settings()
         local_id = 0
         name_counts = {}
         
         # First, get all TV channels and their acestreams
-        channels, _, _ = self.tv_channel_repository.filter_channels(
-            search_term=search_term,
-            per_page=1000  # Large value to avoid pagination
-        )
+        channels = self.tv_channel_repository.get_channels_with_acestreams(search_term=search_term)
         
         # Sort channels by channel_number if available
-        sorted_channels = sorted(
-            channels, 
-            key=lambda c: (c.channel_number is None, c.channel_number or 0, c.name.lower())
-        )
+        sorted_channels = sort_tv_channels(channels)
         
         processed_acestreams = set()
         
         # Process TV channels and their acestreams first
-        for tv_channel in sorted_channels:
-            acestreams = AcestreamChannel.query.filter_by(tv_channel_id=tv_channel.id).all()
-            
+        for tv_channel, acestreams in sorted_channels:
             if not acestreams:
                 continue
                 
             # Sort acestreams by quality
-            def score_acestream(acestream):
-                score = 0
-                if acestream.is_online:
-                    score += 10
-                if acestream.logo:
-                    score += 3
-                if acestream.tvg_id:
-                    score += 2
-                if acestream.tvg_name:
-                    score += 1
-                return score
-                
             sorted_acestreams = sorted(acestreams, key=score_acestream, reverse=True)
             
             # Process each acestream for this TV channel
             for stream_index, acestream in enumerate(sorted_acestreams):
                 processed_acestreams.add(acestream.id)
                 
-                stream_url = self._format_stream_url(acestream.id, local_id)
+                stream_url = self._format_stream_url(acestream.id, local_id, url_settings)
                 local_id += 1
                 
                 # Channel numbering and naming
@@ -472,8 +497,8 @@ class PlaylistService:
                     extinf += f' {"".join(metadata)}'
                 extinf += f',{display_name}'
                 
-                playlist_lines.append(extinf)
-                playlist_lines.append(stream_url)
+                yield extinf
+                yield stream_url
         
         # Now process unassigned acestreams if requested
         if include_unassigned:
@@ -488,14 +513,14 @@ class PlaylistService:
             # Find the next available channel number
             next_channel_number = 9000  # Start unassigned streams at 9000
             if sorted_channels:
-                max_channel_number = max((c.channel_number or 0) for c in sorted_channels)
+                max_channel_number = max((c.channel_number or 0) for c, _ in sorted_channels)
                 next_channel_number = max(next_channel_number, max_channel_number + 1)
             
             for acestream in unassigned_acestreams:
                 if acestream.id in processed_acestreams:
                     continue
                     
-                stream_url = self._format_stream_url(acestream.id, local_id)
+                stream_url = self._format_stream_url(acestream.id, local_id, url_settings)
                 local_id += 1
                 
                 # Use acestream name or fallback
@@ -533,7 +558,70 @@ class PlaylistService:
                     extinf += f' {"".join(metadata)}'
                 extinf += f',{display_name}'
                 
-                playlist_lines.append(extinf)
-                playlist_lines.append(stream_url)
+                yield extinf
+                yield (stream_url)
+
+    def iter_playlist(self, search_term=None, base_url=None) -> Iterator[str]:
+        """Stream the M3U playlist of channels in chunks; see generate_playlist."""
+        return join_lines(self._playlist_lines(search_term, base_url))
+
+    def iter_tv_channels_playlist(self, search_term=None, favorites_only=False) -> Iterator[str]:
+        """Stream the TV channels M3U playlist in chunks; see generate_tv_channels_playlist."""
+        return join_lines(self._tv_channels_playlist_lines(search_term, favorites_only))
+
+    def iter_epg_xml(self, search_term=None, favorites_only=False) -> Iterator[str]:
+        """Stream the XML EPG guide in chunks; see generate_epg_xml.
+        
+        Programmes are loaded ``programme_batch_size`` channel mappings per
+        query, so memory stays proportional to one batch's programmes.
+        """
+        return join_lines(self._epg_xml_lines(search_term, favorites_only))
+
+    def iter_all_streams_playlist(self, search_term=None, include_unassigned=True) -> Iterator[str]:
+        """Stream the all-streams M3U playlist in chunks; see generate_all_streams_playlist."""
+        return join_lines(self._all_streams_playlist_lines(search_term, include_unassigned))
+
+    def generate_playlist(self, search_term=None, base_url=None) -> str:
+        """Generate M3U playlist with channels.
+        
+        Args:
+            search_term: Optional search term to filter channels by name
+            base_url: Optional base URL used instead of the configured one
+        """
+        return ''.join(self.iter_playlist(search_term, base_url))
+
+    def generate_tv_channels_playlist(self, search_term=None, favorites_only=False) -> str:
+        """Generate M3U playlist with TV channels using all their acestreams.
+        
+        Args:
+            search_term: Optional search term to filter channels by name
+            favorites_only: If True, only include favorite channels
             
-        return '\n'.join(playlist_lines)
\ No newline at end of file
+        Returns:
+            String containing the M3U playlist content
+        """
+        return ''.join(self.iter_tv_channels_playlist(search_term, favorites_only))
+
+    def generate_epg_xml(self, search_term=None, favorites_only=False) -> str:
+        """Generate XML EPG guide for channels with EPG data and associated acestreams.
+        
+        Args:
+            search_term: Optional search term to filter channels by name
+            favorites_only: If True, only include favorite channels
+            
+        Returns:
+            String containing the XML EPG guide content
+        """
+        return ''.join(self.iter_epg_xml(search_term, favorites_only))
+
+    def generate_all_streams_playlist(self, search_term=None, include_unassigned=True) -> str:
+        """Generate M3U playlist with all acestreams, including both TV channels and unassigned streams.
+        
+        Args:
+            search_term: Optional search term to filter channels by name
+            include_unassigned: If True, include acestreams not assigned to TV channels
+            
+        Returns:
+            String containing the M3U playlist content
+        """
+        return ''.join(self.iter_all_streams_playlist(search_term, include_unassigned))
@@ -0,0 +1,123 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Outcomes kept per URL, oldest first
+HISTORY_LENGTH = 16
+CHANGED = 'C'
+UNCHANGED = 'U'
+
+# The interval grows by half with each scrape that finds nothing new
+UNCHANGED_FACTOR = 1.5
+# How hard recent changes hold the interval down: it is capped at
+# max_interval * (1 - change rate) ** HISTORY_DAMPING
+HISTORY_DAMPING = 16
+
+
+def record_outcome(history: Optional[str], changed: bool) -> str:
+    """Append a scrape outcome to a change history, dropping the oldest beyond HISTORY_LENGTH."""
+    return ((history or '') + (CHANGED if changed else UNCHANGED))[-HISTORY_LENGTH:]
+
+
+def change_rate(history: Optional[str]) -> Optional[float]:
+    """Share of the recorded scrapes that found new content, None without history."""
+    if not history:
+        return None
+    return history.count(CHANGED) / len(history)
+
+
+def next_interval(current: Optional[float], changed: bool, min_interval: float, max_interval: float,
+                  initial: Optional[float] = None, history: Optional[str] = None) -> float:
+    """
+    Seconds until the next scrape of a URL, after a scrape that did or did not find changes.
+
+    A change drops the interval to ``min_interval``; each scrape without one
+    grows it by half, up to ``max_interval`` scaled down by the change rate of
+    ``history``, so sources that changed recently are not left for long. URLs
+    without an interval yet start from ``initial`` (the maximum if not given).
+    """
+    if changed:
+        return min_interval
+    rate = change_rate(history) or 0.0
+    ceiling = max(min_interval, max_interval * (1 - rate) ** HISTORY_DAMPING)
+    interval = (current or initial or max_interval) * UNCHANGED_FACTOR
+    return max(min_interval, min(ceiling, interval))
+
+
+def failure_delay(error_count: int, min_interval: float, max_interval: float) -> float:
+    """Seconds before retrying a URL that failed ``error_count`` times in a row, doubling from the minimum."""
+    return min(max_interval, min_interval * 2 ** max(0, min(error_count - 1, 16)))
+
+
+def apply_outcome(url_obj, changed: Optional[bool], min_interval: float, max_interval: float,
+                  initial: Optional[float] = None, now: Optional[datetime] = None):
+    """
+    Update a ScrapedURL's change history, interval and next due time after a scrape.
+
+    ``changed`` is None for a failed scrape, which keeps the interval and
+    retries after a delay growing with the URL's consecutive errors.
+    """
+    now = now or datetime.now(timezone.utc)
+    if changed is None:
+        delay = failure_delay(url_obj.error_count or 0, min_interval, max_interval)
+    else:
+        url_obj.change_history = record_outcome(url_obj.change_history, changed)
+        url_obj.scrape_interval = int(next_interval(url_obj.scrape_interval, changed, min_interval,
+                                                    max_interval, initial, url_obj.change_history))
+        delay = url_obj.scrape_interval
+    url_obj.next_scrape_at = now + timedelta(seconds=delay)
+
+
+class RescrapeQueue:
+    """URLs keyed by the time they are next due, earliest first; rescheduling a URL replaces its entry."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._due
+
+    def schedule(self, url: str, due: float):
+        """Make ``url`` due at ``due`` (a timestamp)."""
+        self._due[url] = due
+        heapq.heappush(self._heap, (due, url))
+        # Superseded entries stay in the heap until popped; compact when they dominate
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, url) for url, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, url: str):
+        self._due.pop(url, None)
+
+    def replace_all(self, due_times: Dict[str, float]):
+        self._due = dict(due_times)
+        self._heap = [(due, url) for url, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp of the earliest due URL, None when the queue is empty."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def count_due(self, now: float) -> int:
+        """How many URLs are due at ``now``."""
+        return sum(1 for due in self._due.values() if due <= now)
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[str]:
+        """Remove and return the URLs due at ``now``, earliest first, at most ``limit`` of them."""
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+            _, url = heapq.heappop(self._heap)
+            del self._due[url]
+            due.append(url)
+            self._drop_stale()
+        return due
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
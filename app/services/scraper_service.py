@@ -1,7 +1,11 @@
-from typing import List, Tuple
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
 from ..repositories import URLRepository, ChannelRepository
 import logging
 from ..models.url_types import create_url_object
+from ..utils.config import Config
+from ..utils.db_writer import db_writer
+from .rescrape_scheduler import apply_outcome
 
 logger = logging.getLogger(__name__)
 
@@ -10,12 +14,20 @@ class ScraperService:
         self.url_repository = URLRepository()
         self.channel_repository = ChannelRepository()
 
-    async def scrape_url(self, url: str, url_type: str = None) -> Tuple[List[Tuple[str, str, dict]], str]:
-        """Scrape a URL and update channels."""
+    async def scrape_url(self, url: str, url_type: str = None,
+                         force: bool = False) -> Tuple[List[Tuple[str, str, dict]], str]:
+        """
+        Scrape a URL and update channels.
+
+        Unless ``force`` is set, the fetch is conditional on the previous
+        scrape: when the content did not change, the channels are left as
+        they are, the URL is marked OK with ``content_unchanged`` and no
+        links are returned.
+        """
         try:
+            url_obj = self.url_repository.get_by_url(url)
             # If URL type not provided, get it from database
             if url_type is None:
-                url_obj = self.url_repository.get_by_url(url)
                 url_type = url_obj.url_type if url_obj else 'regular'  # Default to regular if not found
             
             # Skip processing for special URL types that should not be scraped
@@ -23,38 +35,88 @@ class ScraperService:
             if url_type in non_scrapable_types:
                 logger.info(f"Skipping URL '{url}' with type '{url_type}' (not intended for scraping)")
                 # Update status to OK without actually scraping
-                self.url_repository.update_status(url, 'ok')
+                await self._write_status(url, 'ok')
                 # Return empty links list and OK status
                 return [], "OK"
             
             # Update URL status
-            self.url_repository.update_status(url, 'processing')
+            await self._write_status(url, 'processing')
             
             # Import here to avoid circular dependency
             from ..scrapers import create_scraper_for_url
             
             # Create and execute scraper with explicit URL type
             scraper = create_scraper_for_url(url, url_type)
+            if url_obj and not force:
+                scraper.use_previous_fetch(url_obj.etag, url_obj.last_modified, url_obj.content_digest)
             links, status = await scraper.scrape()
             
+            intervals = self._rescrape_intervals()
             if status == "OK":
-                # Update channels with metadata
-                self._update_channels(url, links)
-                self.url_repository.update_status(url, status)
-                
-                # Update URL type in database if needed
-                url_obj = create_url_object(url, url_type)
-                self.url_repository.update_url_type(url, url_obj.type_name)
+                # One trip to the database writer for everything the scrape produced
+                await db_writer.call(lambda: self._record_success(url, url_type, links, scraper, intervals))
             else:
-                self.url_repository.update_status(url, status, "Failed to scrape URL")
+                await db_writer.call(lambda: self._record_failure(url, status, "Failed to scrape URL", intervals))
                 
             return links, status
             
         except Exception as e:
             logger.error(f"Error scraping URL {url}: {e}")
-            self.url_repository.update_status(url, 'failed', str(e))
+            # ``e`` is unbound once the except block ends, before the writer runs the lambda
+            error = str(e)
+            intervals = self._rescrape_intervals()
+            await db_writer.call(lambda: self._record_failure(url, 'failed', error, intervals))
             raise
 
+    async def _write_status(self, url: str, status: str, error: str = None):
+        await db_writer.write('url_status', {
+            'scraped_url': url, 'new_status': status, 'error': error or None,
+            'processed_at': datetime.now(timezone.utc)
+        })
+
+    def _record_success(self, url: str, url_type: str, links: List[Tuple[str, str, dict]], scraper,
+                        intervals: Dict[str, int]):
+        """
+        Store a successful scrape: channels, fetch validators, status, next due time and URL type.
+
+        Runs in the database writer's transaction: nothing here commits, and
+        errors propagate so that the writer rolls the whole batch back.
+        """
+        changed = False
+        if scraper.unchanged:
+            logger.info(f"Content of '{url}' unchanged, keeping its channels")
+        else:
+            # Update channels with metadata
+            result = self._update_channels(url, links, commit=False)
+            changed = bool(result['written'] or result['deleted'])
+        url_obj = self.url_repository.record_scrape(
+            url, "OK", fetch_state=scraper.fetch_state(), url_type=create_url_object(url, url_type).type_name)
+        if url_obj:
+            apply_outcome(url_obj, changed, **intervals)
+
+    def _record_failure(self, url: str, status: str, error: str, intervals: Dict[str, int]):
+        """Store a failed scrape and its next due time, in the database writer's transaction."""
+        url_obj = self.url_repository.record_scrape(url, status, error)
+        if url_obj:
+            # changed is None after a failed scrape
+            apply_outcome(url_obj, None, **intervals)
+
+    @staticmethod
+    def _rescrape_intervals() -> Dict[str, int]:
+        """
+        Interval settings of the adaptive rescrape schedule, in seconds, for apply_outcome.
+
+        Read before handing the outcome to the database writer: the first
+        use of Config commits its cached settings, which must not happen
+        halfway through the writer's transaction.
+        """
+        config = Config()
+        return {
+            'min_interval': config.rescrape_min_interval * 60,
+            'max_interval': config.rescrape_max_interval * 60,
+            'initial': config.rescrape_interval * 3600,
+        }
+
     async def _add_channels_to_database(self, channels: List[Tuple[str, str, dict]], source_url: str):
         """Add channels to the database with their metadata."""
         added_count = 0
@@ -85,31 +147,6 @@ class ScraperService:
         
         logger.info(f"Added/updated {added_count} channels in the database")
 
-    def _update_channels(self, url: str, links: List[Tuple[str, str, dict]]):
-        """Update channels for a given URL."""
-        try:
-            # Get current and existing channels
-            current_channels = set(channel_id for channel_id, _, _ in links)
-            existing_channels = set(
-                ch.id for ch in self.channel_repository.get_by_source(url)
-            )
-            
-            # Remove old channels
-            channels_to_remove = existing_channels - current_channels
-            if channels_to_remove:
-                self.channel_repository.delete_by_source(url)
-            
-            # Add/update new channels with metadata
-            for channel_id, channel_name, metadata in links:
-                self.channel_repository.update_or_create(
-                    channel_id=channel_id,
-                    name=channel_name,
-                    source_url=url,
-                    metadata=metadata or {}
-                )
-                
-            self.channel_repository.commit()
-            
-        except Exception as e:
-            self.channel_repository.rollback()
-            raise
\ No newline at end of file
+    def _update_channels(self, url: str, links: List[Tuple[str, str, dict]], commit: bool = True):
+        """Update channels for a given URL with one set-based upsert; raises if it fails."""
+        return self.channel_repository.sync_source_channels(url, links, commit=commit)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import time
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from ..repositories import ChannelRepository
+from ..utils.config import Config
+from .rescrape_scheduler import RescrapeQueue
+
+logger = logging.getLogger(__name__)
+
+# How many times more often than an ordinary active channel a channel is checked
+INACTIVE_WEIGHT = 0.1
+TV_CHANNEL_WEIGHT = 3.0  # In the TV channel playlists and guide
+FAVORITE_WEIGHT = 4.0
+FLAPPING_WEIGHT = 4.0
+
+# A channel that went online or offline this many times within FLAP_WINDOW seconds is flapping
+FLAP_THRESHOLD = 2
+FLAP_WINDOW = 6 * 3600
+
+# Seconds between rebuilds of the queue from the database, which pick up new,
+# removed and reassigned channels and checks made outside the sweeper
+RESYNC_INTERVAL = 300
+# Longest sleep between sweeps; the budget saved up while idle covers one tick
+TICK = 10
+
+
+def check_weight(snapshot: SimpleNamespace, flapping: bool = False) -> float:
+    """How many times more often than an ordinary active channel ``snapshot`` should be checked."""
+    weight = 1.0 if snapshot.status == 'active' else INACTIVE_WEIGHT
+    if snapshot.in_tv_channel:
+        weight *= TV_CHANNEL_WEIGHT
+    if snapshot.favorite:
+        weight *= FAVORITE_WEIGHT
+    if flapping:
+        weight *= FLAPPING_WEIGHT
+    return weight
+
+
+def _timestamp(moment: Optional[datetime]) -> float:
+    if moment is None:
+        return 0.0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class StatusSweeper:
+    """
+    Keeps channel statuses fresh in the background, the ones that matter first.
+
+    Each channel is due ``interval / weight`` after its last check (see
+    check_weight): favorites, channels in the TV channel playlists and
+    channels that keep going up and down are checked more often, inactive
+    ones rarely. Due channels are checked earliest first, no more than
+    ``checks_per_minute`` of them, so when the budget is short the most
+    overdue of the most important channels still get checked.
+    """
+
+    def __init__(self, checks_per_minute: Optional[int] = None, interval: Optional[float] = None):
+        # Unless given here, both are read from the configuration on every sync()
+        self.checks_per_minute = (Config.DEFAULT_STATUS_SWEEP_CHECKS_PER_MINUTE
+                                  if checks_per_minute is None else checks_per_minute)
+        self.interval = Config.DEFAULT_STATUS_SWEEP_INTERVAL * 60 if interval is None else interval
+        self._configured = (checks_per_minute, interval)
+        self.queue = RescrapeQueue()
+        self.repo = ChannelRepository()
+        self._snapshots: Dict[str, SimpleNamespace] = {}
+        self._flips: Dict[str, Deque[float]] = {}
+        self._tokens = 0.0
+        self._tokens_at: Optional[float] = None
+        self._synced_at: Optional[float] = None
+        self.stats = {'checks': 0, 'online': 0, 'state_changes': 0, 'last_sweep_at': None}
+
+    def is_flapping(self, channel_id: str, now: float) -> bool:
+        flips = self._flips.get(channel_id)
+        if not flips:
+            return False
+        while flips and flips[0] < now - FLAP_WINDOW:
+            flips.popleft()
+        return len(flips) >= FLAP_THRESHOLD
+
+    def due_time(self, snapshot: SimpleNamespace, now: float) -> float:
+        """Timestamp at which a channel is next due; never checked channels are due at once, by weight."""
+        weight = check_weight(snapshot, self.is_flapping(snapshot.id, now))
+        return _timestamp(snapshot.last_checked) + self.interval / weight
+
+    def needs_sync(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._synced_at >= RESYNC_INTERVAL
+
+    def sync(self, now: Optional[float] = None) -> None:
+        """Rebuild the queue from the channels in the database and re-read the budget."""
+        now = now or time.time()
+        config = Config()
+        checks_per_minute, interval = self._configured
+        if checks_per_minute is None:
+            self.checks_per_minute = config.status_sweep_checks_per_minute
+        if interval is None:
+            self.interval = config.status_sweep_interval * 60
+        self._snapshots = {snapshot.id: snapshot for snapshot in self.repo.get_status_snapshots()}
+        self._flips = {channel_id: flips for channel_id, flips in self._flips.items()
+                       if channel_id in self._snapshots}
+        self.queue.replace_all({channel_id: self.due_time(snapshot, now)
+                                for channel_id, snapshot in self._snapshots.items()})
+        self._synced_at = time.monotonic()
+
+    def _budget(self) -> int:
+        """Checks the budget allows right now: a token bucket filling at checks_per_minute, holding one tick."""
+        rate = self.checks_per_minute / 60
+        capacity = max(1.0, rate * TICK)
+        now = time.monotonic()
+        if self._tokens_at is None:
+            self._tokens = capacity
+        else:
+            self._tokens = min(capacity, self._tokens + (now - self._tokens_at) * rate)
+        self._tokens_at = now
+        return int(self._tokens)
+
+    async def sweep_once(self, check: Callable[[List[SimpleNamespace]], Awaitable[List[bool]]],
+                         now: Optional[float] = None) -> int:
+        """Check the channels due now, as many as the budget allows; returns how many were checked."""
+        if self.checks_per_minute <= 0:
+            return 0
+        now = now or time.time()
+        due = self.queue.pop_due(now, limit=self._budget())
+        channels = [self._snapshots[channel_id] for channel_id in due]
+        if not channels:
+            return 0
+        self._tokens -= len(channels)
+
+        results = await check(channels)
+        checked_at = time.time()
+        for snapshot, online in zip(channels, results):
+            if snapshot.last_checked is not None and bool(snapshot.is_online) != online:
+                self._flips.setdefault(snapshot.id, deque()).append(checked_at)
+                self.stats['state_changes'] += 1
+            snapshot.is_online = online
+            snapshot.last_checked = datetime.fromtimestamp(checked_at, timezone.utc)
+            self.queue.schedule(snapshot.id, self.due_time(snapshot, checked_at))
+        # Channels the check did not get to stay due
+        for snapshot in channels[len(results):]:
+            self.queue.schedule(snapshot.id, now)
+
+        self.stats['checks'] += len(results)
+        self.stats['online'] += sum(1 for online in results if online)
+        self.stats['last_sweep_at'] = datetime.fromtimestamp(checked_at, timezone.utc).isoformat()
+        logger.debug(f"Status sweep checked {len(results)} channels, {self.queue.count_due(checked_at)} overdue")
+        return len(results)
+
+    def next_wakeup(self, now: Optional[float] = None) -> float:
+        """Seconds until there may be something to check, at most one tick."""
+        if self.checks_per_minute <= 0:
+            return TICK
+        now = now or time.time()
+        next_due = self.queue.next_due()
+        until_due = TICK if next_due is None else max(0.0, next_due - now)
+        until_token = max(0.0, (1 - self._tokens) * 60 / self.checks_per_minute)
+        return min(TICK, max(until_due, until_token))
+
+    def get_stats(self) -> Dict:
+        now = time.time()
+        next_due = self.queue.next_due()
+        return dict(
+            self.stats,
+            checks_per_minute=self.checks_per_minute,
+            interval_minutes=round(self.interval / 60, 1),
+            channels=len(self._snapshots),
+            overdue=self.queue.count_due(now),
+            flapping=sum(1 for channel_id in self._flips if self.is_flapping(channel_id, now)),
+            next_due_in=round(max(0.0, next_due - now), 1) if next_due is not None else None,
+        )
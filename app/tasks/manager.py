@@ -6,12 +6,18 @@ from ..models import ScrapedURL, AcestreamChannel
 from ..extensions import db
 from ..scrapers import create_scraper
 from flask import current_app
-from sqlalchemy.exc import OperationalError
-from contextlib import contextmanager
 from ..services import ScraperService
+from ..services.m3u_service import m3u_fetch_cycle
 from ..repositories import URLRepository
 from ..utils.config import Config
-from .workers import EPGRefreshWorker
+from ..utils.db_writer import db_writer
+from ..utils.engine_pool import engine_pool
+from ..utils.http_client import http_clients
+from ..utils.process_lock import ProcessLock
+from .workers import EPGRefreshWorker, ScrapeWorker
+from ..services.rescrape_scheduler import RescrapeQueue
+from ..services.channel_status_service import ChannelStatusService
+from ..services.status_sweeper import StatusSweeper, TICK
 from app.services.epg_service import EPGService, refresh_epg_data
 from app.services.tv_channel_service import TVChannelService
 
@@ -33,28 +39,26 @@ class TaskManager:
         self.last_epg_refresh = None
         # Track if channels were updated during current cycle
         self.channels_updated_in_cycle = False
+        # Timing of the last scrape cycle and the latest latency of each URL
+        self.last_scrape_cycle = None
+        self.url_latencies = {}
+        # URLs by the time they are next due, and when it was last rebuilt from the database
+        self.schedule = RescrapeQueue()
+        self._schedule_synced_at = None
+        # Channel status checks in the background, most important and stalest first
+        self.status_sweeper = StatusSweeper()
+        # Every gunicorn worker has a task manager; only the one holding this lock sweeps,
+        # so the engine sees the configured budget once rather than once per worker
+        self.sweeper_lock = ProcessLock('status_sweeper')
+        # Loop running start() and the event that cuts its sleep short on stop() or add_task()
+        self._loop = None
+        self._wakeup = None
     
     def init_app(self, app):
         """Initialize with Flask app context"""
         self.app = app
         self.running = True
 
-    @contextmanager
-    def database_retry(self, max_retries=3):
-        """Context manager for handling SQLite disk I/O errors with retries."""
-        retry_count = 0
-        while True:
-            try:
-                yield
-                break
-            except OperationalError as e:
-                retry_count += 1
-                if retry_count >= max_retries:
-                    raise
-                self.logger.warning(f"SQLite error, retrying ({retry_count}/{max_retries}): {e}")
-                db.session.rollback()
-                time.sleep(1)
-    
     async def process_url(self, url: str):
         if url in self._processing_urls:
             self.logger.info(f"URL {url} is already being processed")
@@ -76,6 +80,46 @@ class TaskManager:
         finally:
             self._processing_urls.remove(url)
     
+    async def scrape_urls(self, urls):
+        """Scrape (url, url_type) pairs concurrently within the configured limits, recording their timing."""
+        config = Config()
+        worker = ScrapeWorker(
+            max_concurrent=config.scrape_concurrency,
+            zeronet_limit=config.scrape_zeronet_concurrency,
+            http_limit=config.scrape_http_concurrency,
+            per_host_limit=config.scrape_per_host_limit
+        )
+        started = time.perf_counter()
+        # M3U files linked from several pages are fetched once per cycle
+        with m3u_fetch_cycle() as m3u_cache:
+            latencies = await worker.run(urls, self.process_url)
+        duration = time.perf_counter() - started
+        m3u_stats = m3u_cache.get_stats()
+        
+        self.url_latencies.update(latencies)
+        slowest = max(latencies.items(), key=lambda item: item[1], default=(None, 0.0))
+        self.last_scrape_cycle = {
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'duration': round(duration, 3),
+            'urls': len(urls),
+            'total_url_time': round(sum(latencies.values()), 3),
+            'slowest_url': slowest[0],
+            'slowest_url_time': round(slowest[1], 3),
+            'm3u': m3u_stats
+        }
+        self.logger.info(f"Scraped {len(urls)} URLs in {duration:.1f}s "
+                         f"({sum(latencies.values()):.1f}s of URL time, slowest {slowest[0]} at {slowest[1]:.1f}s); "
+                         f"{m3u_stats['fetches']} M3U fetches, {m3u_stats['saved_fetches']} saved by the cycle cache")
+        return latencies
+
+    def get_scrape_stats(self):
+        """Timing of the last scrape cycle and the latest latency of each URL."""
+        return {
+            'last_cycle': self.last_scrape_cycle,
+            'schedule': self.get_schedule_stats(),
+            'url_latencies': {url: round(seconds, 3) for url, seconds in self.url_latencies.items()}
+        }
+
     def should_refresh_epg(self):
         """Check if EPG data needs to be refreshed."""
         if self.last_epg_refresh is None:
@@ -111,35 +155,100 @@ class TaskManager:
             raise RuntimeError("TaskManager not initialized with Flask app. Call init_app() first.")
             
         self.running = True
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
         self.logger.info("Task Manager started")
+        background = [asyncio.ensure_future(self._run_status_sweeper()),
+                      asyncio.ensure_future(self._run_engine_health_checks())]
+        try:
+            await self._run_cycles()
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            self.sweeper_lock.release()
+            # The shared HTTP sessions belong to this loop
+            await http_clients.close()
+            self.logger.info("Task Manager HTTP sessions closed")
+
+    def due_time(self, url_obj, now=None):
+        """When a URL is next due: its adaptive schedule, or the global interval for URLs without one."""
+        now = now or datetime.now(timezone.utc)
+        if url_obj.status == 'pending':
+            return now
+        last_processed = url_obj.last_processed
+        if last_processed and last_processed.tzinfo is None:
+            last_processed = last_processed.replace(tzinfo=timezone.utc)
+        if url_obj.status == 'failed' and (url_obj.error_count or 0) < self.MAX_RETRIES and last_processed:
+            return last_processed + timedelta(seconds=self.RETRY_DELAY)
+        if url_obj.next_scrape_at:
+            next_scrape_at = url_obj.next_scrape_at
+            return next_scrape_at if next_scrape_at.tzinfo else next_scrape_at.replace(tzinfo=timezone.utc)
+        if not last_processed:
+            return now
+        return last_processed + timedelta(hours=self.config.rescrape_interval)
+
+    def sync_schedule(self):
+        """Rebuild the rescrape queue from the database, skipping disabled URLs and those being scraped."""
+        now = datetime.now(timezone.utc)
+        urls = ScrapedURL.query.filter(ScrapedURL.status != 'disabled').all()
+        self.schedule.replace_all({
+            url_obj.url: self.due_time(url_obj, now).timestamp()
+            for url_obj in urls if url_obj.url not in self._processing_urls
+        })
+        self._schedule_synced_at = time.monotonic()
+
+    def add_task(self, task_type, url):
+        """
+        Queue work for the task loop; safe to call from any thread.
+
+        ``'scrape_url'`` makes the URL due now and wakes the loop, for URLs
+        added or refreshed through the API.
+        """
+        if task_type != 'scrape_url':
+            raise ValueError(f"Unknown task type: {task_type}")
+        if self._loop is None or self._loop.is_closed():
+            # Not running here; the URL is picked up from the database once the loop starts
+            return
+        self._loop.call_soon_threadsafe(self._scrape_soon, url)
+
+    def _scrape_soon(self, url):
+        self.schedule.schedule(url, time.time())
+        self._wakeup.set()
+
+    async def _run_cycles(self):
         while self.running:
             try:
                 with self.app.app_context():
                     # Check and refresh EPG data if needed
                     await self.refresh_epg_if_needed()
 
-                    config = Config()                    
-                    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=config.rescrape_interval)
-                    urls = ScrapedURL.query.filter(
-                        (ScrapedURL.status != 'disabled') &  # Skip disabled URLs
-                        ((ScrapedURL.status == 'pending') |
-                         ((ScrapedURL.status == 'failed') & 
-                          (ScrapedURL.error_count < self.MAX_RETRIES)) |
-                         (ScrapedURL.last_processed < cutoff_time))
-                    ).all()
+                    # Pick up URLs added, removed or edited outside this loop
+                    if self._schedule_synced_at is None or \
+                            time.monotonic() - self._schedule_synced_at >= self.RETRY_DELAY:
+                        self.sync_schedule()
+
+                    due_urls = [url for url in self.schedule.pop_due(time.time())
+                                if url not in self._processing_urls]
+                    url_objs = ScrapedURL.query.filter(ScrapedURL.url.in_(due_urls)).all() if due_urls else []
+                    url_objs = [url_obj for url_obj in url_objs if url_obj.status != 'disabled']
                     
-                    if urls:
-                        self.logger.info(f"Found {len(urls)} URLs to process")
+                    if url_objs:
+                        self.logger.info(f"Found {len(url_objs)} URLs to process")
                         # Reset the update tracking flag at the start of a new cycle
                         self.channels_updated_in_cycle = False
                         
-                        # Process all URLs
-                        for url_obj in urls:
-                            if url_obj.url not in self._processing_urls:
-                                if url_obj.status == 'OK':
-                                    url_obj.status = 'pending'
-                                    db.session.commit()
-                                await self.process_url(url_obj.url)
+                        due = [(url_obj.url, url_obj.url_type) for url_obj in url_objs]
+                        refreshed = [url_obj.url for url_obj in url_objs if url_obj.status == 'OK']
+                        if refreshed:
+                            await db_writer.call(lambda: self.url_repository.mark_pending(refreshed))
+                        
+                        # Process all URLs concurrently
+                        await self.scrape_urls(due)
+                        # Their next due times were set by the scrapes, through the database
+                        # writer: drop what this session loaded before them
+                        db.session.expire_all()
+                        self.sync_schedule()
                         
                         # After all URLs are processed, associate channels if any were updated
                         if self.channels_updated_in_cycle:
@@ -147,12 +256,68 @@ class TaskManager:
                             await self.associate_channels_by_epg()
             except Exception as e:
                 self.logger.error(f"Task Manager error: {str(e)}")
-            await asyncio.sleep(self.RETRY_DELAY)
+            await self._sleep_until_due()
+
+    async def _run_status_sweeper(self):
+        """Check channel statuses as they fall due, within the sweeper's checks-per-minute budget."""
+        while self.running:
+            if not self.sweeper_lock.acquire():
+                # Another worker sweeps; try again in case it has gone
+                await asyncio.sleep(TICK)
+                continue
+            try:
+                with self.app.app_context():
+                    if self.status_sweeper.needs_sync():
+                        self.status_sweeper.sync()
+                    await self.status_sweeper.sweep_once(ChannelStatusService().check_channels)
+            except Exception as e:
+                self.logger.error(f"Status sweeper error: {str(e)}")
+            await asyncio.sleep(self.status_sweeper.next_wakeup())
+
+    async def _run_engine_health_checks(self):
+        """Check the Acestream engines in the background, so that requests avoid the ones that are down."""
+        while self.running:
+            try:
+                # Picks up engine URLs changed by other worker processes
+                with self.app.app_context():
+                    Config().configure_engine_pool()
+                await engine_pool.check_health()
+            except Exception as e:
+                self.logger.error(f"Engine health check error: {str(e)}")
+            await asyncio.sleep(engine_pool.health_interval)
+
+    async def _sleep_until_due(self):
+        """Sleep until the next URL is due, for at most RETRY_DELAY, or until woken."""
+        timeout = self.RETRY_DELAY
+        next_due = self.schedule.next_due()
+        if next_due is not None:
+            timeout = max(0.0, min(timeout, next_due - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
 
     def stop(self):
+        """Stop the task loop; its HTTP sessions are closed as it exits."""
         self.running = False
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
         self.logger.info("Task Manager stopped")
 
+    def get_schedule_stats(self):
+        """The rescrape queue: how many URLs it holds and when the next one is due."""
+        next_due = self.schedule.next_due()
+        return {
+            'queued_urls': len(self.schedule),
+            'next_due_in': round(max(0.0, next_due - time.time()), 1) if next_due is not None else None
+        }
+
+    def get_status_sweep_stats(self):
+        """The background status sweeper: its budget, its queue and what it has checked."""
+        # Only the worker that sweeps has a queue and counts to report
+        return dict(self.status_sweeper.get_stats(), sweeping_worker=self.sweeper_lock.held)
+
     async def associate_channels_by_epg(self):
         """Associate acestream channels with TV channels based on EPG IDs."""
         try:
@@ -1,21 +1,92 @@
+import time
 import asyncio
 import logging
-from typing import List, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 from ..models import AcestreamChannel, ScrapedURL, EPGSource
+from flask import current_app
 from ..extensions import db
 from ..scrapers import create_scraper_for_url
+from ..models.url_types import ZeronetURL
 from ..services.epg_service import EPGService
 
 logger = logging.getLogger(__name__)
 
 class ScrapeWorker:
-    """Worker class for executing scraping tasks."""
+    """
+    Worker class for executing scraping tasks.
+
+    :meth:`run` processes many URLs at once under three limits: a global
+    one, one per kind of URL (everything ZeroNet shares the local proxy),
+    and one per host so no site gets hammered. Create the worker on the
+    event loop that runs it.
+    """
     
-    def __init__(self, max_concurrent: int = 3):
+    def __init__(self, max_concurrent: int = 3, zeronet_limit: Optional[int] = None,
+                 http_limit: Optional[int] = None, per_host_limit: int = 1):
         self.max_concurrent = max_concurrent
+        self.zeronet_limit = zeronet_limit or max_concurrent
+        self.http_limit = http_limit or max_concurrent
+        self.per_host_limit = per_host_limit
         self.semaphore = asyncio.Semaphore(max_concurrent)
 
+    @staticmethod
+    def url_kind(url: str, url_type: Optional[str]) -> str:
+        """Return 'zeronet' for URLs served by the ZeroNet proxy, 'regular' otherwise."""
+        if url_type == 'zeronet' or (url_type in (None, 'auto') and ZeronetURL.is_valid_url(url)):
+            return 'zeronet'
+        return 'regular'
+
+    @staticmethod
+    def host_key(url: str, kind: str) -> str:
+        """Return the host a URL counts against for the per-host limit."""
+        parsed = urlparse(url)
+        if kind == 'zeronet':
+            # Site addresses are case-sensitive; proxy URLs carry them as the first path segment
+            if parsed.scheme == 'zero':
+                return parsed.netloc
+            segments = [segment for segment in parsed.path.split('/') if segment]
+            if segments:
+                return segments[0]
+        return parsed.netloc.lower()
+
+    async def run(self, urls: List[Tuple[str, Optional[str]]],
+                  process: Callable[[str], Awaitable]) -> Dict[str, float]:
+        """
+        Process (url, url_type) pairs concurrently.
+
+        A URL that fails is logged and does not stop the others.
+
+        Returns:
+            Seconds each URL took, measured from when it got its slots
+        """
+        type_slots = {
+            'zeronet': asyncio.Semaphore(self.zeronet_limit),
+            'regular': asyncio.Semaphore(self.http_limit),
+        }
+        host_slots: Dict[str, asyncio.Semaphore] = {}
+        latencies: Dict[str, float] = {}
+
+        async def run_one(url: str, url_type: Optional[str]):
+            kind = self.url_kind(url, url_type)
+            host = self.host_key(url, kind)
+            if host not in host_slots:
+                host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+            # Narrowest limit first, so a URL waiting on its host holds no other slot
+            async with host_slots[host], type_slots[kind], self.semaphore:
+                start = time.perf_counter()
+                try:
+                    await process(url)
+                except Exception as e:
+                    logger.error(f"Error processing {url}: {e}")
+                finally:
+                    latencies[url] = time.perf_counter() - start
+                    logger.info(f"Processed {url} ({kind}) in {latencies[url]:.1f}s")
+
+        await asyncio.gather(*(run_one(url, url_type) for url, url_type in urls))
+        return latencies
+
     async def execute(self, url: str) -> Tuple[List[Tuple[str, str, dict]], str]:
         """Execute a scraping task for a single URL."""
         async with self.semaphore:
@@ -70,8 +141,11 @@ class EPGRefreshWorker:
             
             logger.info("Starting EPG data refresh")
             
-            # Fetch fresh EPG data (this includes programs)
-            epg_data = self.epg_service.fetch_epg_data()
+            # Fetch fresh EPG data (this includes programs) off the event loop;
+            # the refresh thread needs its own app context for the database
+            app = current_app._get_current_object()
+            loop = asyncio.get_running_loop()
+            epg_data = await loop.run_in_executor(None, self._fetch_in_app_context, app)
             
             # Clean up old programs
             await self.cleanup_old_programs()
@@ -85,6 +159,10 @@ class EPGRefreshWorker:
             logger.error(f"Error during EPG refresh: {e}")
             raise
 
+    def _fetch_in_app_context(self, app):
+        with app.app_context():
+            return self.epg_service.fetch_epg_data()
+
     async def cleanup_old_programs(self):
         """Remove old program data to prevent database bloat."""
         try:
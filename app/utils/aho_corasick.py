@@ -0,0 +1,63 @@
+from collections import deque
+from typing import Iterable, List, Set
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher.
+
+    Builds an Aho–Corasick automaton over a fixed list of patterns so a
+    text can be checked against all of them in a single pass, instead of
+    one ``pattern in text`` scan per pattern. Empty patterns match every
+    text, like ``'' in text`` does.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._always: List[int] = []
+
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                self._always.append(pattern_id)
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(pattern_id)
+
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Set[int]:
+        """Return the IDs (list positions) of every pattern occurring in ``text``."""
+        found = set(self._always)
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
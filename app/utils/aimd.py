@@ -0,0 +1,103 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit that follows the capacity of a backend (additive increase, multiplicative decrease).
+
+    Every request that succeeds within ``latency_tolerance`` times the
+    fastest latency seen lately grows the limit by ``1 / limit``, so about
+    one slot per round of requests. A failure, or a latency beyond the
+    tolerance, cuts the limit by ``decrease``, at most once per round: the
+    requests already in flight when the limit was cut do not cut it again.
+    The limit stays between ``minimum`` and ``maximum``.
+    """
+
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 16,
+                 decrease: float = 0.5, latency_tolerance: float = 3.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        # Fastest latency lately; drifts up slowly so that a backend that got slower for good is relearned
+        self.baseline: Optional[float] = None
+        self._generation = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def current(self) -> int:
+        """Requests allowed in flight right now."""
+        return int(self.limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator['AIMDSlot']:
+        """
+        Wait for a free slot.
+
+        The caller reports how its request went with ``slot.record()``; a slot
+        released without a report leaves the limit as it was.
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.current)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield AIMDSlot(self, self._generation)
+        finally:
+            async with self._changed:
+                self.in_flight -= 1
+                self._changed.notify_all()
+
+    def _record(self, generation: int, latency: float, ok: bool):
+        if ok:
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline += (latency - self.baseline) * 0.01
+            ok = latency <= self.baseline * self.latency_tolerance
+        if ok:
+            if self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.increases += 1
+        elif generation == self._generation and self.limit > self.minimum:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._generation += 1
+            self.decreases += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'limit': self.current,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'baseline_latency': round(self.baseline, 4) if self.baseline is not None else None,
+        }
+
+
+class AIMDSlot:
+    """One request holding a slot of an :class:`AIMDLimiter`."""
+
+    def __init__(self, limiter: AIMDLimiter, generation: int):
+        self.limiter = limiter
+        self.generation = generation
+        self.started = time.perf_counter()
+        self.recorded = False
+
+    def record(self, ok: bool) -> float:
+        """Report whether the backend handled the request; returns its latency in seconds."""
+        latency = time.perf_counter() - self.started
+        if not self.recorded:
+            self.recorded = True
+            self.limiter._record(self.generation, latency, ok)
+        return latency
@@ -0,0 +1,75 @@
+import atexit
+import asyncio
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Optional, TypeVar
+
+from .http_client import http_clients
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class BackgroundLoop:
+    """
+    One event loop in a thread of its own, for coroutines started by request handlers.
+
+    Unlike ``asyncio.run`` per request, the loop and its shared HTTP sessions
+    (and their open connections) outlive each request, and coroutines of
+    different requests can wait on each other. The loop starts on first use
+    and its sessions are closed at exit. Coroutines run in the loop's
+    thread: they push their own app context.
+    """
+
+    def __init__(self, name: str = 'background-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stop_registered = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if not self.running:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                if not self._stop_registered:
+                    atexit.register(self.stop)
+                    self._stop_registered = True
+                logger.info("Background event loop started")
+            return self._loop
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the loop and wait for its result; it is cancelled on timeout."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Close the loop's HTTP sessions and stop it."""
+        with self._lock:
+            if not self.running:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        try:
+            asyncio.run_coroutine_threadsafe(http_clients.close(), loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Error closing background loop sessions: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+        logger.info("Background event loop stopped")
+
+
+background_loop = BackgroundLoop()
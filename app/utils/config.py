@@ -1,8 +1,10 @@
 import os
+import re
 import json
 import logging
 from pathlib import Path
 from app.repositories import SettingsRepository
+from app.utils.engine_pool import engine_pool
 from flask import has_app_context, current_app
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,19 @@ class Config:
     DEFAULT_RESCRAPE_INTERVAL = 24
     DEFAULT_ADDPID = False
     DEFAULT_EPG_REFRESH_INTERVAL = 6  # Hours between EPG data refreshes
+    DEFAULT_EPG_FETCH_PER_HOST_LIMIT = 2  # Concurrent EPG downloads per host
+    DEFAULT_EPG_PARSE_WORKERS = 2  # Worker processes parsing EPG guides (0 parses in-process)
+    DEFAULT_SCRAPE_CONCURRENCY = 6  # URLs scraped at once in a task manager cycle
+    DEFAULT_SCRAPE_ZERONET_CONCURRENCY = 2  # Of those, URLs going through the local ZeroNet proxy
+    DEFAULT_SCRAPE_HTTP_CONCURRENCY = 4  # Of those, URLs on regular HTTP hosts
+    DEFAULT_SCRAPE_PER_HOST_LIMIT = 1  # URLs of the same host or ZeroNet site scraped at once
+    DEFAULT_RESCRAPE_MIN_INTERVAL = 15  # Minutes between scrapes of a URL whose content keeps changing
+    DEFAULT_RESCRAPE_MAX_INTERVAL = 24 * 60  # Minutes between scrapes of a URL whose content never changes
+    DEFAULT_STATUS_CHECK_MAX_CONCURRENCY = 16  # Ceiling of the adaptive number of status checks in flight, per engine
+    DEFAULT_STATUS_CHECK_DEADLINE = 30  # Minutes a status check sweep may run before the rest is skipped
+    DEFAULT_STATUS_CACHE_TTL = 30  # Seconds a single channel's status check result is reused (0 turns it off)
+    DEFAULT_STATUS_SWEEP_CHECKS_PER_MINUTE = 30  # Budget of the background status sweeper (0 turns it off)
+    DEFAULT_STATUS_SWEEP_INTERVAL = 6 * 60  # Minutes between checks of an ordinary active channel
     
     _instance = None
     config_path = None
@@ -269,6 +284,26 @@ class Config:
     def ace_engine_url(self, value):
         """Set Acestream Engine URL."""
         self.set('ace_engine_url', value)
+        self.configure_engine_pool()
+    
+    @property
+    def ace_engine_urls(self):
+        """Get the Acestream Engine URLs checks and searches are spread over; the engine URL if none are set."""
+        urls = self.get('ace_engine_urls')
+        if isinstance(urls, str):
+            urls = re.split(r'[\s,]+', urls)
+        urls = [url.strip() for url in urls or [] if url and url.strip()]
+        return urls or [self.ace_engine_url]
+
+    @ace_engine_urls.setter
+    def ace_engine_urls(self, value):
+        """Set the Acestream Engine URLs, as a list or a comma-separated string, and serve from them."""
+        self.set('ace_engine_urls', value if isinstance(value, str) else ','.join(value))
+        self.configure_engine_pool()
+
+    def configure_engine_pool(self):
+        """Spread status checks and searches over the configured engine URLs."""
+        engine_pool.configure(self.ace_engine_urls)
     
     @property
     def rescrape_interval(self):
@@ -304,6 +339,188 @@ class Config:
     def epg_refresh_interval(self, value):
         """Set EPG refresh interval in hours."""
         self.set('epg_refresh_interval', str(value))
+    
+    @property
+    def epg_fetch_per_host_limit(self):
+        """Get the maximum number of concurrent EPG downloads per host."""
+        limit = self.get('epg_fetch_per_host_limit', self.DEFAULT_EPG_FETCH_PER_HOST_LIMIT)
+        try:
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_EPG_FETCH_PER_HOST_LIMIT
+    
+    @epg_fetch_per_host_limit.setter
+    def epg_fetch_per_host_limit(self, value):
+        """Set the maximum number of concurrent EPG downloads per host."""
+        self.set('epg_fetch_per_host_limit', str(value))
+    
+    @property
+    def epg_parse_workers(self):
+        """Get the number of worker processes used to parse EPG guides."""
+        workers = self.get('epg_parse_workers', self.DEFAULT_EPG_PARSE_WORKERS)
+        try:
+            return max(0, int(workers))
+        except (TypeError, ValueError):
+            return self.DEFAULT_EPG_PARSE_WORKERS
+    
+    @epg_parse_workers.setter
+    def epg_parse_workers(self, value):
+        """Set the number of worker processes used to parse EPG guides."""
+        self.set('epg_parse_workers', str(value))
+    
+    @property
+    def scrape_concurrency(self):
+        """Get the maximum number of URLs scraped at once."""
+        limit = self.get('scrape_concurrency', self.DEFAULT_SCRAPE_CONCURRENCY)
+        try:
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_SCRAPE_CONCURRENCY
+    
+    @scrape_concurrency.setter
+    def scrape_concurrency(self, value):
+        """Set the maximum number of URLs scraped at once."""
+        self.set('scrape_concurrency', str(value))
+    
+    @property
+    def scrape_zeronet_concurrency(self):
+        """Get the maximum number of ZeroNet URLs scraped at once."""
+        limit = self.get('scrape_zeronet_concurrency', self.DEFAULT_SCRAPE_ZERONET_CONCURRENCY)
+        try:
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_SCRAPE_ZERONET_CONCURRENCY
+    
+    @scrape_zeronet_concurrency.setter
+    def scrape_zeronet_concurrency(self, value):
+        """Set the maximum number of ZeroNet URLs scraped at once."""
+        self.set('scrape_zeronet_concurrency', str(value))
+    
+    @property
+    def scrape_http_concurrency(self):
+        """Get the maximum number of regular HTTP URLs scraped at once."""
+        limit = self.get('scrape_http_concurrency', self.DEFAULT_SCRAPE_HTTP_CONCURRENCY)
+        try:
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_SCRAPE_HTTP_CONCURRENCY
+    
+    @scrape_http_concurrency.setter
+    def scrape_http_concurrency(self, value):
+        """Set the maximum number of regular HTTP URLs scraped at once."""
+        self.set('scrape_http_concurrency', str(value))
+    
+    @property
+    def scrape_per_host_limit(self):
+        """Get the maximum number of URLs of the same host scraped at once."""
+        limit = self.get('scrape_per_host_limit', self.DEFAULT_SCRAPE_PER_HOST_LIMIT)
+        try:
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_SCRAPE_PER_HOST_LIMIT
+    
+    @scrape_per_host_limit.setter
+    def scrape_per_host_limit(self, value):
+        """Set the maximum number of URLs of the same host scraped at once."""
+        self.set('scrape_per_host_limit', str(value))
+
+    @property
+    def rescrape_min_interval(self):
+        """Get the shortest adaptive rescrape interval in minutes."""
+        minutes = self.get('rescrape_min_interval', self.DEFAULT_RESCRAPE_MIN_INTERVAL)
+        try:
+            return max(1, int(minutes))
+        except (TypeError, ValueError):
+            return self.DEFAULT_RESCRAPE_MIN_INTERVAL
+
+    @rescrape_min_interval.setter
+    def rescrape_min_interval(self, value):
+        """Set the shortest adaptive rescrape interval in minutes."""
+        self.set('rescrape_min_interval', str(value))
+
+    @property
+    def rescrape_max_interval(self):
+        """Get the longest adaptive rescrape interval in minutes; never below the shortest."""
+        minutes = self.get('rescrape_max_interval', self.DEFAULT_RESCRAPE_MAX_INTERVAL)
+        try:
+            return max(self.rescrape_min_interval, int(minutes))
+        except (TypeError, ValueError):
+            return max(self.rescrape_min_interval, self.DEFAULT_RESCRAPE_MAX_INTERVAL)
+
+    @rescrape_max_interval.setter
+    def rescrape_max_interval(self, value):
+        """Set the longest adaptive rescrape interval in minutes."""
+        self.set('rescrape_max_interval', str(value))
+
+    @property
+    def status_check_max_concurrency(self):
+        """Get the most channel status checks allowed in flight at once, per engine."""
+        limit = self.get('status_check_max_concurrency', self.DEFAULT_STATUS_CHECK_MAX_CONCURRENCY)
+        try:
+            return max(1, int(limit))
+        except (TypeError, ValueError):
+            return self.DEFAULT_STATUS_CHECK_MAX_CONCURRENCY
+
+    @status_check_max_concurrency.setter
+    def status_check_max_concurrency(self, value):
+        """Set the most channel status checks allowed in flight at once, per engine."""
+        self.set('status_check_max_concurrency', str(value))
+
+    @property
+    def status_check_deadline(self):
+        """Get the minutes a channel status sweep may run."""
+        minutes = self.get('status_check_deadline', self.DEFAULT_STATUS_CHECK_DEADLINE)
+        try:
+            return max(1, int(minutes))
+        except (TypeError, ValueError):
+            return self.DEFAULT_STATUS_CHECK_DEADLINE
+
+    @status_check_deadline.setter
+    def status_check_deadline(self, value):
+        """Set the minutes a channel status sweep may run."""
+        self.set('status_check_deadline', str(value))
+
+    @property
+    def status_cache_ttl(self):
+        """Get the seconds a single channel's status check result is reused; 0 turns reuse off."""
+        seconds = self.get('status_cache_ttl', self.DEFAULT_STATUS_CACHE_TTL)
+        try:
+            return max(0, int(seconds))
+        except (TypeError, ValueError):
+            return self.DEFAULT_STATUS_CACHE_TTL
+
+    @status_cache_ttl.setter
+    def status_cache_ttl(self, value):
+        """Set the seconds a single channel's status check result is reused."""
+        self.set('status_cache_ttl', str(value))
+
+    @property
+    def status_sweep_checks_per_minute(self):
+        """Get the checks per minute the background status sweeper may make; 0 turns it off."""
+        budget = self.get('status_sweep_checks_per_minute', self.DEFAULT_STATUS_SWEEP_CHECKS_PER_MINUTE)
+        try:
+            return max(0, int(budget))
+        except (TypeError, ValueError):
+            return self.DEFAULT_STATUS_SWEEP_CHECKS_PER_MINUTE
+
+    @status_sweep_checks_per_minute.setter
+    def status_sweep_checks_per_minute(self, value):
+        """Set the checks per minute the background status sweeper may make."""
+        self.set('status_sweep_checks_per_minute', str(value))
+
+    @property
+    def status_sweep_interval(self):
+        """Get the minutes between background checks of an ordinary active channel."""
+        minutes = self.get('status_sweep_interval', self.DEFAULT_STATUS_SWEEP_INTERVAL)
+        try:
+            return max(1, int(minutes))
+        except (TypeError, ValueError):
+            return self.DEFAULT_STATUS_SWEEP_INTERVAL
+
+    @status_sweep_interval.setter
+    def status_sweep_interval(self, value):
+        """Set the minutes between background checks of an ordinary active channel."""
+        self.set('status_sweep_interval', str(value))
         
     def is_initialized(self):
         """Check if configuration is fully initialized."""
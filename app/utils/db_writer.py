@@ -0,0 +1,218 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from sqlalchemy.exc import OperationalError
+
+from ..extensions import db
+from ..repositories import ChannelRepository, URLRepository
+
+logger = logging.getLogger(__name__)
+
+# Writes a batch of intents of one kind, given their parameters, in the writer's session
+BatchHandler = Callable[[List[Dict[str, Any]]], None]
+
+
+class WriteIntent:
+    """One write waiting for the writer: parameters for a batch handler, or a function to call."""
+
+    __slots__ = ('kind', 'payload', 'key', 'future')
+
+    def __init__(self, kind: Optional[str], payload: Any, key: Optional[Hashable] = None):
+        self.kind = kind
+        self.payload = payload
+        self.key = key
+        self.future: Future = Future()
+
+
+class DatabaseWriter:
+    """
+    The one thread that writes to the database on behalf of background work.
+
+    Callers submit write intents: parameters for a registered batch handler
+    (:meth:`submit`, :meth:`write`) or a function run against the writer's
+    session (:meth:`submit_call`, :meth:`call`), and get a future back. The
+    writer takes what queued up within ``flush_interval`` of the first
+    intent, up to ``max_batch`` intents, runs it as one transaction and
+    resolves the futures. Consecutive intents of one kind go to their handler
+    together, and of those sharing a key only the last is written. SQLite
+    errors such as "database is locked" are retried here, not by callers.
+
+    Other writers that cannot go through the queue (the EPG pipeline's bulk
+    syncs) hold :meth:`exclusive` around each of their commits, so the two
+    never contend for the SQLite write lock and queued intents are written
+    in between.
+
+    Until :meth:`start` is called (tests, scripts, an in-memory database a
+    second thread could not see), intents run inline in the calling thread,
+    in its app context and session.
+    """
+
+    def __init__(self, flush_interval: float = 0.05, max_batch: int = 500,
+                 max_retries: int = 5, retry_delay: float = 0.2):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.handlers: Dict[str, BatchHandler] = {}
+        self._queue: 'queue.Queue[Optional[WriteIntent]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._app = None
+        # Held while a batch is written, and by exclusive() writers
+        self._write_lock = threading.RLock()
+        self.stats = {'intents': 0, 'batches': 0, 'coalesced': 0, 'retries': 0, 'failed': 0, 'largest_batch': 0}
+
+    def register(self, kind: str, handler: BatchHandler) -> None:
+        """Route intents of ``kind`` to ``handler``, which writes a list of their parameters without committing."""
+        self.handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app) -> None:
+        """Start the writer thread, working in an app context of ``app``."""
+        if self.running:
+            return
+        if db.get_engine(app).url.database in (None, '', ':memory:'):
+            # Every thread shares the one connection of an in-memory database
+            logger.info("In-memory database, writing inline")
+            return
+        self._app = app
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+        logger.info("Database writer started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Write what is queued, then stop the thread."""
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("Database writer stopped")
+
+    def submit(self, kind: str, params: Dict[str, Any], key: Optional[Hashable] = None) -> Future:
+        """Queue a write for the ``kind`` handler; a later intent with the same key in the batch replaces it."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown write kind: {kind}")
+        return self._put(WriteIntent(kind, params, key))
+
+    def submit_call(self, fn: Callable[[], Any]) -> Future:
+        """Queue a function to run in the writer's transaction; the future gets its return value."""
+        return self._put(WriteIntent(None, fn))
+
+    async def write(self, kind: str, params: Dict[str, Any], key: Optional[Hashable] = None) -> None:
+        """:meth:`submit` for coroutines: waits for the batch to commit without blocking the event loop."""
+        await asyncio.wrap_future(self.submit(kind, params, key))
+
+    async def call(self, fn: Callable[[], Any]) -> Any:
+        """:meth:`submit_call` for coroutines."""
+        return await asyncio.wrap_future(self.submit_call(fn))
+
+    @contextmanager
+    def exclusive(self):
+        """Keep the writer thread from writing while the caller writes through its own session."""
+        with self._write_lock:
+            yield
+
+    def _put(self, intent: WriteIntent) -> Future:
+        self.stats['intents'] += 1
+        if self.running and threading.current_thread() is not self._thread:
+            self._queue.put(intent)
+        else:
+            self._write([intent])
+        return intent.future
+
+    def _run(self) -> None:
+        with self._app.app_context():
+            stopping = False
+            while not stopping:
+                intent = self._queue.get()
+                if intent is None:
+                    break
+                batch = [intent]
+                flush_at = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch:
+                    try:
+                        intent = self._queue.get(timeout=max(0.0, flush_at - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if intent is None:
+                        stopping = True
+                        break
+                    batch.append(intent)
+                self._write(batch)
+                # A fresh session per batch: nothing cached outlives the transaction
+                db.session.remove()
+
+    def _write(self, batch: List[WriteIntent]) -> None:
+        """Write a batch in one transaction, retrying lock errors; resolves the intents' futures."""
+        with self._write_lock:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    results = self._apply(batch)
+                    db.session.commit()
+                    break
+                except OperationalError as e:
+                    db.session.rollback()
+                    if attempt == self.max_retries:
+                        return self._fail(batch, e)
+                    self.stats['retries'] += 1
+                    logger.warning(f"Database write failed, retrying ({attempt}/{self.max_retries}): {e}")
+                    time.sleep(self.retry_delay * attempt)
+                except Exception as e:
+                    db.session.rollback()
+                    if len(batch) == 1:
+                        return self._fail(batch, e)
+                    # Write the intents one by one so that only the bad one fails
+                    for intent in batch:
+                        self._write([intent])
+                    return
+        self.stats['batches'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        for intent, result in zip(batch, results):
+            intent.future.set_result(result)
+
+    def _apply(self, batch: List[WriteIntent]) -> List[Any]:
+        results: List[Any] = []
+        start = 0
+        while start < len(batch):
+            intent = batch[start]
+            if intent.kind is None:
+                results.append(intent.payload())
+                start += 1
+                continue
+            end = start
+            while end < len(batch) and batch[end].kind == intent.kind:
+                end += 1
+            # The last intent for each key wins, in the position of the first
+            rows = {}
+            for index in range(start, end):
+                key = batch[index].key
+                rows[index if key is None else ('key', key)] = batch[index].payload
+            self.stats['coalesced'] += (end - start) - len(rows)
+            self.handlers[intent.kind](list(rows.values()))
+            results.extend([None] * (end - start))
+            start = end
+        return results
+
+    def _fail(self, batch: List[WriteIntent], error: Exception) -> None:
+        self.stats['failed'] += len(batch)
+        logger.error(f"Database write of {len(batch)} intent(s) failed: {error}")
+        for intent in batch:
+            if not intent.future.done():
+                intent.future.set_exception(error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, running=self.running, queued=self._queue.qsize())
+
+
+db_writer = DatabaseWriter()
+db_writer.register('channel_status', ChannelRepository().write_statuses)
+db_writer.register('url_status', URLRepository().write_statuses)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
+
+import aiohttp
+
+from .http_client import http_clients
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_engine_url(url: str) -> str:
+    """Engine URL with a scheme (http:// if missing) and without a trailing slash."""
+    url = url.strip()
+    if not url.startswith('http'):
+        url = f"http://{url}"
+    return url.rstrip('/')
+
+
+class Engine:
+    """One Acestream engine of an :class:`EnginePool` and its bookkeeping."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_health_check: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class EnginePool:
+    """
+    The Acestream engines that status checks and searches are spread over.
+
+    A request goes to the healthy engine with the fewest requests in flight.
+    Requests about a channel keep going to the engine that first served it,
+    as long as that engine is healthy. An engine is marked down after
+    ``failure_threshold`` failures in a row, whether callers
+    (:meth:`report`) or the background health checks (:meth:`check_health`)
+    saw them. Its channels then move to the other engines, and one
+    successful request or health check brings it back. When every engine is
+    down, requests are spread over all of them anyway.
+
+    The pool is shared by request threads and event loops; its bookkeeping
+    is guarded by a lock.
+    """
+
+    def __init__(self, urls: Iterable[str] = (), failure_threshold: int = 3,
+                 health_interval: float = 30.0, health_timeout: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.engines: Dict[str, Engine] = {}
+        # Channel (or other key) -> URL of the engine serving it
+        self._assignments: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        self.configure(urls)
+
+    @property
+    def urls(self) -> List[str]:
+        return list(self.engines)
+
+    @property
+    def size(self) -> int:
+        return len(self.engines)
+
+    def configure(self, urls: Iterable[str]) -> None:
+        """Serve from ``urls``; engines already in the pool keep their state and channels."""
+        urls = list(dict.fromkeys(normalize_engine_url(url) for url in urls if url and url.strip()))
+        with self._lock:
+            if urls == list(self.engines):
+                return
+            self.engines = {url: self.engines.get(url) or Engine(url) for url in urls}
+            self._assignments = {key: url for key, url in self._assignments.items() if url in self.engines}
+        logger.info(f"Acestream engine pool: {', '.join(urls) or 'no engines'}")
+
+    @contextmanager
+    def acquire(self, key: Optional[Hashable] = None, exclude: Iterable[str] = ()) -> Iterator[Engine]:
+        """
+        Pick an engine for a request about ``key`` and count the request against it while it runs.
+
+        Engines in ``exclude`` (URLs that already failed this request) are
+        passed over, unless nothing else is left.
+        """
+        engine = self._pick(key, set(exclude))
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                engine.outstanding -= 1
+
+    def _pick(self, key: Optional[Hashable], exclude: set) -> Engine:
+        with self._lock:
+            if not self.engines:
+                raise RuntimeError("No Acestream engine configured")
+            candidates = [engine for engine in self.engines.values() if engine.url not in exclude] or \
+                list(self.engines.values())
+            healthy = [engine for engine in candidates if engine.healthy] or candidates
+            engine = self.engines.get(self._assignments.get(key)) if key is not None else None
+            if engine not in healthy:
+                # Fewest in flight, then fewest served, so that idle engines take turns
+                engine = min(healthy, key=lambda candidate: (candidate.outstanding, candidate.requests))
+                if key is not None:
+                    self._assignments[key] = engine.url
+            engine.outstanding += 1
+            engine.requests += 1
+            return engine
+
+    def report(self, engine: Engine, ok: bool, error: Optional[str] = None) -> None:
+        """Record whether the engine handled a request (not whether the channel was online)."""
+        with self._lock:
+            if ok:
+                engine.consecutive_failures = 0
+                if not engine.healthy:
+                    engine.healthy = True
+                    logger.info(f"Acestream engine {engine.url} is back")
+                return
+            engine.failures += 1
+            engine.consecutive_failures += 1
+            engine.last_error = error
+            if engine.healthy and engine.consecutive_failures >= self.failure_threshold:
+                engine.healthy = False
+                logger.warning(f"Acestream engine {engine.url} marked down after "
+                               f"{engine.consecutive_failures} failures: {error}")
+
+    async def check_health(self) -> None:
+        """Ask every engine for its status, marking engines down or back up."""
+        session = http_clients.session('status')
+        timeout = aiohttp.ClientTimeout(total=self.health_timeout)
+
+        async def check(engine: Engine):
+            try:
+                async with session.get(f"{engine.url}/server/api",
+                                       params={'api_version': '3', 'method': 'get_status'},
+                                       timeout=timeout) as response:
+                    ok, error = response.status == 200, f"HTTP {response.status}"
+            except Exception as e:
+                ok, error = False, str(e) or type(e).__name__
+            engine.last_health_check = datetime.now(timezone.utc).isoformat()
+            self.report(engine, ok, None if ok else f"Health check failed: {error}")
+
+        with self._lock:
+            engines = list(self.engines.values())
+        await asyncio.gather(*(check(engine) for engine in engines))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'engines': [engine.to_dict() for engine in self.engines.values()],
+                'healthy': sum(1 for engine in self.engines.values() if engine.healthy),
+                'assigned_channels': len(self._assignments),
+            }
+
+
+engine_pool = EnginePool()
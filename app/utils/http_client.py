@@ -0,0 +1,196 @@
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Awaitable, Dict, Optional, Tuple, TypeVar
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+@dataclass(frozen=True)
+class SessionProfile:
+    """Connection pool settings for one kind of outgoing traffic."""
+    limit: int
+    limit_per_host: int
+    dns_ttl: int = 300
+    keepalive_timeout: float = 30.0
+    timeout: float = 60.0
+    cookies: bool = True
+
+
+PROFILES: Dict[str, SessionProfile] = {
+    # Scraped websites, many hosts with a few requests each
+    'scraper': SessionProfile(limit=32, limit_per_host=4),
+    # M3U files linked from scraped pages
+    'm3u': SessionProfile(limit=32, limit_per_host=4),
+    # Everything goes to the local ZeroNet proxy
+    'zeronet': SessionProfile(limit=8, limit_per_host=8),
+    # Everything goes to the Acestream engines, a handful of hosts
+    'status': SessionProfile(limit=64, limit_per_host=16, keepalive_timeout=60.0, cookies=False),
+}
+
+
+class PoolCounters:
+    """Request and connection counters of one session pool, fed by aiohttp tracing."""
+
+    def __init__(self):
+        self.sessions_created = 0
+        self.requests = 0
+        self.errors = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        # Requests that had to wait for a free connection: the pool was saturated
+        self.queued = 0
+        self.queued_seconds = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def to_dict(self) -> Dict:
+        stats = dict(vars(self))
+        connections = self.connections_created + self.connections_reused
+        stats['reuse_ratio'] = round(self.connections_reused / connections, 3) if connections else None
+        stats['queued_seconds'] = round(self.queued_seconds, 3)
+        return stats
+
+
+class HTTPClientManager:
+    """
+    Shared aiohttp sessions, one per purpose and event loop.
+
+    Sessions are bound to the loop that created them, so each loop gets its
+    own set, created on first use and kept for the loop's lifetime. Whoever
+    owns a loop closes its sessions with :meth:`close` before the loop ends;
+    :meth:`run` does that for one-off coroutines.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, SessionProfile]] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.profiles = dict(profiles or PROFILES)
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.counters = {purpose: PoolCounters() for purpose in self.profiles}
+        self._sessions: Dict[int, Tuple[asyncio.AbstractEventLoop, Dict[str, aiohttp.ClientSession]]] = {}
+        self._lock = threading.Lock()
+
+    def session(self, purpose: str) -> aiohttp.ClientSession:
+        """Return the shared session for ``purpose`` on the running event loop."""
+        profile = self.profiles[purpose]
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._forget_closed_loops()
+            sessions = self._sessions.setdefault(id(loop), (loop, {}))[1]
+            session = sessions.get(purpose)
+            if session is None or session.closed:
+                session = sessions[purpose] = self._create_session(purpose, profile)
+                self.counters[purpose].sessions_created += 1
+            return session
+
+    def _create_session(self, purpose: str, profile: SessionProfile) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=profile.limit,
+            limit_per_host=profile.limit_per_host,
+            ttl_dns_cache=profile.dns_ttl,
+            keepalive_timeout=profile.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=profile.timeout),
+            cookie_jar=None if profile.cookies else aiohttp.DummyCookieJar(),
+            trace_configs=[self._trace_config(self.counters[purpose])],
+        )
+
+    @staticmethod
+    def _trace_config(counters: PoolCounters) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx: SimpleNamespace())
+
+        async def on_request_start(session, ctx, params):
+            counters.requests += 1
+            counters.in_flight += 1
+            counters.peak_in_flight = max(counters.peak_in_flight, counters.in_flight)
+
+        async def on_request_end(session, ctx, params):
+            counters.in_flight -= 1
+
+        async def on_request_exception(session, ctx, params):
+            counters.in_flight -= 1
+            counters.errors += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            counters.queued += 1
+            ctx.queued_at = time.monotonic()
+
+        async def on_connection_queued_end(session, ctx, params):
+            counters.queued_seconds += time.monotonic() - ctx.queued_at
+
+        async def on_connection_create_end(session, ctx, params):
+            counters.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            counters.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _forget_closed_loops(self):
+        # Loops that ended without close(); their sessions can no longer be awaited
+        for key, (loop, sessions) in list(self._sessions.items()):
+            if loop.is_closed():
+                del self._sessions[key]
+                logger.debug(f"Dropped {len(sessions)} HTTP session(s) of an event loop closed without shutdown")
+                for session in sessions.values():
+                    session.detach()
+
+    async def close(self) -> None:
+        """Close the sessions of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            _, sessions = self._sessions.pop(id(loop), (loop, {}))
+        for session in sessions.values():
+            await session.close()
+        if sessions:
+            logger.debug(f"Closed {len(sessions)} shared HTTP session(s)")
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on a new event loop like ``asyncio.run``, closing its sessions afterwards."""
+        async def main():
+            try:
+                return await coro
+            finally:
+                await self.close()
+        return asyncio.run(main())
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            open_sessions = {purpose: 0 for purpose in self.profiles}
+            for _, sessions in self._sessions.values():
+                for purpose, session in sessions.items():
+                    if not session.closed:
+                        open_sessions[purpose] += 1
+        return {
+            purpose: {
+                'limit': profile.limit,
+                'limit_per_host': profile.limit_per_host,
+                'open_sessions': open_sessions[purpose],
+                **self.counters[purpose].to_dict(),
+            }
+            for purpose, profile in self.profiles.items()
+        }
+
+
+http_clients = HTTPClientManager()
@@ -0,0 +1,89 @@
+import re
+import codecs
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+M3UEntry = Tuple[str, str, Dict[str, str]]
+
+_EXTINF_TAG = re.compile(r'(tvg-[^=]+|group-title)="([^"]+)"')
+_ACESTREAM = re.compile(r'acestream://([\w\d]+)')
+_GETSTREAM = re.compile(r'ace/getstream\?id=([\w\d]+)')
+
+# EXTINF attributes stored under the channel's column names; others keep their own name
+_TAG_FIELDS = {'tvg-id': 'tvg_id', 'tvg-name': 'tvg_name', 'tvg-logo': 'logo', 'group-title': 'group'}
+
+# Everything str.splitlines() breaks on
+_LINE_BREAKS = '\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+
+class M3UEntryParser:
+    """
+    Line-at-a-time M3U parser.
+
+    Only the attributes of the pending #EXTINF are kept between lines, so
+    memory does not grow with the playlist. Entries are acestream://ID and
+    .../ace/getstream?id=ID URLs; channels without an #EXTINF name are named
+    "Channel <ID>".
+    """
+
+    def __init__(self):
+        self._info: Dict[str, str] = {}
+
+    def feed(self, line: str) -> Optional[M3UEntry]:
+        """Consume one line, returning the (id, name, metadata) entry it completes, if any."""
+        line = line.strip()
+        if not line:
+            return None
+
+        if line[0] == '#':
+            if line.startswith('#EXTINF:'):
+                # The name follows the last comma that has something after it
+                comma = line.rfind(',', 8, len(line) - 1)
+                if comma >= 0:
+                    self._info['name'] = line[comma + 1:].strip()
+                if '="' in line:
+                    for tag, value in _EXTINF_TAG.findall(line):
+                        self._info[_TAG_FIELDS.get(tag, tag)] = value
+            return None
+
+        match = _ACESTREAM.search(line) or _GETSTREAM.search(line)
+        if not match:
+            return None
+        channel_id = match.group(1)
+        metadata = self._info
+        self._info = {}
+        name = metadata.pop('name', f"Channel {channel_id}")
+        return channel_id, name, metadata
+
+
+def iter_m3u_entries(lines: Iterable[str]) -> Iterator[M3UEntry]:
+    """Yield (id, name, metadata) for each acestream entry of an M3U playlist given as lines."""
+    parser = M3UEntryParser()
+    yield from filter(None, map(parser.feed, lines))
+
+
+async def _aiter_line_batches(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[List[str]]:
+    # Lines come out a chunk at a time: one await per chunk rather than per line
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).splitlines(True)
+        # The last line may continue in the next chunk, as may a \r\n split across chunks
+        pending = lines.pop() if lines and lines[-1][-1] not in _LINE_BREAKS[1:] else ''
+        yield [line[:-2] if line.endswith('\r\n') else line[:-1] for line in lines]
+    pending += decoder.decode(b'', final=True)
+    yield pending.splitlines()
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes], encoding: str = 'utf-8') -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield its lines, split as str.splitlines() would."""
+    async for lines in _aiter_line_batches(chunks, encoding):
+        for line in lines:
+            yield line
+
+
+async def aiter_m3u_entries(chunks: AsyncIterable[bytes], encoding: str = 'utf-8') -> AsyncIterator[M3UEntry]:
+    """Yield (id, name, metadata) for each acestream entry of an M3U playlist read from a byte stream."""
+    parser = M3UEntryParser()
+    async for lines in _aiter_line_batches(chunks, encoding):
+        for entry in filter(None, map(parser.feed, lines)):
+            yield entry
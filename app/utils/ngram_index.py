@@ -0,0 +1,142 @@
+import heapq
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class NGramIndex:
+    """
+    Character n-gram inverted index for fuzzy name lookups.
+
+    Instead of scoring a query against every entry with SequenceMatcher, the
+    index ranks entries by how many padded n-grams they share with the query
+    (Dice coefficient, so long names are not favoured just for having more
+    n-grams) and first rescores the top ``top_k`` candidates with the exact
+    ``SequenceMatcher(None, query, text).ratio()``. The best score found there
+    is then a floor for the remaining entries: only those sharing enough
+    characters with the query to still reach it are scored, so the result is
+    always the one a linear scan would find, ties included.
+    """
+
+    def __init__(self, n: int = 3, top_k: int = 50):
+        self.n = n
+        self.top_k = top_k
+        self._keys = []
+        self._texts = []
+        self._sizes = []
+        self._postings: Dict[str, List[int]] = {}
+        self._matchers: Dict[int, SequenceMatcher] = {}
+        # Character -> positions of the entries holding it at least once, twice, ...
+        self._char_postings: Dict[str, List[List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _grams(self, text: str) -> set:
+        padded = f" {text} "
+        if len(padded) <= self.n:
+            return {padded}
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def add(self, key: Any, text: str) -> None:
+        """Index ``text`` under ``key``."""
+        position = len(self._keys)
+        self._keys.append(key)
+        self._texts.append(text)
+        grams = self._grams(text)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+        for char, count in Counter(text).items():
+            levels = self._char_postings.setdefault(char, [])
+            while len(levels) < count:
+                levels.append([])
+            for level in levels[:count]:
+                level.append(position)
+
+    def candidates(self, text: str, top_k: Optional[int] = None) -> List[int]:
+        """Positions of the entries sharing the most n-grams with ``text``, in insertion order."""
+        grams = self._grams(text)
+        counts = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings:
+                counts.update(postings)
+
+        query_size = len(grams)
+        sizes = self._sizes
+        best = heapq.nlargest(
+            top_k or self.top_k,
+            counts.items(),
+            key=lambda item: (item[1] / (query_size + sizes[item[0]]), -item[0])
+        )
+        return sorted(position for position, _ in best)
+
+    def _within_char_bound(self, text: str, floor: float) -> List[int]:
+        """
+        Positions, in insertion order, of the entries whose characters allow a ratio of at least ``floor``.
+
+        A ratio is at most SequenceMatcher's ``quick_ratio``: twice the
+        characters the two texts have in common (with multiplicity) over
+        their total length. The common characters of every entry are counted
+        at once from the per-character postings.
+        """
+        if floor <= 0 or not text:
+            return list(range(len(self._keys)))
+        common = Counter()
+        for char, count in Counter(text).items():
+            for level in self._char_postings.get(char, [])[:count]:
+                common.update(level)
+        length = len(text)
+        texts = self._texts
+        return sorted(position for position, shared in common.items()
+                      if 2.0 * shared / (length + len(texts[position])) >= floor)
+
+    def best_match(self, text: str, threshold: float, min_score: float = 0.0) -> Optional[Tuple[Any, float]]:
+        """
+        Find the best-scoring entry for ``text``.
+
+        Returns what a linear scan would: the first entry whose ratio is
+        greater than the best so far (starting at ``min_score``) and at least
+        ``threshold``. The n-gram candidates are scored first; any other entry
+        is scored only if SequenceMatcher's cheap upper bounds say it could
+        still match or beat the best score.
+
+        Returns:
+            (key, score) of the winner, or None
+        """
+        best_position = None
+        best_score = min_score
+
+        def consider(position: int) -> None:
+            nonlocal best_position, best_score
+            matcher = self._matchers.get(position)
+            if matcher is None:
+                # seq2 is the indexed text, so its analysis is cached per entry
+                matcher = self._matchers[position] = SequenceMatcher(None, '', self._texts[position])
+            matcher.set_seq1(text)
+            floor = max(best_score, threshold)
+            if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                return
+            score = matcher.ratio()
+            if score < threshold:
+                return
+            # Equal scores go to the entry indexed first, as in a linear scan
+            if score > best_score or (score == best_score and best_position is not None
+                                      and position < best_position):
+                best_score = score
+                best_position = position
+
+        candidates = self.candidates(text)
+        for position in candidates:
+            consider(position)
+
+        # Entries the n-grams ranked lower can still win on SequenceMatcher's terms
+        scored = set(candidates)
+        for position in self._within_char_bound(text, max(best_score, threshold)):
+            if position not in scored:
+                consider(position)
+
+        if best_position is None:
+            return None
+        return self._keys[best_position], best_score
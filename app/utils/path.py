@@ -22,6 +22,12 @@ def config_dir() -> Path:
     logger.debug(f"Using config directory: {path}")
     return path
 
+def data_dir() -> Path:
+    """Return the directory for cached data files (e.g. downloaded EPG guides)."""
+    path = config_dir() / 'data'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
 def log_dir() -> Path:
     """Return the log directory path."""
     if os.environ.get('DOCKER_ENVIRONMENT'):
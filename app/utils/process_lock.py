@@ -0,0 +1,62 @@
+import logging
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .path import data_dir
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessLock:
+    """
+    A lock that at most one process of the app holds, for background work that must run once.
+
+    Gunicorn runs several workers, each with its own task manager; the one
+    that takes the lock does the work. It is a non-blocking flock() on a
+    file in the data dir, so the OS drops it when its holder exits and
+    another worker takes over on its next try. Without fcntl (Windows, where
+    the app runs as a single process) the lock is always granted.
+    """
+
+    def __init__(self, name: str, path: Optional[Path] = None):
+        self.name = name
+        self._path = path
+        self._file = None
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            self._path = data_dir() / f"{self.name}.lock"
+        return self._path
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """Take the lock if no other process holds it; True if this process holds it."""
+        if self._file is not None:
+            return True
+        f = open(self.path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+        self._file = f
+        logger.info(f"Took the {self.name} lock")
+        return True
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
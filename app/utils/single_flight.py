@@ -0,0 +1,69 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# How a result was served: from the cache, by joining a check already in flight, or by a new check
+HIT, SHARED, MISS = 'hit', 'shared', 'miss'
+
+
+class SingleFlightCache:
+    """
+    Recent results by key, and the computations in flight, shared by everyone asking.
+
+    A result younger than the ``ttl`` given to :meth:`get` is returned as is.
+    Otherwise the first caller starts the computation and later callers for
+    the same key wait for it instead of starting their own. Failures are
+    passed to every waiter and not cached. Callers must share one event loop.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        # Key -> (monotonic time the result was computed, result)
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._in_flight: Dict[Hashable, 'asyncio.Future[Any]'] = {}
+        self.stats = {HIT: 0, SHARED: 0, MISS: 0}
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                  ttl: float) -> Tuple[Any, str, Optional[float]]:
+        """
+        The result for ``key``, computed by ``compute()`` only if needed.
+
+        Returns:
+            The result, how it was served (HIT, SHARED or MISS) and, for a
+            cache hit, its age in seconds
+        """
+        cached = self._results.get(key)
+        if cached is not None:
+            age = time.monotonic() - cached[0]
+            if age < ttl:
+                self.stats[HIT] += 1
+                return cached[1], HIT, age
+
+        task = self._in_flight.get(key)
+        if task is None:
+            served = MISS
+            task = self._in_flight[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda done: self._settle(key, done))
+        else:
+            served = SHARED
+        self.stats[served] += 1
+        # A waiter that gives up does not cancel the computation for the others
+        return await asyncio.shield(task), served, None
+
+    def _settle(self, key: Hashable, task: 'asyncio.Future[Any]'):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if len(self._results) >= self.max_entries:
+            # Drop the oldest results
+            for stale in sorted(self._results, key=lambda k: self._results[k][0])[:self.max_entries // 4]:
+                del self._results[stale]
+        self._results[key] = (time.monotonic(), task.result())
+
+    def invalidate(self, key: Hashable) -> None:
+        self._results.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = sum(self.stats.values())
+        return dict(self.stats, cached=len(self._results), in_flight=len(self._in_flight),
+                    hit_ratio=round((self.stats[HIT] + self.stats[SHARED]) / lookups, 3) if lookups else None)
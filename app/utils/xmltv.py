@@ -0,0 +1,145 @@
+import io
+import gzip
+import lzma
+import shutil
+import zipfile
+import tempfile
+import logging
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Magic numbers used to detect compressed guides regardless of URL or headers
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZIP_MAGIC = b'PK\x03\x04'
+
+# Size of the in-memory buffer used before a zip archive spills to disk
+ZIP_SPOOL_SIZE = 16 * 1024 * 1024
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """Return 'gzip', 'xz' or 'zip' for a compressed header, None for plain XML."""
+    if header.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if header.startswith(XZ_MAGIC):
+        return 'xz'
+    if header.startswith(ZIP_MAGIC):
+        return 'zip'
+    return None
+
+
+def open_xmltv_stream(fileobj: BinaryIO) -> BinaryIO:
+    """
+    Wrap a binary stream so it yields decompressed XMLTV bytes.
+
+    The compression format is sniffed from the first bytes, so guides served
+    as .gz, .xz or .zip are handled even when the URL or Content-Type lie.
+    Decompression happens incrementally; nothing is read up front except for
+    zip archives, which need a seekable file and are spooled first.
+    """
+    reader = fileobj if hasattr(fileobj, 'peek') else io.BufferedReader(fileobj)
+    compression = detect_compression(reader.peek(8)[:8])
+
+    if compression == 'gzip':
+        logger.info("Detected gzipped EPG content, decompressing on the fly")
+        return gzip.GzipFile(fileobj=reader)
+    if compression == 'xz':
+        logger.info("Detected xz-compressed EPG content, decompressing on the fly")
+        return lzma.LZMAFile(reader)
+    if compression == 'zip':
+        logger.info("Detected zipped EPG content, spooling archive before extraction")
+        spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE)
+        shutil.copyfileobj(reader, spool)
+        spool.seek(0)
+        archive = zipfile.ZipFile(spool)
+        members = [m for m in archive.namelist() if not m.endswith('/')]
+        xml_members = [m for m in members if m.lower().endswith('.xml')]
+        if not members:
+            raise ValueError("Zip archive does not contain any files")
+        return archive.open((xml_members or members)[0])
+    return reader
+
+
+def _text(elem: ET.Element, path: str) -> Optional[str]:
+    found = elem.find(path)
+    return found.text if found is not None else None
+
+
+def _parse_channel(elem: ET.Element) -> Dict:
+    display_name = elem.find('display-name')
+    icon = elem.find('icon')
+    return {
+        'id': elem.get('id'),
+        'name': display_name.text if display_name is not None else '',
+        'language': display_name.get('lang') if display_name is not None else None,
+        'icon': icon.get('src') if icon is not None else '',
+    }
+
+
+def _parse_programme(elem: ET.Element) -> Dict:
+    icon = elem.find('icon')
+    return {
+        'channel': elem.get('channel'),
+        'start': elem.get('start'),
+        'stop': elem.get('stop'),
+        'title': _text(elem, 'title'),
+        'subtitle': _text(elem, 'sub-title'),
+        'description': _text(elem, 'desc'),
+        'category': _text(elem, 'category'),
+        'episode_number': _text(elem, 'episode-num'),
+        'rating': _text(elem, 'rating/value'),
+        'icon_url': icon.get('src') if icon is not None else None,
+    }
+
+
+def _iter_top_level(stream: BinaryIO) -> Iterator[ET.Element]:
+    """Yield each direct child of <tv>, clearing the tree once the caller is done with it."""
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        # Only top-level children of <tv> are records; nested tags are read
+        # through their parent before it gets cleared.
+        if depth != 1:
+            continue
+
+        yield elem
+        root.clear()
+
+
+def iter_xmltv(stream: BinaryIO) -> Iterator[Tuple[str, Dict]]:
+    """
+    Incrementally walk an XMLTV document.
+
+    Yields ('channel', data) and ('programme', data) tuples in document order.
+    Each element is cleared from the tree once it has been converted, so
+    memory use stays flat no matter how large the guide is.
+    """
+    for elem in _iter_top_level(stream):
+        if elem.tag == 'channel':
+            yield 'channel', _parse_channel(elem)
+        elif elem.tag == 'programme':
+            yield 'programme', _parse_programme(elem)
+
+
+def iter_channel_elements(stream: BinaryIO) -> Iterator[ET.Element]:
+    """
+    Yield the raw <channel> elements of an XMLTV document.
+
+    The XMLTV DTD lists every channel before the first programme, so reading
+    stops there instead of walking the whole guide. Elements are only valid
+    until the next one is requested.
+    """
+    for elem in _iter_top_level(stream):
+        if elem.tag == 'programme':
+            return
+        if elem.tag == 'channel':
+            yield elem
@@ -7,7 +7,7 @@ from ..utils.config import Config
 from ..repositories import URLRepository, ChannelRepository, SettingsRepository
 from ..services import PlaylistService, ScraperService  # Add ScraperService import
 from ..models.url_types import create_url_object, ZeronetURL, RegularURL
-import asyncio  # Add asyncio import for refresh_url function
+from ..utils.http_client import http_clients
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -102,6 +102,11 @@ def add_url():
         
         url_db_obj = url_repo.add(url, effective_type)
         
+        # Scrape it now rather than when the task loop next polls
+        from app import task_manager
+        if task_manager:
+            task_manager.add_task('scrape_url', url_db_obj.url)
+        
         # Return success message
         return jsonify({
             'message': 'URL added successfully',
@@ -126,7 +131,7 @@ def refresh_url(url):
     url_type = url_obj.url_type if url_obj else 'auto'
     
     try:
-        links, status = asyncio.run(ScraperService().scrape_url(url, url_type))
+        links, status = http_clients.run(ScraperService().scrape_url(url, url_type, force=True))
         return jsonify({
             'message': 'URL refreshed successfully',
             'status': status,
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, jsonify, request, Response, current_app, redirect, url_for
+from flask import Blueprint, render_template, jsonify, request, current_app, redirect, url_for
 from datetime import datetime, timedelta, timezone
 import asyncio
 import logging
@@ -12,6 +12,7 @@ from ..tasks.manager import TaskManager
 from ..services import ScraperService, PlaylistService
 from ..repositories import URLRepository, ChannelRepository
 from ..services.channel_status_service import ChannelStatusService
+from ..services.artifact_cache import artifact_cache, artifact_response, streamed_response
 
 bp = Blueprint('main', __name__)
 logger = logging.getLogger(__name__)
@@ -53,14 +54,19 @@ def get_playlist():
     Legacy endpoint for M3U playlist.
     Maintains backward compatibility by directly serving the playlist.
     """
-    config = Config()
-    if not config.is_initialized() and not current_app.testing:
-        return redirect(url_for('main.setup'))
-        
     refresh = request.args.get('refresh', 'false').lower() == 'true'
     search = request.args.get('search', None)
     base_url_param = request.args.get('base_url', None)
     
+    # A cached playlist implies setup was complete when it was rendered; any
+    # settings change starts a new generation, so the check runs again then
+    params = {'search': search, 'base_url': base_url_param}
+    artifact = artifact_cache.get('playlist.m3u', params)
+    if artifact is None:
+        config = Config()
+        if not config.is_initialized() and not current_app.testing:
+            return redirect(url_for('main.setup'))
+    
     if refresh and task_manager:
         from app.repositories import URLRepository
         url_repository = URLRepository()
@@ -69,25 +75,19 @@ def get_playlist():
         for url in urls:
             task_manager.add_url(url.url)
     
-    playlist_service = PlaylistService()
-    
-    if base_url_param:
-        original_base_url = playlist_service.config.base_url
-        playlist_service.config.base_url = base_url_param
-        playlist = playlist_service.generate_playlist(search_term=search)
-        playlist_service.config.base_url = original_base_url
-    else:
-        playlist = playlist_service.generate_playlist(search_term=search)
-    
     filename = f"acestream_playlist_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
     if search:
         filename += f"_filtered"
     filename += ".m3u"
     
-    return Response(
-        playlist,
+    if artifact is not None:
+        return artifact_response(artifact, filename)
+    
+    return streamed_response(
+        'playlist.m3u', params,
+        lambda: PlaylistService().iter_playlist(search_term=search, base_url=base_url_param),
         mimetype="audio/x-mpegurl",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        filename=filename
     )
 
 @bp.route('/config')
@@ -0,0 +1,103 @@
+"""
+Benchmark persisting a scraped source: per-link update_or_create (plus a
+delete-and-recreate when a channel disappears) vs. the set-based upsert.
+
+Each run starts from a source already holding ``--links`` channels and
+persists a rescrape where ``--changed`` channels were renamed and one
+disappeared, against a file-backed SQLite database.
+
+Usage:
+    python benchmarks/bench_channel_upsert.py --links 3000 --changed 30
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TESTING'] = '1'
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.extensions import db  # noqa: E402
+from app.models import AcestreamChannel  # noqa: E402
+from app.repositories import ChannelRepository  # noqa: E402
+
+SOURCE = 'http://benchmark.invalid/page'
+
+
+def legacy_update_channels(repo, url, links):
+    """ScraperService._update_channels as it was."""
+    current_channels = set(channel_id for channel_id, _, _ in links)
+    existing_channels = set(ch.id for ch in repo.get_by_source(url))
+    if existing_channels - current_channels:
+        repo.delete_by_source(url)
+    for channel_id, channel_name, metadata in links:
+        repo.update_or_create(channel_id=channel_id, name=channel_name, source_url=url, metadata=metadata or {})
+    repo.commit()
+
+
+def make_links(count, renamed=0):
+    return [(f'{i:040x}', f'Channel {i}{" HD" if i < renamed else ""}', {'group': 'Sports', 'tvg_id': f'ch{i}.es'})
+            for i in range(count)]
+
+
+def seed(count):
+    db.session.query(AcestreamChannel).delete()
+    db.session.bulk_insert_mappings(AcestreamChannel, [
+        {'id': channel_id, 'name': name, 'source_url': SOURCE, 'status': 'active', 'is_online': True,
+         'group': metadata['group'], 'tvg_id': metadata['tvg_id']}
+        for channel_id, name, metadata in make_links(count)
+    ])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def measure(persist, links):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        start = time.perf_counter()
+        persist(links)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    db.session.expunge_all()
+    return elapsed, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--links', type=int, default=3000)
+    parser.add_argument('--changed', type=int, default=30, help='Channels renamed in the rescrape')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                          SQLALCHEMY_TRACK_MODIFICATIONS=False)
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            repo = ChannelRepository()
+            # The rescrape renames a few channels and drops the last one
+            rescrape = make_links(args.links, renamed=args.changed)[:-1]
+
+            seed(args.links)
+            legacy = measure(lambda links: legacy_update_channels(repo, SOURCE, links), rescrape)
+            seed(args.links)
+            upsert = measure(lambda links: repo.sync_source_channels(SOURCE, links), rescrape)
+            unchanged = measure(lambda links: repo.sync_source_channels(SOURCE, links), rescrape)
+
+    print(f"{args.links} links, {args.changed} renamed, 1 removed")
+    print(f"legacy     {legacy[0]:6.3f}s  {legacy[1]:>5} statements")
+    print(f"upsert     {upsert[0]:6.3f}s  {upsert[1]:>5} statements")
+    print(f"unchanged  {unchanged[0]:6.3f}s  {unchanged[1]:>5} statements")
+
+
+if __name__ == '__main__':
+    main()
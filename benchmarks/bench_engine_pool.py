@@ -0,0 +1,149 @@
+"""
+Benchmark how status sweeps and searches scale with the number of Acestream
+engines in the pool.
+
+For each count in ``--engines``, that many stub engines
+(benchmarks/stub_acestream_engine.py, all with the same capacity and
+latency) are started, each in a process of its own, and form the pool.
+``--channels`` channels are swept with ChannelStatusService.check_channels,
+with a ceiling of ``--per-engine`` checks per engine, as the app sets it by
+default. Then ``--searches`` searches run from ``--search-clients`` threads
+through AcestreamSearchService. Throughput should grow about linearly with the
+engines, and so should each engine's share of the requests.
+
+Usage:
+    python benchmarks/bench_engine_pool.py --engines 1 2 4 --channels 2000 --capacity 8 --latency 0.05
+    python benchmarks/bench_engine_pool.py --engines 1 3 --overload reject --searches 400
+"""
+import os
+import sys
+import time
+import asyncio
+import socket
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ['TESTING'] = '1'
+
+import requests  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from app.extensions import db  # noqa: E402
+from app.models import AcestreamChannel  # noqa: E402
+from app.services.acestream_search_service import AcestreamSearchService  # noqa: E402
+from app.services.channel_status_service import ChannelStatusService  # noqa: E402
+from app.utils.db_writer import db_writer  # noqa: E402
+from app.utils.engine_pool import EnginePool  # noqa: E402
+from app.utils.http_client import http_clients  # noqa: E402
+from stub_acestream_engine import add_engine_arguments  # noqa: E402
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_acestream_engine.py')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_engines(args, count):
+    """Stub engines in processes of their own, so that serving them does not compete with the app for a CPU."""
+    processes, urls = [], []
+    for _ in range(count):
+        port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, STUB, '--port', str(port), '--capacity', str(args.capacity),
+             '--latency', str(args.latency), '--jitter', str(args.jitter), '--overload', args.overload,
+             '--failure-rate', str(args.failure_rate), '--hang-rate', str(args.hang_rate),
+             '--offline-rate', str(args.offline_rate)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        urls.append(f'http://127.0.0.1:{port}')
+    for url in urls:
+        for _ in range(100):
+            try:
+                requests.get(f'{url}/server/api', params={'method': 'get_status'}, timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+    return processes, urls
+
+
+async def run(args, app, channels, urls):
+    pool = EnginePool(urls)
+    try:
+        service = ChannelStatusService()
+        service.engines = pool
+        start = time.perf_counter()
+        with app.app_context():
+            await service.check_channels(channels, max_concurrency=args.per_engine * len(urls))
+        sweep_rate = len(channels) / (time.perf_counter() - start)
+        sweep_share = [engine.requests for engine in pool.engines.values()]
+
+        search = AcestreamSearchService(engine_url=urls[0])
+        search.engines = pool
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(args.search_clients) as executor:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(loop.run_in_executor(executor, search.search, f'query {i}')
+                                             for i in range(args.searches)))
+            search_rate = args.searches / (time.perf_counter() - start)
+        failed_searches = sum(1 for result in results if not result['success'])
+        search_share = [engine.requests - before for engine, before in zip(pool.engines.values(), sweep_share)]
+    finally:
+        await http_clients.close()
+    return sweep_rate, sweep_share, search_rate, search_share, failed_searches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', type=int, nargs='+', default=[1, 2, 4], help='Pool sizes to compare')
+    parser.add_argument('--channels', type=int, default=2000)
+    parser.add_argument('--per-engine', type=int, default=16, help='Ceiling of the adaptive sweep, per engine')
+    parser.add_argument('--searches', type=int, default=200)
+    parser.add_argument('--search-clients', type=int, default=64, help='Threads searching at once')
+    add_engine_arguments(parser)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                          SQLALCHEMY_TRACK_MODIFICATIONS=False)
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.bulk_insert_mappings(AcestreamChannel, [
+                {'id': f'{i:040x}', 'name': f'Channel {i}', 'status': 'active'} for i in range(args.channels)
+            ])
+            db.session.commit()
+            channels = AcestreamChannel.query.order_by(AcestreamChannel.id).all()
+            db.session.expunge_all()
+        db_writer.start(app)
+        try:
+            for count in args.engines:
+                processes, urls = start_engines(args, count)
+                try:
+                    rows.append((count, *asyncio.run(run(args, app, channels, urls))))
+                finally:
+                    for process in processes:
+                        process.terminate()
+                        process.wait()
+        finally:
+            db_writer.stop()
+
+    print(f"{args.channels} channels, {args.searches} searches; each engine serves {args.capacity} requests "
+          f"at once, {args.latency * 1000:.0f} ms each, overload={args.overload}")
+    base_sweep, base_search = rows[0][1], rows[0][3]
+    for count, sweep_rate, sweep_share, search_rate, search_share, failed in rows:
+        print(f"{count} engine(s): sweep {sweep_rate:7.1f} checks/s (x{sweep_rate / base_sweep:4.2f})  "
+              f"search {search_rate:6.1f}/s (x{search_rate / base_search:4.2f}, {failed} failed)  "
+              f"requests per engine: sweep {sweep_share}, search {search_share}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark EPG ingestion: legacy in-memory parse vs. streaming iterparse.
+
+The sample guide in samples/epg.xml is replicated ``--scale`` times (channel
+IDs get a numeric suffix) and gzipped to a temporary file. Each ingestion path
+then runs in its own subprocess against an in-memory database so that peak
+RSS is measured independently.
+
+Usage:
+    python benchmarks/bench_epg_ingest.py --scale 200
+"""
+import os
+import sys
+import gzip
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_PATH = os.path.join(ROOT, 'samples', 'epg.xml')
+
+
+def build_synthetic_guide(path, scale):
+    """Write a gzipped XMLTV guide with the sample content repeated ``scale`` times."""
+    sample = ET.parse(SAMPLE_PATH).getroot()
+    channels = sample.findall('channel')
+    programmes = sample.findall('programme')
+
+    with gzip.open(path, 'wb') as out:
+        out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<tv generator-info-name="benchmark">\n')
+        for i in range(scale):
+            for channel in channels:
+                channel.set('id', f"{channel.get('id').split('#')[0]}#{i}")
+                out.write(ET.tostring(channel, encoding='utf-8'))
+        for i in range(scale):
+            for programme in programmes:
+                programme.set('channel', f"{programme.get('channel').split('#')[0]}#{i}")
+                out.write(ET.tostring(programme, encoding='utf-8'))
+        out.write(b'</tv>\n')
+
+
+def legacy_ingest(service, path, source_id):
+    """The pre-streaming path: decompress fully, build a tree, insert everything at once."""
+    with open(path, 'rb') as f:
+        xml_content = gzip.decompress(f.read()).decode('utf-8')
+    root = ET.fromstring(xml_content)
+
+    channels_to_insert = []
+    for channel in root.findall('.//channel'):
+        display_name = channel.find('display-name')
+        channels_to_insert.append({
+            'epg_source_id': source_id,
+            'channel_xml_id': channel.get('id'),
+            'name': display_name.text if display_name is not None else '',
+            'icon_url': '',
+            'language': display_name.get('lang') if display_name is not None else None
+        })
+    service.epg_program_repo.delete_by_source_id(source_id)
+    service.epg_channel_repo.delete_by_source_id(source_id)
+    service.epg_channel_repo.bulk_insert(channels_to_insert)
+    channel_mapping = {ch.channel_xml_id: ch.id for ch in service.epg_channel_repo.get_by_source_id(source_id)}
+
+    programs = []
+    for programme in root.findall('.//programme'):
+        title = programme.find('title')
+        desc = programme.find('desc')
+        row = service._prepare_program({
+            'channel': programme.get('channel'),
+            'start': programme.get('start'),
+            'stop': programme.get('stop'),
+            'title': title.text if title is not None else None,
+            'subtitle': None,
+            'description': desc.text if desc is not None else None,
+            'category': None,
+            'episode_number': None,
+            'rating': None,
+            'icon_url': None,
+        })
+        if row and row['channel_xml_id'] in channel_mapping:
+            row['epg_channel_id'] = channel_mapping[row.pop('channel_xml_id')]
+            programs.append(row)
+    return service.epg_program_repo.bulk_insert(programs)
+
+
+def streaming_ingest(service, path, source_id):
+    from app.utils.xmltv import open_xmltv_stream
+
+    with open(path, 'rb') as f:
+        return service._ingest_xmltv_stream(open_xmltv_stream(f), source_id)['programs']
+
+
+def run_mode(mode, path):
+    os.environ['TESTING'] = '1'
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from app import create_app
+    from app.extensions import db
+    from app.models.epg_source import EPGSource
+    from app.services.epg_service import EPGService
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        source = EPGSource(url='http://benchmark.invalid/guide.xml.gz')
+        db.session.add(source)
+        db.session.commit()
+
+        service = EPGService()
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        if mode == 'legacy':
+            programs = legacy_ingest(service, path, source.id)
+        else:
+            programs = streaming_ingest(service, path, source.id)
+        elapsed = time.perf_counter() - start
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"{mode:<10} programs={programs:<8} time={elapsed:7.2f}s "
+          f"peak_rss={peak_rss / 1024:8.1f} MiB (+{(peak_rss - baseline_rss) / 1024:.1f} MiB during ingest)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=100, help='Number of times the sample guide is replicated')
+    parser.add_argument('--mode', choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'guide.xml.gz')
+        build_synthetic_guide(path, args.scale)
+        print(f"Synthetic guide: scale={args.scale}, {os.path.getsize(path) / 1024 / 1024:.1f} MiB gzipped")
+        for mode in ('legacy', 'streaming'):
+            subprocess.run([sys.executable, __file__, '--mode', mode, '--path', path], check=True)
+
+
+if __name__ == '__main__':
+    main()
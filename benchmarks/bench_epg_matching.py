@@ -0,0 +1,120 @@
+"""
+Benchmark EPG fuzzy matching: linear SequenceMatcher scan vs. n-gram index.
+
+Synthetic EPG names are built from a channel-name vocabulary and the
+acestream names are noisy copies of them (typos, quality suffixes, dropped
+words) mixed with unrelated names. The index matches every acestream name;
+the linear scan is run on a sample and extrapolated, since the full cross
+product takes far too long. Results on the sample are compared one by one.
+
+Usage:
+    python benchmarks/bench_epg_matching.py --epg 20000 --acestreams 10000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from difflib import SequenceMatcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.utils.ngram_index import NGramIndex  # noqa: E402
+
+BRANDS = ['movistar', 'dazn', 'eurosport', 'sky', 'bein', 'espn', 'fox', 'tnt', 'canal', 'rtve',
+          'antena', 'telecinco', 'cuatro', 'gol', 'real madrid', 'barca', 'nba', 'nfl', 'ufc', 'viaplay',
+          'arena', 'setanta', 'super', 'premier', 'match', 'astro', 'star', 'ziggo', 'polsat', 'nova']
+TOPICS = ['sports', 'laliga', 'liga', 'f1', 'motogp', 'golf', 'tennis', 'news', 'cine', 'series',
+          'action', 'football', 'futbol', 'racing', 'extra', 'plus', 'max', 'premium', 'events', 'deportes']
+COUNTRIES = ['es', 'uk', 'pt', 'fr', 'it', 'de', 'pl', 'nl', 'us', 'ar', 'mx', 'tr', 'ro', 'gr', 'se']
+
+
+def make_epg_names(count, rng):
+    names = set()
+    while len(names) < count:
+        words = [rng.choice(BRANDS), rng.choice(TOPICS)]
+        if rng.random() < 0.6:
+            words.append(str(rng.randint(1, 12)))
+        if rng.random() < 0.5:
+            words.append(rng.choice(COUNTRIES))
+        names.add(' '.join(words))
+    return list(names)
+
+
+def perturb(name, rng):
+    chars = list(name)
+    for _ in range(rng.randint(0, 2)):
+        position = rng.randrange(len(chars))
+        if rng.random() < 0.5:
+            chars[position] = rng.choice('abcdefghijklmnopqrstuvwxyz0123456789')
+        else:
+            del chars[position]
+    words = ''.join(chars).split()
+    if len(words) > 2 and rng.random() < 0.3:
+        del words[rng.randrange(len(words))]
+    return ' '.join(words)
+
+
+def make_acestream_names(epg_names, count, rng):
+    names = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            names.append(perturb(rng.choice(epg_names), rng))
+        else:
+            names.append(' '.join(rng.choice(BRANDS + TOPICS) for _ in range(rng.randint(1, 4))))
+    return names
+
+
+def linear_best(epg_names, query, threshold):
+    best, best_score = None, 0
+    for name in epg_names:
+        score = SequenceMatcher(None, query, name).ratio()
+        if score > best_score and score >= threshold:
+            best, best_score = name, score
+    return (best, best_score) if best is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--epg', type=int, default=20000, help='Number of EPG channel names')
+    parser.add_argument('--acestreams', type=int, default=10000, help='Number of acestream names to match')
+    parser.add_argument('--sample', type=int, default=100, help='Acestream names matched by the linear scan')
+    parser.add_argument('--threshold', type=float, default=0.75)
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    epg_names = make_epg_names(args.epg, rng)
+    queries = make_acestream_names(epg_names, args.acestreams, rng)
+
+    start = time.perf_counter()
+    index = NGramIndex(top_k=args.top_k)
+    for name in epg_names:
+        index.add(name, name)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index.best_match(query, args.threshold) for query in queries]
+    index_time = time.perf_counter() - start
+
+    sample = rng.sample(range(len(queries)), min(args.sample, len(queries)))
+    start = time.perf_counter()
+    linear = {i: linear_best(epg_names, queries[i], args.threshold) for i in sample}
+    linear_sample_time = time.perf_counter() - start
+    linear_time = linear_sample_time / len(sample) * len(queries)
+
+    agree = sum(1 for i in sample if linear[i] == indexed[i])
+    matched = sum(1 for match in indexed if match)
+
+    print(f"{args.epg} EPG names x {args.acestreams} acestream names (threshold {args.threshold}, top-k {args.top_k})")
+    print(f"index build      {build_time:8.2f}s")
+    print(f"index matching   {index_time:8.2f}s  ({matched} matched)")
+    print(f"linear scan      {linear_time:8.2f}s  (extrapolated from {len(sample)} names, {linear_sample_time:.2f}s)")
+    print(f"speedup          {linear_time / (build_time + index_time):8.1f}x")
+    print(f"agreement        {agree}/{len(sample)} sampled names have the same winner and score")
+
+
+if __name__ == '__main__':
+    main()
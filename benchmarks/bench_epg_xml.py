@@ -0,0 +1,138 @@
+"""
+Benchmark EPG guide rendering: per-mapping programme queries vs. batched
+windowed fetch with shared programme fragments.
+
+A synthetic library of TV channels, each with ``--variants`` acestreams and
+``--days`` days of programmes, is loaded into an in-memory database. The
+guide is rendered with the legacy programme loop (one query and one round
+of escaping per channel variant) and with the current generator; both
+outputs are compared and query counts and CPU time are reported.
+
+Usage:
+    python benchmarks/bench_epg_xml.py --channels 1000 --variants 3 --days 7
+"""
+import os
+import sys
+import time
+import html
+import argparse
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TESTING'] = '1'
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.extensions import db  # noqa: E402
+from app.models import AcestreamChannel  # noqa: E402
+from app.models.tv_channel import TVChannel  # noqa: E402
+from app.models.epg_source import EPGSource  # noqa: E402
+from app.models.epg_channel import EPGChannel  # noqa: E402
+from app.models.epg_program import EPGProgram  # noqa: E402
+from app.services.playlist_service import PlaylistService  # noqa: E402
+
+
+class LegacyPlaylistService(PlaylistService):
+    """The programme section as it was: one query and one formatting pass per mapping."""
+
+    def _programme_lines(self, channel_epg_mappings, epg_program_repo=None):
+        from app.repositories.epg_program_repository import EPGProgramRepository
+        epg_program_repo = epg_program_repo or EPGProgramRepository()
+        for mapping in channel_epg_mappings:
+            epg_id = mapping['epg_id']
+            epg_channel = mapping['epg_channel']
+            if not epg_channel:
+                continue
+            now = datetime.utcnow()
+            programs = epg_program_repo.get_programs_for_channel(
+                epg_channel.id, now - timedelta(hours=12), now + timedelta(days=7))
+            for program in programs:
+                start_time_str = program.start_time.strftime("%Y%m%d%H%M%S %z")
+                stop_time_str = program.end_time.strftime("%Y%m%d%H%M%S %z")
+                if start_time_str.endswith(' '):
+                    start_time_str += '+0000'
+                if stop_time_str.endswith(' '):
+                    stop_time_str += '+0000'
+                yield f'  <programme start="{start_time_str}" stop="{stop_time_str}" channel="{html.escape(epg_id)}">'
+                yield f'    <title>{html.escape(program.title)}</title>'
+                if program.description:
+                    yield f'    <desc>{html.escape(program.description)}</desc>'
+                if program.category:
+                    yield f'    <category>{html.escape(program.category)}</category>'
+                yield '  </programme>'
+
+
+def build_library(channels, variants, days, per_day):
+    source = EPGSource(url='http://benchmark.invalid/guide.xml')
+    db.session.add(source)
+    db.session.flush()
+
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=6)
+    slot = timedelta(hours=24 / per_day)
+    programs = []
+    for i in range(channels):
+        tv_channel = TVChannel(name=f'Channel {i}', channel_number=i + 1, epg_id=f'ch{i}.bench', is_active=True)
+        epg_channel = EPGChannel(epg_source_id=source.id, channel_xml_id=f'ch{i}.bench', name=f'Channel {i}')
+        db.session.add_all([tv_channel, epg_channel])
+        db.session.flush()
+        for variant in range(variants):
+            db.session.add(AcestreamChannel(id=f'{i:036d}{variant:04d}', name=f'Channel {i}',
+                                            tv_channel_id=tv_channel.id, is_online=variant == 0))
+        for p in range(days * per_day):
+            programs.append({
+                'epg_channel_id': epg_channel.id,
+                'title': f'Programme {p} & "friends" <live>',
+                'description': 'Description of the programme with some <markup> & entities',
+                'category': 'Sports',
+                'start_time': start + slot * p,
+                'end_time': start + slot * (p + 1),
+            })
+    db.session.commit()
+    db.session.bulk_insert_mappings(EPGProgram, programs)
+    db.session.commit()
+    return len(programs)
+
+
+def render(service):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        start_cpu, start_wall = time.process_time(), time.perf_counter()
+        guide = service.generate_epg_xml()
+        cpu, wall = time.process_time() - start_cpu, time.perf_counter() - start_wall
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    db.session.expunge_all()
+    return guide, len(statements), cpu, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=1000)
+    parser.add_argument('--variants', type=int, default=3, help='Acestreams per TV channel')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--per-day', type=int, default=24, help='Programmes per channel per day')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        programs = build_library(args.channels, args.variants, args.days, args.per_day)
+        print(f"{args.channels} channels x {args.variants} variants, {programs} programmes")
+
+        legacy, legacy_queries, legacy_cpu, legacy_wall = render(LegacyPlaylistService())
+        batched, batched_queries, batched_cpu, batched_wall = render(PlaylistService())
+
+        print(f"legacy    queries={legacy_queries:<6} cpu={legacy_cpu:6.2f}s wall={legacy_wall:6.2f}s")
+        print(f"batched   queries={batched_queries:<6} cpu={batched_cpu:6.2f}s wall={batched_wall:6.2f}s")
+        print(f"speedup   {legacy_cpu / batched_cpu:.1f}x cpu, {legacy_queries / batched_queries:.0f}x fewer queries")
+        print(f"identical {legacy == batched} ({len(batched) / 1024 / 1024:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
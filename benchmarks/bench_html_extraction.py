@@ -0,0 +1,75 @@
+"""
+Benchmark channel extraction from scraped HTML pages: full BeautifulSoup
+parse (the previous behaviour) vs. the raw-markup fast path.
+
+Synthetic pages in the formats seen on scraped sites (a ZeroNet list with an
+embedded listaplana.txt, a linksData page and a plain page with acestream
+links) are padded to ``--kb`` kilobytes of surrounding markup. Both paths
+must produce identical channels.
+
+Usage:
+    python benchmarks/bench_html_extraction.py --channels 500 --kb 512 --rounds 5
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TESTING'] = '1'
+
+from app.scrapers import create_scraper_for_url  # noqa: E402
+from app.scrapers.page import DEFAULT_PARSER  # noqa: E402
+
+
+def build_pages(channels, kb):
+    filler = ''.join(f'<div class="row"><span class="label">Item {i} &amp; more</span><a href="/p/{i}">link</a></div>\n'
+                     for i in range(kb * 1024 // 90))
+    ids = [f'{i:040x}' for i in range(channels)]
+    lista = '\n'.join(f'CHANNEL {i}: acestream://{channel_id}' for i, channel_id in enumerate(ids))
+    links = json.dumps({'links': [{'name': f'Channel {i}', 'url': f'acestream://{channel_id}'}
+                                  for i, channel_id in enumerate(ids)]})
+    plain = ''.join(f'<p><a href="acestream://{channel_id}">Watch</a></p>\n' for channel_id in ids)
+    return {
+        'listaplana': f'<html><head><script>var fileContents = {{"listaplana.txt": `{lista}`}};</script></head>'
+                      f'<body>{filler}</body></html>',
+        'links_data': f'<html><body>{filler}<script>const linksData = {links};</script></body></html>',
+        'plain': f'<html><body><div class="link-name">Sports</div>{filler}{plain}</body></html>',
+    }
+
+
+async def extract(content, parser, fast):
+    scraper = create_scraper_for_url('https://example.com/page', 'regular')
+    scraper.html_parser = parser
+    scraper.fast_extraction = fast
+    return await scraper.extract_channels(content)
+
+
+def measure(content, parser, fast, rounds):
+    start = time.process_time()
+    for _ in range(rounds):
+        channels = asyncio.run(extract(content, parser, fast))
+    return channels, (time.process_time() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=500)
+    parser.add_argument('--kb', type=int, default=512, help='Size of the markup around the channels')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"DOM fallback parser: {DEFAULT_PARSER}")
+    for name, content in build_pages(args.channels, args.kb).items():
+        legacy, legacy_cpu = measure(content, 'html.parser', False, args.rounds)
+        fast, fast_cpu = measure(content, DEFAULT_PARSER, True, args.rounds)
+        print(f"{name:<11} {len(content) / 1024:7.0f} KiB  full parse {legacy_cpu * 1000:8.1f}ms  "
+              f"fast path {fast_cpu * 1000:7.1f}ms  {legacy_cpu / fast_cpu:6.1f}x  "
+              f"identical {legacy == fast} ({len(fast)} channels)")
+
+
+if __name__ == '__main__':
+    main()
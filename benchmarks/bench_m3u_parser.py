@@ -0,0 +1,125 @@
+"""
+Benchmark M3U parsing: the previous whole-body parsers vs. the streaming
+line parser.
+
+A synthetic aggregator playlist with ``--entries`` channels (a mix of
+acestream:// and ace/getstream?id= entries with tvg attributes) is parsed
+by the legacy extract_channels_from_content loop (regexes compiled inline,
+whole body decoded and split) and by the streaming parser fed the raw bytes
+in 64 KiB chunks, as aiohttp delivers them. CPU time and peak traced
+memory are reported, and both outputs must be identical.
+
+Usage:
+    python benchmarks/bench_m3u_parser.py --entries 100000
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TESTING'] = '1'
+
+from app.utils.m3u import aiter_m3u_entries  # noqa: E402
+from app.services.m3u_service import STREAM_CHUNK_SIZE  # noqa: E402
+
+
+def legacy_extract_channels_from_content(content):
+    """M3UService.extract_channels_from_content as it was."""
+    acestream_pattern = re.compile(r'acestream://([\w\d]+)')
+    channels = []
+    channel_info = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXTINF:'):
+            name_match = re.search(r'#EXTINF:.*,(.+)', line)
+            if name_match:
+                channel_info['name'] = name_match.group(1).strip()
+            for tag_match in re.finditer(r'(tvg-[^=]+|group-title)="([^"]+)"', line):
+                tag_name, tag_value = tag_match.group(1), tag_match.group(2)
+                if tag_name == 'tvg-id':
+                    channel_info['tvg_id'] = tag_value
+                elif tag_name == 'tvg-name':
+                    channel_info['tvg_name'] = tag_value
+                elif tag_name == 'tvg-logo':
+                    channel_info['logo'] = tag_value
+                elif tag_name == 'group-title':
+                    channel_info['group'] = tag_value
+                else:
+                    channel_info[tag_name] = tag_value
+            continue
+        if line.startswith('#'):
+            continue
+        acestream_match = acestream_pattern.search(line)
+        getstream_match = re.search(r'ace/getstream\?id=([\w\d]+)', line) if not acestream_match else None
+        match = acestream_match or getstream_match
+        if match:
+            channel_id = match.group(1)
+            name = channel_info.get('name', f"Channel {channel_id}")
+            channels.append((channel_id, name, {k: v for k, v in channel_info.items() if k != 'name'}))
+            channel_info = {}
+    return channels
+
+
+def build_playlist(entries):
+    lines = ['#EXTM3U']
+    for i in range(entries):
+        lines.append(f'#EXTINF:-1 tvg-id="ch{i}.es" tvg-name="Channel {i}" tvg-logo="http://logos.invalid/{i}.png" '
+                     f'group-title="Group {i % 50}",Channel {i} HD')
+        url = f'acestream://{i:040x}' if i % 2 else f'http://127.0.0.1:6878/ace/getstream?id={i:040x}'
+        lines.append(url)
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+async def chunked(body):
+    for i in range(0, len(body), STREAM_CHUNK_SIZE):
+        yield body[i:i + STREAM_CHUNK_SIZE]
+
+
+async def stream_count(body):
+    # Entries are consumed as they are parsed, as a caller streaming to the database would
+    count = 0
+    async for _ in aiter_m3u_entries(chunked(body)):
+        count += 1
+    return count
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.process_time()
+    result = func()
+    cpu = time.process_time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, cpu, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    args = parser.parse_args()
+
+    body = build_playlist(args.entries)
+    print(f"{args.entries} entries, {len(body) / 1024 / 1024:.1f} MiB")
+
+    legacy, legacy_cpu, legacy_peak = measure(lambda: legacy_extract_channels_from_content(body.decode('utf-8')))
+
+    async def collect():
+        return [entry async for entry in aiter_m3u_entries(chunked(body))]
+    streamed, streamed_cpu, streamed_peak = measure(lambda: asyncio.run(collect()))
+    count, _, streaming_peak = measure(lambda: asyncio.run(stream_count(body)))
+
+    print(f"legacy      cpu={legacy_cpu:6.2f}s  peak={legacy_peak:7.1f} MiB (body decoded and split, all entries)")
+    print(f"streamed    cpu={streamed_cpu:6.2f}s  peak={streamed_peak:7.1f} MiB (all entries collected)")
+    print(f"streaming   peak={streaming_peak:7.1f} MiB (entries consumed as parsed)")
+    print(f"identical {legacy == streamed} ({count} entries)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Simulate a week of rescrapes: the fixed global interval vs. the adaptive
+per-URL schedule.
+
+``--hot`` sources change every ``--hot-every`` minutes during match windows
+(evenings on three days of the week) and rarely otherwise; ``--static``
+sources change once a week. For each policy the total number of fetches is
+reported, together with the mean staleness (time between a change and the
+scrape that picks it up) of hot and static sources.
+
+Usage:
+    python benchmarks/bench_rescrape_schedule.py --hot 5 --static 45 --fixed-hours 24
+"""
+import os
+import sys
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.rescrape_scheduler import next_interval, record_outcome  # noqa: E402
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+WEEK = 7 * DAY
+
+
+def change_times(hot, hot_every, rng):
+    if not hot:
+        return [rng.uniform(0, WEEK)]
+    times = []
+    for day in (1, 3, 5):
+        start = day * DAY + 18 * HOUR
+        times += [start + i * hot_every * MINUTE for i in range(int(5 * HOUR / (hot_every * MINUTE)))]
+    times += [rng.uniform(0, WEEK) for _ in range(3)]
+    return sorted(times)
+
+
+def simulate(changes, next_delay):
+    """Fetch count and staleness of each change of one source over a week."""
+    t, fetches, seen, staleness, interval, history = 0.0, 0, 0, [], None, None
+    while t < WEEK:
+        fetches += 1
+        new = [c for c in changes[seen:] if c <= t]
+        staleness += [t - c for c in new]
+        seen += len(new)
+        history = record_outcome(history, bool(new))
+        interval = next_delay(interval, bool(new), history)
+        t += interval
+    staleness += [WEEK - c for c in changes[seen:]]
+    return fetches, staleness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hot', type=int, default=5)
+    parser.add_argument('--static', type=int, default=45)
+    parser.add_argument('--hot-every', type=int, default=20, help='Minutes between changes of hot sources')
+    parser.add_argument('--fixed-hours', type=float, default=24, help='Global rescrape interval to compare with')
+    parser.add_argument('--min-minutes', type=int, default=15)
+    parser.add_argument('--max-hours', type=int, default=24)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    sources = [(True, change_times(True, args.hot_every, rng)) for _ in range(args.hot)]
+    sources += [(False, change_times(False, args.hot_every, rng)) for _ in range(args.static)]
+    policies = {
+        'fixed': lambda interval, changed, history: args.fixed_hours * HOUR,
+        'adaptive': lambda interval, changed, history: next_interval(
+            interval, changed, args.min_minutes * MINUTE, args.max_hours * HOUR,
+            initial=args.fixed_hours * HOUR, history=history),
+    }
+
+    print(f"{args.hot} hot sources (change every {args.hot_every} min in match windows), "
+          f"{args.static} static sources, one week")
+    # A fixed interval short enough to keep hot sources about as fresh as the adaptive schedule does
+    policies['fixed-1h'] = lambda interval, changed, history: HOUR
+    for name, policy in policies.items():
+        fetches, stale = 0, {True: [], False: []}
+        for hot, changes in sources:
+            count, staleness = simulate(changes, policy)
+            fetches += count
+            stale[hot] += staleness
+        print(f"{name:<9} fetches={fetches:<6} hot staleness={sum(stale[True]) / len(stale[True]) / MINUTE:6.1f} min  "
+              f"static staleness={sum(stale[False]) / len(stale[False]) / MINUTE:6.1f} min")
+
+
+if __name__ == '__main__':
+    main()
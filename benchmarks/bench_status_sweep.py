@@ -0,0 +1,151 @@
+"""
+Benchmark a channel status sweep against the stub Acestream engine: the
+previous fixed chunks and sleeps vs. a fixed concurrency without sleeps vs.
+the adaptive (AIMD) concurrency of ChannelStatusService.check_channels.
+
+``--channels`` channels are seeded in a file-backed SQLite database and
+checked against benchmarks/stub_acestream_engine.py served in-process; its
+engine options (capacity, latency, failure modes) are accepted here too.
+The legacy sweep sleeps about 2 seconds per check, so it only runs over
+``--legacy-sample`` channels and its rate is reported from that.
+
+Usage:
+    python benchmarks/bench_status_sweep.py --channels 2000 --capacity 8 --latency 0.05
+    python benchmarks/bench_status_sweep.py --channels 2000 --capacity 8 --overload reject
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ['TESTING'] = '1'
+
+from aiohttp import web  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from app.extensions import db  # noqa: E402
+from app.models import AcestreamChannel  # noqa: E402
+from app.services.channel_status_service import ChannelStatusService, StatusSweep  # noqa: E402
+from app.utils.db_writer import db_writer  # noqa: E402
+from app.utils.engine_pool import EnginePool  # noqa: E402
+from app.utils.http_client import http_clients  # noqa: E402
+from stub_acestream_engine import add_engine_arguments, engine_from_arguments  # noqa: E402
+
+
+async def legacy_check_channels(service, channels, concurrency=2):
+    """ChannelStatusService.check_channels as it was."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check_with_semaphore(channel):
+        async with semaphore:
+            result = await service.check_channel(channel)
+            await asyncio.sleep(2)
+            return result
+
+    results = []
+    for i in range(0, len(channels), 2):
+        chunk = channels[i:i + 2]
+        results.extend(await asyncio.gather(*(check_with_semaphore(channel) for channel in chunk)))
+        await asyncio.sleep(2)
+    return results
+
+
+async def fixed_check_channels(service, channels, concurrency):
+    """A plain semaphore: as many checks at once as configured, whatever the engine copes with."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(channel):
+        async with semaphore:
+            return await service.check_channel(channel)
+
+    return await asyncio.gather(*(check(channel) for channel in channels))
+
+
+async def run(args, app, channels):
+    engine = engine_from_arguments(args)
+    runner = web.AppRunner(engine.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    service = ChannelStatusService()
+    service.engines = EnginePool([f'http://127.0.0.1:{port}'])
+    rows = []
+
+    async def measure(name, check, count):
+        before = dict(engine.stats)
+        start = time.perf_counter()
+        with app.app_context():
+            await check(channels[:count])
+        elapsed = time.perf_counter() - start
+        errors = sum(engine.stats[key] - before[key] for key in ('rejected', 'failed', 'hung'))
+        rows.append((name, count, elapsed, errors))
+
+    try:
+        await measure('legacy', lambda batch: legacy_check_channels(service, batch), args.legacy_sample)
+        engine.stats['peak_in_flight'] = 0
+        await measure(f'fixed-{args.max_concurrency}',
+                      lambda batch: fixed_check_channels(service, batch, args.max_concurrency), len(channels))
+        sweep = StatusSweep()
+        await measure('adaptive', lambda batch: service.check_channels(
+            batch, max_concurrency=args.max_concurrency, sweep=sweep), len(channels))
+    finally:
+        await http_clients.close()
+        await runner.cleanup()
+    return rows, sweep
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=2000)
+    parser.add_argument('--max-concurrency', type=int, default=32, help='Ceiling of the adaptive sweep')
+    parser.add_argument('--legacy-sample', type=int, default=8, help='Channels checked by the legacy sweep')
+    parser.add_argument('--writer', action=argparse.BooleanOptionalAction, default=True,
+                        help='Write results through the database writer thread, as the app does')
+    parser.add_argument('--flush-interval', type=float, default=0.05)
+    add_engine_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                          SQLALCHEMY_TRACK_MODIFICATIONS=False)
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.bulk_insert_mappings(AcestreamChannel, [
+                {'id': f'{i:040x}', 'name': f'Channel {i}', 'status': 'active'} for i in range(args.channels)
+            ])
+            db.session.commit()
+            channels = AcestreamChannel.query.order_by(AcestreamChannel.id).all()
+            db.session.expunge_all()
+        if args.writer:
+            db_writer.flush_interval = args.flush_interval
+            db_writer.start(app)
+        try:
+            rows, sweep = asyncio.run(run(args, app, channels))
+        finally:
+            db_writer.stop()
+
+    print(f"{args.channels} channels, engine capacity {args.capacity}, {args.latency * 1000:.0f} ms per check, "
+          f"overload={args.overload}")
+    for name, count, elapsed, errors in rows:
+        print(f"{name:<10} {count:>6} checks  {elapsed:7.2f}s  {count / elapsed:7.1f} checks/s  "
+              f"{errors:>5} engine errors  est. {args.channels / (count / elapsed) / 60:7.1f} min per sweep")
+    limiter = sweep.limiter.get_stats()
+    if args.writer:
+        stats = db_writer.get_stats()
+        print(f"database writer: {stats['intents']} writes in {stats['batches']} transactions, "
+              f"{stats['retries']} lock retries")
+    print(f"adaptive concurrency ended at {limiter['limit']} (peak {limiter['peak_in_flight']}, "
+          f"{limiter['decreases']} decreases)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+A stand-in Acestream engine answering ``/ace/getstream?method=get_status``
+and ``/search`` requests, for benchmarking status checks and searches
+offline. ``/server/api`` answers health checks (``method=get_status``) and
+``method=get_content_id`` at once.
+
+The engine serves ``--capacity`` requests at a time, each taking
+``--latency`` seconds (plus up to ``--jitter``). Requests beyond capacity
+queue, so latency grows with load, or with ``--overload reject`` get an
+immediate HTTP 503. A share of requests can fail with HTTP 500
+(``--failure-rate``) or hang until the client gives up (``--hang-rate``),
+and a share of channels is reported offline (``--offline-rate``).
+
+Usage:
+    python benchmarks/stub_acestream_engine.py --port 6878 --capacity 8 --latency 0.05
+"""
+import asyncio
+import argparse
+import random
+from typing import Dict
+
+from aiohttp import web
+
+
+class StubEngine:
+    """Engine behaviour and counters; :meth:`make_app` serves it."""
+
+    def __init__(self, capacity: int = 8, latency: float = 0.05, jitter: float = 0.0, overload: str = 'queue',
+                 failure_rate: float = 0.0, hang_rate: float = 0.0, offline_rate: float = 0.0, seed: int = 0):
+        self.capacity = capacity
+        self.latency = latency
+        self.jitter = jitter
+        self.overload = overload
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.offline_rate = offline_rate
+        self.random = random.Random(seed)
+        self.stats: Dict[str, int] = {'requests': 0, 'rejected': 0, 'failed': 0, 'hung': 0, 'peak_in_flight': 0}
+        self._in_flight = 0
+        self._slots = None
+
+    def is_live(self, channel_id: str) -> bool:
+        # Stable per channel, so repeated sweeps agree
+        return random.Random(channel_id).random() >= self.offline_rate
+
+    async def _serve(self, respond) -> web.Response:
+        """Take a slot for ``latency`` seconds, failing as configured, then answer with ``respond()``."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        self.stats['requests'] += 1
+        self._in_flight += 1
+        self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+        try:
+            if self.overload == 'reject' and self._slots.locked():
+                self.stats['rejected'] += 1
+                return web.Response(status=503, text='Engine busy')
+            roll = self.random.random()
+            async with self._slots:
+                if roll < self.hang_rate:
+                    self.stats['hung'] += 1
+                    await asyncio.sleep(3600)
+                await asyncio.sleep(self.latency + self.random.random() * self.jitter)
+            if roll < self.hang_rate + self.failure_rate:
+                self.stats['failed'] += 1
+                return web.Response(status=500, text='Internal error')
+            return respond()
+        finally:
+            self._in_flight -= 1
+
+    async def get_status(self, request: web.Request) -> web.Response:
+        def respond():
+            if self.is_live(request.query.get('id', '')):
+                return web.json_response({'response': {'is_live': 1, 'status': 'dl'}, 'error': None})
+            return web.json_response({'response': None, 'error': 'failed to load content'})
+        return await self._serve(respond)
+
+    async def search(self, request: web.Request) -> web.Response:
+        query = request.query.get('query', '')
+        return await self._serve(lambda: web.json_response({'result': {'total': 1, 'results': [
+            {'name': f'{query or "Channel"} 1', 'items': [{'infohash': f'{abs(hash(query)):040x}'[:40]}]}
+        ]}}))
+
+    async def server_api(self, request: web.Request) -> web.Response:
+        method = request.query.get('method')
+        if method == 'get_status':
+            return web.json_response({'result': {'version': {'version': 'stub', 'platform': 'stub'}}})
+        if method == 'get_content_id':
+            return web.json_response({'result': {'content_id': request.query.get('infohash')}})
+        return web.json_response({'error': f'unknown method {method}'}, status=400)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/ace/getstream', self.get_status)
+        app.router.add_get('/search', self.search)
+        app.router.add_get('/server/api', self.server_api)
+        return app
+
+
+def add_engine_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--capacity', type=int, default=8, help='Requests the engine serves at once')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds per request')
+    parser.add_argument('--overload', choices=('queue', 'reject'), default='queue',
+                        help='Queue requests beyond capacity or answer them with HTTP 503')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests failing with HTTP 500')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='Share of requests never answered')
+    parser.add_argument('--offline-rate', type=float, default=0.2, help='Share of channels reported offline')
+
+
+def engine_from_arguments(args: argparse.Namespace) -> StubEngine:
+    return StubEngine(capacity=args.capacity, latency=args.latency, jitter=args.jitter, overload=args.overload,
+                      failure_rate=args.failure_rate, hang_rate=args.hang_rate, offline_rate=args.offline_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6878)
+    add_engine_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(engine_from_arguments(args).make_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""add content hash to epg programs
+
+Revision ID: 20261017_add_content_hash_to_epg_programs
+Revises: 20250412_add_epg_channels_update_tv_channels
+Create Date: 2026-10-17 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic
+revision = '20261017_add_content_hash_to_epg_programs'
+down_revision = '20250412_add_epg_channels_update_tv_channels'
+branch_labels = None
+depends_on = None
+
+def has_table(table_name):
+    """Check if a table exists"""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return table_name in insp.get_table_names()
+
+def has_column(table, column):
+    """Check if a column exists in a table"""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    columns = [col['name'] for col in insp.get_columns(table)]
+    return column in columns
+
+def upgrade():
+    # Existing rows keep a NULL hash and are rewritten once on the next refresh
+    if has_table('epg_programs') and not has_column('epg_programs', 'content_hash'):
+        with op.batch_alter_table('epg_programs') as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(40), nullable=True))
+
+
+def downgrade():
+    if has_table('epg_programs') and has_column('epg_programs', 'content_hash'):
+        with op.batch_alter_table('epg_programs') as batch_op:
+            batch_op.drop_column('content_hash')
@@ -0,0 +1,51 @@
+"""add fetch validators to scraped urls
+
+Revision ID: 20261017_add_fetch_validators_to_scraped_urls
+Revises: 20261017_add_fetch_cache_fields_to_epg_sources
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic
+revision = '20261017_add_fetch_validators_to_scraped_urls'
+down_revision = '20261017_add_fetch_cache_fields_to_epg_sources'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('etag', sa.String(255)),
+    ('last_modified', sa.String(64)),
+    ('content_digest', sa.String(64)),
+    ('content_unchanged', sa.Boolean()),
+]
+
+def has_table(table_name):
+    """Check if a table exists"""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return table_name in insp.get_table_names()
+
+def has_column(table, column):
+    """Check if a column exists in a table"""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    columns = [col['name'] for col in insp.get_columns(table)]
+    return column in columns
+
+def upgrade():
+    if has_table('scraped_urls'):
+        with op.batch_alter_table('scraped_urls') as batch_op:
+            for name, column_type in COLUMNS:
+                if not has_column('scraped_urls', name):
+                    batch_op.add_column(sa.Column(name, column_type, nullable=True))
+
+
+def downgrade():
+    if has_table('scraped_urls'):
+        with op.batch_alter_table('scraped_urls') as batch_op:
+            for name, _ in COLUMNS:
+                if has_column('scraped_urls', name):
+                    batch_op.drop_column(name)
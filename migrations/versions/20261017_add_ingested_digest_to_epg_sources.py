@@ -0,0 +1,48 @@
+"""add ingested digest to epg sources
+
+Revision ID: 20261017_add_ingested_digest_to_epg_sources
+Revises: 20261017_add_rescrape_schedule_to_scraped_urls
+Create Date: 2026-10-17 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic
+revision = '20261017_add_ingested_digest_to_epg_sources'
+down_revision = '20261017_add_rescrape_schedule_to_scraped_urls'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('ingested_digest', sa.String(64)),
+]
+
+def has_table(table_name):
+    """Check if a table exists"""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return table_name in insp.get_table_names()
+
+def has_column(table, column):
+    """Check if a column exists in a table"""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    columns = [col['name'] for col in insp.get_columns(table)]
+    return column in columns
+
+def upgrade():
+    if has_table('epg_sources'):
+        with op.batch_alter_table('epg_sources') as batch_op:
+            for name, column_type in COLUMNS:
+                if not has_column('epg_sources', name):
+                    batch_op.add_column(sa.Column(name, column_type, nullable=True))
+
+
+def downgrade():
+    if has_table('epg_sources'):
+        with op.batch_alter_table('epg_sources') as batch_op:
+            for name, _ in COLUMNS:
+                if has_column('epg_sources', name):
+                    batch_op.drop_column(name)
@@ -40,7 +40,7 @@ def reset_config():
     Config._instance = original_instance
 
 @pytest.fixture(scope='function')
-def app():
+def app(reset_singletons):
     """Create application for the tests."""
     # Set testing environment
     os.environ['TESTING'] = '1'
@@ -209,6 +209,14 @@ def setup_task_manager(app, monkeypatch):
     
     return task_manager
 
+@pytest.fixture(autouse=True)
+def clear_artifact_cache():
+    """Don't let rendered playlists leak between tests."""
+    from app.services.artifact_cache import artifact_cache
+    artifact_cache.clear()
+    yield
+    artifact_cache.clear()
+
 # Fix the clean_app_contexts fixture
 @pytest.fixture(autouse=True)
 def clean_app_contexts():
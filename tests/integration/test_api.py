@@ -5,6 +5,7 @@ from app.models import ScrapedURL, AcestreamChannel
 from app.utils.config import Config
 from app.services import ScraperService
 from app.models.url_types import create_url_object
+from app.extensions import db
 
 def test_get_playlist(client, db_session, config):
     # Override config for test
@@ -132,4 +133,73 @@ def test_get_playlist(client):
     """Test getting a playlist."""
     response = client.get('/api/playlists/m3u')
     assert response.status_code == 200
-    # other assertions
\ No newline at end of file
+    # other assertions
+
+
+def test_playlist_etag_and_not_modified(client, db_session, setup_test_channels):
+    """Unchanged polls get a 304 without touching the database; changes produce a new ETag."""
+    from sqlalchemy import event
+
+    # The first request is streamed while it renders; the next one is served from the cache
+    streamed = client.get('/api/playlists/m3u')
+    assert streamed.status_code == 200
+    assert 'ETag' not in streamed.headers
+    assert b'Sports Channel' in streamed.data
+    response = client.get('/api/playlists/m3u')
+    assert response.status_code == 200
+    assert response.data == streamed.data
+    etag = response.headers['ETag']
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        cached = client.get('/api/playlists/m3u', headers={'If-None-Match': etag})
+        legacy = client.get('/playlist.m3u', headers={'If-None-Match': etag})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert cached.status_code == 304
+    assert legacy.status_code == 304
+    assert cached.data == b''
+    assert statements == []
+
+    channel = db_session.get(AcestreamChannel, '123')
+    channel.name = 'Renamed Channel'
+    db_session.commit()
+
+    response = client.get('/api/playlists/m3u', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Renamed Channel' in response.data
+    response = client.get('/api/playlists/m3u', headers={'If-None-Match': etag})
+    assert response.headers['ETag'] != etag
+
+
+def test_playlist_is_served_gzipped_when_accepted(client, db_session):
+    """Gzip clients get the pre-compressed document, streamed first and from the cache after."""
+    import gzip
+    db_session.add_all([AcestreamChannel(id=f'{i:040d}', name=f'Channel {i}', group='Sports', status='active')
+                        for i in range(40)])
+    db_session.commit()
+    accept = {'Accept-Encoding': 'gzip, deflate'}
+
+    streamed = client.get('/api/playlists/m3u', headers=accept)
+    assert streamed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in streamed.headers['Vary']
+    plain = gzip.decompress(streamed.data)
+    assert b'Channel 39' in plain
+
+    cached = client.get('/api/playlists/m3u', headers=accept)
+    assert cached.headers['Content-Encoding'] == 'gzip'
+    assert cached.data == streamed.data
+    assert int(cached.headers['Content-Length']) == len(cached.data) < len(plain)
+    assert 'Accept-Encoding' in cached.headers['Vary']
+
+    identity = client.get('/api/playlists/m3u')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.data == plain
+    assert identity.headers['ETag'] != cached.headers['ETag']
+
+    not_modified = client.get('/api/playlists/m3u', headers={**accept, 'If-None-Match': cached.headers['ETag']})
+    assert not_modified.status_code == 304
+    refused = client.get('/api/playlists/m3u', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
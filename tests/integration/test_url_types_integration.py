@@ -89,6 +89,11 @@ async def test_scraper_service_with_url_types(db_session):
         mock_zeronet_scraper = AsyncMock()
         mock_zeronet_scraper.scrape.return_value = ([("456", "ZeroNet Channel", {})], "OK")
         
+        for mock_scraper in (mock_http_scraper, mock_zeronet_scraper):
+            mock_scraper.use_previous_fetch = MagicMock()
+            mock_scraper.unchanged = False
+            mock_scraper.fetch_state = MagicMock(return_value={'unchanged': False})
+        
         # Configure mock to return different scrapers based on URL
         def side_effect(url, url_type='auto', *args, **kwargs):
             if url == regular_url:
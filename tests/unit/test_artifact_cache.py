@@ -0,0 +1,92 @@
+from app.services.artifact_cache import Artifact, ArtifactCache, DataGeneration
+
+
+def test_generation_picks_up_bumps_from_other_processes(tmp_path):
+    """Two instances sharing the file behave like two worker processes."""
+    path = tmp_path / 'data_generation'
+    ours, theirs = DataGeneration(path), DataGeneration(path)
+
+    first = ours.current()
+    assert ours.current() == first
+
+    theirs.bump()
+    assert ours.current() == first + 1
+    assert ours.current() == first + 1
+
+
+def test_artifacts_are_keyed_by_params_and_generation(tmp_path):
+    generation = DataGeneration(tmp_path / 'data_generation')
+    cache = ArtifactCache(generation)
+    renders = []
+
+    def render(text):
+        renders.append(text)
+        return text
+
+    a = cache.get_or_render('playlist.m3u', {'search': None}, lambda: render('all'), 'audio/x-mpegurl')
+    b = cache.get_or_render('playlist.m3u', {'search': None}, lambda: render('all'), 'audio/x-mpegurl')
+    cache.get_or_render('playlist.m3u', {'search': 'x'}, lambda: render('some'), 'audio/x-mpegurl')
+    assert a is b
+    assert renders == ['all', 'some']
+
+    generation.bump()
+    c = cache.get_or_render('playlist.m3u', {'search': None}, lambda: render('all'), 'audio/x-mpegurl')
+    assert c is not a
+    # Same content, same strong ETag
+    assert c.etag == a.etag
+    assert renders == ['all', 'some', 'all']
+
+
+def test_render_is_not_cached_when_data_changes_meanwhile(tmp_path):
+    generation = DataGeneration(tmp_path / 'data_generation')
+    cache = ArtifactCache(generation)
+
+    def render():
+        generation.bump()
+        return 'stale'
+
+    cache.get_or_render('epg.xml', {}, render, 'application/xml')
+    assert cache.get('epg.xml', {}) is None
+
+
+def test_streamed_documents_are_cached_once_complete(tmp_path):
+    cache = ArtifactCache(DataGeneration(tmp_path / 'data_generation'))
+
+    stream = cache.stream('tv-channels.m3u', {}, lambda: iter(['#EXTM3U', '\nlast']), 'audio/x-mpegurl')
+    assert next(stream) == b'#EXTM3U'
+    assert cache.get('tv-channels.m3u', {}) is None
+    assert list(stream) == [b'\nlast']
+    assert cache.get('tv-channels.m3u', {}).body == b'#EXTM3U\nlast'
+
+    large = cache.stream('epg.xml', {}, lambda: iter(['x' * 10, 'y' * 10]), 'application/xml', max_size=15)
+    assert b''.join(large) == b'x' * 10 + b'y' * 10
+    assert cache.get('epg.xml', {}) is None
+
+
+def test_streamed_documents_keep_a_gzipped_copy(tmp_path):
+    import gzip
+    cache = ArtifactCache(DataGeneration(tmp_path / 'data_generation'))
+    lines = [f'#EXTINF:-1,Channel {i}\nacestream://{i:040d}\n' for i in range(200)]
+    document = ''.join(lines).encode('utf-8')
+
+    sent = b''.join(cache.stream('playlist.m3u', {}, lambda: iter(lines), 'audio/x-mpegurl', gzipped=True))
+    assert gzip.decompress(sent) == document
+    artifact = cache.get('playlist.m3u', {})
+    assert artifact.body == document
+    assert artifact.encoded('gzip') == sent
+    assert 'gzip' in artifact.available_encodings()
+    # Same bytes as compressing the cached body, in this or any other process
+    assert Artifact(document, 'audio/x-mpegurl').encoded('gzip') == sent
+
+
+def test_documents_too_large_to_cache_plain_keep_only_the_gzipped_copy(tmp_path):
+    cache = ArtifactCache(DataGeneration(tmp_path / 'data_generation'))
+    document = 'x' * 100000
+
+    assert b''.join(cache.stream('epg.xml', {}, lambda: iter([document]), 'application/xml',
+                                 max_size=50000)) == document.encode()
+    artifact = cache.get('epg.xml', {})
+    assert artifact.body is None
+    assert artifact.size == len(document)
+    assert artifact.available_encodings() == ['gzip']
+    assert b''.join(artifact.iter_body()) == document.encode()
@@ -1,8 +1,11 @@
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from datetime import datetime, timezone
+from types import SimpleNamespace
 from app.services.channel_status_service import ChannelStatusService
 from app.models import AcestreamChannel
+from app.extensions import db
 
 # Add a mock for the ChannelStatusService
 @pytest.fixture
@@ -201,4 +204,135 @@ async def test_check_channels_concurrently():
         # Verify the channels were updated
         assert channels[0].is_online is True
         assert channels[1].is_online is False
-        assert channels[2].is_online is True
\ No newline at end of file
+        assert channels[2].is_online is True
+
+@pytest.mark.asyncio
+async def test_aimd_limiter_grows_while_healthy_and_halves_once_per_round():
+    from app.utils.aimd import AIMDLimiter
+
+    # Latencies of microseconds are noise: only failures count here
+    limiter = AIMDLimiter(initial=2, maximum=8, latency_tolerance=float('inf'))
+    for _ in range(40):
+        async with limiter.slot() as slot:
+            slot.record(True)
+    assert limiter.current == 8
+
+    # Failures of requests that started before the cut do not cut again
+    slots = []
+    for _ in range(4):
+        async with limiter.slot() as slot:
+            slots.append(slot)
+    for slot in slots:
+        slot.record(False)
+    assert limiter.current == 4 and limiter.decreases == 1
+
+
+@pytest.mark.asyncio
+async def test_sweep_adapts_to_an_overloaded_engine_and_honours_the_deadline(app):
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from app.services.channel_status_service import StatusSweep
+    from app.utils.engine_pool import EnginePool
+    from app.utils.http_client import http_clients
+
+    capacity, in_flight, peak = 3, [0], [0]
+
+    async def get_status(request):
+        # Busy beyond its capacity, like an engine with all its slots taken
+        if in_flight[0] >= capacity:
+            return web.Response(status=503)
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.005)
+        finally:
+            in_flight[0] -= 1
+        return web.json_response({'response': {'is_live': 1}, 'error': None})
+
+    server_app = web.Application()
+    server_app.router.add_get('/ace/getstream', get_status)
+    server = TestServer(server_app)
+    await server.start_server()
+    try:
+        with app.app_context():
+            db.session.add_all(AcestreamChannel(id=f'{i:040x}', name=f'Channel {i}') for i in range(60))
+            db.session.commit()
+            # Detached, as the channels handed over by the API request are
+            channels = AcestreamChannel.query.all()
+            db.session.expunge_all()
+
+            service = ChannelStatusService()
+            service.engines = EnginePool([str(server.make_url(''))])
+            sweep = StatusSweep()
+            results = await service.check_channels(channels, max_concurrency=12, sweep=sweep)
+            assert len(results) == 60 and sweep.checked == 60
+            assert sweep.online + sweep.engine_errors == 60
+            # The limiter backs off to what the engine serves instead of piling on rejections
+            assert sweep.limiter.decreases >= 1 and sweep.engine_errors < 20
+            assert sweep.to_dict()['checks_per_second'] > 0
+            assert AcestreamChannel.query.filter_by(is_online=True).count() == sweep.online
+
+            sweep = StatusSweep()
+            assert await service.check_channels(channels, deadline=1e-9, sweep=sweep) == []
+            assert sweep.deadline_reached and sweep.skipped == 60
+    finally:
+        await http_clients.close()
+        await server.close()
+
+
+def test_concurrent_checks_of_a_channel_share_one_probe(app, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.channel_status_service import check_channel_status_shared, status_cache
+    from app.utils.background_loop import BackgroundLoop
+
+    probes = []
+
+    async def query_engine(self, channel):
+        probes.append(channel.id)
+        await asyncio.sleep(0.2)
+        return True, None
+
+    monkeypatch.setattr(ChannelStatusService, '_query_engine', query_engine)
+    loop = BackgroundLoop()
+    channel = SimpleNamespace(id='c' * 40, name='Popular')
+    with app.app_context():
+        db.session.add(AcestreamChannel(id=channel.id, name=channel.name))
+        db.session.commit()
+    try:
+        # Requests from several threads at once, like several clients asking
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: loop.run(check_channel_status_shared(app, channel, ttl=30)),
+                                    range(8)))
+        assert probes == [channel.id]
+        assert sorted(result['cache'] for result in results) == ['miss'] + ['shared'] * 7
+        assert all(result['is_online'] and result['status'] == 'online' for result in results)
+
+        # Within the TTL the result is reused; a TTL of 0 checks again
+        result = loop.run(check_channel_status_shared(app, channel, ttl=30))
+        assert result['cache'] == 'hit' and result['cache_hit'] and result['cache_age'] >= 0
+        result = loop.run(check_channel_status_shared(app, channel, ttl=0))
+        assert result['cache'] == 'miss' and not result['cache_hit'] and len(probes) == 2
+        with app.app_context():
+            assert db.session.get(AcestreamChannel, channel.id).is_online is True
+    finally:
+        loop.stop()
+        status_cache.invalidate(channel.id)
+
+
+@pytest.mark.asyncio
+async def test_failed_computations_are_shared_but_not_cached():
+    from app.utils.single_flight import SingleFlightCache
+
+    cache, calls = SingleFlightCache(), []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError('engine down')
+
+    outcomes = await asyncio.gather(*(cache.get('key', failing, ttl=30) for _ in range(3)), return_exceptions=True)
+    assert len(calls) == 1 and all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    with pytest.raises(RuntimeError):
+        await cache.get('key', failing, ttl=30)
+    assert len(calls) == 2
+    assert cache.get_stats()['cached'] == 0 and cache.get_stats()['shared'] == 2
@@ -0,0 +1,100 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.models import ScrapedURL, AcestreamChannel
+from app.scrapers.base import content_digest
+from app.services import ScraperService
+from app.utils.http_client import http_clients
+
+PAGE = '<html><body><div class="link-name">Sports One</div> acestream://{id}</body></html>'
+CHANNEL_ID = 'a' * 40
+
+
+def test_content_digest_ignores_whitespace_and_zeronet_tokens():
+    page = '<script>wrapper_nonce = "abc123"; ajax_key: "k1"</script>\n<p>acestream://1</p>'
+    same = '<script>wrapper_nonce = "zzz999";  ajax_key: "k2"</script> <p>acestream://1</p>'
+    assert content_digest(page) == content_digest(same)
+    assert content_digest(page) != content_digest(page.replace('acestream://1', 'acestream://2'))
+
+
+async def _serve(pages, requests, etag=None):
+    async def handler(request):
+        requests.append(dict(request.headers))
+        if etag and request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        headers = {'ETag': etag} if etag else {}
+        return web.Response(text=pages[0], content_type='text/html', headers=headers)
+
+    app = web.Application()
+    app.router.add_get('/page', handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('etag', ['"v1"', None])
+async def test_unchanged_pages_are_not_reprocessed(db_session, etag):
+    pages, requests = [PAGE.format(id=CHANNEL_ID)], []
+    server = await _serve(pages, requests, etag)
+    url = str(server.make_url('/page'))
+    db_session.add(ScrapedURL(url=url, url_type='regular'))
+    db_session.commit()
+    service = ScraperService()
+    try:
+        links, status = await service.scrape_url(url)
+        assert status == 'OK' and [link[0] for link in links] == [CHANNEL_ID]
+        record = service.url_repository.get_by_url(url)
+        assert record.etag == etag
+        assert record.content_digest == content_digest(pages[0])
+        assert not record.content_unchanged
+
+        # A manual edit survives an unchanged rescrape: the channels are not rewritten
+        channel = db_session.get(AcestreamChannel, CHANNEL_ID)
+        channel.name = 'Edited'
+        db_session.commit()
+
+        links, status = await service.scrape_url(url)
+        assert (links, status) == ([], 'OK')
+        assert requests[-1].get('If-None-Match') == etag
+        record = service.url_repository.get_by_url(url)
+        assert record.content_unchanged and record.status == 'OK'
+        assert record.content_digest == content_digest(pages[0])
+        # The first scrape found new channels, the second one nothing; a source
+        # that changed that recently is kept on the shortest interval
+        assert record.change_history == 'CU'
+        assert record.scrape_interval == 15 * 60 and record.next_scrape_at is not None
+        assert db_session.get(AcestreamChannel, CHANNEL_ID).name == 'Edited'
+
+        # Forced scrapes always process the page
+        links, status = await service.scrape_url(url, force=True)
+        assert [link[0] for link in links] == [CHANNEL_ID]
+        assert 'If-None-Match' not in requests[-1]
+        assert not service.url_repository.get_by_url(url).content_unchanged
+    finally:
+        await http_clients.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_pages_linking_playlists_are_always_scraped(db_session):
+    pages, requests = [PAGE.format(id=CHANNEL_ID) + '<a href="/list.m3u">list</a>'], []
+    server = await _serve(pages, requests, etag='"v1"')
+    url = str(server.make_url('/page'))
+    db_session.add(ScrapedURL(url=url, url_type='regular'))
+    db_session.commit()
+    service = ScraperService()
+    try:
+        await service.scrape_url(url)
+        record = service.url_repository.get_by_url(url)
+        # No validators are kept, so the next fetch cannot be answered with a 304
+        assert record.etag is None
+
+        links, status = await service.scrape_url(url)
+        assert 'If-None-Match' not in requests[-1]
+        assert CHANNEL_ID in [link[0] for link in links]
+        assert not service.url_repository.get_by_url(url).content_unchanged
+    finally:
+        await http_clients.close()
+        await server.close()
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask
+
+from app.extensions import db
+from app.models import AcestreamChannel, ScrapedURL
+from app.repositories import ChannelRepository, URLRepository
+from app.utils.db_writer import DatabaseWriter
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """An app on a file database, which the writer thread sees like the rest of the app does."""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp_path, 'writer.db')}",
+                      SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(AcestreamChannel(id=f'{i:040x}', name=f'Channel {i}') for i in range(20))
+        db.session.add(ScrapedURL(url='https://example.com/list', status='pending', error_count=0))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def writer(file_app):
+    writer = DatabaseWriter(flush_interval=0.05)
+    writer.register('channel_status', ChannelRepository().write_statuses)
+    writer.register('url_status', URLRepository().write_statuses)
+    writer.start(file_app)
+    yield writer
+    writer.stop()
+
+
+def test_concurrent_writes_are_batched_and_coalesced(file_app, writer):
+    now = datetime.now(timezone.utc)
+
+    async def check(i, online):
+        await writer.write('channel_status', {'channel_id': f'{i:040x}', 'online': online,
+                                              'check_time': now, 'error': None if online else 'offline'},
+                           key=f'{i:040x}')
+
+    async def main():
+        # Every channel is written twice; the second result wins
+        await asyncio.gather(*(check(i, False) for i in range(20)), *(check(i, i % 2 == 0) for i in range(20)))
+        await writer.write('url_status', {'scraped_url': 'https://example.com/list', 'new_status': 'failed',
+                                          'error': 'timeout', 'processed_at': now})
+        await writer.write('url_status', {'scraped_url': 'https://example.com/list', 'new_status': 'failed',
+                                          'error': 'timeout', 'processed_at': now})
+
+    asyncio.run(main())
+    with file_app.app_context():
+        online = {channel.id: channel.is_online for channel in AcestreamChannel.query.all()}
+        assert online == {f'{i:040x}': i % 2 == 0 for i in range(20)}
+        # Not coalesced without a key: both errors count
+        assert ScrapedURL.query.one().error_count == 2
+    stats = writer.get_stats()
+    assert stats['batches'] < stats['intents'] == 42
+    assert stats['coalesced'] > 0 and stats['failed'] == 0
+
+
+def test_a_failing_intent_fails_alone(file_app, writer):
+    def bad():
+        raise ValueError('bad intent')
+
+    def rename():
+        channel = AcestreamChannel.query.get(f'{0:040x}')
+        channel.name = 'Renamed'
+        return channel.name
+
+    futures = [writer.submit_call(rename), writer.submit_call(bad),
+               writer.submit('channel_status', {'channel_id': f'{1:040x}', 'online': True,
+                                                'check_time': datetime.now(timezone.utc), 'error': None})]
+    assert futures[0].result(timeout=5) == 'Renamed'
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) is None
+    with pytest.raises(ValueError):
+        writer.submit('unknown', {})
+
+    with file_app.app_context():
+        assert AcestreamChannel.query.get(f'{0:040x}').name == 'Renamed'
+        assert AcestreamChannel.query.get(f'{1:040x}').is_online is True
+
+
+def test_exclusive_holds_the_writer_off(file_app, writer):
+    with writer.exclusive():
+        future = writer.submit_call(lambda: threading.current_thread().name)
+        time.sleep(0.2)
+        assert not future.done()
+    assert future.result(timeout=5) == 'db-writer'
+
+
+def test_writes_run_inline_until_started(file_app):
+    writer = DatabaseWriter()
+    writer.register('url_status', URLRepository().write_statuses)
+    with file_app.app_context():
+        future = writer.submit('url_status', {'scraped_url': 'https://example.com/list', 'new_status': 'OK',
+                                              'error': None, 'processed_at': datetime.now(timezone.utc)})
+        assert future.done() and future.result() is None
+        assert ScrapedURL.query.one().status == 'OK'
+        assert writer.submit_call(lambda: threading.current_thread().name).result() == \
+            threading.current_thread().name
+
+
+def test_a_failed_scrape_record_leaves_no_partial_writes(file_app, writer, monkeypatch):
+    from types import SimpleNamespace
+    from app.services import scraper_service
+    from app.services.scraper_service import ScraperService
+
+    def failing_outcome(*args, **kwargs):
+        raise RuntimeError('scheduling failed')
+
+    monkeypatch.setattr(scraper_service, 'apply_outcome', failing_outcome)
+    scraper = SimpleNamespace(unchanged=False, fetch_state=lambda: {'unchanged': False, 'etag': '"v2"'})
+    links = [(f'{100 + i:040x}', f'New {i}', {}) for i in range(3)]
+    service = ScraperService()
+
+    with writer.exclusive():
+        # Queued together, so the writer takes them as one batch
+        record = writer.submit_call(
+            lambda: service._record_success('https://example.com/list', 'regular', links, scraper,
+                                            {'min_interval': 60, 'max_interval': 3600, 'initial': 3600}))
+        status = writer.submit('channel_status', {'channel_id': f'{2:040x}', 'online': False,
+                                                  'check_time': datetime.now(timezone.utc), 'error': 'offline'})
+    with pytest.raises(RuntimeError):
+        record.result(timeout=5)
+    assert status.result(timeout=5) is None
+
+    with file_app.app_context():
+        # Nothing the failed record wrote before it raised was committed
+        assert AcestreamChannel.query.filter_by(source_url='https://example.com/list').count() == 0
+        url = ScrapedURL.query.one()
+        assert url.status == 'pending' and url.etag is None
+        # The status write queued with it was written on its own
+        assert AcestreamChannel.query.get(f'{2:040x}').is_online is False
+
+
+def test_only_online_flips_start_a_new_data_generation(file_app, writer, monkeypatch):
+    from app.services.artifact_cache import data_generation
+    bumps = []
+    monkeypatch.setattr(data_generation, 'bump', lambda: bumps.append(True))
+
+    def sweep(online, error=None):
+        check_time = datetime.now(timezone.utc)
+        asyncio.run(writer.write('channel_status', {'channel_id': f'{0:040x}', 'online': online,
+                                                    'check_time': check_time, 'error': error},
+                                 key=f'{0:040x}'))
+        return len(bumps)
+
+    assert sweep(True) == 1
+    # Rechecks that only move the check time or error leave cached playlists valid
+    assert sweep(True) == 1
+    assert sweep(False, 'offline') == 2
+    assert sweep(False, 'still offline') == 2
+    with file_app.app_context():
+        channel = AcestreamChannel.query.get(f'{0:040x}')
+        assert channel.is_online is False and channel.check_error == 'still offline'
+
+
+def test_queued_writes_go_in_between_epg_sync_batches(file_app, tmp_path):
+    import io
+    from unittest.mock import MagicMock, patch
+    from app.models.epg_source import EPGSource
+    from app.services.epg_refresh import EPGRefreshPipeline
+    from app.services.epg_service import EPGService
+    from app.services.epg_source_cache import EPGSourceCache
+    from app.utils.db_writer import db_writer
+
+    programmes = ''.join(
+        f'<programme start="2025052606{i:02d}00 +0000" stop="2025052606{i + 1:02d}00 +0000" channel="one">'
+        f'<title>Show {i}</title></programme>' for i in range(4))
+    guide = f'<tv><channel id="one"><display-name>One</display-name></channel>{programmes}</tv>'.encode()
+    written_meanwhile = []
+
+    with file_app.app_context():
+        source = EPGSource(url='http://example.com/guide.xml', enabled=True)
+        db.session.add(source)
+        db.session.commit()
+        service = EPGService()
+        service.source_cache = EPGSourceCache(tmp_path)
+        service.program_batch_size = 1
+        parse = service._iter_prepared_records
+
+        def parse_and_check_status(stream):
+            for index, record in enumerate(parse(stream)):
+                if index == 3:
+                    # Two programme batches are committed; the writer is not held off for the whole guide
+                    written_meanwhile.append(db_writer.submit('channel_status', {
+                        'channel_id': f'{1:040x}', 'online': True,
+                        'check_time': datetime.now(timezone.utc), 'error': None}).result(timeout=5))
+                yield record
+
+        service._iter_prepared_records = parse_and_check_status
+        response = MagicMock(status_code=200, raw=io.BytesIO(guide), headers={})
+        # The pipeline shares the app's writer
+        db_writer.start(file_app)
+        try:
+            with patch('app.services.epg_source_cache.requests.get', return_value=response):
+                service._reset_refresh_stats()
+                EPGRefreshPipeline(service, per_host_limit=1, parse_workers=0).run([source])
+        finally:
+            db_writer.stop()
+        assert service.refresh_stats['inserted'] == 4
+    assert written_meanwhile == [None]
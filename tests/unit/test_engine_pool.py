@@ -0,0 +1,157 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import requests
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services import acestream_status_service
+from app.services.acestream_status_service import AcestreamStatusService
+from app.services.channel_status_service import ChannelStatusService
+from app.utils.engine_pool import EnginePool, normalize_engine_url
+from app.utils.http_client import http_clients
+
+
+def test_least_outstanding_routing_with_sticky_channels():
+    pool = EnginePool(['engine-a:6878', 'http://engine-b:6878/', 'http://engine-a:6878'])
+    assert pool.urls == ['http://engine-a:6878', 'http://engine-b:6878']
+
+    with pool.acquire('one') as first, pool.acquire('two') as second:
+        # The second request goes to the idle engine
+        assert first.url != second.url
+        assert first.outstanding == second.outstanding == 1
+        with pool.acquire('one') as again:
+            assert again is first and first.outstanding == 2
+        with pool.acquire() as unkeyed:
+            # Tied on outstanding requests: the engine that served fewer
+            assert unkeyed is second and second.outstanding == 2
+    assert all(engine.outstanding == 0 for engine in pool.engines.values())
+    assert pool.get_stats()['assigned_channels'] == 2
+
+    # Keeps the engines and their channels that are still configured
+    pool.configure(['http://engine-b:6878', 'http://engine-c:6878'])
+    assert pool.urls == ['http://engine-b:6878', 'http://engine-c:6878']
+    assert pool.get_stats()['assigned_channels'] == 1
+
+
+def test_failing_engine_is_marked_down_and_its_channels_fail_over():
+    pool = EnginePool(['http://engine-a', 'http://engine-b'], failure_threshold=2)
+    with pool.acquire('channel') as engine:
+        down = engine
+    for _ in range(2):
+        pool.report(down, False, 'HTTP 503')
+    assert not down.healthy and pool.get_stats()['healthy'] == 1
+
+    with pool.acquire('channel') as engine:
+        assert engine is not down
+    # Excluded engines are passed over only while there is another one
+    with pool.acquire('other', exclude=[engine.url]) as fallback:
+        assert fallback is down
+
+    pool.report(down, True)
+    assert down.healthy and down.consecutive_failures == 0
+
+
+def test_engine_status_page_checks_an_engine_of_the_pool(monkeypatch):
+    pool = EnginePool(['http://engine-a'], failure_threshold=1)
+    monkeypatch.setattr(acestream_status_service, 'engine_pool', pool)
+    monkeypatch.delenv('ENABLE_ACESTREAM_ENGINE', raising=False)
+
+    def refused(url, timeout):
+        raise requests.ConnectionError('refused')
+
+    monkeypatch.setattr(acestream_status_service.requests, 'get', refused)
+    status = AcestreamStatusService().check_status()
+    assert status['available'] is False and status['engine_url'] == 'http://engine-a'
+    # The failed check counts against the engine like any other request
+    engine = pool.engines['http://engine-a']
+    assert not engine.healthy and engine.outstanding == 0
+
+    online = SimpleNamespace(status_code=200, json=lambda: {'result': {'version': {'version': '3.2'},
+                                                                       'connected': True}})
+    monkeypatch.setattr(acestream_status_service.requests, 'get', lambda url, timeout: online)
+    status = AcestreamStatusService().check_status()
+    assert status['available'] and status['version'] == '3.2' and engine.healthy
+
+
+def test_setting_the_engine_urls_configures_the_pool(monkeypatch):
+    from app.utils import config as config_module
+    from app.utils.config import Config
+    pool = EnginePool()
+    monkeypatch.setattr(config_module, 'engine_pool', pool)
+    # Settings stay in this test; stored ones are cached class-wide and would leak into later tests
+    settings = {}
+    monkeypatch.setattr(Config, 'get', lambda self, key, default=None: settings.get(key, default))
+    monkeypatch.setattr(Config, 'set', lambda self, key, value: settings.__setitem__(key, value))
+
+    Config().ace_engine_urls = ['engine-a:6878', 'engine-b:6878']
+    assert pool.urls == ['http://engine-a:6878', 'http://engine-b:6878']
+
+
+def test_created_app_serves_from_the_configured_engines(monkeypatch):
+    from app import create_app
+    from app.utils import config as config_module
+    pool = EnginePool()
+    monkeypatch.setattr(config_module, 'engine_pool', pool)
+
+    # Before any task manager or config change, as in scripts and tests
+    create_app('testing')
+    assert pool.size and pool.urls == [normalize_engine_url(url) for url in config_module.Config().ace_engine_urls]
+
+
+def test_search_without_engines_fails_like_any_search(monkeypatch):
+    from app.services import acestream_search_service
+    monkeypatch.setattr(acestream_search_service, 'engine_pool', EnginePool())
+
+    result = acestream_search_service.AcestreamSearchService().search('news', page=2, page_size=5)
+    assert result['success'] is False and result['message'] == 'No Acestream engine configured'
+    assert result['results'] == [] and result['pagination']['page'] == 2
+
+
+@pytest.mark.asyncio
+async def test_status_checks_spread_over_engines_and_fail_over(app):
+    served = {}
+
+    def make_engine(name, status=200):
+        async def get_status(request):
+            served[name] = served.get(name, 0) + 1
+            await asyncio.sleep(0.01)
+            if status != 200:
+                return web.Response(status=status)
+            return web.json_response({'response': {'is_live': 1}, 'error': None})
+
+        async def server_api(request):
+            return web.json_response({'result': {}}, status=status)
+
+        server_app = web.Application()
+        server_app.router.add_get('/ace/getstream', get_status)
+        server_app.router.add_get('/server/api', server_api)
+        return TestServer(server_app)
+
+    servers = [make_engine('a'), make_engine('b'), make_engine('broken', status=503)]
+    for server in servers:
+        await server.start_server()
+    try:
+        with app.app_context():
+            service = ChannelStatusService()
+            service.engines = pool = EnginePool([str(server.make_url('')) for server in servers])
+            await pool.check_health()
+            assert pool.get_stats()['healthy'] == 3
+
+            channels = [SimpleNamespace(id=f'{i:040x}', name=f'Channel {i}') for i in range(30)]
+            results = await asyncio.gather(*(service._query_engine(channel) for channel in channels))
+            # Every check succeeded, the broken engine's ones on another engine
+            assert all(online for online, _ in results)
+            assert served['a'] + served['b'] == 30 and served['a'] >= 10 and served['b'] >= 10
+            broken = pool.engines[str(servers[2].make_url('')).rstrip('/')]
+            assert not broken.healthy and broken.failures >= pool.failure_threshold
+
+            # Once down, the broken engine gets nothing
+            before = served['broken']
+            await asyncio.gather(*(service._query_engine(channel) for channel in channels))
+            assert served['broken'] == before
+    finally:
+        await http_clients.close()
+        for server in servers:
+            await server.close()
@@ -0,0 +1,149 @@
+import pytest
+from app.models.epg_string_mapping import EPGStringMapping
+from app.services.artifact_cache import DataGeneration
+from app.services.epg_mapping_rules import (
+    CompiledMappingRules, get_mapping_rules, invalidate_mapping_rules, mapping_generation
+)
+from app.utils.aho_corasick import AhoCorasick
+
+ROWS = [
+    (1, 'DAZN', 'dazn.es'),
+    (2, 'DAZN LaLiga', 'dazn.laliga.es'),
+    (3, 'laliga', 'movistar.laliga.es'),
+    (4, 'Eurosport 1', 'eurosport1.es'),
+    (5, 'Eurosport', 'eurosport.es'),
+    (6, '!test', ''),
+    (7, 'sport', 'generic.sport'),
+    (8, 'sports', 'generic.sports'),
+    (9, 'bein sports 1', 'bein1.es'),
+    (10, 'la 1', 'la1.es'),
+]
+
+NAMES = [
+    'DAZN LaLiga', 'DAZN LaLiga 2', 'DAZN F1', 'Movistar LaLiga', 'Eurosport 1 HD',
+    'Eurosport 2', 'TEST DAZN', 'bein sports 1', 'beIN Sports 2 (test)', 'La 1', 'la 10',
+    'Sky Sports', 'Unrelated', '',
+]
+
+
+def _reference(rows, name):
+    """The original scoring loop from EPGService._update_channel_epg."""
+    name_lower = name.lower()
+    for _, pattern, _ in rows:
+        if pattern.startswith('!') and pattern[1:].lower() in name_lower:
+            return 'excluded', pattern
+
+    potential = []
+    for row in rows:
+        pattern = row[1].lower()
+        if row[1].startswith('!') or pattern not in name_lower:
+            continue
+        score = len(pattern) * 10
+        if any(char.isdigit() for char in pattern):
+            score += 1500
+        if pattern == name_lower:
+            score += 10000
+        if name_lower.startswith(pattern):
+            score += 3000
+        pattern_words = pattern.split()
+        channel_words = name_lower.split()
+        matching_words = sum(1 for word in pattern_words if word in channel_words)
+        if matching_words == len(pattern_words):
+            score += 1000 * matching_words
+            if ' '.join(pattern_words) in ' '.join(channel_words):
+                score += 500
+        if pattern_words and channel_words and pattern_words[0] == channel_words[0]:
+            score += 1800
+        potential.append((row, score))
+
+    potential.sort(key=lambda item: item[1], reverse=True)
+    return ('mapped', potential[0][0][1]) if potential else None
+
+
+def _compiled(rules, name):
+    exclusion = rules.exclusion_for(name)
+    if exclusion:
+        return 'excluded', exclusion.search_pattern
+    best = rules.best_mapping(name)
+    return ('mapped', best.search_pattern) if best else None
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers', ''])
+    assert automaton.find_all('ushers') == {0, 1, 3, 4}
+    assert automaton.find_all('xyz') == {4}
+
+
+@pytest.mark.parametrize('rows', [
+    ROWS,
+    list(reversed(ROWS)),
+    # Identical patterns and equal scores resolve to the earliest rule
+    ROWS + [(11, 'dazn', 'dazn.duplicate'), (12, 'LALIGA', 'laliga.duplicate')],
+])
+def test_compiled_rules_pick_the_same_winner_as_scoring_every_rule(rows):
+    """The automaton finds the same exclusion or highest-scoring rule as the linear loop."""
+    rules = CompiledMappingRules(rows)
+    for name in NAMES:
+        assert _compiled(rules, name) == _reference(rows, name), name
+
+
+def test_literal_matches_and_mapping_count():
+    rules = CompiledMappingRules(ROWS)
+    assert rules.mapping_count == len(ROWS) - 1
+    assert [rule.id for rule in rules.literal_matches('DAZN LaLiga')] == [1, 2, 3]
+    assert [rule.id for rule in rules.literal_matches('!test channel')] == [6]
+
+
+def test_rules_are_cached_until_mappings_change(db_session):
+    invalidate_mapping_rules()
+    db_session.add(EPGStringMapping(search_pattern='dazn', epg_channel_id='dazn.es'))
+    db_session.commit()
+
+    rules = get_mapping_rules()
+    assert get_mapping_rules() is rules
+    assert rules.best_mapping('DAZN 1').epg_channel_id == 'dazn.es'
+
+    db_session.add(EPGStringMapping(search_pattern='dazn 1', epg_channel_id='dazn1.es'))
+    db_session.commit()
+
+    refreshed = get_mapping_rules()
+    assert refreshed is not rules
+    assert refreshed.best_mapping('DAZN 1').epg_channel_id == 'dazn1.es'
+
+    invalidate_mapping_rules()
+    assert get_mapping_rules() is not refreshed
+
+
+def test_cached_rules_are_served_without_queries(db_session):
+    """Matching channel after channel reads the rules once; a commit elsewhere is noticed."""
+    from sqlalchemy import event
+    from app.extensions import db
+
+    invalidate_mapping_rules()
+    db_session.add(EPGStringMapping(search_pattern='dazn', epg_channel_id='dazn.es'))
+    db_session.commit()
+    rules = get_mapping_rules()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(20):
+            assert get_mapping_rules() is rules
+        assert statements == []
+
+        # Another worker process committed a mapping change
+        DataGeneration(mapping_generation.path).bump()
+        assert get_mapping_rules() is rules
+        assert len(statements) == 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    mapping = db_session.query(EPGStringMapping).one()
+    mapping.epg_channel_id = 'dazn.tv'
+    db_session.commit()
+    assert get_mapping_rules().best_mapping('DAZN 1').epg_channel_id == 'dazn.tv'
+
+    db_session.delete(mapping)
+    db_session.commit()
+    assert get_mapping_rules().best_mapping('DAZN 1') is None
@@ -0,0 +1,381 @@
+import io
+import gzip
+import lzma
+import zipfile
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from app.models.epg_source import EPGSource
+from app.models.epg_channel import EPGChannel
+from app.models.epg_program import EPGProgram
+from app.services.epg_service import EPGService
+from app.services.epg_refresh import EPGRefreshPipeline
+from app.services.epg_source_cache import EPGSourceCache
+from app.utils.xmltv import open_xmltv_stream, iter_xmltv
+
+SAMPLE_XMLTV = b'''<?xml version="1.0" encoding="UTF-8"?>
+<tv generator-info-name="test">
+  <channel id="la1">
+    <display-name lang="es">La 1</display-name>
+    <icon src="http://example.com/la1.png" />
+  </channel>
+  <channel id="la2">
+    <display-name lang="es">La 2</display-name>
+  </channel>
+  <programme start="20250526064200 +0200" stop="20250526074200 +0200" channel="la1">
+    <title lang="es">Telediario</title>
+    <desc lang="es">Noticias</desc>
+    <category lang="es">News</category>
+  </programme>
+  <programme start="20250526074200 +0200" stop="20250526084200 +0200" channel="la1">
+    <title lang="es">El Tiempo</title>
+    <rating><value>TP</value></rating>
+  </programme>
+  <programme start="20250526064200 +0200" stop="20250526094200 +0200" channel="la2">
+    <title lang="es">Documental</title>
+  </programme>
+  <programme start="20250526064200 +0200" stop="20250526094200 +0200" channel="unknown">
+    <title lang="es">Ignored</title>
+  </programme>
+</tv>'''
+
+
+def _zip_bytes(content):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('guide.xml', content)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('payload', [
+    SAMPLE_XMLTV,
+    gzip.compress(SAMPLE_XMLTV),
+    lzma.compress(SAMPLE_XMLTV),
+    _zip_bytes(SAMPLE_XMLTV),
+], ids=['plain', 'gzip', 'xz', 'zip'])
+def test_open_xmltv_stream_detects_compression(payload):
+    """Compressed guides are detected from their magic bytes and decompressed."""
+    records = list(iter_xmltv(open_xmltv_stream(io.BytesIO(payload))))
+
+    kinds = [kind for kind, _ in records]
+    assert kinds == ['channel', 'channel', 'programme', 'programme', 'programme', 'programme']
+    assert records[0][1] == {
+        'id': 'la1',
+        'name': 'La 1',
+        'language': 'es',
+        'icon': 'http://example.com/la1.png',
+    }
+    assert records[3][1]['rating'] == 'TP'
+
+
+def test_ingest_xmltv_stream_stores_channels_and_programs(db_session):
+    """Streaming ingestion stores channels and flushes programs in batches."""
+    source = EPGSource(url='http://example.com/guide.xml.gz')
+    db_session.add(source)
+    db_session.commit()
+
+    service = EPGService()
+    service.program_batch_size = 2  # Force more than one flush
+
+    stats = service._ingest_xmltv_stream(open_xmltv_stream(io.BytesIO(gzip.compress(SAMPLE_XMLTV))), source.id)
+
+    assert stats == {'channels': 2, 'programs': 3, 'inserted': 3, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    assert set(service.epg_data.keys()) == {'la1', 'la2'}
+    assert EPGChannel.query.filter_by(epg_source_id=source.id).count() == 2
+
+    la1 = EPGChannel.query.filter_by(channel_xml_id='la1').first()
+    titles = [p.title for p in EPGProgram.query.filter_by(epg_channel_id=la1.id).order_by(EPGProgram.start_time)]
+    assert titles == ['Telediario', 'El Tiempo']
+
+
+def test_parse_epg_xml_replaces_previous_data(db_session):
+    """Re-ingesting a source replaces its channels and programs instead of duplicating them."""
+    source = EPGSource(url='http://example.com/guide.xml')
+    db_session.add(source)
+    db_session.commit()
+
+    service = EPGService()
+    service._parse_epg_xml(SAMPLE_XMLTV.decode('utf-8'), source.id)
+    service._parse_epg_xml(SAMPLE_XMLTV.decode('utf-8'), source.id)
+
+    assert EPGChannel.query.count() == 2
+    assert EPGProgram.query.count() == 3
+
+
+def test_ingest_xmltv_stream_only_writes_changed_programs(db_session):
+    """A refresh diffs programmes against stored hashes and keeps channel IDs stable."""
+    source = EPGSource(url='http://example.com/guide.xml')
+    db_session.add(source)
+    db_session.commit()
+
+    service = EPGService()
+    service._ingest_xmltv_stream(io.BytesIO(SAMPLE_XMLTV), source.id)
+    channel_ids = {ch.channel_xml_id: ch.id for ch in EPGChannel.query.all()}
+    unchanged_id = EPGProgram.query.filter_by(title='Telediario').first().id
+
+    changed = (SAMPLE_XMLTV
+               .replace(b'<title lang="es">El Tiempo</title>', b'<title lang="es">El Tiempo (2)</title>')
+               .replace(b'stop="20250526094200 +0200" channel="la2"', b'stop="20250526104200 +0200" channel="la2"'))
+    stats = service._ingest_xmltv_stream(io.BytesIO(changed), source.id)
+
+    assert stats == {'channels': 2, 'programs': 3, 'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1}
+    assert {ch.channel_xml_id: ch.id for ch in EPGChannel.query.all()} == channel_ids
+    assert EPGProgram.query.filter_by(title='Telediario').first().id == unchanged_id
+    assert sorted(p.title for p in EPGProgram.query.all()) == ['Documental', 'El Tiempo (2)', 'Telediario']
+
+
+def test_ingest_xmltv_stream_removes_channels_missing_from_feed(db_session):
+    """Channels dropped from a feed are removed together with their programmes."""
+    source = EPGSource(url='http://example.com/guide.xml')
+    db_session.add(source)
+    db_session.commit()
+
+    service = EPGService()
+    service._ingest_xmltv_stream(io.BytesIO(SAMPLE_XMLTV), source.id)
+
+    la2 = b'  <channel id="la2">\n    <display-name lang="es">La 2</display-name>\n  </channel>\n'
+    assert la2 in SAMPLE_XMLTV
+    stats = service._ingest_xmltv_stream(io.BytesIO(SAMPLE_XMLTV.replace(la2, b'')), source.id)
+
+    assert stats['deleted'] == 1
+    assert [ch.channel_xml_id for ch in EPGChannel.query.all()] == ['la1']
+    assert EPGProgram.query.count() == 2
+
+
+class _FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.raw = io.BytesIO(body)
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+def test_fetch_epg_data_skips_parse_for_cached_sources(db_session, tmp_path):
+    """Conditional fetches reuse the on-disk copy and skip the parse when nothing changed."""
+    source = EPGSource(url='http://example.com/guide.xml', enabled=True)
+    db_session.add(source)
+    db_session.commit()
+
+    service = EPGService()
+    service.source_cache = EPGSourceCache(tmp_path)
+    responses = [
+        _FakeResponse(200, SAMPLE_XMLTV, {'ETag': '"v1"', 'Last-Modified': 'Mon, 26 May 2025 06:00:00 GMT'}),
+        _FakeResponse(304),
+        _FakeResponse(200, SAMPLE_XMLTV, {'ETag': '"v2"'}),
+    ]
+
+    with patch('app.services.epg_source_cache.requests.get', side_effect=responses) as mock_get:
+        service.fetch_epg_data()
+        assert service.refresh_stats['per_source'][source.id]['status'] == 'modified'
+        assert service.refresh_stats['inserted'] == 3
+        assert source.etag == '"v1"'
+
+        service.fetch_epg_data()
+        assert mock_get.call_args.kwargs['headers'] == {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Mon, 26 May 2025 06:00:00 GMT',
+        }
+        stats = service.refresh_stats
+        assert stats['per_source'][source.id]['status'] == 'not_modified'
+        assert stats['per_source'][source.id]['parsed'] is False
+        assert stats['bytes_saved'] == len(SAMPLE_XMLTV)
+        assert set(service.epg_data.keys()) == {'la1', 'la2'}
+
+        service.fetch_epg_data()
+        source_stats = service.refresh_stats['per_source'][source.id]
+        assert source_stats['status'] == 'unchanged'
+        assert source_stats['parsed'] is False
+        assert source_stats['hit_rate'] == round(2 / 3, 3)
+        assert source.etag == '"v2"'
+
+    # Uncompressed guides are stored gzipped
+    assert (tmp_path / f'source_{source.id}.xml.cache').read_bytes()[:2] == gzip.compress(b'')[:2]
+    assert EPGProgram.query.count() == 3
+
+
+def test_guide_whose_sync_failed_is_parsed_again_after_a_304(db_session, tmp_path):
+    """A downloaded body counts as current only once it has been synced into the database."""
+    source = EPGSource(url='http://example.com/guide.xml', enabled=True)
+    db_session.add(source)
+    db_session.commit()
+
+    service = EPGService()
+    service.source_cache = EPGSourceCache(tmp_path)
+    sync = service._sync_source_records
+
+    def sync_then_fail(records, source_id):
+        # The channels and programmes are written, then the write fails
+        sync(records, source_id)
+        raise OSError('database is locked')
+
+    responses = [_FakeResponse(200, SAMPLE_XMLTV, {'ETag': '"v1"'}), _FakeResponse(304), _FakeResponse(304)]
+    with patch('app.services.epg_source_cache.requests.get', side_effect=responses):
+        with patch.object(service, '_sync_source_records', side_effect=sync_then_fail):
+            service.fetch_epg_data()
+        assert service.refresh_stats['per_source'][source.id]['status'] == 'error'
+        assert source.etag == '"v1"' and source.ingested_digest is None
+
+        service.fetch_epg_data()
+        source_stats = service.refresh_stats['per_source'][source.id]
+        assert source_stats['status'] == 'not_modified' and source_stats['parsed'] is True
+        assert source.ingested_digest == source.content_digest
+
+        service.fetch_epg_data()
+        assert service.refresh_stats['per_source'][source.id]['parsed'] is False
+    assert EPGProgram.query.count() == 3
+
+
+@pytest.mark.parametrize('parse_workers', [0, 2], ids=['in-process', 'process-pool'])
+def test_refresh_pipeline_limits_downloads_per_host(db_session, tmp_path, parse_workers):
+    """Sources download concurrently within the per-host limit and record per-source timings."""
+    sources = [EPGSource(url=f'http://{host}/guide{i}.xml', enabled=True)
+               for i, host in enumerate(['a.example', 'a.example', 'a.example', 'b.example'])]
+    db_session.add_all(sources)
+    db_session.commit()
+
+    lock = threading.Lock()
+    active = {'a.example': 0, 'b.example': 0}
+    peak = dict(active)
+
+    def fake_get(url, **kwargs):
+        host = url.split('/')[2]
+        with lock:
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+        time.sleep(0.05)
+        with lock:
+            active[host] -= 1
+        # Each source lists its own channels so the guides don't overlap
+        suffix = url[-5].encode()
+        return _FakeResponse(200, SAMPLE_XMLTV.replace(b'la1', b'la1-' + suffix).replace(b'la2', b'la2-' + suffix))
+
+    service = EPGService()
+    service.source_cache = EPGSourceCache(tmp_path)
+    pipeline = EPGRefreshPipeline(service, per_host_limit=2, parse_workers=parse_workers)
+    service._reset_refresh_stats()
+
+    with patch('app.services.epg_source_cache.requests.get', side_effect=fake_get):
+        pipeline.run(sources)
+
+    assert peak == {'a.example': 2, 'b.example': 1}
+    assert service.refresh_stats['inserted'] == 12
+    assert len(service.epg_data) == 8
+    assert EPGProgram.query.count() == 12
+    for source in sources:
+        timings = service.refresh_stats['per_source'][source.id]['timings']
+        assert timings['download'] >= 0.05
+        assert timings['total'] >= timings['download']
+        assert ('parse' in timings) == (parse_workers > 0)
+
+
+def test_update_all_channels_epg_applies_compiled_rules(db_session):
+    """Matched channels are updated, excluded ones cleaned, and reruns leave them alone."""
+    from app.models.acestream_channel import AcestreamChannel
+    from app.models.epg_string_mapping import EPGStringMapping
+
+    db_session.add_all([
+        AcestreamChannel(id='a' * 40, name='DAZN LaLiga HD'),
+        AcestreamChannel(id='b' * 40, name='DAZN LaLiga TEST', tvg_id='old.id'),
+        AcestreamChannel(id='c' * 40, name='Unmatched'),
+        EPGStringMapping(search_pattern='dazn', epg_channel_id='dazn.es'),
+        EPGStringMapping(search_pattern='dazn laliga', epg_channel_id='dazn.laliga.es'),
+        EPGStringMapping(search_pattern='!test', epg_channel_id=''),
+    ])
+    db_session.commit()
+
+    service = EPGService()
+    service.epg_data = {
+        'dazn.es': {'tvg_id': 'dazn.es', 'tvg_name': 'DAZN', 'logo': None},
+        'dazn.laliga.es': {'tvg_id': 'dazn.laliga.es', 'tvg_name': 'DAZN LaLiga', 'logo': 'logo.png'},
+    }
+
+    stats = service.update_all_channels_epg(clean_unmatched=True)
+    assert stats['updated'] == 1
+    assert stats['excluded'] == 1
+    assert stats['errors'] == 0
+    assert db_session.get(AcestreamChannel, 'a' * 40).tvg_id == 'dazn.laliga.es'
+    assert db_session.get(AcestreamChannel, 'b' * 40).tvg_id is None
+
+    stats = service.update_all_channels_epg(clean_unmatched=True)
+    assert stats['updated'] == 0
+    assert stats['cleaned'] == 0
+    assert stats['excluded'] == 1
+    assert db_session.get(AcestreamChannel, 'a' * 40).tvg_id == 'dazn.laliga.es'
+
+
+def test_update_all_channels_epg_dry_run_and_chunked_writes(db_session):
+    """Dry runs return the planned diff untouched; real runs write it in chunks."""
+    from app.models.acestream_channel import AcestreamChannel
+    from app.models.epg_string_mapping import EPGStringMapping
+
+    db_session.add_all([AcestreamChannel(id=f'{i:040d}', name=f'DAZN {i}') for i in range(5)])
+    db_session.add(AcestreamChannel(id='f' * 40, name='Other', tvg_id='stale.id'))
+    db_session.add(EPGStringMapping(search_pattern='dazn', epg_channel_id='dazn.es'))
+    db_session.commit()
+
+    service = EPGService()
+    service.epg_data = {'dazn.es': {'tvg_id': 'dazn.es', 'tvg_name': 'DAZN', 'logo': None}}
+    service.channel_update_chunk_size = 2
+
+    stats = service.update_all_channels_epg(clean_unmatched=True, dry_run=True)
+    assert stats['updated'] == 5
+    assert stats['cleaned'] == 1
+    changes = {change['id']: change for change in stats['changes']}
+    assert changes['f' * 40]['before']['tvg_id'] == 'stale.id'
+    assert changes['f' * 40]['after'] == {'tvg_id': None, 'tvg_name': None, 'logo': None}
+    assert AcestreamChannel.query.filter_by(tvg_id='dazn.es').count() == 0
+
+    with patch.object(db_session, 'commit', wraps=db_session.commit) as commit:
+        stats = service.update_all_channels_epg(clean_unmatched=True, commit_every_chunk=True)
+    assert 'changes' not in stats
+    assert commit.call_count == 4  # three chunks of two plus the final commit
+    assert AcestreamChannel.query.filter_by(tvg_id='dazn.es').count() == 5
+    assert db_session.get(AcestreamChannel, 'f' * 40).tvg_id is None
+
+
+def test_update_all_channels_epg_dry_run_is_read_only(db_session):
+    """Without EPG data loaded, a dry run plans against the stored guide channels and writes nothing."""
+    from sqlalchemy import event
+    from app.extensions import db
+    from app.models.acestream_channel import AcestreamChannel
+    from app.models.epg_string_mapping import EPGStringMapping
+
+    source = EPGSource(url='http://example.com/guide.xml', enabled=True)
+    db_session.add(source)
+    db_session.flush()
+    db_session.add_all([
+        EPGChannel(epg_source_id=source.id, channel_xml_id='dazn.es', name='DAZN', icon_url='dazn.png'),
+        AcestreamChannel(id='a' * 40, name='DAZN 1'),
+        AcestreamChannel(id='b' * 40, name='Other', tvg_id='stale.id'),
+        EPGStringMapping(search_pattern='dazn', epg_channel_id='dazn.es'),
+    ])
+    db_session.commit()
+
+    def snapshot():
+        return [sorted(map(tuple, db_session.execute(table.select()).fetchall()))
+                for table in (AcestreamChannel.__table__, EPGChannel.__table__,
+                              EPGProgram.__table__, EPGSource.__table__)]
+
+    before = snapshot()
+    writes = []
+
+    def listener(conn, cursor, statement, *args):
+        if not statement.lstrip().upper().startswith('SELECT'):
+            writes.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        with patch.object(EPGService, 'fetch_epg_data') as fetch:
+            stats = EPGService().update_all_channels_epg(clean_unmatched=True, dry_run=True)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    fetch.assert_not_called()
+    assert writes == []
+    assert snapshot() == before
+    changes = {change['id']: change for change in stats['changes']}
+    assert changes['a' * 40]['after'] == {'tvg_id': 'dazn.es', 'tvg_name': 'DAZN', 'logo': 'dazn.png'}
+    assert changes['b' * 40]['after'] == {'tvg_id': None, 'tvg_name': None, 'logo': None}
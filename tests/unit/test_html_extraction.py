@@ -0,0 +1,80 @@
+import pytest
+
+from app.scrapers import create_scraper_for_url
+from app.scrapers.page import DEFAULT_PARSER, HTMLPage
+
+ID1, ID2, ID3 = 'a' * 40, 'b' * 40, 'c' * 40
+
+LISTA_PLANA = f'''<html><head><script>
+var fileContents = {{"listaplana.txt": `
+SPORTS ONE: acestream://{ID1}
+  Sports   Two - acestream://{ID2}
+acestream://{ID3}
+`}};
+</script></head><body><div class="link-name">Ignored</div> acestream://{ID3}</body></html>'''
+
+LINKS_DATA = f'''<html><body><script src="app.js"></script>
+<script>const linksData = {{"links": [{{"name": "One", "url": "acestream://{ID1}"}},
+{{"name": "Two\\n HD", "url": "acestream://{ID2}"}}, {{"name": "Web", "url": "https://example.com"}}]}};</script>
+</body></html>'''
+
+NEW_ERA = f'''<!DOCTYPE html><html><body><div class="channel-list">
+<div class="channel-item"><span class="item-name">Channel &amp; One</span><span class="item-url">{ID1}</span></div>
+<div class="channel-item"><span class="item-url">{ID2}</span></div>
+</div><p>acestream://{ID3}</p><div class="link-name">  Page name </div></body></html>'''
+
+CORPUS = {
+    'listaplana': LISTA_PLANA,
+    'links_data': LINKS_DATA,
+    'new_era_iframe': NEW_ERA,
+    'link_name': f'<div class="card link-name"> Sports\n One </div><a href="acestream://{ID1}">x</a> acestream://{ID2}',
+    'no_link_name': f'<p>acestream://{ID1}</p><div class="link-names">Not it</div>',
+    'entity_in_id': f'<p>acestream://{ID1[:20]}&#98;{ID1[21:]}</p><div class="link-name">Name</div>',
+    'entity_in_script': (f'<script>var x = "acestream://{ID1}&auml;";</script>'
+                         f'<div class="link-name">Name</div>acestream://{ID2}&amp;x=1'),
+    'commented_name': f'<!-- <div class="link-name">Old</div> --><div class="link-name">New</div>acestream://{ID1}',
+    'template_name': (f'<script>html = \'<div class="link-name">\' + name + \'</div>\';</script>'
+                      f'<div class="link-name">Real</div>acestream://{ID1}'),
+    'nested_name': f'<div class="link-name"><b>Bold</b> name</div>acestream://{ID1}',
+    'entity_name': f'<div class="link-name">Caf&eacute; TV</div>acestream://{ID1}',
+    'uppercase_tags': f'<DIV CLASS="link-name">Upper</DIV><SCRIPT>acestream://{ID2}</SCRIPT>acestream://{ID1}',
+    'unquoted_class': f'<div class=link-name>Bare</div>acestream://{ID1}',
+    'unclosed_comment': f'<div class="link-name">Name</div>acestream://{ID1}<!-- acestream://{ID2}',
+    'cdata': f'<div class="link-name">Name</div><![CDATA[acestream://{ID2}]]>acestream://{ID1}',
+    'bare_tag': f'<div class="link-name">Name</div><acestream://{ID1}>',
+    'style': f'<style>.x:after {{content: "acestream://{ID2}"}}</style><div class="link-name">N</div>',
+    'empty': '',
+}
+
+PARSERS = sorted({'html.parser', DEFAULT_PARSER})
+
+
+async def _extract(content, parser, fast):
+    scraper = create_scraper_for_url('https://example.com/page', 'regular')
+    scraper.html_parser = parser
+    scraper.fast_extraction = fast
+    return await scraper.extract_channels(content)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('parser', PARSERS)
+@pytest.mark.parametrize('name', sorted(CORPUS))
+async def test_fast_path_matches_full_parse(name, parser):
+    content = CORPUS[name]
+    assert await _extract(content, parser, fast=True) == await _extract(content, parser, fast=False)
+
+
+@pytest.mark.asyncio
+async def test_common_pages_are_extracted_without_a_dom():
+    assert await _extract(LISTA_PLANA, 'html.parser', fast=True) == [
+        (ID1, 'SPORTS ONE', {}), (ID2, 'Sports Two', {})]
+    assert [channel[1] for channel in await _extract(LINKS_DATA, 'html.parser', fast=True)] == ['One', 'Two HD']
+
+    for name in ('listaplana', 'links_data', 'link_name', 'entity_in_id', 'commented_name', 'template_name'):
+        page = HTMLPage(CORPUS[name])
+        page.scripts(), page.acestream_text(), page.first_text('div', 'link-name')
+        assert not page.dom_built, name
+
+    page = HTMLPage(CORPUS['nested_name'])
+    assert page.first_text('div', 'link-name') == 'Bold name'
+    assert page.dom_built
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.utils.http_client import HTTPClientManager, SessionProfile
+
+
+async def _start_server():
+    async def hello(request):
+        await asyncio.sleep(0.01)
+        return web.Response(text='hello')
+
+    app = web.Application()
+    app.router.add_get('/', hello)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_shared_and_connections_reused():
+    manager = HTTPClientManager({'scraper': SessionProfile(limit=1, limit_per_host=1)})
+    server = await _start_server()
+    try:
+        session = manager.session('scraper')
+        assert manager.session('scraper') is session
+
+        for _ in range(3):
+            async with session.get(server.make_url('/')) as response:
+                assert await response.text() == 'hello'
+
+        async def fetch():
+            async with manager.session('scraper').get(server.make_url('/')) as response:
+                return await response.text()
+
+        # A single connection: concurrent requests queue for it
+        assert await asyncio.gather(fetch(), fetch()) == ['hello', 'hello']
+
+        stats = manager.get_stats()['scraper']
+        assert stats['requests'] == 5
+        assert stats['connections_created'] == 1
+        assert stats['connections_reused'] == 4
+        assert stats['queued'] >= 1
+        assert stats['in_flight'] == 0
+        assert stats['open_sessions'] == 1
+    finally:
+        await manager.close()
+        await server.close()
+
+    assert session.closed
+    assert manager.get_stats()['scraper']['open_sessions'] == 0
+
+
+def test_each_event_loop_gets_its_own_sessions_closed_by_run():
+    manager = HTTPClientManager({'m3u': SessionProfile(limit=4, limit_per_host=2)})
+
+    async def grab():
+        return manager.session('m3u')
+
+    first = manager.run(grab())
+    second = manager.run(grab())
+    assert first is not second
+    assert first.closed and second.closed
+    assert manager.get_stats()['m3u']['sessions_created'] == 2
+
+
+def test_task_manager_stop_wakes_the_loop_and_closes_sessions(app, monkeypatch):
+    from app.tasks.manager import TaskManager
+
+    manager = HTTPClientManager({'scraper': SessionProfile(limit=4, limit_per_host=2)})
+    monkeypatch.setattr('app.tasks.manager.http_clients', manager)
+    task_manager = TaskManager()
+    task_manager.init_app(app)
+    task_manager.RETRY_DELAY = 3600
+    sessions = []
+
+    async def cycle():
+        sessions.append(manager.session('scraper'))
+
+    monkeypatch.setattr(task_manager, 'refresh_epg_if_needed', cycle)
+
+    async def main():
+        runner = asyncio.ensure_future(task_manager.start())
+        while not sessions:
+            await asyncio.sleep(0.01)
+        task_manager.stop()
+        await asyncio.wait_for(runner, timeout=5)
+
+    asyncio.run(main())
+    assert sessions[0].closed
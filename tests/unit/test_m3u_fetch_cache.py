@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.scrapers import create_scraper_for_url
+from app.services.m3u_service import M3UFetchCache, m3u_fetch_cycle, current_m3u_fetch_cache
+from app.utils.http_client import http_clients
+
+PLAYLIST = '#EXTM3U\n#EXTINF:-1,Sports One\nacestream://{}\n'
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_fetch_and_mirrors_one_list():
+    cache = M3UFetchCache(max_concurrent=2)
+    fetched, running, peak = [], [0], [0]
+
+    async def load(url):
+        fetched.append(url)
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        # Both mirrors serve the same file
+        return (None, []) if 'broken' in url else ('digest', [('a' * 40, 'Sports One', {})])
+
+    urls = ['http://a.com/list.m3u'] * 3 + ['http://mirror.com/list.m3u', 'http://c.com/broken.m3u']
+    results = await asyncio.gather(*(cache.get(url, load) for url in urls))
+    # Later requests in the same cycle hit the cache
+    results.append(await cache.get('http://a.com/list.m3u', load))
+
+    assert results[0] == [('a' * 40, 'Sports One', {})]
+    assert results[0] == results[1] == results[3] == results[5]
+    assert results[4] == []
+    assert sorted(fetched) == ['http://a.com/list.m3u', 'http://c.com/broken.m3u', 'http://mirror.com/list.m3u']
+    assert peak[0] == 2
+    assert cache.get_stats() == {'requests': 6, 'fetches': 3, 'saved_fetches': 3,
+                                 'distinct_contents': 1, 'duplicate_contents': 1, 'max_concurrent': 2}
+
+
+@pytest.mark.asyncio
+async def test_pages_linking_the_same_playlist_fetch_it_once_per_cycle(app):
+    requests = []
+
+    async def playlist(request):
+        requests.append(request.path)
+        return web.Response(text=PLAYLIST.format('b' * 40))
+
+    server_app = web.Application()
+    server_app.router.add_get('/list.m3u', playlist)
+    server = TestServer(server_app)
+    await server.start_server()
+    page = f'<html><body><a href="{server.make_url("/list.m3u")}">list</a></body></html>'
+    try:
+        with app.app_context(), m3u_fetch_cycle() as cache:
+            assert current_m3u_fetch_cache() is cache
+            scrapers = [create_scraper_for_url(f'https://site{i}.com/', 'regular') for i in range(3)]
+            results = await asyncio.gather(*(scraper.extract_channels(page) for scraper in scrapers))
+        assert current_m3u_fetch_cache() is None
+        assert all(channels == [('b' * 40, 'Sports One', {})] for channels in results)
+        assert requests == ['/list.m3u']
+        assert cache.get_stats()['saved_fetches'] == 2
+    finally:
+        await http_clients.close()
+        await server.close()
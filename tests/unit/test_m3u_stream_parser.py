@@ -0,0 +1,69 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.m3u_service import M3UService
+from app.utils.http_client import http_clients
+from app.utils.m3u import aiter_m3u_entries, iter_m3u_entries
+
+ID1, ID2, ID3 = 'a' * 40, 'b' * 40, 'c' * 40
+
+PLAYLIST = f'''#EXTM3U
+#EXTINF:-1 tvg-id="one.es" tvg-name="One" tvg-logo="http://logo/1.png" group-title="Sports" tvg-x="y",Sports, One HD
+acestream://{ID1}
+
+#EXTINF:-1,Café TV
+#EXTVLCOPT:network-caching=1000
+http://127.0.0.1:6878/ace/getstream?id={ID2}
+http://example.com/not-an-acestream.ts
+acestream://{ID3}
+'''
+
+EXPECTED = [
+    (ID1, 'One HD', {'tvg_id': 'one.es', 'tvg_name': 'One', 'logo': 'http://logo/1.png', 'group': 'Sports',
+                     'tvg-x': 'y'}),
+    (ID2, 'Café TV', {}),
+    (ID3, f'Channel {ID3}', {}),
+]
+
+
+def test_entries_are_parsed_from_lines():
+    assert list(iter_m3u_entries(PLAYLIST.splitlines())) == EXPECTED
+    assert M3UService().extract_channels_from_content(PLAYLIST.replace('\n', '\r\n')) == EXPECTED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunk_size', [1, 3, 64, 1 << 16])
+async def test_entries_are_parsed_from_a_byte_stream(chunk_size):
+    body = PLAYLIST.replace('\n', '\r\n').encode('utf-8')
+
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    assert [entry async for entry in aiter_m3u_entries(chunks())] == EXPECTED
+
+
+@pytest.mark.asyncio
+async def test_linked_playlists_are_streamed_with_their_digest():
+    async def playlist(request):
+        response = web.StreamResponse(headers={'Content-Type': 'audio/x-mpegurl; charset=utf-8'})
+        await response.prepare(request)
+        for line in PLAYLIST.splitlines(True):
+            await response.write(line.encode('utf-8'))
+        return response
+
+    server_app = web.Application()
+    server_app.router.add_get('/list.m3u', playlist)
+    server = TestServer(server_app)
+    await server.start_server()
+    try:
+        service = M3UService()
+        digest, channels = await service._load_m3u(str(server.make_url('/list.m3u')))
+        assert channels == EXPECTED
+        assert len(digest) == 64
+
+        assert await service._load_m3u(str(server.make_url('/missing.m3u'))) == (None, [])
+    finally:
+        await http_clients.close()
+        await server.close()
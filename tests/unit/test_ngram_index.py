@@ -0,0 +1,87 @@
+import random
+from difflib import SequenceMatcher
+from app.utils.ngram_index import NGramIndex
+
+NAMES = [
+    'movistar laliga', 'movistar liga de campeones', 'dazn laliga', 'dazn f1',
+    'eurosport 1', 'eurosport 2', 'la 1', 'la 2', 'antena 3', 'cuatro',
+    'telecinco', 'la sexta', 'sky sports main event', 'sky sports premier league',
+    'bein sports 1', 'bein sports 2', 'espn', 'espn 2', 'fox sports', 'tnt sports',
+]
+
+
+def _linear_best(names, query, threshold, min_score=0.0):
+    best, best_score = None, min_score
+    for name in names:
+        score = SequenceMatcher(None, query, name).ratio()
+        if score > best_score and score >= threshold:
+            best, best_score = name, score
+    return (best, best_score) if best is not None else None
+
+
+def _build(names, top_k=50):
+    index = NGramIndex(top_k=top_k)
+    for name in names:
+        index.add(name, name)
+    return index
+
+
+def test_best_match_agrees_with_linear_scan():
+    """The index returns the same winner and score as scoring every name."""
+    index = _build(NAMES)
+    rng = random.Random(42)
+    queries = ['movistar la liga', 'eurosport1', 'la 1 hd', 'sky sport premier', 'bein sport 2', 'unknown']
+    for name in NAMES:
+        chars = list(name)
+        chars[rng.randrange(len(chars))] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+        queries.append(''.join(chars))
+
+    for query in queries:
+        for threshold in (0.5, 0.75, 0.9):
+            assert index.best_match(query, threshold) == _linear_best(NAMES, query, threshold), query
+
+
+def test_best_match_ties_resolve_in_insertion_order():
+    """Equal scores keep the first indexed entry, like a linear scan."""
+    index = _build(['abcx', 'abcy'])
+    assert index.best_match('abcz', 0.5) == ('abcx', 0.75)
+
+
+def test_best_match_respects_min_score():
+    """Candidates must beat an existing score, not just the threshold."""
+    index = _build(NAMES)
+    assert index.best_match('espn 3', 0.5, min_score=1.0) is None
+    assert index.best_match('espn 3', 0.5) == ('espn 2', SequenceMatcher(None, 'espn 3', 'espn 2').ratio())
+
+
+def test_best_match_is_exact_on_a_corpus_beyond_the_candidates():
+    """Winners the n-grams rank low are still found: the index never disagrees with a linear scan."""
+    rng = random.Random(7)
+    words = ['sport', 'sports', 'liga', 'news', 'cine', 'max', 'plus', 'tv', 'one', 'hd', 'uk', 'es',
+             'movistar', 'dazn', 'bein', 'sky', 'canal', 'premier', 'golf', 'moto']
+    corpus = list(dict.fromkeys(
+        ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))) + rng.choice(['', ' 1', ' 2', '+'])
+        for _ in range(200)
+    ))
+    # Few n-gram candidates, so most winners have to come from the bounded scan
+    index = _build(corpus, top_k=2)
+
+    queries = []
+    for name in rng.sample(corpus, 40):
+        chars = list(name)
+        for _ in range(rng.randint(1, 3)):
+            operation = rng.random()
+            position = rng.randrange(len(chars))
+            if operation < 0.4:
+                chars[position] = rng.choice('abcdefghijklmnopqrstuvwxyz ')
+            elif operation < 0.7 and len(chars) > 1:
+                del chars[position]
+            else:
+                chars.insert(position, rng.choice('abcdefghijklmnopqrstuvwxyz'))
+        queries.append(''.join(chars))
+    queries += [' '.join(reversed(name.split())) for name in rng.sample(corpus, 10)]
+
+    for query in queries:
+        for threshold in (0.0, 0.6, 0.85):
+            assert index.best_match(query, threshold) == _linear_best(corpus, query, threshold), query
+        assert index.best_match(query, 0.5, min_score=0.8) == _linear_best(corpus, query, 0.5, 0.8), query
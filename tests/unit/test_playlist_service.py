@@ -156,4 +156,127 @@ def test_generate_playlist_with_duplicate_names(db_session):
     
     # Make sure the original name doesn't have a number
     assert ',Sports Channel 1' not in playlist
-    assert ',News Channel 1' not in playlist
\ No newline at end of file
+    assert ',News Channel 1' not in playlist
+
+def _count_queries(func):
+    from sqlalchemy import event
+    from app.extensions import db
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, len(statements)
+
+
+@pytest.mark.parametrize('generator', [
+    'generate_tv_channels_playlist', 'generate_all_streams_playlist', 'generate_epg_xml'
+])
+def test_tv_channel_generators_use_a_fixed_number_of_queries(db_session, generator):
+    """Query count does not grow with the number of TV channels, acestreams or programmes."""
+    from datetime import datetime, timedelta
+    from app.models.tv_channel import TVChannel
+    from app.models.epg_source import EPGSource
+    from app.models.epg_channel import EPGChannel
+    from app.models.epg_program import EPGProgram
+
+    source = EPGSource(url='http://example.com/guide.xml')
+    db_session.add(source)
+    db_session.flush()
+    source_id = source.id
+    now = datetime.utcnow()
+
+    def add_channels(start, count):
+        for i in range(start, start + count):
+            tv_channel = TVChannel(name=f'Channel {i}', channel_number=i, epg_id=f'ch{i}.es', is_active=True)
+            epg_channel = EPGChannel(epg_source_id=source_id, channel_xml_id=f'ch{i}.es', name=f'Channel {i}')
+            db_session.add_all([tv_channel, epg_channel])
+            db_session.flush()
+            for stream in range(2):
+                db_session.add(AcestreamChannel(id=f'{i:038d}{stream:02d}', name=f'Channel {i}',
+                                                tv_channel_id=tv_channel.id, is_online=bool(stream)))
+            db_session.add(EPGProgram(epg_channel_id=epg_channel.id, title=f'Show {i}',
+                                      start_time=now, end_time=now + timedelta(hours=1)))
+        db_session.commit()
+        db_session.expunge_all()
+
+    service = PlaylistService()
+    service.programme_batch_size = 10000
+    add_channels(0, 3)
+    small, small_queries = _count_queries(getattr(service, generator))
+    add_channels(3, 1200)
+    large, large_queries = _count_queries(getattr(service, generator))
+
+    assert small_queries == large_queries
+    # All channels are rendered, beyond the old 1000-channel cap
+    assert 'Channel 1202' in large
+    if generator == 'generate_epg_xml':
+        assert large.count('<title>Show 1202</title>') == 2
+
+
+
+def test_epg_xml_resolves_mapped_channels_with_a_fixed_number_of_queries(db_session):
+    """EPG channels of mapped TV channels are looked up at once, however many channels there are."""
+    from datetime import datetime, timedelta
+    from app.models.tv_channel import TVChannel
+    from app.models.epg_source import EPGSource
+    from app.models.epg_channel import EPGChannel
+    from app.models.epg_program import EPGProgram
+
+    source = EPGSource(url='http://example.com/guide.xml')
+    db_session.add(source)
+    db_session.flush()
+    source_id = source.id
+    now = datetime.utcnow()
+
+    def add_channel(i, mapped, programmes=0):
+        tv_channel = TVChannel(name=f'Channel {i}', channel_number=i, epg_id=f'ch{i}.es', is_active=True)
+        db_session.add(tv_channel)
+        if mapped:
+            epg_channel = EPGChannel(epg_source_id=source_id, channel_xml_id=f'ch{i}.es', name=f'Channel {i}')
+            db_session.add(epg_channel)
+        db_session.flush()
+        for stream in range(2):
+            db_session.add(AcestreamChannel(id=f'{i:038d}{stream:02d}', name=f'Channel {i}',
+                                            tv_channel_id=tv_channel.id, is_online=bool(stream)))
+        for number in range(programmes):
+            db_session.add(EPGProgram(epg_channel_id=epg_channel.id, title=f'Show {i}.{number}',
+                                      start_time=now + timedelta(hours=number),
+                                      end_time=now + timedelta(hours=number + 1)))
+
+    # A few mapped channels with programmes
+    for i in range(3):
+        add_channel(i, mapped=True, programmes=2)
+    db_session.commit()
+    db_session.expunge_all()
+
+    service = PlaylistService()
+    # Programmes are fetched per batch of mappings; keep every mapping in one batch
+    service.programme_batch_size = 10000
+    small, small_queries = _count_queries(service.generate_epg_xml)
+
+    # Many more channels: mapped ones without programmes and ones whose EPG ID matches no EPG channel
+    for i in range(3, 603):
+        add_channel(i, mapped=i % 2 == 0)
+    db_session.commit()
+    db_session.expunge_all()
+    large, large_queries = _count_queries(service.generate_epg_xml)
+
+    assert small_queries == large_queries
+    for xml in (small, large):
+        # Each programme is rendered for both acestream variants of its channel
+        assert xml.count('<title>Show 2.1</title>') == 2
+        assert 'channel="ch2.es.1"' in xml and 'channel="ch2.es.2"' in xml
+    assert '<channel id="ch601.es.2">' in large
+    assert '<channel id="ch602.es.2">' in large
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024])
+def test_join_lines_streams_the_same_document(chunk_size):
+    from app.services.playlist_service import join_lines
+    lines = ['#EXTM3U', '#EXTINF:-1,Channel', 'acestream://123', '', 'last']
+    chunks = list(join_lines(iter(lines), chunk_size=chunk_size))
+    assert ''.join(chunks) == '\n'.join(lines)
+    if chunk_size == 1:
+        assert len(chunks) == len(lines)
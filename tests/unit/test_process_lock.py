@@ -0,0 +1,17 @@
+from app.utils.process_lock import ProcessLock
+
+
+def test_only_one_holder_at_a_time(tmp_path):
+    path = tmp_path / 'status_sweeper.lock'
+    # Each worker process opens the lock file of its own
+    first, second = ProcessLock('status_sweeper', path), ProcessLock('status_sweeper', path)
+
+    assert first.acquire() and first.held
+    assert first.acquire()
+    assert not second.acquire() and not second.held
+
+    # Released, as when the holding worker exits, another one takes over
+    first.release()
+    assert second.acquire()
+    assert not first.acquire()
+    second.release()
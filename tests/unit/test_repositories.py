@@ -43,4 +43,50 @@ def test_channel_repository_crud(db_session):
     repo.commit()
     
     channels = repo.get_by_source("http://test.com")
-    assert len(channels) == 0
\ No newline at end of file
+    assert len(channels) == 0
+def test_sync_source_channels_upserts_in_place(db_session):
+    from sqlalchemy import event
+    from app.extensions import db
+    repo = ChannelRepository()
+    source = "http://test.com"
+    db_session.add_all([
+        AcestreamChannel(id="keep", name="Keep", source_url=source, is_online=False, tv_channel_id=7),
+        AcestreamChannel(id="rename", name="Old name", source_url=source, group="News"),
+        AcestreamChannel(id="gone", name="Gone", source_url=source),
+        AcestreamChannel(id="moved", name="Moved", source_url="http://other.com", is_online=False),
+    ])
+    db_session.commit()
+
+    stats = repo.sync_source_channels(source, [
+        ("keep", "Keep", {}),
+        ("rename", "New name", {}),
+        ("moved", "Moved", {"group": "Sports"}),
+        ("new", "New", {"tvg_id": "new.es"}),
+    ])
+    assert stats == {'written': 3, 'unchanged': 1, 'deleted': 1}
+    db_session.expire_all()
+
+    keep = repo.get_by_id("keep")
+    assert (keep.is_online, keep.tv_channel_id) == (False, 7)
+    rename = repo.get_by_id("rename")
+    # Metadata the link does not carry is left alone
+    assert (rename.name, rename.group) == ("New name", "News")
+    moved = repo.get_by_id("moved")
+    assert (moved.source_url, moved.group, moved.is_online) == (source, "Sports", False)
+    new = repo.get_by_id("new")
+    assert (new.tvg_id, new.status, new.is_online) == ("new.es", "active", True)
+    assert repo.get_by_id("gone") is None
+
+    # Syncing the same links again writes nothing
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        stats = repo.sync_source_channels(source, [
+            ("keep", "Keep", {}), ("rename", "New name", {}), ("moved", "Moved", {"group": "Sports"}),
+            ("new", "New", {"tvg_id": "new.es"}),
+        ])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert stats == {'written': 0, 'unchanged': 4, 'deleted': 0}
+    assert [s for s in statements if not s.lstrip().upper().startswith('SELECT')] == []
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+from app.models import ScrapedURL
+from app.services.rescrape_scheduler import (
+    RescrapeQueue, apply_outcome, change_rate, failure_delay, next_interval, record_outcome
+)
+
+MINUTE, HOUR = 60, 3600
+
+
+def test_interval_backs_off_within_bounds():
+    # A change drops the interval to the minimum, quiet periods push it up to the maximum
+    assert next_interval(6 * HOUR, True, 15 * MINUTE, 48 * HOUR) == 15 * MINUTE
+    interval = None
+    for _ in range(20):
+        interval = next_interval(interval, False, 15 * MINUTE, 48 * HOUR, initial=HOUR)
+    assert interval == 48 * HOUR
+    assert next_interval(None, False, MINUTE, 48 * HOUR, initial=HOUR) == 1.5 * HOUR
+
+    # Sources that changed recently are held well below the maximum
+    assert next_interval(40 * HOUR, False, 15 * MINUTE, 48 * HOUR, history='U' * 15 + 'C') < 18 * HOUR
+    assert next_interval(40 * HOUR, False, 15 * MINUTE, 48 * HOUR, history='UUCU' * 4) < HOUR
+    assert failure_delay(1, 15 * MINUTE, 48 * HOUR) == 15 * MINUTE
+    assert failure_delay(3, 15 * MINUTE, 48 * HOUR) == 60 * MINUTE
+    assert failure_delay(100, 15 * MINUTE, 48 * HOUR) == 48 * HOUR
+
+
+def test_history_is_bounded():
+    history = None
+    for i in range(20):
+        history = record_outcome(history, i % 4 == 0)
+    assert len(history) == 16
+    assert history.startswith('CUUU')
+    assert change_rate(history) == 0.25
+    assert change_rate('') is None
+
+
+def test_apply_outcome_sets_the_next_due_time():
+    now = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+    url_obj = ScrapedURL(url='https://example.com/', error_count=0)
+    apply_outcome(url_obj, False, 15 * MINUTE, 48 * HOUR, initial=8 * HOUR, now=now)
+    assert (url_obj.change_history, url_obj.scrape_interval) == ('U', 12 * HOUR)
+    assert url_obj.next_scrape_at == now + timedelta(hours=12)
+
+    url_obj.error_count = 2
+    apply_outcome(url_obj, None, 15 * MINUTE, 48 * HOUR, now=now)
+    assert (url_obj.change_history, url_obj.scrape_interval) == ('U', 12 * HOUR)
+    assert url_obj.next_scrape_at == now + timedelta(minutes=30)
+
+
+def test_queue_pops_due_urls_in_order_and_reschedules_in_place():
+    queue = RescrapeQueue()
+    queue.schedule('b', 20)
+    queue.schedule('a', 10)
+    queue.schedule('c', 30)
+    queue.schedule('b', 5)
+    queue.discard('c')
+    assert len(queue) == 2 and queue.next_due() == 5
+    assert queue.pop_due(15) == ['b', 'a']
+    assert queue.pop_due(100) == []
+    assert queue.next_due() is None
+
+    for i in range(500):
+        queue.schedule('x', i)
+    assert len(queue._heap) < 200
+    assert queue.pop_due(1000) == ['x']
+
+
+def test_due_time_uses_the_adaptive_schedule(app):
+    from app.tasks.manager import TaskManager
+
+    task_manager = TaskManager()
+    now = datetime.now(timezone.utc)
+    soon = now + timedelta(minutes=20)
+    assert task_manager.due_time(ScrapedURL(status='pending'), now) == now
+    assert task_manager.due_time(ScrapedURL(status='OK', next_scrape_at=soon, last_processed=now), now) == soon
+    legacy = ScrapedURL(status='OK', last_processed=now.replace(tzinfo=None))
+    with app.app_context():
+        assert task_manager.due_time(legacy, now) == now + timedelta(hours=task_manager.config.rescrape_interval)
+
+
+def test_add_task_wakes_the_loop(app, db_session, monkeypatch):
+    from app.tasks.manager import TaskManager
+
+    later = datetime.now(timezone.utc) + timedelta(days=1)
+    db_session.add(ScrapedURL(url='https://example.com/list', url_type='regular', status='OK',
+                              last_processed=datetime.now(timezone.utc), next_scrape_at=later))
+    db_session.commit()
+
+    task_manager = TaskManager()
+    task_manager.init_app(app)
+    task_manager.RETRY_DELAY = 3600
+    scraped = []
+
+    async def refresh_epg_if_needed():
+        pass
+
+    async def process_url(url):
+        scraped.append(url)
+        # Nothing records the scrape, so the URL would stay pending and due: stop after one
+        task_manager.stop()
+
+    monkeypatch.setattr(task_manager, 'refresh_epg_if_needed', refresh_epg_if_needed)
+    monkeypatch.setattr(task_manager, 'process_url', process_url)
+
+    async def main():
+        runner = asyncio.ensure_future(task_manager.start())
+        while task_manager._schedule_synced_at is None:
+            await asyncio.sleep(0.01)
+        # Not due for a day, and the loop sleeps for up to an hour
+        assert 'https://example.com/list' in task_manager.schedule
+        assert scraped == []
+
+        # The API calls add_task from request threads
+        thread = threading.Thread(target=task_manager.add_task, args=('scrape_url', 'https://example.com/list'))
+        thread.start()
+        thread.join()
+        for _ in range(200):
+            if scraped:
+                break
+            await asyncio.sleep(0.01)
+        task_manager.stop()
+        await asyncio.wait_for(runner, timeout=5)
+
+    asyncio.run(main())
+    assert scraped == ['https://example.com/list']
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+
+from app.tasks.workers import ScrapeWorker
+
+
+def test_urls_are_grouped_by_kind_and_host():
+    assert ScrapeWorker.url_kind('http://127.0.0.1:43110/1SiteA/index.html', 'zeronet') == 'zeronet'
+    assert ScrapeWorker.url_kind('zero://1SiteA/index.html', 'auto') == 'zeronet'
+    assert ScrapeWorker.url_kind('https://example.com/list', 'regular') == 'regular'
+
+    assert ScrapeWorker.host_key('http://127.0.0.1:43110/1SiteA/index.html', 'zeronet') == '1SiteA'
+    assert ScrapeWorker.host_key('zero://1SiteA/index.html', 'zeronet') == '1SiteA'
+    assert ScrapeWorker.host_key('https://Example.com/a', 'regular') == 'example.com'
+
+
+@pytest.mark.asyncio
+async def test_run_respects_global_type_and_host_limits():
+    worker = ScrapeWorker(max_concurrent=4, zeronet_limit=1, http_limit=3, per_host_limit=1)
+    urls = [(f'https://host{i % 3}.com/{i}', 'regular') for i in range(6)]
+    urls += [(f'zero://1Site{i}/index.html', 'zeronet') for i in range(3)]
+    urls.append(('https://broken.com/', 'regular'))
+    running = {'total': 0, 'zeronet': 0}
+    hosts = {}
+    peaks = {'total': 0, 'zeronet': 0, 'host': 0}
+
+    async def process(url):
+        kind = 'zeronet' if url.startswith('zero://') else 'regular'
+        host = ScrapeWorker.host_key(url, kind)
+        running['total'] += 1
+        running[kind] = running.get(kind, 0) + 1
+        hosts[host] = hosts.get(host, 0) + 1
+        peaks['total'] = max(peaks['total'], running['total'])
+        peaks['zeronet'] = max(peaks['zeronet'], running['zeronet'])
+        peaks['host'] = max(peaks['host'], hosts[host])
+        try:
+            await asyncio.sleep(0.01)
+            if 'broken' in url:
+                raise RuntimeError('boom')
+        finally:
+            running['total'] -= 1
+            running[kind] -= 1
+            hosts[host] -= 1
+
+    latencies = await worker.run(urls, process)
+
+    assert set(latencies) == {url for url, _ in urls}
+    assert peaks['total'] == 4
+    assert peaks['zeronet'] == 1
+    assert peaks['host'] == 1
+
+
+@pytest.mark.asyncio
+async def test_task_manager_records_cycle_timing(app, monkeypatch):
+    from app.tasks.manager import TaskManager
+
+    task_manager = TaskManager()
+    processed = []
+
+    async def process_url(url):
+        await asyncio.sleep(0.01)
+        processed.append(url)
+
+    monkeypatch.setattr(task_manager, 'process_url', process_url)
+    with app.app_context():
+        await task_manager.scrape_urls([('https://a.com/', 'regular'), ('https://b.com/', 'regular')])
+
+    assert sorted(processed) == ['https://a.com/', 'https://b.com/']
+    stats = task_manager.get_scrape_stats()
+    assert stats['last_cycle']['urls'] == 2
+    assert stats['last_cycle']['duration'] < stats['last_cycle']['total_url_time']
+    assert stats['last_cycle']['m3u']['saved_fetches'] == 0
+    assert set(stats['url_latencies']) == {'https://a.com/', 'https://b.com/'}
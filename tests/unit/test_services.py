@@ -17,6 +17,9 @@ async def test_scraper_service_scrape_url(db_session):
     # Mock the scraper
     mock_scraper = AsyncMock()
     mock_scraper.scrape.return_value = ([("123", "Test Channel", {})], "OK")
+    mock_scraper.use_previous_fetch = Mock()
+    mock_scraper.unchanged = False
+    mock_scraper.fetch_state = Mock(return_value={'unchanged': False})
     
     # Use the new create_scraper_for_url function
     with patch('app.scrapers.create_scraper_for_url', return_value=mock_scraper):
@@ -0,0 +1,96 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import AcestreamChannel
+from app.models.tv_channel import TVChannel
+from app.services.status_sweeper import StatusSweeper
+
+HOUR = 3600
+
+
+@pytest.fixture
+def channels(app_context):
+    """Channels of every weight, all last checked two hours ago, and one never checked."""
+    checked = datetime.utcnow() - timedelta(hours=2)
+    favorite = TVChannel(name='Favorite', is_favorite=True)
+    listed = TVChannel(name='Listed')
+    retired = TVChannel(name='Retired', is_active=False, is_favorite=True)
+    db.session.add_all([favorite, listed, retired])
+    db.session.flush()
+    db.session.add_all([
+        AcestreamChannel(id='a' * 40, name='Plain', status='active', last_checked=checked, is_online=True),
+        AcestreamChannel(id='b' * 40, name='Favorite', status='active', last_checked=checked, is_online=True,
+                         tv_channel_id=favorite.id),
+        AcestreamChannel(id='c' * 40, name='Listed', status='active', last_checked=checked, is_online=True,
+                         tv_channel_id=listed.id),
+        AcestreamChannel(id='d' * 40, name='Retired', status='active', last_checked=checked, is_online=True,
+                         tv_channel_id=retired.id),
+        AcestreamChannel(id='e' * 40, name='Inactive', status='inactive', last_checked=checked, is_online=False),
+        AcestreamChannel(id='f' * 40, name='New', status='active'),
+    ])
+    db.session.commit()
+
+
+def checker(online=True, log=None):
+    async def check(batch):
+        if log is not None:
+            log.extend(channel.name for channel in batch)
+        return [online(channel) if callable(online) else online for channel in batch]
+    return check
+
+
+@pytest.mark.asyncio
+async def test_due_channels_are_checked_by_weight_and_staleness(channels):
+    # An ordinary channel is due every 6 hours, a favorite's every 30 minutes
+    sweeper = StatusSweeper(checks_per_minute=600, interval=6 * HOUR)
+    sweeper.sync()
+    snapshots = sweeper._snapshots
+    assert snapshots['b' * 40].favorite and snapshots['b' * 40].in_tv_channel
+    assert snapshots['d' * 40].in_tv_channel is False and snapshots['d' * 40].favorite is False
+
+    log = []
+    assert await sweeper.sweep_once(checker(log=log)) == 3
+    # Never checked first, then the favorite; the plain and inactive channels are not due yet
+    assert log == ['New', 'Favorite', 'Listed']
+    # The favorite is next, half an hour on
+    assert sweeper.queue.next_due() == pytest.approx(time.time() + HOUR / 2, abs=5)
+    assert await sweeper.sweep_once(checker(log=log)) == 0
+
+    stats = sweeper.get_stats()
+    assert stats['checks'] == 3 and stats['channels'] == 6 and stats['overdue'] == 0
+
+
+@pytest.mark.asyncio
+async def test_checks_stay_within_the_budget(channels):
+    sweeper = StatusSweeper(checks_per_minute=6, interval=HOUR)
+    sweeper.sync()
+    log = []
+    # One tick (10 seconds) of a 6 per minute budget: a single check, the most important first
+    assert await sweeper.sweep_once(checker(log=log)) == 1
+    assert await sweeper.sweep_once(checker(log=log)) == 0
+    assert log == ['New']
+    assert sweeper.get_stats()['overdue'] == 4
+    assert 9 < sweeper.next_wakeup() <= 10
+
+    assert await StatusSweeper(checks_per_minute=0, interval=HOUR).sweep_once(checker()) == 0
+
+
+@pytest.mark.asyncio
+async def test_flapping_channels_are_checked_more_often(channels):
+    sweeper = StatusSweeper(checks_per_minute=600, interval=HOUR)
+    sweeper.sync()
+    plain = sweeper._snapshots['a' * 40]
+    now = time.time()
+
+    # Going down and back up counts as flapping: a quarter of the interval to the next check
+    for online in (False, True):
+        sweeper.queue.schedule(plain.id, 0)
+        await sweeper.sweep_once(checker(online=lambda channel: online if channel is plain else True))
+    assert sweeper.is_flapping(plain.id, time.time())
+    assert sweeper.queue._due[plain.id] == pytest.approx(now + HOUR / 4, abs=5)
+    assert sweeper.get_stats()['flapping'] == 1
+    # Flips age out of the window
+    assert not sweeper.is_flapping(plain.id, time.time() + 7 * HOUR)